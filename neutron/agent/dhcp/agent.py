@@ -15,6 +15,7 @@
 
 import collections
 import os
+import time
 
 import eventlet
 from neutron_lib.agent import constants as agent_consts
@@ -22,11 +23,13 @@ from neutron_lib.agent import topics
 from neutron_lib import constants
 from neutron_lib import context
 from neutron_lib import exceptions
+from neutron_lib.utils import file as file_utils
 from neutron_lib.utils import runtime
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging
+from oslo_serialization import jsonutils
 from oslo_service import loopingcall
 from oslo_utils import fileutils
 from oslo_utils import importutils
@@ -44,6 +47,7 @@ from neutron import manager
 
 LOG = logging.getLogger(__name__)
 _SYNC_STATE_LOCK = lockutils.ReaderWriterLock()
+SYNC_PROGRESS_FILE = 'sync_progress.json'
 
 
 def _sync_lock(f):
@@ -100,6 +104,14 @@ class DhcpAgent(manager.Manager):
         self._process_monitor = external_process.ProcessMonitor(
             config=self.conf,
             resource_type='dhcp')
+        self._port_events = PortEventCoalescer(
+            self.conf.port_event_debounce_interval,
+            self._process_port_events)
+        # {network_id: time of the last port event}, used to prioritize the
+        # networks during a sync
+        self._port_activity = {}
+        self._sync_progress = SyncProgress(
+            os.path.join(dhcp_dir, SYNC_PROGRESS_FILE))
 
     def init_host(self):
         self.sync_state()
@@ -184,12 +196,22 @@ class DhcpAgent(manager.Manager):
         LOG.info('Synchronizing state')
         pool = eventlet.GreenPool(self.conf.num_sync_threads)
         known_network_ids = set(self.cache.get_network_ids())
+        paged = self.conf.sync_page_size > 0
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info(
-                enable_dhcp_filter=False)
-            LOG.info('All active networks have been fetched through RPC.')
-            active_network_ids = set(network.id for network in active_networks)
+            if paged:
+                active_networks = {}
+                ordered_network_ids = self.plugin_rpc.get_active_network_ids()
+                LOG.info('All active network IDs have been fetched through '
+                         'RPC.')
+            else:
+                active_networks = collections.OrderedDict(
+                    (network.id, network) for network in
+                    self.plugin_rpc.get_active_networks_info(
+                        enable_dhcp_filter=False))
+                ordered_network_ids = list(active_networks)
+                LOG.info('All active networks have been fetched through RPC.')
+            active_network_ids = set(ordered_network_ids)
             for deleted_id in known_network_ids - active_network_ids:
                 try:
                     self.disable_dhcp_helper(deleted_id)
@@ -198,12 +220,21 @@ class DhcpAgent(manager.Manager):
                     LOG.exception('Unable to sync network state on '
                                   'deleted network %s', deleted_id)
 
-            for network in active_networks:
+            sync_network_ids = self._prioritize_networks(
+                net_id for net_id in ordered_network_ids
                 if (not only_nets or  # specifically resync all
-                        network.id not in known_network_ids or  # missing net
-                        network.id in only_nets):  # specific network to sync
-                    pool.spawn(self.safe_configure_dhcp_for_network, network)
+                    net_id not in known_network_ids or  # missing net
+                    net_id in only_nets))  # specific network to sync
+            if paged:
+                sync_networks = self._iter_network_pages(sync_network_ids)
+            else:
+                sync_networks = (active_networks[net_id]
+                                 for net_id in sync_network_ids)
+            for network in sync_networks:
+                pool.spawn(self._sync_network, network, not only_nets)
             pool.waitall()
+            if not only_nets:
+                self._sync_progress.clear()
             # we notify all ports in case some were created while the agent
             # was down
             self.dhcp_ready_ports |= set(self.cache.get_port_ids(only_nets))
@@ -217,6 +248,54 @@ class DhcpAgent(manager.Manager):
                 self.schedule_resync(e)
             LOG.exception('Unable to sync network state.')
 
+    def _prioritize_networks(self, network_ids):
+        """Sort the networks to sync by priority.
+
+        Networks that were not configured by an interrupted full sync come
+        first, then the networks with the most recent port changes. The
+        networks configured by the interrupted sync are not skipped: the
+        cache of the agent, which the port events are applied to, and the
+        process monitor are rebuilt from them, their running dnsmasq
+        processes are adopted if dnsmasq_fast_restart is enabled.
+        """
+        return sorted(
+            network_ids,
+            key=lambda net_id: (net_id in self._sync_progress,
+                                -self._port_activity.get(net_id, 0)))
+
+    def _iter_network_pages(self, network_ids):
+        """Fetch the info of the given networks, a page at a time.
+
+        A failure only schedules a resync of the networks of the failed page.
+        """
+        page_size = self.conf.sync_page_size
+        for index in range(0, len(network_ids), page_size):
+            page = network_ids[index:index + page_size]
+            try:
+                networks = self.plugin_rpc.get_active_networks_info(
+                    enable_dhcp_filter=False, network_ids=page)
+            except Exception as e:
+                for network_id in page:
+                    self.schedule_resync(e, network_id)
+                LOG.exception('Unable to fetch the state of networks %s.',
+                              page)
+                continue
+            for network in networks:
+                yield network
+
+    def _sync_network(self, network, full_sync=False):
+        try:
+            configured = self.safe_configure_dhcp_for_network(network)
+        except Exception as e:
+            # already logged by safe_configure_dhcp_for_network; only this
+            # network is retried on the next periodic resync
+            self.schedule_resync(e, network.id)
+            return
+        # the driver errors are handled by call_driver, which schedules a
+        # resync of the network, it is not recorded as configured then
+        if full_sync and configured:
+            self._sync_progress.add(network.id)
+
     def _dhcp_ready_ports_loop(self):
         """Notifies the server of any ports that had reservations setup."""
         while True:
@@ -283,27 +362,36 @@ class DhcpAgent(manager.Manager):
         try:
             network_id = network.get('id')
             LOG.info('Starting network %s dhcp configuration', network_id)
-            self.configure_dhcp_for_network(network)
+            configured = self.configure_dhcp_for_network(network)
             LOG.info('Finished network %s dhcp configuration', network_id)
+            return configured
         except (exceptions.NetworkNotFound, RuntimeError):
             LOG.warning('Network %s may have been deleted and '
                         'its resources may have already been disposed.',
                         network.id)
+            return False
 
     def configure_dhcp_for_network(self, network):
+        """Configure DHCP for a network.
+
+        :returns: False if the driver failed to enable DHCP for the network,
+            True otherwise.
+        """
         if not network.admin_state_up:
-            return
+            return True
 
         for subnet in network.subnets:
             if subnet.enable_dhcp:
-                if self.call_driver('enable', network):
-                    self.update_isolated_metadata_proxy(network)
-                    self.cache.put(network)
-                    # After enabling dhcp for network, mark all existing
-                    # ports as ready. So that the status of ports which are
-                    # created before enabling dhcp can be updated.
-                    self.dhcp_ready_ports |= {p.id for p in network.ports}
+                if not self.call_driver('enable', network):
+                    return False
+                self.update_isolated_metadata_proxy(network)
+                self.cache.put(network)
+                # After enabling dhcp for network, mark all existing
+                # ports as ready. So that the status of ports which are
+                # created before enabling dhcp can be updated.
+                self.dhcp_ready_ports |= {p.id for p in network.ports}
                 break
+        return True
 
     def disable_dhcp_helper(self, network_id):
         """Disable DHCP for a network known to the agent."""
@@ -317,6 +405,8 @@ class DhcpAgent(manager.Manager):
             # destroy_monitored_metadata_proxy() is a noop when
             # there is no process running.
             self.disable_isolated_metadata_proxy(network)
+            self._port_events.discard(network.id)
+            self._port_activity.pop(network.id, None)
             if self.call_driver('disable', network):
                 self.cache.remove(network)
 
@@ -344,6 +434,9 @@ class DhcpAgent(manager.Manager):
                                       old_non_local_subnets)]
         new_cidrs = [s.cidr for s in (network.subnets +
                                       new_non_local_subnets)]
+        # The driver is about to be refreshed with the full network state, so
+        # any coalesced port events for it are already covered.
+        self._port_events.discard(network.id)
         if old_cidrs == new_cidrs:
             self.call_driver('reload_allocations', network)
             self.cache.put(network)
@@ -425,6 +518,7 @@ class DhcpAgent(manager.Manager):
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
         updated_port = dhcp.DictModel(payload['port'])
+        self._port_activity[updated_port.network_id] = time.time()
         with _net_lock(updated_port.network_id):
             if self.cache.is_port_message_stale(payload['port']):
                 LOG.debug("Discarding stale port update: %s", updated_port)
@@ -457,8 +551,52 @@ class DhcpAgent(manager.Manager):
                               network.id, old_ips, new_ips)
                     driver_action = 'restart'
             self.cache.put_port(updated_port)
+            if driver_action == 'reload_allocations':
+                self._reload_allocations(network, updated_port.id)
+                return
+            pending_port_ids = self._port_events.discard(network.id)
             self.call_driver(driver_action, network)
             self.dhcp_ready_ports.add(updated_port.id)
+            self.dhcp_ready_ports |= pending_port_ids
+            self.update_isolated_metadata_proxy(network)
+
+    def _reload_allocations(self, network, port_id=None):
+        """Reload the driver allocations for a port event.
+
+        When port event coalescing is enabled the reload is queued and done
+        once for all the events received for the network within the debounce
+        interval.
+        """
+        if self._port_events.enabled:
+            self._port_events.add(network.id, port_id)
+            return
+        self.call_driver('reload_allocations', network)
+        if port_id:
+            self.dhcp_ready_ports.add(port_id)
+        self.update_isolated_metadata_proxy(network)
+
+    @utils.exception_logger()
+    @_wait_if_syncing
+    def _process_port_events(self, network_id):
+        """Reload the driver once for the coalesced events of a network."""
+        with _net_lock(network_id):
+            batch = self._port_events.pop(network_id)
+            if not batch:
+                # already handled by a restart, refresh or disable
+                return
+            network = self.cache.get_network_by_id(network_id)
+            if not network:
+                return
+            LOG.debug("Reloading allocations for network %(net)s after "
+                      "%(events)d coalesced port events (queued for "
+                      "%(latency).3f seconds)",
+                      {'net': network_id, 'events': batch.events,
+                       'latency': batch.latency})
+            self.call_driver('reload_allocations', network)
+            # ports deleted while the batch was pending must not be reported
+            self.dhcp_ready_ports |= {
+                port_id for port_id in batch.port_ids
+                if self.cache.get_port_by_id(port_id)}
             self.update_isolated_metadata_proxy(network)
 
     def _is_port_on_this_agent(self, port):
@@ -475,6 +613,7 @@ class DhcpAgent(manager.Manager):
         network_id = self._get_network_lock_id(payload)
         if not network_id:
             return
+        self._port_activity[network_id] = time.time()
         with _net_lock(network_id):
             port_id = payload['port_id']
             port = self.cache.get_port_by_id(port_id)
@@ -487,11 +626,11 @@ class DhcpAgent(manager.Manager):
                 # the agent's port has been deleted. disable the service
                 # and add the network to the resync list to create
                 # (or acquire a reserved) port.
+                self._port_events.discard(network.id)
                 self.call_driver('disable', network)
                 self.schedule_resync("Agent port was deleted", port.network_id)
             else:
-                self.call_driver('reload_allocations', network)
-                self.update_isolated_metadata_proxy(network)
+                self._reload_allocations(network)
 
     def update_isolated_metadata_proxy(self, network):
         """Spawn or kill metadata proxy.
@@ -567,6 +706,8 @@ class DhcpPluginApi(object):
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
         1.5 - Added dhcp_ready_on_ports
+        1.7 - Added get_active_network_ids and the network_ids argument of
+              get_active_networks_info
 
     """
 
@@ -587,9 +728,16 @@ class DhcpPluginApi(object):
         # can be independently tracked server side.
         return context.get_admin_context_without_session()
 
+    def get_active_network_ids(self):
+        """Make a remote process call to retrieve the active network IDs."""
+        cctxt = self.client.prepare(version='1.7')
+        return cctxt.call(self.context, 'get_active_network_ids',
+                          host=self.host)
+
     def get_active_networks_info(self, **kwargs):
         """Make a remote process call to retrieve all network info."""
-        cctxt = self.client.prepare(version='1.1')
+        version = '1.7' if 'network_ids' in kwargs else '1.1'
+        cctxt = self.client.prepare(version=version)
         networks = cctxt.call(self.context, 'get_active_networks_info',
                               host=self.host, **kwargs)
         return [dhcp.NetModel(n) for n in networks]
@@ -732,6 +880,137 @@ class NetworkCache(object):
                 'ports': num_ports}
 
 
+class SyncProgress(object):
+    """Networks configured by the current full sync, persisted on disk.
+
+    The file is removed when the sync completes. If the agent is restarted
+    in the middle of a sync, the networks it had not configured yet are
+    synchronized first on the next run, the others are synchronized next.
+    """
+    # number of configured networks between two writes of the file
+    SAVE_INTERVAL = 50
+
+    def __init__(self, path):
+        self.path = path
+        self._network_ids = self._load()
+        self._unsaved = 0
+
+    def __contains__(self, network_id):
+        return network_id in self._network_ids
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                network_ids = set(jsonutils.loads(f.read())['completed'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return set()
+        LOG.info('Resuming an interrupted sync, %d networks were already '
+                 'configured.', len(network_ids))
+        return network_ids
+
+    def add(self, network_id):
+        self._network_ids.add(network_id)
+        self._unsaved += 1
+        if self._unsaved >= self.SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        self._unsaved = 0
+        try:
+            file_utils.replace_file(
+                self.path,
+                jsonutils.dumps({'completed': sorted(self._network_ids)}))
+        except (IOError, OSError):
+            LOG.warning('Unable to save the sync progress to %s', self.path)
+
+    def clear(self):
+        self._network_ids = set()
+        self._unsaved = 0
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class _PortEventBatch(object):
+    """Port events queued for a network."""
+    def __init__(self):
+        self.started = time.time()
+        self.events = 0
+        self.port_ids = set()
+
+    @property
+    def latency(self):
+        return time.time() - self.started
+
+
+class PortEventCoalescer(object):
+    """Coalesces port events into a single driver reload per network.
+
+    The first event queued for a network starts a debounce timer and later
+    events for the same network are added to the pending batch. When the
+    timer expires the process callback is invoked once for the network and
+    is expected to pop the batch. The callers keep applying the events to
+    the NetworkCache as they arrive, so creates and deletes are seen in the
+    order they were received and the reload always uses the latest state.
+    """
+    def __init__(self, interval, process_callback):
+        self.interval = interval
+        self._process_callback = process_callback
+        self._batches = {}
+        self._counters = collections.Counter()
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def add(self, network_id, port_id=None):
+        batch = self._batches.get(network_id)
+        if batch is None:
+            batch = self._batches[network_id] = _PortEventBatch()
+            eventlet.spawn_after(self.interval, self._process_callback,
+                                 network_id)
+        else:
+            self._counters['coalesced_events'] += 1
+        self._counters['received_events'] += 1
+        batch.events += 1
+        if port_id:
+            batch.port_ids.add(port_id)
+
+    def pop(self, network_id):
+        """Remove and return the pending batch of a network, if any."""
+        batch = self._batches.pop(network_id, None)
+        if batch:
+            latency = batch.latency
+            self._counters['processed_batches'] += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+        return batch
+
+    def discard(self, network_id):
+        """Drop the pending batch of a network and return its port IDs.
+
+        Used when the network is about to be fully restarted, refreshed or
+        disabled, which supersedes the queued reload.
+        """
+        batch = self.pop(network_id)
+        return batch.port_ids if batch else set()
+
+    def get_stats(self):
+        processed = self._counters['processed_batches']
+        return {
+            'pending_networks': len(self._batches),
+            'pending_events': sum(b.events for b in self._batches.values()),
+            'received_events': self._counters['received_events'],
+            'coalesced_events': self._counters['coalesced_events'],
+            'processed_batches': processed,
+            'avg_latency': (round(self._total_latency / processed, 3)
+                            if processed else 0.0),
+            'max_latency': round(self._max_latency, 3)}
+
+
 class DhcpAgentWithStateReport(DhcpAgent):
     def __init__(self, host=None, conf=None):
         super(DhcpAgentWithStateReport, self).__init__(host=host, conf=conf)
@@ -757,6 +1036,9 @@ class DhcpAgentWithStateReport(DhcpAgent):
         try:
             self.agent_state.get('configurations').update(
                 self.cache.get_state())
+            if self._port_events.enabled:
+                self.agent_state['configurations']['port_event_queue'] = (
+                    self._port_events.get_stats())
             ctx = context.get_admin_context_without_session()
             agent_status = self.state_rpc.report_state(
                 ctx, self.agent_state, True)
@@ -15,6 +15,7 @@
 
 import abc
 import collections
+import hashlib
 import os
 import re
 import shutil
@@ -60,6 +61,7 @@ NS_PREFIX = 'qdhcp-'
 DNSMASQ_SERVICE_NAME = 'dnsmasq'
 DHCP_RELEASE_TRIES = 3
 DHCP_RELEASE_TRIES_SLEEP = 0.3
+FINGERPRINT_FILES = ('host', 'addn_hosts', 'opts')
 
 # this variable will be removed when neutron-lib is updated with this value
 DHCP_OPT_CLIENT_ID_NUM = 61
@@ -324,6 +326,68 @@ class Dnsmasq(DhcpLocalProcess):
         except OSError:
             return []
 
+    def enable(self):
+        """Enables DHCP for this network by spawning a local process.
+
+        With dnsmasq_fast_restart, a running process, for instance one left
+        by a previous run of the agent, is adopted if it was started with
+        the configuration rendered for the network and restarted otherwise.
+        """
+        if not (self.conf.dnsmasq_fast_restart and self.active and
+                self._enable_dhcp()):
+            super(Dnsmasq, self).enable()
+            return
+        self.interface_name = self.device_manager.setup(self.network)
+        if self._adopt_process():
+            return
+        LOG.debug('Configuration of dnsmasq for network %s changed, '
+                  'restarting it', self.network.id)
+        self._get_process_manager().disable()
+        self.spawn_process()
+
+    def _adopt_process(self):
+        """Adopts the running process if its fingerprint is up to date."""
+        self._output_config_files()
+        pm = self._get_process_manager(
+            cmd_callback=self._build_cmdline_callback)
+        fingerprint = self._get_config_fingerprint(pm)
+        if (not fingerprint or
+                fingerprint != self._get_value_from_conf_file('fingerprint')):
+            return False
+        self.process_monitor.register(uuid=self.network.id,
+                                      service_name=DNSMASQ_SERVICE_NAME,
+                                      monitored_process=pm)
+        LOG.debug('Adopted running dnsmasq for network %s', self.network.id)
+        return True
+
+    def _get_config_fingerprint(self, pm):
+        """Returns a digest of the dnsmasq command line and config files.
+
+        The lines of the config files are sorted, so the fingerprint does not
+        depend on the order the ports were returned by the server.
+        """
+        digest = hashlib.sha256()
+        for arg in self._build_cmdline_callback(pm.get_pid_file_name()):
+            digest.update(arg.encode('utf-8') + b'\0')
+        for kind in FINGERPRINT_FILES:
+            try:
+                with open(self.get_conf_file_name(kind), 'rb') as f:
+                    lines = sorted(f.read().splitlines())
+            except IOError:
+                return None
+            digest.update(b'\0'.join([kind.encode('utf-8')] + lines))
+            digest.update(b'\0\0')
+        return digest.hexdigest()
+
+    def _update_config_fingerprint(self, pm):
+        file_name = self.get_conf_file_name('fingerprint')
+        fingerprint = (self.conf.dnsmasq_fast_restart and
+                       self._get_config_fingerprint(pm))
+        if fingerprint:
+            file_utils.replace_file(file_name, fingerprint)
+        else:
+            fileutils.delete_if_exists(file_name)
+
     def _build_cmdline_callback(self, pid_file):
         # We ignore local resolv.conf if dns servers are specified
         # or if local resolution is explicitly disabled.
@@ -463,6 +527,7 @@ class Dnsmasq(DhcpLocalProcess):
             cmd_callback=self._build_cmdline_callback)
 
         pm.enable(reload_cfg=reload_with_HUP)
+        self._update_config_fingerprint(pm)
 
         self.process_monitor.register(uuid=self.network.id,
                                       service_name=DNSMASQ_SERVICE_NAME,
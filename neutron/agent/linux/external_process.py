@@ -14,9 +14,12 @@
 
 import abc
 import collections
+import ctypes
+from ctypes import util
 import os.path
 
 import eventlet
+from eventlet import hubs
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -31,6 +34,18 @@ from neutron.conf.agent import common as agent_cfg
 
 LOG = logging.getLogger(__name__)
 
+# epoll is removed from the select module by the eventlet monkey patching,
+# it is only polled without blocking once its fd is readable
+select = eventlet.patcher.original('select')
+
+
+# pidfd_open(2) is only exposed by the os module from Python 3.9, it is called
+# through the syscall(3) wrapper of the C library otherwise. New system calls
+# have the same number on all the architectures.
+_os_pidfd_open = getattr(os, 'pidfd_open', None)
+_NR_PIDFD_OPEN = 434
+_libc = None
+
 
 agent_cfg.register_external_process_opts()
 agent_cfg.register_process_monitor_opts(cfg.CONF)
@@ -148,6 +163,41 @@ class ProcessManager(MonitoredProcess):
 
 
 ServiceId = collections.namedtuple('ServiceId', ['uuid', 'service'])
+WatchedProcess = collections.namedtuple('WatchedProcess', ['pid', 'pidfd'])
+
+
+def _syscall(*args):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(util.find_library('c'), use_errno=True)
+    return _libc.syscall(*args)
+
+
+def pidfd_open(pid):
+    """Returns a file descriptor referring to a process.
+
+    :raises OSError: if the process does not exist or the kernel does not
+        support pidfds.
+    """
+    if _os_pidfd_open:
+        return _os_pidfd_open(pid)
+    pidfd = _syscall(_NR_PIDFD_OPEN, pid, 0)
+    if pidfd < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return pidfd
+
+
+def pidfd_supported():
+    """Returns True if the exit of processes can be watched with pidfds."""
+    if not hasattr(select, 'epoll'):
+        return False
+    try:
+        os.close(pidfd_open(os.getpid()))
+    except (OSError, AttributeError):
+        # kernel older than 5.3, or C library without syscall(3)
+        return False
+    return True
 
 
 class ProcessMonitor(object):
@@ -164,8 +214,15 @@ class ProcessMonitor(object):
         self._resource_type = resource_type
 
         self._monitored_processes = {}
+        self._watched_processes = {}
+        self._watched_pidfds = {}
+        self._epoll = None
+        self._pidfd_watcher = None
 
         if self._config.AGENT.check_child_processes_interval:
+            if (self._config.AGENT.check_child_processes_events and
+                    pidfd_supported()):
+                self._epoll = select.epoll()
             self._spawn_checking_thread()
 
     def register(self, uuid, service_name, monitored_process):
@@ -188,6 +245,7 @@ class ProcessMonitor(object):
 
         service_id = ServiceId(uuid, service_name)
         self._monitored_processes[service_id] = monitored_process
+        self._watch(service_id, monitored_process)
 
     def unregister(self, uuid, service_name):
         """Stop monitoring a process.
@@ -207,18 +265,81 @@ class ProcessMonitor(object):
 
         service_id = ServiceId(uuid, service_name)
         self._monitored_processes.pop(service_id, None)
+        self._unwatch(service_id)
 
     def stop(self):
         """Stop the process monitoring.
 
-        This method will stop the monitoring thread, but no monitored
-        process will be stopped.
+        This method will stop the monitoring threads and close the pidfds
+        of the watched processes, but no monitored process will be stopped.
         """
         self._monitor_processes = False
+        if self._pidfd_watcher:
+            self._pidfd_watcher.kill()
+            self._pidfd_watcher = None
+        if self._epoll:
+            for service_id in list(self._watched_processes):
+                self._unwatch(service_id)
+            self._epoll.close()
+            self._epoll = None
 
     def _spawn_checking_thread(self):
         self._monitor_processes = True
         eventlet.spawn(self._periodic_checking_thread)
+        if self._epoll:
+            self._pidfd_watcher = eventlet.spawn(self._pidfd_watching_thread)
+
+    def _watch(self, service_id, monitored_process):
+        """Watches the exit of the process with a pidfd, if possible.
+
+        Processes whose pid is unknown yet, e.g. a daemon which did not write
+        its pid file yet, are left to the periodic checks which will try to
+        watch them again.
+        """
+        if not self._epoll:
+            return
+        pid = getattr(monitored_process, 'pid', None)
+        watched = self._watched_processes.get(service_id)
+        if watched and watched.pid == pid:
+            return
+        self._unwatch(service_id)
+        if not pid:
+            return
+        try:
+            pidfd = pidfd_open(pid)
+        except OSError:
+            return
+        # the pid file may be stale and the pid reused by another process,
+        # the pidfd is only kept if it refers to the monitored process
+        if not monitored_process.active:
+            os.close(pidfd)
+            return
+        self._epoll.register(pidfd, select.EPOLLIN)
+        self._watched_processes[service_id] = WatchedProcess(pid, pidfd)
+        self._watched_pidfds[pidfd] = service_id
+
+    def _unwatch(self, service_id):
+        watched = self._watched_processes.pop(service_id, None)
+        if watched:
+            del self._watched_pidfds[watched.pidfd]
+            self._epoll.unregister(watched.pidfd)
+            os.close(watched.pidfd)
+
+    def _check_child_process(self, service_id):
+        pm = self._monitored_processes.get(service_id)
+        if not pm:
+            return
+        if not pm.active:
+            LOG.error("%(service)s for %(resource_type)s "
+                      "with uuid %(uuid)s not found. "
+                      "The process should not have died",
+                      {'service': service_id.service,
+                       'resource_type': self._resource_type,
+                       'uuid': service_id.uuid})
+            self._execute_action(service_id)
+        # the process may have been respawned, or restarted with a new pid
+        # by its manager, e.g. on a reload
+        self._watch(service_id, pm)
 
     @lockutils.synchronized("_check_child_processes")
     def _check_child_processes(self):
@@ -226,16 +347,16 @@ class ProcessMonitor(object):
         # the case where other threads add or remove items from the
         # dictionary which otherwise will cause a RuntimeError
         for service_id in list(self._monitored_processes):
-            pm = self._monitored_processes.get(service_id)
-
-            if pm and not pm.active:
-                LOG.error("%(service)s for %(resource_type)s "
-                          "with uuid %(uuid)s not found. "
-                          "The process should not have died",
-                          {'service': service_id.service,
-                           'resource_type': self._resource_type,
-                           'uuid': service_id.uuid})
-                self._execute_action(service_id)
+            # the exit of watched processes is handled by the pidfd watching
+            # thread as soon as it happens
+            if service_id not in self._watched_processes:
+                self._check_child_process(service_id)
+                eventlet.sleep(0)
+
+    @lockutils.synchronized("_check_child_processes")
+    def _check_exited_child_processes(self, service_ids):
+        for service_id in service_ids:
+            self._check_child_process(service_id)
             eventlet.sleep(0)
 
     def _periodic_checking_thread(self):
@@ -243,6 +364,33 @@ class ProcessMonitor(object):
             eventlet.sleep(self._config.AGENT.check_child_processes_interval)
             eventlet.spawn(self._check_child_processes)
 
+    def _pidfd_watching_thread(self):
+        interval = self._config.AGENT.check_child_processes_interval
+        while self._monitor_processes:
+            try:
+                # the epoll fd becomes readable when one of the registered
+                # pidfds does, i.e. when a watched process exits
+                hubs.trampoline(self._epoll.fileno(), read=True,
+                                timeout=interval,
+                                timeout_exc=eventlet.Timeout)
+            except eventlet.Timeout:
+                continue
+            # processes exiting because they are stopped with the monitor
+            # must not be respawned
+            if self._monitor_processes:
+                self._handle_exited_child_processes()
+
+    def _handle_exited_child_processes(self):
+        service_ids = [self._watched_pidfds[fd]
+                       for fd, _event in self._epoll.poll(0)
+                       if fd in self._watched_pidfds]
+        # unwatched right away so the level triggered epoll fd is not
+        # readable anymore because of them
+        for service_id in service_ids:
+            self._unwatch(service_id)
+        if service_ids:
+            eventlet.spawn(self._check_exited_child_processes, service_ids)
+
     def _execute_action(self, service_id):
         action = self._config.AGENT.check_child_processes_action
         action_function = getattr(self, "_%s_action" % action)
@@ -14,6 +14,8 @@
 
 import hashlib
 import hmac
+import os
+import time
 
 from neutron_lib.agent import topics
 from neutron_lib import constants
@@ -24,13 +26,18 @@ import oslo_messaging
 from oslo_service import loopingcall
 from oslo_utils import encodeutils
 import requests
+from requests import adapters
 import six
 import six.moves.urllib.parse as urlparse
 import webob
 
 from neutron._i18n import _
 from neutron.agent.linux import utils as agent_utils
+from neutron.agent.metadata import port_cache
 from neutron.agent import rpc as agent_rpc
+from neutron.api.rpc.callbacks.consumer import registry as registry_rpc
+from neutron.api.rpc.callbacks import resources
+from neutron.api.rpc.handlers import resources_rpc
 from neutron.common import cache_utils as cache
 from neutron.common import constants as n_const
 from neutron.common import rpc as n_rpc
@@ -43,6 +50,7 @@ MODE_MAP = {
     config.GROUP_MODE: 0o664,
     config.ALL_MODE: 0o666,
 }
+PORT_CACHE_STATS_INTERVAL = 300
 
 
 class MetadataPluginAPI(object):
@@ -79,6 +87,48 @@ class MetadataProxyHandler(object):
 
         self.plugin_rpc = MetadataPluginAPI(topics.PLUGIN)
         self.context = context.get_admin_context_without_session()
+        self._port_cache = None
+        self._port_cache_pid = None
+        self._port_cache_stats_time = 0
+        self._session = None
+        self._session_pid = None
+        self._response_cache = {}
+        self._response_cache_purge_time = 0
+
+    def _get_port_cache(self):
+        """Returns the port lookup cache of the current worker process.
+
+        The cache is created on first use since the handler is instantiated
+        before the metadata workers are forked, and each worker needs its own
+        consumer for the port notifications invalidating the cache.
+        """
+        if not self.conf.metadata_port_cache_ttl:
+            return None
+        if self._port_cache_pid != os.getpid():
+            self._port_cache_pid = os.getpid()
+            self._port_cache = port_cache.PortLookupCache(
+                self.conf.metadata_port_cache_ttl,
+                self.conf.metadata_port_cache_negative_ttl)
+            registry_rpc.register(self._handle_port_notification,
+                                  resources.PORT)
+            connection = n_rpc.Connection()
+            connection.create_consumer(
+                resources_rpc.resource_type_versioned_topic(resources.PORT),
+                [resources_rpc.ResourcesPushRpcCallback()], fanout=True)
+            connection.consume_in_threads()
+        return self._port_cache
+
+    def _handle_port_notification(self, context, resource_type, ports,
+                                  event_type):
+        for port in ports:
+            self._port_cache.invalidate_port(port)
+
+    def _log_port_cache_stats(self, cache):
+        now = time.time()
+        if now - self._port_cache_stats_time < PORT_CACHE_STATS_INTERVAL:
+            return
+        self._port_cache_stats_time = now
+        LOG.info("Metadata port cache statistics: %s", cache.get_stats())
 
     @webob.dec.wsgify(RequestClass=webob.Request)
     def __call__(self, req):
@@ -143,16 +193,44 @@ class MetadataProxyHandler(object):
         given router. Either one of network_id or router_id must be passed.
 
         """
+        if not network_id and not router_id:
+            raise TypeError(_("Either one of parameter network_id or router_id"
+                              " must be passed to _get_ports method."))
+        cache = self._get_port_cache()
+        if cache:
+            return self._get_cached_ports(cache, remote_address, network_id,
+                                          router_id)
         if network_id:
             networks = (network_id,)
-        elif router_id:
-            networks = self._get_router_networks(router_id)
         else:
-            raise TypeError(_("Either one of parameter network_id or router_id"
-                              " must be passed to _get_ports method."))
+            networks = self._get_router_networks(router_id)
 
         return self._get_ports_for_remote_address(remote_address, networks)
 
+    def _get_cached_ports(self, cache, remote_address, network_id=None,
+                          router_id=None):
+        """Same as _get_ports, using the port lookup cache."""
+        self._log_port_cache_stats(cache)
+        key = (network_id or router_id, remote_address)
+        ports = cache.get_ports(key)
+        if ports is not None:
+            return ports
+        generation = cache.generation
+        if network_id:
+            networks = (network_id,)
+        else:
+            networks = cache.get_router_networks(router_id)
+            if networks is None:
+                networks = tuple(
+                    p['network_id'] for p in
+                    self._get_ports_from_server(router_id=router_id))
+                cache.set_router_networks(router_id, networks, generation)
+        ports = self._get_ports_from_server(networks=networks,
+                                            ip_address=remote_address)
+        cache.set_ports(key, networks, remote_address, ports, generation,
+                        router_id=router_id)
+        return ports
+
     def _get_instance_and_tenant_id(self, req):
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Neutron-Network-ID')
@@ -169,7 +247,57 @@ class MetadataProxyHandler(object):
             return ports[0]['device_id'], ports[0]['tenant_id']
         return None, None
 
+    def _get_session(self):
+        """Returns the HTTP session of the current worker process.
+
+        The session keeps up to nova_metadata_pool_maxsize connections to the
+        Nova metadata server alive, so consecutive requests do not need a new
+        TCP connection and TLS handshake. Requests wait for a free connection
+        when all of them are in use.
+        """
+        if self._session_pid != os.getpid():
+            self._session_pid = os.getpid()
+            self._session = requests.Session()
+            adapter = adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.conf.nova_metadata_pool_maxsize,
+                pool_block=True)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    def _get_cached_response(self, key):
+        cached = self._response_cache.get(key)
+        if cached and cached[0] > time.time():
+            return cached[1:]
+
+    def _cache_response(self, key, content_type, content):
+        now = time.time()
+        ttl = self.conf.nova_metadata_cache_ttl
+        if now - self._response_cache_purge_time > ttl:
+            self._response_cache_purge_time = now
+            self._response_cache = {
+                k: v for k, v in self._response_cache.items() if v[0] > now}
+        self._response_cache[key] = (now + ttl, content_type, content)
+
+    def _invalidate_cached_responses(self, instance_id):
+        self._response_cache = {k: v for k, v in self._response_cache.items()
+                                if k[0] != instance_id}
+
     def _proxy_request(self, instance_id, tenant_id, req):
+        cache_key = None
+        if self.conf.nova_metadata_cache_ttl:
+            if req.method == 'GET':
+                cache_key = (instance_id, req.path_info, req.query_string)
+                cached = self._get_cached_response(cache_key)
+                if cached:
+                    req.response.content_type, req.response.body = cached
+                    return req.response
+            else:
+                # the request may change the data returned by Nova for
+                # the instance, e.g. a password being set
+                self._invalidate_cached_responses(instance_id)
+
         headers = {
             'X-Forwarded-For': req.headers.get('X-Forwarded-For'),
             'X-Instance-ID': instance_id,
@@ -197,16 +325,19 @@ class MetadataProxyHandler(object):
             client_cert = (self.conf.nova_client_cert,
                            self.conf.nova_client_priv_key)
 
-        resp = requests.request(method=req.method, url=url,
-                                headers=headers,
-                                data=req.body,
-                                cert=client_cert,
-                                verify=verify_cert)
+        resp = self._get_session().request(method=req.method, url=url,
+                                           headers=headers,
+                                           data=req.body,
+                                           cert=client_cert,
+                                           verify=verify_cert)
 
         if resp.status_code == 200:
             req.response.content_type = resp.headers['content-type']
             req.response.body = resp.content
             LOG.debug(str(resp))
+            if cache_key:
+                self._cache_response(cache_key, req.response.content_type,
+                                     resp.content)
             return req.response
         elif resp.status_code == 403:
             LOG.warning(
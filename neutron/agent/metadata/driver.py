@@ -17,7 +17,9 @@ import errno
 import grp
 import os
 import pwd
+import re
 
+import eventlet
 from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
@@ -28,6 +30,8 @@ from neutron._i18n import _
 from neutron.agent.l3 import ha_router
 from neutron.agent.l3 import namespaces
 from neutron.agent.linux import external_process
+from neutron.agent.linux import ip_lib
+from neutron.agent.linux import utils as linux_utils
 from neutron.common import constants
 from neutron.common import exceptions
 
@@ -36,13 +40,23 @@ LOG = logging.getLogger(__name__)
 METADATA_SERVICE_NAME = 'metadata-proxy'
 
 PROXY_CONFIG_DIR = "ns-metadata-proxy"
-_HAPROXY_CONFIG_TEMPLATE = """
+HAPROXY_MAXCONN = 1024
+# global maxconn of a consolidated metadata proxy, which also bounds the
+# number of file descriptors haproxy needs
+CONSOLIDATED_HAPROXY_MAXCONN = 65536
+CONSOLIDATED_PROXY_UUID = 'metadata-proxy-%ss'
+# the changes of the proxied resources made within this delay (seconds),
+# e.g. while the agent syncs all its resources, are applied by a single
+# reload of the consolidated metadata proxy
+CONSOLIDATED_PROXY_RELOAD_DELAY = 1
+
+_HAPROXY_GLOBAL_TEMPLATE = """
 global
     log         /dev/log local0 %(log_level)s
     log-tag     %(log_tag)s
     user        %(user)s
     group       %(group)s
-    maxconn     1024
+    maxconn     %(maxconn)s
     pidfile     %(pidfile)s
     daemon
 
@@ -59,13 +73,27 @@ defaults
     timeout client          32s
     timeout server          32s
     timeout http-keep-alive 30s
+"""
 
+_HAPROXY_CONFIG_TEMPLATE = _HAPROXY_GLOBAL_TEMPLATE + """
 listen listener
     bind 0.0.0.0:%(port)s
     server metadata %(unix_socket_path)s
     http-request add-header X-Neutron-%(res_type)s-ID %(res_id)s
 """
 
+_HAPROXY_NAMESPACE_LISTEN_TEMPLATE = """
+listen %(res_type)s-%(res_id)s
+    bind 0.0.0.0:%(port)s namespace %(namespace)s
+    maxconn %(maxconn)s
+    server metadata %(unix_socket_path)s
+    http-request add-header X-Neutron-%(res_type)s-ID %(res_id)s
+"""
+# matches the resource type, ID, port and namespace of the listen sections
+_HAPROXY_NAMESPACE_LISTEN_RE = re.compile(
+    r'^listen (\w+)-(\S+)\n\s+bind 0\.0\.0\.0:(\d+) namespace (\S+)$',
+    re.MULTILINE)
+
 
 class InvalidUserOrGroupException(Exception):
     pass
@@ -94,8 +122,7 @@ class HaproxyConfigurator(object):
         uuid = network_id or router_id
         self.log_tag = "haproxy-" + METADATA_SERVICE_NAME + "-" + uuid
 
-    def create_config_file(self):
-        """Create the config file for haproxy."""
+    def _get_user_and_group_names(self):
         # Need to convert uid/gid into username/group
         try:
             username = pwd.getpwuid(int(self.user)).pw_name
@@ -114,12 +141,28 @@ class HaproxyConfigurator(object):
             except KeyError:
                 raise InvalidUserOrGroupException(
                     _("Invalid group/gid: '%s'") % self.group)
+        return username, groupname
+
+    def _write_config_file(self, uuid, haproxy_cfg):
+        LOG.debug("haproxy_cfg = %s", haproxy_cfg)
+        cfg_dir = self.get_config_path(self.state_path)
+        # uuid has to be included somewhere in the command line so that it can
+        # be tracked by process_monitor.
+        self.cfg_path = os.path.join(cfg_dir, "%s.conf" % uuid)
+        if not os.path.exists(cfg_dir):
+            os.makedirs(cfg_dir)
+        with open(self.cfg_path, "w") as cfg_file:
+            cfg_file.write(haproxy_cfg)
 
+    def create_config_file(self):
+        """Create the config file for haproxy."""
+        username, groupname = self._get_user_and_group_names()
         cfg_info = {
             'port': self.port,
             'unix_socket_path': self.unix_socket_path,
             'user': username,
             'group': groupname,
+            'maxconn': HAPROXY_MAXCONN,
             'pidfile': self.pidfile,
             'log_level': self.log_level,
             'log_tag': self.log_tag
@@ -132,15 +175,7 @@ class HaproxyConfigurator(object):
             cfg_info['res_id'] = self.router_id
 
         haproxy_cfg = _HAPROXY_CONFIG_TEMPLATE % cfg_info
-        LOG.debug("haproxy_cfg = %s", haproxy_cfg)
-        cfg_dir = self.get_config_path(self.state_path)
-        # uuid has to be included somewhere in the command line so that it can
-        # be tracked by process_monitor.
-        self.cfg_path = os.path.join(cfg_dir, "%s.conf" % cfg_info['res_id'])
-        if not os.path.exists(cfg_dir):
-            os.makedirs(cfg_dir)
-        with open(self.cfg_path, "w") as cfg_file:
-            cfg_file.write(haproxy_cfg)
+        self._write_config_file(cfg_info['res_id'], haproxy_cfg)
 
     @staticmethod
     def get_config_path(state_path):
@@ -163,9 +198,77 @@ class HaproxyConfigurator(object):
                 raise
 
 
+class ConsolidatedHaproxyConfigurator(HaproxyConfigurator):
+    """Configures one haproxy proxying the metadata of many namespaces.
+
+    Each proxied network or router gets its own listen section, bound in its
+    namespace with the namespace option of the haproxy bind keyword.
+
+    :param proxies: dict of (resource type, namespace, port) tuples by
+                    resource ID.
+    """
+
+    def __init__(self, uuid, proxies, unix_socket_path, user, group,
+                 state_path, pid_file):
+        self.uuid = uuid
+        self.proxies = proxies
+        self.user = user
+        self.group = group
+        self.state_path = state_path
+        self.unix_socket_path = unix_socket_path
+        self.pidfile = pid_file
+        self.log_level = (
+            'debug' if logging.is_debug_enabled(cfg.CONF) else 'info')
+        self.log_tag = "haproxy-" + uuid
+
+    def create_config_file(self):
+        """Create the config file for haproxy."""
+        username, groupname = self._get_user_and_group_names()
+        haproxy_cfg = _HAPROXY_GLOBAL_TEMPLATE % {
+            'user': username,
+            'group': groupname,
+            'maxconn': min(HAPROXY_MAXCONN * len(self.proxies),
+                           CONSOLIDATED_HAPROXY_MAXCONN),
+            'pidfile': self.pidfile,
+            'log_level': self.log_level,
+            'log_tag': self.log_tag}
+        for res_id, (res_type, namespace, port) in sorted(
+                self.proxies.items()):
+            haproxy_cfg += _HAPROXY_NAMESPACE_LISTEN_TEMPLATE % {
+                'res_type': res_type,
+                'res_id': res_id,
+                'namespace': namespace,
+                'port': port,
+                'maxconn': HAPROXY_MAXCONN,
+                'unix_socket_path': self.unix_socket_path}
+        self._write_config_file(self.uuid, haproxy_cfg)
+
+    @classmethod
+    def load_proxies(cls, uuid, state_path):
+        """Load the proxies of the config file written by a previous run.
+
+        :returns: dict of (resource type, namespace, port) tuples by
+                  resource ID, empty if there is no config file.
+        """
+        cfg_path = os.path.join(cls.get_config_path(state_path),
+                                "%s.conf" % uuid)
+        try:
+            with open(cfg_path) as cfg_file:
+                haproxy_cfg = cfg_file.read()
+        except (IOError, OSError):
+            return {}
+        return {res_id: (res_type, namespace, int(port))
+                for res_type, res_id, port, namespace in
+                _HAPROXY_NAMESPACE_LISTEN_RE.findall(haproxy_cfg)}
+
+
 class MetadataDriver(object):
 
     monitors = {}
+    # resources proxied by the consolidated metadata proxies, by proxy uuid
+    consolidated_proxies = {}
+    # pending reloads of the consolidated metadata proxies, by proxy uuid
+    _consolidated_reloads = {}
 
     def __init__(self, l3_agent):
         self.metadata_port = l3_agent.conf.metadata_port
@@ -230,9 +333,133 @@ class MetadataDriver(object):
 
         return callback
 
+    @classmethod
+    def _get_consolidated_metadata_proxy_process_manager(cls, proxy_uuid,
+                                                         conf):
+        def _create_config_file(pid_file):
+            user, group = cls._get_metadata_proxy_user_group(conf)
+            haproxy = ConsolidatedHaproxyConfigurator(
+                proxy_uuid, cls.consolidated_proxies[proxy_uuid],
+                conf.metadata_proxy_socket, user, group, conf.state_path,
+                pid_file)
+            haproxy.create_config_file()
+            return haproxy.cfg_path
+
+        def callback(pid_file):
+            return ['haproxy', '-f', _create_config_file(pid_file)]
+
+        def reload_callback(pid_file):
+            # the new haproxy process binds the sockets of the new
+            # configuration and asks the old one to finish serving its
+            # connections and exit
+            old_pid = linux_utils.get_value_from_file(pid_file, int)
+            return ['haproxy', '-f', _create_config_file(pid_file),
+                    '-sf', str(old_pid)]
+
+        return external_process.ProcessManager(
+            conf=conf,
+            uuid=proxy_uuid,
+            default_cmd_callback=callback,
+            custom_reload_callback=reload_callback,
+            run_as_root=True)
+
+    @classmethod
+    def _get_consolidated_proxies(cls, proxy_uuid, conf):
+        """Return the resources proxied by a consolidated metadata proxy.
+
+        After a restart of the agent, they are loaded from the config file
+        of the running process, so the resources synced again are not new
+        and do not reload it, and the process keeps proxying the resources
+        not synced yet. The resources whose namespace is gone are dropped.
+        """
+        proxies = cls.consolidated_proxies.get(proxy_uuid)
+        if proxies is None:
+            proxies = ConsolidatedHaproxyConfigurator.load_proxies(
+                proxy_uuid, conf.state_path)
+            if proxies:
+                namespaces = set(ip_lib.list_network_namespaces())
+                proxies = {res_id: proxy for res_id, proxy in proxies.items()
+                           if proxy[1] in namespaces}
+            cls.consolidated_proxies[proxy_uuid] = proxies
+        return proxies
+
+    @classmethod
+    def _schedule_consolidated_metadata_proxy_reload(cls, proxy_uuid, pm):
+        """Reload a consolidated metadata proxy after a short delay.
+
+        The changes made until then are applied by the same reload, which
+        spawns the process if it is not running.
+        """
+        if proxy_uuid not in cls._consolidated_reloads:
+            cls._consolidated_reloads[proxy_uuid] = eventlet.spawn_after(
+                CONSOLIDATED_PROXY_RELOAD_DELAY,
+                cls._reload_consolidated_metadata_proxy, proxy_uuid, pm)
+
+    @classmethod
+    def _reload_consolidated_metadata_proxy(cls, proxy_uuid, pm):
+        cls._consolidated_reloads.pop(proxy_uuid, None)
+        if cls.consolidated_proxies.get(proxy_uuid):
+            pm.enable(reload_cfg=True)
+
+    @classmethod
+    def _spawn_consolidated_metadata_proxy(cls, monitor, ns_name, port, conf,
+                                           network_id=None, router_id=None):
+        uuid = network_id or router_id
+        res_type = 'Network' if network_id else 'Router'
+        proxy_uuid = CONSOLIDATED_PROXY_UUID % res_type.lower()
+        proxies = cls._get_consolidated_proxies(proxy_uuid, conf)
+        proxy = (res_type, ns_name, port)
+        pm = cls._get_consolidated_metadata_proxy_process_manager(proxy_uuid,
+                                                                  conf)
+        if proxies.get(uuid) != proxy:
+            if uuid not in proxies:
+                # stop the dedicated proxy spawned before the consolidated
+                # mode was enabled, it listens on the same port
+                cls._get_metadata_proxy_process_manager(
+                    uuid, conf, ns_name=ns_name).disable()
+            proxies[uuid] = proxy
+            cls._schedule_consolidated_metadata_proxy_reload(proxy_uuid, pm)
+        elif proxy_uuid not in cls._consolidated_reloads:
+            # the configuration is unchanged, the process is only spawned
+            # again if it is not running
+            pm.enable()
+        monitor.register(proxy_uuid, METADATA_SERVICE_NAME, pm)
+        cls.monitors[router_id] = pm
+
+    @classmethod
+    def _destroy_consolidated_metadata_proxy(cls, monitor, uuid, conf):
+        if conf.metadata_proxy_consolidated:
+            for res_type in ('network', 'router'):
+                cls._get_consolidated_proxies(
+                    CONSOLIDATED_PROXY_UUID % res_type, conf)
+        for proxy_uuid, proxies in cls.consolidated_proxies.items():
+            if uuid in proxies:
+                break
+        else:
+            return
+        del proxies[uuid]
+        pm = cls._get_consolidated_metadata_proxy_process_manager(proxy_uuid,
+                                                                  conf)
+        if proxies:
+            cls._schedule_consolidated_metadata_proxy_reload(proxy_uuid, pm)
+            return
+        reload = cls._consolidated_reloads.pop(proxy_uuid, None)
+        if reload:
+            reload.cancel()
+        monitor.unregister(proxy_uuid, METADATA_SERVICE_NAME)
+        pm.disable()
+        HaproxyConfigurator.cleanup_config_file(proxy_uuid,
+                                                cfg.CONF.state_path)
+        del cls.consolidated_proxies[proxy_uuid]
+
     @classmethod
     def spawn_monitored_metadata_proxy(cls, monitor, ns_name, port, conf,
                                        network_id=None, router_id=None):
+        if conf.metadata_proxy_consolidated:
+            cls._spawn_consolidated_metadata_proxy(
+                monitor, ns_name, port, conf, network_id=network_id,
+                router_id=router_id)
+            return
         uuid = network_id or router_id
         callback = cls._get_metadata_proxy_callback(
             port, conf, network_id=network_id, router_id=router_id)
@@ -245,6 +472,9 @@ class MetadataDriver(object):
 
     @classmethod
     def destroy_monitored_metadata_proxy(cls, monitor, uuid, conf, ns_name):
+        # a dedicated proxy may also have been left by a previous run of the
+        # agent in the other mode, so it is always cleaned up
+        cls._destroy_consolidated_metadata_proxy(monitor, uuid, conf)
         monitor.unregister(uuid, METADATA_SERVICE_NAME)
         pm = cls._get_metadata_proxy_process_manager(uuid, conf,
                                                      ns_name=ns_name)
@@ -0,0 +1,128 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import time
+
+from neutron_lib import constants
+
+
+class PortLookupCache(object):
+    """Index of the ports found for a (network or router, IP address) key.
+
+    The entries are filled by the metadata proxy handler with the result of
+    the port lookups done through RPC and are invalidated when a port
+    notification is received for a port they contain or for one of the
+    (network, IP address) pairs they were searched on. Entries are also
+    dropped when they expire, after a short time for lookups which did not
+    find any port.
+    """
+
+    def __init__(self, ttl, negative_ttl):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (ports, expiration time, searched (network, address) pairs)
+        self._entries = {}
+        self._keys_by_address = collections.defaultdict(set)
+        self._keys_by_port = collections.defaultdict(set)
+        self._keys_by_router = collections.defaultdict(set)
+        self._router_networks = {}
+        # bumped on every invalidation, lookups which were in progress when
+        # it changed may have returned stale data and are not cached
+        self.generation = 0
+        self._stats = collections.Counter()
+
+    def get_router_networks(self, router_id):
+        networks = self._router_networks.get(router_id)
+        if networks is None or networks[1] < time.time():
+            return None
+        return networks[0]
+
+    def set_router_networks(self, router_id, networks, generation):
+        if generation == self.generation:
+            self._router_networks[router_id] = (
+                tuple(networks), time.time() + self.ttl)
+
+    def get_ports(self, key):
+        """Returns the cached ports for key or None on a cache miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] < time.time():
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+        if entry[0]:
+            self._stats['hits'] += 1
+        else:
+            self._stats['negative_hits'] += 1
+        return entry[0]
+
+    def set_ports(self, key, networks, ip_address, ports, generation,
+                  router_id=None):
+        """Caches the ports found for ip_address in networks under key."""
+        if generation != self.generation:
+            return
+        self._drop(key)
+        ttl = self.ttl if ports else self.negative_ttl
+        addresses = [(network_id, ip_address) for network_id in networks]
+        self._entries[key] = (ports, time.time() + ttl, addresses)
+        for address in addresses:
+            self._keys_by_address[address].add(key)
+        for port in ports:
+            self._keys_by_port[port['id']].add(key)
+        if router_id:
+            self._keys_by_router[router_id].add(key)
+
+    def invalidate_port(self, port):
+        """Drops the entries a created, updated or deleted port affects.
+
+        :param port: a Port object as received in a push notification.
+        """
+        self.generation += 1
+        keys = self._keys_by_port.pop(port.id, set())
+        for ip in port.fixed_ips:
+            keys |= self._keys_by_address.get(
+                (port.network_id, str(ip.ip_address)), set())
+        if port.device_owner in constants.ROUTER_INTERFACE_OWNERS:
+            # the networks connected to the router may have changed
+            self._router_networks.pop(port.device_id, None)
+            keys |= self._keys_by_router.pop(port.device_id, set())
+        for key in keys:
+            self._drop(key)
+        if keys:
+            self._stats['invalidations'] += len(keys)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for index, index_key in ([(self._keys_by_address, address)
+                                  for address in entry[2]] +
+                                 [(self._keys_by_port, port['id'])
+                                  for port in entry[0]] +
+                                 [(self._keys_by_router, key[0])]):
+            keys = index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[index_key]
+
+    def get_stats(self):
+        lookups = (self._stats['hits'] + self._stats['negative_hits'] +
+                   self._stats['misses'])
+        stats = {'entries': len(self._entries),
+                 'hit_rate': (float(lookups - self._stats['misses']) /
+                              lookups if lookups else 0.0)}
+        for name in ('hits', 'negative_hits', 'misses', 'invalidations'):
+            stats[name] = self._stats[name]
+        return stats
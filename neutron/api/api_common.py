@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import binascii
 import functools
 
 from neutron_lib.api import attributes
@@ -22,6 +24,7 @@ from oslo_config import cfg
 import oslo_i18n
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+import six
 from six.moves.urllib import parse
 from webob import exc
 
@@ -119,11 +122,79 @@ def is_empty_string_filtering_supported():
                                         get_instance().extensions)
 
 
+class PaginationMarker(six.text_type):
+    """The ID of the marker item of a page with the values of its sort keys.
+
+    The plugins get the marker as the ID of the marker item, the values of
+    its sort keys let the plugins supporting them build the keyset criteria
+    of the page without retrieving the marker item.
+    """
+
+    sort_values = None
+
+
+def get_marker(item, sort_keys, primary_key='id'):
+    """Returns the marker of the page following or preceding an item.
+
+    :param item: The first or last item of the page.
+    :param sort_keys: The sort keys of the items.
+    :param primary_key: The primary key of the items.
+    """
+    marker = PaginationMarker(item[primary_key])
+    sort_values = {primary_key: item[primary_key]}
+    for key in sort_keys:
+        if key not in item or not isinstance(
+                item[key], six.string_types + six.integer_types +
+                (float, type(None))):
+            # the marker item is retrieved by the plugin instead
+            return marker
+        sort_values[key] = item[key]
+    marker.sort_values = sort_values
+    return marker
+
+
+def _get_link_marker(request, item, id_key):
+    """Returns the marker of a pagination link.
+
+    The values of the sort keys other than the primary key are encoded
+    after the ID of the marker item, see decode_marker().
+    """
+    marker = get_marker(item, list_args(request, 'sort_key'), id_key)
+    sort_values = dict(marker.sort_values or {})
+    sort_values.pop(id_key, None)
+    if not sort_values:
+        return marker
+    cursor = base64.urlsafe_b64encode(jsonutils.dump_as_bytes(sort_values))
+    return '%s.%s' % (marker, cursor.decode('ascii').rstrip('='))
+
+
+def decode_marker(marker, primary_key='id'):
+    """Decodes the marker of a pagination link.
+
+    :returns: The marker, as a PaginationMarker with the values of the sort
+        keys encoded in the link if there are any.
+    """
+    marker_id, _sep, cursor = marker.rpartition('.')
+    if not marker_id:
+        return marker
+    try:
+        sort_values = jsonutils.loads(base64.urlsafe_b64decode(
+            str(cursor + '=' * (-len(cursor) % 4))))
+    except (binascii.Error, TypeError, ValueError):
+        # the ID of the marker item
+        return marker
+    if not isinstance(sort_values, dict):
+        return marker
+    marker = PaginationMarker(marker_id)
+    marker.sort_values = dict(sort_values, **{primary_key: marker_id})
+    return marker
+
+
 def get_previous_link(request, items, id_key):
     params = request.GET.copy()
     params.pop('marker', None)
     if items:
-        marker = items[0][id_key]
+        marker = _get_link_marker(request, items[0], id_key)
         params['marker'] = marker
     params['page_reverse'] = True
     return "%s?%s" % (prepare_url(request.path_url), parse.urlencode(params))
@@ -133,7 +204,7 @@ def get_next_link(request, items, id_key):
     params = request.GET.copy()
     params.pop('marker', None)
     if items:
-        marker = items[-1][id_key]
+        marker = _get_link_marker(request, items[-1], id_key)
         params['marker'] = marker
     params.pop('page_reverse', None)
     return "%s?%s" % (prepare_url(request.path_url), parse.urlencode(params))
@@ -272,6 +343,87 @@ def is_filter_validation_supported(plugin):
     return getattr(plugin, filter_validation_attr_name, False)
 
 
+def is_streaming_supported(native_pagination, native_sorting, limit=None):
+    """Return True if a list response can be streamed.
+
+    The items are retrieved in chunks using native pagination, which can't
+    be combined with the pagination requested by the user.
+    """
+    return bool(cfg.CONF.list_streaming_chunk_size and native_pagination and
+                native_sorting and not limit)
+
+
+class CollectionStream(object):
+    """A list response retrieved and serialized one chunk at a time.
+
+    The items are retrieved using native pagination, each chunk goes through
+    the filters added to the stream and is serialized before the next one is
+    retrieved, so the memory used by the response is bounded by the chunk
+    size instead of the size of the collection.
+
+    :param collection: the name of the collection.
+    :param lister: the plugin method listing the items, with all its
+        arguments but the pagination ones.
+    :param sorts: the sort keys and directions requested.
+    """
+
+    def __init__(self, collection, lister, sorts=None, primary_key='id'):
+        self.collection = collection
+        self.chunk_size = cfg.CONF.list_streaming_chunk_size
+        self._primary_key = primary_key
+        sorts = list(sorts or [])
+        if primary_key not in dict(sorts):
+            sorts.append((primary_key, True))
+        self._sort_keys = [key for key, _direction in sorts]
+        self._lister = functools.partial(lister, sorts=sorts,
+                                         limit=self.chunk_size,
+                                         page_reverse=False)
+        self._filters = []
+        # the first chunk is retrieved right away so errors are reported
+        # before the response is started
+        self._first_chunk = self._lister(marker=None)
+
+    def add_filter(self, chunk_filter):
+        """Add a function applied to each chunk of items.
+
+        The filters are applied in the order they were added, they are
+        called with a list of items and return the filtered list.
+        """
+        self._filters.append(chunk_filter)
+
+    def _get_chunks(self):
+        chunk, self._first_chunk = self._first_chunk, None
+        previous_marker = None
+        while chunk:
+            # the marker is taken before the items are filtered, they may
+            # be removed or stripped of their primary key
+            marker = (get_marker(chunk[-1], self._sort_keys,
+                                 self._primary_key)
+                      if len(chunk) >= self.chunk_size else None)
+            if marker and marker == previous_marker:
+                # the lister ignored the marker and returned the same items
+                return
+            previous_marker = marker
+            for chunk_filter in self._filters:
+                chunk = chunk_filter(chunk)
+            yield chunk
+            if not marker:
+                return
+            chunk = self._lister(marker=marker)
+
+    def serialize(self):
+        """Generate the JSON document of the response."""
+        yield jsonutils.dump_as_bytes(self.collection).join(
+            [b'{', b': ['])
+        separator = b''
+        for chunk in self._get_chunks():
+            if chunk:
+                yield separator + b', '.join(
+                    jsonutils.dump_as_bytes(item) for item in chunk)
+                separator = b', '
+        yield b']}'
+
+
 class PaginationHelper(object):
 
     def __init__(self, request, primary_key='id'):
@@ -296,6 +448,8 @@ class PaginationEmulatedHelper(PaginationHelper):
     def __init__(self, request, primary_key='id'):
         super(PaginationEmulatedHelper, self).__init__(request, primary_key)
         self.limit, self.marker = get_limit_and_marker(request)
+        if self.marker:
+            self.marker = decode_marker(self.marker, primary_key)
         self.page_reverse = get_page_reverse(request)
 
     def update_fields(self, original_fields, fields_to_add):
@@ -17,6 +17,8 @@ import copy
 import itertools
 import operator
 
+from neutron_lib.api.definitions import dns as dns_apidef
+from neutron_lib.api.definitions import extra_dhcp_opt as edo_ext
 from neutron_lib.api.definitions import portbindings
 from neutron_lib.api import extensions
 from neutron_lib.callbacks import resources
@@ -35,6 +37,8 @@ from neutron._i18n import _
 from neutron.common import constants as n_const
 from neutron.common import exceptions as n_exc
 from neutron.common import utils
+from neutron.db import _model_query as model_query
+from neutron.db import dhcp_info_db
 from neutron.db import provisioning_blocks
 from neutron.extensions import segment as segment_ext
 from neutron.quota import resource_registry
@@ -72,10 +76,12 @@ class DhcpRpcCallback(object):
     #     1.6 - Removed get_active_networks. It's not used by reference
     #           DHCP agent since Havana, so similar rationale for not bumping
     #           the major version as above applies here too.
+    #     1.7 - Added get_active_network_ids and the network_ids argument of
+    #           get_active_networks_info.
 
     target = oslo_messaging.Target(
         namespace=n_const.RPC_NAMESPACE_DHCP_PLUGIN,
-        version='1.6')
+        version='1.7')
 
     def _get_active_networks(self, context, **kwargs):
         """Retrieve and return a list of the active networks."""
@@ -136,22 +142,63 @@ class DhcpRpcCallback(object):
             grouped[net_id] = list(values)
         return grouped
 
-    def get_active_networks_info(self, context, **kwargs):
-        """Returns all the networks/subnets/ports in system."""
+    def get_active_network_ids(self, context, **kwargs):
+        """Returns the IDs of the active networks of the agent."""
         host = kwargs.get('host')
-        LOG.debug('get_active_networks_info from %s', host)
-        networks = self._get_active_networks(context, **kwargs)
-        plugin = directory.get_plugin()
+        LOG.debug('get_active_network_ids from %s', host)
+        return [network['id']
+                for network in self._get_active_networks(context, **kwargs)]
+
+    def _get_subnets_and_ports(self, context, plugin, networks,
+                               enable_dhcp_filter):
         filters = {'network_id': [network['id'] for network in networks]}
         ports = plugin.get_ports(context, filters=filters)
-        # default is to filter subnets based on 'enable_dhcp' flag
-        if kwargs.get('enable_dhcp_filter', True):
+        if enable_dhcp_filter:
             filters['enable_dhcp'] = [True]
         # NOTE(kevinbenton): we sort these because the agent builds tags
         # based on position in the list and has to restart the process if
         # the order changes.
         subnets = sorted(plugin.get_subnets(context, filters=filters),
                          key=operator.itemgetter('id'))
+        return subnets, ports
+
+    def _get_subnets_and_ports_projection(self, context, plugin, networks,
+                                          enable_dhcp_filter):
+        # NOTE: the subnets are returned sorted by ID, like above
+        return dhcp_info_db.get_networks_subnets_and_ports(
+            context, [network['id'] for network in networks],
+            enable_dhcp_filter=enable_dhcp_filter,
+            extra_dhcp_opts=extensions.is_extension_supported(
+                plugin, edo_ext.ALIAS),
+            dns_assignment=extensions.is_extension_supported(
+                plugin, dns_apidef.ALIAS))
+
+    def get_active_networks_info(self, context, **kwargs):
+        """Returns all the networks/subnets/ports in system.
+
+        If network_ids is passed, only the information of those networks,
+        previously returned by get_active_network_ids, is returned.
+        """
+        host = kwargs.get('host')
+        LOG.debug('get_active_networks_info from %s', host)
+        plugin = directory.get_plugin()
+        network_ids = kwargs.get('network_ids')
+        if network_ids is None:
+            networks = self._get_active_networks(context, **kwargs)
+        elif network_ids:
+            networks = plugin.get_networks(
+                context,
+                filters={'id': network_ids, 'admin_state_up': [True]})
+        else:
+            return []
+        # default is to filter subnets based on 'enable_dhcp' flag
+        enable_dhcp_filter = kwargs.get('enable_dhcp_filter', True)
+        if cfg.CONF.dhcp_agent_minimal_network_info:
+            subnets, ports = self._get_subnets_and_ports_projection(
+                context, plugin, networks, enable_dhcp_filter)
+        else:
+            subnets, ports = self._get_subnets_and_ports(
+                context, plugin, networks, enable_dhcp_filter)
         # Handle the possibility that the dhcp agent(s) only has connectivity
         # inside a segment.  If the segment service plugin is loaded and
         # there are active dhcp enabled subnets, then filter out the subnets
@@ -193,6 +240,10 @@ class DhcpRpcCallback(object):
 
     def get_network_info(self, context, **kwargs):
         """Retrieve and return extended information about a network."""
+        with model_query.loading_profile(context, model_query.RPC_AGENT):
+            return self._get_network_info(context, **kwargs)
+
+    def _get_network_info(self, context, **kwargs):
         network_id = kwargs.get('network_id')
         host = kwargs.get('host')
         LOG.debug('Network %(network_id)s requested from '
@@ -15,6 +15,7 @@
 
 import collections
 import copy
+import functools
 
 from neutron_lib.api import attributes
 from neutron_lib.api import faults
@@ -33,6 +34,7 @@ from neutron.api.v2 import resource as wsgi_resource
 from neutron.common import constants as n_const
 from neutron.common import exceptions as n_exc
 from neutron.common import rpc as n_rpc
+from neutron.db import _model_query as model_query
 from neutron.db import api as ndb_api
 from neutron import policy
 from neutron import quota
@@ -279,6 +281,11 @@ class Controller(object):
             return api_common.SortingEmulatedHelper(request, self._attr_info)
         return api_common.NoSortingHelper(request, self._attr_info)
 
+    def _list_objects(self, context, **kwargs):
+        obj_getter = getattr(self._plugin, self._plugin_handlers[self.LIST])
+        with model_query.loading_profile(context, model_query.API_LIST):
+            return obj_getter(context, **kwargs)
+
     def _items(self, request, do_authz=False, parent_id=None):
         """Retrieves and formats a list of elements of the requested entity."""
         # NOTE(salvatore-orlando): The following ensures that fields which
@@ -298,27 +305,21 @@ class Controller(object):
         sorting_helper.update_args(kwargs)
         sorting_helper.update_fields(original_fields, fields_to_add)
         pagination_helper.update_args(kwargs)
+        if api_common.is_streaming_supported(
+                self._native_pagination, self._native_sorting,
+                kwargs.get('limit')):
+            return self._stream_items(request, kwargs, fields_to_add,
+                                      do_authz, parent_id)
         pagination_helper.update_fields(original_fields, fields_to_add)
         if parent_id:
             kwargs[self._parent_id_name] = parent_id
-        obj_getter = getattr(self._plugin, self._plugin_handlers[self.LIST])
-        obj_list = obj_getter(request.context, **kwargs)
+        obj_list = self._list_objects(request.context, **kwargs)
         obj_list = sorting_helper.sort(obj_list)
         obj_list = pagination_helper.paginate(obj_list)
         # Check authz
         if do_authz:
-            # FIXME(salvatore-orlando): obj_getter might return references to
-            # other resources. Must check authZ on them too.
-            # Omit items from list that should not be visible
-            tmp_list = []
-            for obj in obj_list:
-                self._set_parent_id_into_ext_resources_request(
-                    request, obj, parent_id, is_get=True)
-                if policy.check(
-                        request.context, self._plugin_handlers[self.SHOW],
-                        obj, plugin=self._plugin, pluralized=self._collection):
-                    tmp_list.append(obj)
-            obj_list = tmp_list
+            obj_list = self._get_authorized_items(request, obj_list,
+                                                  parent_id)
         # Use the first element in the list for discriminating which attributes
         # should be filtered out because of authZ policies
         # fields_to_add contains a list of attributes added for request policy
@@ -340,6 +341,66 @@ class Controller(object):
             request.context, self._resource, request.context.tenant_id)
         return collection
 
+    def _get_authorized_items(self, request, obj_list, parent_id=None):
+        # FIXME(salvatore-orlando): obj_getter might return references to
+        # other resources. Must check authZ on them too.
+        # Omit items from list that should not be visible
+        for obj in obj_list:
+            self._set_parent_id_into_ext_resources_request(
+                request, obj, parent_id, is_get=True)
+        policy.prefetch_parent_resources(
+            request.context, self._plugin_handlers[self.SHOW], obj_list)
+        return [obj for obj in obj_list
+                if policy.check(request.context,
+                                self._plugin_handlers[self.SHOW],
+                                obj, plugin=self._plugin,
+                                pluralized=self._collection)]
+
+    def _stream_items(self, request, kwargs, fields_to_add, do_authz=False,
+                      parent_id=None):
+        """Returns a stream of the elements of the requested entity.
+
+        The elements are retrieved, authorized and formatted in chunks as
+        the response is sent.
+        """
+        fields = kwargs['fields']
+        # the primary key is needed to retrieve the next chunk
+        if fields and self._primary_key not in fields:
+            fields.append(self._primary_key)
+            fields_to_add.append(self._primary_key)
+        for key in ('limit', 'marker', 'page_reverse'):
+            kwargs.pop(key, None)
+        sorts = kwargs.pop('sorts', None)
+        if parent_id:
+            kwargs[self._parent_id_name] = parent_id
+        stream = api_common.CollectionStream(
+            self._collection,
+            functools.partial(self._list_objects, request.context, **kwargs),
+            sorts=sorts, primary_key=self._primary_key)
+        # Use the first authorized element of the stream for discriminating
+        # which attributes should be filtered out because of authZ policies,
+        # as done for the whole list
+        fields_to_strip = []
+
+        def _filter_chunk(obj_list):
+            if do_authz:
+                obj_list = self._get_authorized_items(request, obj_list,
+                                                      parent_id)
+            if obj_list and not fields_to_strip:
+                fields_to_strip.append(
+                    (fields_to_add or []) +
+                    self._exclude_attributes_by_policy(request.context,
+                                                       obj_list[0]))
+            return [self._filter_attributes(
+                        obj, fields_to_strip=fields_to_strip[0])
+                    for obj in obj_list]
+
+        stream.add_filter(_filter_chunk)
+        # Synchronize usage trackers, if needed
+        resource_registry.resync_resource(
+            request.context, self._resource, request.context.tenant_id)
+        return stream
+
     def _item(self, request, id, do_authz=False, field_list=None,
               parent_id=None):
         """Retrieves and formats a single element of the requested entity."""
@@ -459,6 +520,9 @@ class Controller(object):
         # current structure of this controller there will hardly be more than
         # one resource for which reservations are being made
         request_deltas = collections.defaultdict(int)
+        policy.prefetch_parent_resources(
+            request.context, action,
+            [item[self._resource] for item in items])
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
@@ -112,6 +112,10 @@ def Resource(controller, faults=None, deserializers=None, serializers=None,
             raise mapped_exc
 
         status = action_status.get(action, 200)
+        if isinstance(result, api_common.CollectionStream):
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=result.serialize())
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -145,6 +145,14 @@ PROCESS_MONITOR_OPTS = [
     cfg.IntOpt('check_child_processes_interval', default=60,
                help=_('Interval between checks of child process liveness '
                       '(seconds), use 0 to disable')),
+    cfg.BoolOpt('check_child_processes_events', default=False,
+                help=_('Watch the exit of the monitored child processes '
+                       'with process file descriptors (pidfd) when the '
+                       'kernel supports them, from Linux 5.3, so dead '
+                       'processes are handled immediately. The periodic '
+                       'liveness checks then only inspect the processes '
+                       'which could not be watched. The periodic checks are '
+                       'used for all the processes on older kernels.')),
 ]
 
 AVAILABILITY_ZONE_OPTS = [
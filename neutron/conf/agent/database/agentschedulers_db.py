@@ -41,6 +41,16 @@ AGENTS_SCHEDULER_OPTS = [
                        'selected for automatic scheduling regardless of this '
                        'option. But manual scheduling to such agents is '
                        'available if this option is True.')),
+    cfg.BoolOpt('dhcp_agent_minimal_network_info', default=False,
+                help=_('Build the network information sent to DHCP agents '
+                       'with projection queries that only load the subnet '
+                       'and port attributes used by the reference DHCP '
+                       'driver, instead of the full API representation of '
+                       'the resources. This reduces the load on the server '
+                       'when DHCP agents synchronize their state, but the '
+                       'port attributes added by extensions other than '
+                       'extra_dhcp_opt and dns-integration are not sent to '
+                       'the agents.')),
 ]
 
 
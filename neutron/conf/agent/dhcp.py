@@ -58,7 +58,22 @@ DHCP_AGENT_OPTS = [
     cfg.IntOpt('num_sync_threads', default=4,
                help=_('Number of threads to use during sync process. '
                       'Should not exceed connection pool size configured on '
-                      'server.'))
+                      'server.')),
+    cfg.FloatOpt('port_event_debounce_interval', default=0, min=0,
+                 help=_("Number of seconds during which port create, update "
+                        "and delete notifications for a network are "
+                        "coalesced before the DHCP driver reloads its "
+                        "allocations once for the whole batch. A value of 0 "
+                        "disables coalescing and every notification triggers "
+                        "an immediate reload.")),
+    cfg.IntOpt('sync_page_size', default=0, min=0,
+               help=_("Maximum number of networks whose information is "
+                      "fetched from the Neutron server in a single RPC call "
+                      "while synchronizing the agent state. The networks are "
+                      "configured while the following pages are fetched and "
+                      "an error only affects the networks of the failed "
+                      "page. A value of 0 fetches all the networks in a "
+                      "single call.")),
 ]
 
 DHCP_OPTS = [
@@ -92,6 +107,17 @@ DNSMASQ_OPTS = [
         'dnsmasq_lease_max',
         default=(2 ** 24),
         help=_('Limit number of leases to prevent a denial-of-service.')),
+    cfg.BoolOpt('dnsmasq_fast_restart', default=False,
+                help=_("Record a fingerprint of the command line and of the "
+                       "configuration files loaded by each dnsmasq process. "
+                       "When the DHCP agent enables a network whose dnsmasq "
+                       "process is already running, for instance after an "
+                       "agent restart, the process is adopted if its "
+                       "fingerprint matches the configuration rendered by "
+                       "the agent. Otherwise it is restarted as usual and its "
+                       "lease file is regenerated from the ports of the "
+                       "network. This reduces the agent restart time and the "
+                       "DHCP outage on hosts with many networks.")),
     cfg.BoolOpt('dhcp_broadcast_reply', default=False,
                 help=_("Use broadcast in DHCP replies.")),
     cfg.IntOpt('dhcp_renewal_time', default=0,
@@ -36,7 +36,17 @@ SHARED_OPTS = [
                default='',
                help=_("Group (gid or name) running metadata proxy after "
                       "its initialization (if empty: agent effective "
-                      "group)."))
+                      "group).")),
+    cfg.BoolOpt('metadata_proxy_consolidated',
+                default=False,
+                help=_("Run a single metadata proxy per agent, listening "
+                       "in the namespace of each router or network, instead "
+                       "of one metadata proxy process per namespace. The "
+                       "proxy is reloaded when namespaces are added or "
+                       "removed, once for the changes made within a second, "
+                       "and keeps its namespaces across agent restarts. "
+                       "Requires haproxy to be built with network namespace "
+                       "support (USE_NS)."))
 ]
 
 
@@ -72,7 +82,37 @@ METADATA_PROXY_HANDLER_OPTS = [
                help=_("Client certificate for nova metadata api server.")),
     cfg.StrOpt('nova_client_priv_key',
                default='',
-               help=_("Private key of client certificate."))
+               help=_("Private key of client certificate.")),
+    cfg.IntOpt('nova_metadata_pool_maxsize',
+               default=10,
+               min=1,
+               help=_("Maximum number of connections each metadata worker "
+                      "keeps open to the Nova metadata server. Requests "
+                      "wait for a free connection when all of them are "
+                      "in use.")),
+    cfg.IntOpt('nova_metadata_cache_ttl',
+               default=0,
+               min=0,
+               help=_("Time in seconds the successful responses of the Nova "
+                      "metadata server to GET requests are cached by each "
+                      "metadata worker. Any other request sent for an "
+                      "instance drops its cached responses. 0 disables "
+                      "the cache.")),
+    cfg.IntOpt('metadata_port_cache_ttl',
+               default=0,
+               min=0,
+               help=_("Time in seconds the ports found for the address of "
+                      "a metadata request are cached. Cached lookups are "
+                      "invalidated when a notification is received for a "
+                      "port they depend on. 0 disables the port lookup "
+                      "cache.")),
+    cfg.IntOpt('metadata_port_cache_negative_ttl',
+               default=5,
+               min=0,
+               help=_("Time in seconds the port lookup cache remembers that "
+                      "no port was found for the address of a metadata "
+                      "request. Only used when metadata_port_cache_ttl is "
+                      "set.")),
 ]
 
 
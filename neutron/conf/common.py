@@ -51,6 +51,34 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.IntOpt('list_streaming_chunk_size', default=0, min=0,
+               help=_("Number of items retrieved from the database, "
+                      "filtered and serialized at a time when streaming "
+                      "list responses. List requests without pagination "
+                      "parameters on resources supporting native "
+                      "pagination and sorting are streamed, so the memory "
+                      "used by the response is bounded by this number of "
+                      "items instead of the size of the collection. 0 "
+                      "disables streaming.")),
+    cfg.IntOpt('collection_count_cache_ttl', default=0, min=0,
+               help=_("Number of seconds the counts of the resources, "
+                      "done for the quotas and the list pages, are cached "
+                      "in memory by each API worker. The cached counts are "
+                      "invalidated when the worker changes the counted "
+                      "resources, but they may not reflect the changes "
+                      "done by the other workers and servers for up to "
+                      "this number of seconds. 0 disables the cache.")),
+    cfg.IntOpt('rbac_shared_objects_cache_ttl', default=0, min=0,
+               help=_("Number of seconds the IDs of the objects shared with "
+                      "a project by RBAC policies are cached in memory by "
+                      "each API worker, to filter the objects the project "
+                      "can access. The cached IDs are updated when the "
+                      "worker changes the RBAC policies, but they may not "
+                      "reflect the policies created or deleted by the other "
+                      "workers and servers for up to this number of "
+                      "seconds. 0 disables the cache, the objects are then "
+                      "filtered with a subquery on the RBAC policies of the "
+                      "project.")),
     cfg.ListOpt('default_availability_zones', default=[],
                 help=_("Default value of availability zone hints. The "
                        "availability zone aware schedulers use this when "
@@ -114,6 +142,27 @@ core_opts = [
                help=_("Neutron IPAM (IP address management) driver to use. "
                       "By default, the reference implementation of the "
                       "Neutron IPAM driver is used.")),
+    cfg.IntOpt('ipam_allocation_shards', default=0, min=0,
+               help=_("Number of shards the allocation pools of the subnets "
+                      "are divided into by the internal IPAM driver. Each "
+                      "API worker allocates the addresses from the shards "
+                      "it allocated from before, and its concurrent "
+                      "requests from different shards, picking another "
+                      "shard at random when they are exhausted, so that "
+                      "the concurrent allocations of addresses from a "
+                      "subnet rarely conflict. The pools of the existing "
+                      "subnets are divided when they are updated. 0 "
+                      "disables the shards, the addresses are then picked "
+                      "at random in a window starting at a random free "
+                      "address of the subnet.")),
+    cfg.IntOpt('ip_usage_check_interval', default=0, min=0,
+               help=_("Number of seconds between the checks of the counters "
+                      "of the used IPs of the subnets against the count of "
+                      "their IP allocations. The counters found out of "
+                      "sync, as after IP addresses were allocated or "
+                      "deallocated by servers not yet upgraded, are deleted "
+                      "so that they are initialized again from the "
+                      "allocations. 0 disables the checks.")),
     cfg.BoolOpt('vlan_transparent', default=False,
                 help=_('If True, then allow plugins that support it to '
                        'create VLAN transparent networks.')),
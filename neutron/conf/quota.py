@@ -61,6 +61,42 @@ core_quota_opts = [
                 help=_('Keep in track in the database of current resource '
                        'quota usage. Plugins which do not leverage the '
                        'neutron database should set this flag to False.')),
+    cfg.BoolOpt('track_quota_usage_deltas',
+                default=False,
+                help=_('Update the tracked quota usage of a tenant by the '
+                       'number of resources created or deleted, in the '
+                       'transaction creating or deleting them, instead of '
+                       'marking the usage dirty and counting the resources '
+                       'of the tenant again on the next quota check. The '
+                       'usage is still counted again when it is dirty or '
+                       'missing.')),
+    cfg.IntOpt('quota_usage_check_interval',
+               default=0, min=0,
+               help=_('Number of seconds between the checks of the tracked '
+                      'quota usages against the count of the resources of '
+                      'the tenants. The usages found out of sync are marked '
+                      'dirty so that they are counted again on the next '
+                      'quota check. 0 disables the checks.')),
+    cfg.IntOpt('reservation_cleanup_interval',
+               default=0, min=0,
+               help=_('Number of seconds between the removals of the expired '
+                      'quota reservations of all the tenants. The expired '
+                      'reservations of a tenant are otherwise only removed '
+                      'when the tenant makes a reservation. 0 disables the '
+                      'periodic removals.')),
+    cfg.IntOpt('quota_limits_cache_ttl',
+               default=0, min=0,
+               help=_('Number of seconds the quota limits set for the '
+                      'tenants are cached, so that the quota checks of the '
+                      'requests do not read them from the database. The '
+                      'limits are cached in the backend of the [cache] '
+                      'section when it is enabled, shared by the API '
+                      'workers and servers using it, in the memory of each '
+                      'API worker otherwise. The cached limits of a tenant '
+                      'are dropped when they are updated or deleted, but '
+                      'the limits cached in memory by the other workers and '
+                      'servers may not reflect the change for up to this '
+                      'number of seconds. 0 disables the cache.')),
 ]
 
 # security_group_quota_opts from neutron/extensions/securitygroup.py
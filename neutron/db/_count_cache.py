@@ -0,0 +1,162 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+NOTE: This module shall not be used by external projects. It will be moved
+      to neutron-lib in due course, and then it can be used from there.
+"""
+
+import collections
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
+
+# This dictionary will store the cached counts of the rows of the models.
+# The projects of an entry are the projects of the rows it counts, None if
+# the rows of any project can be counted.
+#   <model> : {<key> : (<count>, <expiration time>, <projects or None>)}
+_counts = collections.defaultdict(dict)
+# Bumped on every invalidation of the counts of a model, the counts which
+# were in progress when it changed may be stale and are not cached.
+_generations = collections.Counter()
+# The models whose counts depend on the rows of the related models, through
+# their relationships used by the query hooks and RBAC filters.
+#   <related model> : {<model>}
+_dependents = collections.defaultdict(set)
+_registered_models = set()
+# The maximum number of counts cached per model.
+MAX_COUNTS = 1000
+
+# The models with rows inserted, updated or deleted by the transaction of a
+# session are stored in the info of the session, the counts of these models
+# are not cached until the transaction ends.
+_PENDING_KEY = 'count_cache_pending'
+
+
+def get_generation(model):
+    return _generations[model]
+
+
+def get_count(session, model, key):
+    """Returns the cached count of the rows of a model, None if unknown."""
+    if model in session.info.get(_PENDING_KEY, {}):
+        return None
+    entry = _counts[model].get(key)
+    if entry is None:
+        return None
+    if entry[1] < time.time():
+        _counts[model].pop(key, None)
+        return None
+    return entry[0]
+
+
+def set_count(session, model, key, count, ttl, generation, projects=None):
+    """Caches the count of the rows of a model for ttl seconds.
+
+    The count is invalidated when a row of the model is inserted, updated or
+    deleted, for any project or for one of the given projects. It is not
+    cached if the counts of the model were invalidated since the generation
+    returned by get_generation() before counting the rows.
+    """
+    if (model in session.info.get(_PENDING_KEY, {}) or
+            generation != _generations[model]):
+        return
+    _register_events(model)
+    counts = _counts[model]
+    now = time.time()
+    if len(counts) >= MAX_COUNTS:
+        for cached_key, entry in list(counts.items()):
+            if entry[1] < now:
+                counts.pop(cached_key, None)
+        if len(counts) >= MAX_COUNTS:
+            return
+    counts[key] = (count, now + ttl,
+                   frozenset(projects) if projects else None)
+
+
+def invalidate(model, project_id=None):
+    """Drops the counts of a model affected by the rows of a project.
+
+    All the counts of the model are dropped when no project is given.
+    """
+    _generations[model] += 1
+    counts = _counts.get(model)
+    if not counts:
+        return
+    if project_id is None:
+        counts.clear()
+        return
+    for key, entry in list(counts.items()):
+        if entry[2] is None or project_id in entry[2]:
+            counts.pop(key, None)
+
+
+def clear():
+    _counts.clear()
+    _generations.clear()
+
+
+def _get_changes(model, project_id):
+    changes = [(model, project_id)]
+    changes.extend((dependent, None) for dependent in _dependents[model])
+    return changes
+
+
+def _row_event_handler(mapper, _conn, target):
+    changes = _get_changes(mapper.class_, getattr(target, 'project_id', None))
+    for model, project_id in changes:
+        invalidate(model, project_id)
+    session = orm.object_session(target)
+    if session is not None:
+        # the transaction may not be committed yet, the counts done by other
+        # transactions are invalidated again once it is
+        pending = session.info.setdefault(_PENDING_KEY, {})
+        for model, project_id in changes:
+            pending.setdefault(model, set()).add(project_id)
+
+
+def _listen(model):
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        if not event.contains(model, event_name, _row_event_handler):
+            event.listen(model, event_name, _row_event_handler)
+
+
+def _register_events(model):
+    if model in _registered_models:
+        return
+    _registered_models.add(model)
+    _listen(model)
+    for relationship in sa.inspect(model).relationships:
+        # the rows referenced by the rows of the model, as their standard
+        # attributes, are not used to filter them
+        if relationship.direction is orm.interfaces.MANYTOONE:
+            continue
+        related_model = relationship.mapper.class_
+        _dependents[related_model].add(model)
+        _listen(related_model)
+
+
+@event.listens_for(orm.Session, 'after_commit')
+@event.listens_for(orm.Session, 'after_rollback')
+def _transaction_end_handler(session):
+    for model, project_ids in session.info.pop(_PENDING_KEY, {}).items():
+        for project_id in project_ids:
+            invalidate(model, project_id)
+
+
+@event.listens_for(orm.Session, 'after_bulk_update')
+@event.listens_for(orm.Session, 'after_bulk_delete')
+def _bulk_event_handler(bulk_context):
+    for model, _project_id in _get_changes(bulk_context.mapper.class_, None):
+        invalidate(model)
@@ -0,0 +1,131 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+NOTE: This module shall not be used by external projects. It will be moved
+      to neutron-lib in due course, and then it can be used from there.
+"""
+
+import random
+
+from oslo_log import log as logging
+import sqlalchemy as sa
+from sqlalchemy import event
+
+from neutron.db import api as db_api
+from neutron.db.models import subnet_ip_usage
+from neutron.db import models_v2
+
+LOG = logging.getLogger(__name__)
+
+# The number of shards of the counters of the used IPs of the subnets.
+NUM_SHARDS = 16
+
+_usage_table = subnet_ip_usage.SubnetIpUsage.__table__
+_allocation_table = models_v2.IPAllocation.__table__
+
+
+def _count_allocations(connection, subnet_id):
+    return connection.scalar(
+        sa.select([sa.func.count()]).select_from(_allocation_table).where(
+            _allocation_table.c.subnet_id == subnet_id))
+
+
+def _shard_exists(connection, subnet_id, shard):
+    return connection.scalar(
+        sa.select([sa.func.count()]).select_from(_usage_table).where(
+            sa.and_(_usage_table.c.subnet_id == subnet_id,
+                    _usage_table.c.shard == shard)))
+
+
+def _change_used_ips(connection, subnet_id, delta):
+    shard = random.randrange(NUM_SHARDS)
+    result = connection.execute(
+        _usage_table.update().where(
+            sa.and_(_usage_table.c.subnet_id == subnet_id,
+                    _usage_table.c.shard == shard)).values(
+            used_ips=_usage_table.c.used_ips + delta))
+    if result.rowcount:
+        return
+    if shard and _shard_exists(connection, subnet_id, 0):
+        connection.execute(_usage_table.insert().values(
+            subnet_id=subnet_id, shard=shard, used_ips=delta))
+        return
+    # The counter of the subnet is initialized in the first shard from its
+    # allocations, which include this change. A concurrent initialization
+    # fails with a duplicate entry and is retried.
+    connection.execute(_usage_table.insert().values(
+        subnet_id=subnet_id, shard=0,
+        used_ips=_count_allocations(connection, subnet_id)))
+
+
+@event.listens_for(models_v2.IPAllocation, 'after_insert')
+def _allocation_insert_handler(_mapper, connection, target):
+    _change_used_ips(connection, target.subnet_id, 1)
+
+
+@event.listens_for(models_v2.IPAllocation, 'after_delete')
+def _allocation_delete_handler(_mapper, connection, target):
+    _change_used_ips(connection, target.subnet_id, -1)
+
+
+def delete_used_ips(context, subnet_ids):
+    """Delete the counters of the used IPs of subnets.
+
+    The used IPs of the subnets are counted from their allocations until
+    their counters are initialized again, when an address is next allocated
+    or deallocated in them.
+
+    :param context: The request context.
+    :param subnet_ids: The IDs of the subnets.
+    """
+    if not subnet_ids:
+        return
+    with db_api.context_manager.writer.using(context):
+        context.session.query(subnet_ip_usage.SubnetIpUsage).filter(
+            subnet_ip_usage.SubnetIpUsage.subnet_id.in_(subnet_ids)).delete(
+            synchronize_session=False)
+
+
+def check_used_ips(context):
+    """Delete the counters of the used IPs out of sync with the allocations.
+
+    The counters are not updated by the servers not upgraded yet, they are
+    compared with a count of the allocations of the subnets and deleted if
+    they differ, so that they are initialized again.
+
+    :param context: The request context.
+    :returns: The IDs of the subnets whose counters were deleted.
+    """
+    usage = subnet_ip_usage.SubnetIpUsage
+    allocation = models_v2.IPAllocation
+    with db_api.context_manager.reader.using(context):
+        used_ips = dict(context.session.query(
+            usage.subnet_id, sa.func.sum(usage.used_ips)).group_by(
+            usage.subnet_id))
+        counts = dict(context.session.query(
+            allocation.subnet_id, sa.func.count()).filter(
+            allocation.subnet_id.in_(
+                context.session.query(usage.subnet_id))).group_by(
+            allocation.subnet_id))
+    out_of_sync_subnets = []
+    for subnet_id, used in used_ips.items():
+        in_use = counts.get(subnet_id, 0)
+        if used == in_use:
+            continue
+        LOG.warning("Used IPs of subnet %(subnet_id)s are %(used)d, "
+                    "%(in_use)d counted. Deleting its counters.",
+                    {'subnet_id': subnet_id, 'used': used,
+                     'in_use': in_use})
+        out_of_sync_subnets.append(subnet_id)
+    delete_used_ips(context, out_of_sync_subnets)
+    return out_of_sync_subnets
@@ -16,14 +16,24 @@ NOTE: This module shall not be used by external projects. It will be moved
       to neutron-lib in due course, and then it can be used from there.
 """
 
+import collections
+import contextlib
+
 from neutron_lib.api import attributes
 from neutron_lib.db import model_query
 from neutron_lib.db import utils as db_utils
 from neutron_lib.objects import utils as obj_utils
 from neutron_lib.utils import helpers
+from oslo_config import cfg
 from oslo_db.sqlalchemy import utils as sa_utils
+import six
+import sqlalchemy as sa
 from sqlalchemy import sql, or_, and_
 from sqlalchemy.ext import associationproxy
+from sqlalchemy import orm
+
+from neutron.db import _count_cache
+from neutron.db import _rbac_cache
 
 
 # TODO(boden): remove shims
@@ -31,20 +41,117 @@ _model_query_hooks = model_query._model_query_hooks
 register_hook = model_query.register_hook
 get_hooks = model_query.get_hooks
 
+# Relationship loading profiles, selecting how the relationships of the
+# queried models are loaded for a kind of call.
+# The resources listed by the API.
+API_LIST = 'api-list'
+# The resources retrieved by the agents through RPC.
+RPC_AGENT = 'rpc-agent'
+# The resources counted, no relationship is needed.
+COUNT_ONLY = 'count-only'
+
+# The maximum number of cached object IDs the RBAC filters compare the
+# objects to, the larger sets are filtered with a subquery.
+_MAX_RBAC_IDS = 1000
+
+_LOADING_STRATEGIES = {
+    'joined': orm.joinedload,
+    'subquery': orm.subqueryload,
+    'selectin': orm.selectinload,
+    'lazy': orm.lazyload,
+    'noload': orm.noload,
+}
+
+# This dictionary will store the loading strategies of the profiles, the
+# strategies registered for the None model apply to all the models.
+#   <profile> : {<model or None> : {<relationship or '*'> : <strategy>}}
+_loading_profiles = collections.defaultdict(dict)
+
+
+def register_loading_profile(profile, model, strategies):
+    """Register the loading strategies of relationships for a profile.
+
+    :param profile: The name of the loading profile.
+    :param model: The model the strategies apply to, None for all the models.
+    :param strategies: A dict of the loading strategies, one of 'joined',
+        'subquery', 'selectin', 'lazy' and 'noload', by relationship name.
+        The strategy of '*' applies to the relationships without strategy,
+        they keep the loading strategy of the model otherwise.
+    """
+    for strategy in strategies.values():
+        if strategy not in _LOADING_STRATEGIES:
+            raise ValueError("Unknown loading strategy: %s" % strategy)
+    _loading_profiles[profile].setdefault(model, {}).update(strategies)
+
+
+def get_loading_options(model, profile):
+    """Returns the query options loading the model as in the profile."""
+    profile_strategies = _loading_profiles.get(profile, {})
+    strategies = dict(profile_strategies.get(None, {}))
+    strategies.update(profile_strategies.get(model, {}))
+    default = strategies.pop('*', None)
+    options = [_LOADING_STRATEGIES[strategy](getattr(model, name))
+               for name, strategy in sorted(strategies.items())
+               if hasattr(model, name)]
+    if default:
+        # NOTE: must be the last option, it only applies to the
+        # relationships without any other option
+        options.append(_LOADING_STRATEGIES[default]('*'))
+    return options
+
+
+# The counts made by get_collection_count() with a context, see count_mode().
+# The counts are not read from nor stored in the cache, for the quotas.
+EXACT_COUNT = 'exact'
+# The counts of all the rows of a table are estimated from the statistics of
+# the database, for the admin dashboards.
+APPROXIMATE_COUNT = 'approximate'
+
+
+@contextlib.contextmanager
+def count_mode(context, mode):
+    """Count the rows of the models queried with the context as in the mode.
+
+    The mode is used by get_collection_count() and is one of EXACT_COUNT or
+    APPROXIMATE_COUNT.
+    """
+    previous_mode = getattr(context, 'count_mode', None)
+    context.count_mode = mode
+    try:
+        yield
+    finally:
+        context.count_mode = previous_mode
 
-def query_with_hooks(context, model):
+
+@contextlib.contextmanager
+def loading_profile(context, profile):
+    """Load the models queried with the context as in the profile.
+
+    The profile is used by the queries of query_with_hooks() unless they
+    are given their own profile.
+    """
+    previous_profile = getattr(context, 'loading_profile', None)
+    context.loading_profile = profile
+    try:
+        yield
+    finally:
+        context.loading_profile = previous_profile
+
+
+def query_with_hooks(context, model, profile=None):
     query = context.session.query(model)
+    profile = profile or getattr(context, 'loading_profile', None)
+    if profile:
+        options = get_loading_options(model, profile)
+        if options:
+            query = query.options(*options)
     # define basic filter condition for model query
     query_filter = None
     if db_utils.model_query_scope_is_project(context, model):
         if hasattr(model, 'rbac_entries'):
-            query = query.outerjoin(model.rbac_entries)
-            rbac_model = model.rbac_entries.property.mapper.class_
             query_filter = (
                 (model.tenant_id == context.tenant_id) |
-                ((rbac_model.action == 'access_as_shared') &
-                 ((rbac_model.target_tenant == context.tenant_id) |
-                  (rbac_model.target_tenant == '*'))))
+                get_rbac_filter(context, model, 'access_as_shared'))
         elif hasattr(model, 'shared'):
             query_filter = ((model.tenant_id == context.tenant_id) |
                             (model.shared == sql.true()))
@@ -67,8 +174,44 @@ def query_with_hooks(context, model):
     return query
 
 
-def get_by_id(context, model, object_id):
-    query = query_with_hooks(context=context, model=model)
+def get_rbac_filter(context, model, action):
+    """Returns the criteria of the objects of a model granted to a project.
+
+    The objects are those with an RBAC entry granting the action to the
+    project of the context or to all the projects. The criteria are an IN
+    against the IDs of the objects, a list of the IDs cached per project
+    when rbac_shared_objects_cache_ttl is set, or a subquery on the RBAC
+    entries of the project otherwise. The subquery is not correlated to the
+    queried rows and seeks the entries of the project in the unique index
+    of the RBAC table, so neither depends on the total number of entries.
+
+    :param context: The context of the project, may be None to match the
+        entries granting the action to all the projects only.
+    :param model: A model with rbac_entries.
+    :param action: The action of the RBAC entries, as 'access_as_shared'.
+    """
+    rbac_model = model.rbac_entries.property.mapper.class_
+    # This is the column joining the table to rbac via the object_id. We
+    # can't just use model.id because subnets join on network.id so we have
+    # to inspect the relationship.
+    object_id = list(model.rbac_entries.property.local_columns)[0]
+    project_id = context.tenant_id if context else None
+    ttl = cfg.CONF.rbac_shared_objects_cache_ttl
+    if ttl and project_id:
+        object_ids = _rbac_cache.get_object_ids(context, rbac_model, action,
+                                                ttl)
+        if object_ids is not None and len(object_ids) <= _MAX_RBAC_IDS:
+            return object_id.in_(sorted(object_ids)) if object_ids else (
+                sql.false())
+    target_tenants = ['*', project_id] if project_id else ['*']
+    return object_id.in_(
+        sa.select([rbac_model.object_id]).where(and_(
+            rbac_model.target_tenant.in_(target_tenants),
+            rbac_model.action == action)))
+
+
+def get_by_id(context, model, object_id, profile=None):
+    query = query_with_hooks(context=context, model=model, profile=profile)
     return query.filter(model.id == object_id).one()
 
 
@@ -109,39 +252,18 @@ def apply_filters(query, model, filters, context=None):
                     query = query.filter(column.in_(value))
             elif key == 'shared' and hasattr(model, 'rbac_entries'):
                 # translate a filter on shared into a query against the
-                # object's rbac entries
-                rbac = model.rbac_entries.property.mapper.class_
-                matches = [rbac.target_tenant == '*']
-                if context:
-                    matches.append(rbac.target_tenant == context.tenant_id)
-                # any 'access_as_shared' records that match the
-                # wildcard or requesting tenant
-                is_shared = and_(rbac.action == 'access_as_shared',
-                                 or_(*matches))
+                # object's rbac entries: any 'access_as_shared' records that
+                # match the wildcard or requesting tenant
+                is_shared = get_rbac_filter(context, model,
+                                            'access_as_shared')
                 if not value[0]:
                     # NOTE(kevinbenton): we need to find objects that don't
-                    # have an entry that matches the criteria above so
-                    # we use a subquery to exclude them.
-                    # We can't just filter the inverse of the query above
-                    # because that will still give us a network shared to
-                    # our tenant (or wildcard) if it's shared to another
-                    # tenant.
-                    # This is the column joining the table to rbac via
-                    # the object_id. We can't just use model.id because
-                    # subnets join on network.id so we have to inspect the
-                    # relationship.
-                    join_cols = model.rbac_entries.property.local_columns
-                    oid_col = list(join_cols)[0]
-                    is_shared = ~oid_col.in_(
-                        query.session.query(rbac.object_id).filter(is_shared)
-                    )
-                elif (not context or
-                      not db_utils.model_query_scope_is_project(
-                          context, model)):
-                    # we only want to join if we aren't using the subquery
-                    # and if we aren't already joined because this is a
-                    # scoped query
-                    query = query.outerjoin(model.rbac_entries)
+                    # have an entry that matches the criteria above.
+                    # We can't just filter the inverse of a join on the
+                    # entries because that will still give us a network
+                    # shared to our tenant (or wildcard) if it's shared to
+                    # another tenant.
+                    is_shared = ~is_shared
                 query = query.filter(is_shared)
         for hook in get_hooks(model):
             result_filter = helpers.resolve_ref(
@@ -152,9 +274,15 @@ def apply_filters(query, model, filters, context=None):
 
 
 def get_collection_query(context, model, filters=None, sorts=None, limit=None,
-                         marker_obj=None, page_reverse=False):
-    collection = query_with_hooks(context, model)
+                         marker_obj=None, page_reverse=False, profile=None):
+    collection = query_with_hooks(context, model, profile=profile)
     collection = apply_filters(collection, model, filters, context)
+    return sort_and_paginate(collection, model, sorts=sorts, limit=limit,
+                             marker_obj=marker_obj, page_reverse=page_reverse)
+
+
+def sort_and_paginate(collection, model, sorts=None, limit=None,
+                      marker_obj=None, page_reverse=False):
     if sorts:
         sort_keys = db_utils.get_and_validate_sort_keys(sorts, model)
         sort_dirs = db_utils.get_sort_dirs(sorts, page_reverse)
@@ -164,33 +292,151 @@ def get_collection_query(context, model, filters=None, sorts=None, limit=None,
         #  loading_relationships.html#subqueryload-ordering)
         # (http://docs.sqlalchemy.org/en/latest/faq/
         #  ormconfiguration.html#faq-subqueryload-limit-sort)
-        for k in _unique_keys(model):
+        for k in _unique_keys(model, sort_keys):
             if k not in sort_keys:
                 sort_keys.append(k)
                 sort_dirs.append('asc')
+        if marker_obj is not None:
+            collection = collection.filter(get_keyset_criteria(
+                model, sort_keys, sort_dirs,
+                [getattr(marker_obj, key) for key in sort_keys]))
+        if _get_dialect_name(collection) == 'postgresql':
+            # sort the NULL values first as MySQL and SQLite do, the keyset
+            # criteria depend on it
+            sort_dirs = [sort_dir + ('-nullsfirst' if sort_dir == 'asc'
+                                     else '-nullslast')
+                         for sort_dir in sort_dirs]
         collection = sa_utils.paginate_query(collection, model, limit,
-                                             marker=marker_obj,
                                              sort_keys=sort_keys,
                                              sort_dirs=sort_dirs)
     return collection
 
 
-def _unique_keys(model):
-    # just grab first set of unique keys and use them.
+class _Marker(object):
+    """The marker of a page, built from the sort values sent with it.
+
+    The marker object is only retrieved if a sort key misses from the
+    sort values.
+    """
+
+    def __init__(self, sort_values, get_object):
+        self._sort_values = sort_values
+        self._get_object = get_object
+        self._object = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._sort_values:
+            return self._sort_values[name]
+        if self._object is None:
+            self._object = self._get_object()
+        return getattr(self._object, name)
+
+
+def get_marker(marker, get_object):
+    """Returns the marker object of a page.
+
+    :param marker: The marker of the page, the ID of the marker object
+        with the values of its sort keys in the sort_values attribute when
+        they are known.
+    :param get_object: The function retrieving the marker object, only
+        called when the values of the sort keys are not all known.
+    """
+    sort_values = getattr(marker, 'sort_values', None)
+    if sort_values:
+        return _Marker(sort_values, get_object)
+    return get_object()
+
+
+def get_marker_obj(plugin, context, resource, limit, marker):
+    """Retrieve a resource marker object.
+
+    As neutron_lib.db.utils.get_marker_obj(), but the marker object is
+    not retrieved when the values of its sort keys come with the marker.
+    """
+    if limit and marker:
+        return get_marker(
+            marker, lambda: getattr(plugin, '_get_%s' % resource)(
+                context, marker))
+
+
+def _get_dialect_name(query):
+    bind = query.session.bind
+    return bind.dialect.name if bind is not None else None
+
+
+def get_keyset_criteria(model, sort_keys, sort_dirs, marker_values):
+    """Returns the criteria of the rows following a marker in a sort order.
+
+    The NULL values are sorted before the other values. The criteria are
+    nested from the first sort key, which is also bounded by the marker so
+    that an index on the sort keys can be used to seek to the marker.
+
+    :param model: The model of the sorted rows.
+    :param sort_keys: The sort keys.
+    :param sort_dirs: The sort directions of the keys, 'asc' or 'desc'.
+    :param marker_values: The values of the sort keys of the marker row.
+    """
+    criteria = None
+    for sort_key, sort_dir, value in reversed(
+            list(zip(sort_keys, sort_dirs, marker_values))):
+        column = getattr(model, sort_key)
+        nullable = getattr(column.expression, 'nullable', True)
+        if isinstance(column.type, sa.Boolean) and value is not None:
+            # sqlalchemy doesn't like booleans in < >. bug/1656947
+            column = sa.cast(column, sa.Integer)
+            value = int(value)
+        if value is None:
+            equal = column.is_(None)
+            following = (column.isnot(None) if sort_dir == 'asc'
+                         else sql.false())
+            bound = None if sort_dir == 'asc' else equal
+        else:
+            equal = column == value
+            if sort_dir == 'asc':
+                following = column > value
+                bound = column >= value
+            else:
+                following = column < value
+                bound = column <= value
+                if nullable:
+                    following = or_(following, column.is_(None))
+                    bound = or_(bound, column.is_(None))
+        if criteria is not None:
+            following = or_(following, and_(equal, criteria))
+        criteria = following
+    if bound is not None:
+        criteria = and_(bound, criteria)
+    return criteria
+
+
+def _unique_keys(model, sort_keys=()):
+    # just grab first set of unique keys and use them, unless the sort keys
+    # already contain a set of unique keys.
     # if model has no unqiue sets, 'paginate_query' will
     # warn if sorting is unstable
     uk_sets = sa_utils.get_unique_keys(model)
+    if any(set(uk_set) <= set(sort_keys) for uk_set in uk_sets):
+        return []
     return uk_sets[0] if uk_sets else []
 
 
+def lazyload_relationships(query, model, relationships):
+    """Do not eagerly load the given relationships of the queried model."""
+    options = [orm.lazyload(getattr(model, name))
+               for name in sorted(relationships) if hasattr(model, name)]
+    return query.options(*options) if options else query
+
+
 def get_collection(context, model, dict_func,
                    filters=None, fields=None,
                    sorts=None, limit=None, marker_obj=None,
-                   page_reverse=False):
+                   page_reverse=False, profile=None):
     query = get_collection_query(context, model,
                                  filters=filters, sorts=sorts,
                                  limit=limit, marker_obj=marker_obj,
-                                 page_reverse=page_reverse)
+                                 page_reverse=page_reverse, profile=profile)
     items = [
         attributes.populate_project_info(
             dict_func(c, fields) if dict_func else c)
@@ -201,5 +447,105 @@ def get_collection(context, model, dict_func,
     return items
 
 
+_CACHEABLE_FILTER_TYPES = six.string_types + six.integer_types + (bool,
+                                                                  type(None))
+
+
+def _get_count_cache_key(context, model, filters):
+    """Returns the key and the projects of the cached count of a model.
+
+    The key is None when the count cannot be cached.
+    """
+    normalized_filters = []
+    for key, value in sorted((filters or {}).items()):
+        if (not isinstance(value, (list, tuple, set)) or
+                not all(isinstance(v, _CACHEABLE_FILTER_TYPES)
+                        for v in value)):
+            return None, None
+        normalized_filters.append(
+            (key, tuple(sorted(set(value), key=repr))))
+    projects = None
+    if db_utils.model_query_scope_is_project(context, model):
+        scope = context.tenant_id
+        # the RBAC entries, shared flags and filter hooks may count the rows
+        # of the other projects
+        if not (hasattr(model, 'rbac_entries') or hasattr(model, 'shared') or
+                any(hook.get('filter') for hook in get_hooks(model))):
+            projects = [scope]
+    else:
+        # a filter on shared depends on the project of the context
+        scope = context.tenant_id if 'shared' in (filters or {}) else None
+    for key in ('project_id', 'tenant_id'):
+        if key in (filters or {}):
+            projects = list(filters[key])
+    return (scope, tuple(normalized_filters)), projects
+
+
+_APPROXIMATE_COUNT_QUERIES = {
+    'mysql': sql.text("SELECT table_rows FROM information_schema.tables "
+                      "WHERE table_schema = DATABASE() "
+                      "AND table_name = :table_name"),
+    'postgresql': sql.text("SELECT reltuples FROM pg_class "
+                           "WHERE relname = :table_name AND relkind = 'r' "
+                           "AND pg_table_is_visible(oid)"),
+}
+
+
+def get_approximate_count(context, model, filters=None):
+    """Estimate the number of rows of a model from the database statistics.
+
+    The rows are only estimated in the APPROXIMATE_COUNT mode, when all the
+    rows of the table are counted with an admin context, on MySQL and
+    PostgreSQL. This is much cheaper than counting the rows of large tables.
+
+    :returns: The estimated number of rows, or None if the rows must be
+        counted.
+    """
+    if (getattr(context, 'count_mode', None) != APPROXIMATE_COUNT or
+            filters or not context.is_admin):
+        return None
+    query = _APPROXIMATE_COUNT_QUERIES.get(
+        context.session.bind.dialect.name
+        if context.session.bind is not None else None)
+    if query is None:
+        return None
+    count = context.session.execute(
+        query, {'table_name': model.__tablename__}).scalar()
+    # the statistics of the tables never analyzed may be missing
+    if count is None or count < 0:
+        return None
+    return int(count)
+
+
 def get_collection_count(context, model, filters=None):
-    return get_collection_query(context, model, filters).count()
+    """Count the rows of a model visible to the context.
+
+    The counts are cached for collection_count_cache_ttl seconds when the
+    filters only hold strings, integers, booleans or None, except in the
+    EXACT_COUNT mode. They are invalidated when the rows of the model or of
+    its related models are changed by this process. In the APPROXIMATE_COUNT
+    mode, the count of all the rows may be estimated, see
+    get_approximate_count().
+    """
+    count = get_approximate_count(context, model, filters)
+    if count is not None:
+        return count
+    ttl = (cfg.CONF.collection_count_cache_ttl
+           if getattr(context, 'count_mode', None) != EXACT_COUNT else 0)
+    key = projects = None
+    if ttl:
+        key, projects = _get_count_cache_key(context, model, filters)
+    if key is None:
+        return get_collection_query(context, model, filters,
+                                    profile=COUNT_ONLY).count()
+    count = _count_cache.get_count(context.session, model, key)
+    if count is None:
+        generation = _count_cache.get_generation(model)
+        count = get_collection_query(context, model, filters,
+                                     profile=COUNT_ONLY).count()
+        _count_cache.set_count(context.session, model, key, count, ttl,
+                               generation, projects)
+    return count
+
+
+register_loading_profile(COUNT_ONLY, None, {'*': 'lazy'})
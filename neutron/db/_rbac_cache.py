@@ -0,0 +1,126 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+NOTE: This module shall not be used by external projects. It will be moved
+      to neutron-lib in due course, and then it can be used from there.
+"""
+
+import collections
+import time
+
+from sqlalchemy import event
+from sqlalchemy import orm
+
+# This dictionary will store the sets of the IDs of the objects an action is
+# granted on to a project by the RBAC entries targeting it or all the
+# projects ('*').
+#   <rbac model> : {(<action>, <project>) : (<object IDs>, <expiration time>)}
+_object_ids = collections.defaultdict(dict)
+# Bumped on every change of the RBAC entries of a model, the sets which were
+# being loaded when they changed may be stale and are not cached.
+_generations = collections.Counter()
+_registered_models = set()
+
+# The RBAC models with entries inserted, updated or deleted by the
+# transaction of a session are stored in the info of the session, their sets
+# are not used until the transaction ends.
+_PENDING_KEY = 'rbac_cache_pending'
+
+
+def get_object_ids(context, rbac_model, action, ttl):
+    """Returns the IDs of the objects an action is granted on to a project.
+
+    The objects are those of the RBAC entries of the model with the action
+    targeting the project of the context or all the projects. The sets are
+    loaded once per project and cached for ttl seconds, they are updated
+    when the RBAC entries are created, updated or deleted by this process.
+
+    :returns: A frozenset of the object IDs, or None if the set is not
+        cached and cannot be, as when the entries are being changed by the
+        transaction of the context.
+    """
+    session = context.session
+    if rbac_model in session.info.get(_PENDING_KEY, {}):
+        return None
+    key = (action, context.tenant_id)
+    entry = _object_ids[rbac_model].get(key)
+    now = time.time()
+    if entry is not None and entry[1] >= now:
+        return entry[0]
+    generation = _generations[rbac_model]
+    _register_events(rbac_model)
+    object_ids = frozenset(
+        object_id for object_id, in session.query(rbac_model.object_id).
+        filter(rbac_model.action == action,
+               rbac_model.target_tenant.in_([context.tenant_id, '*'])))
+    if generation == _generations[rbac_model]:
+        _object_ids[rbac_model][key] = (object_ids, now + ttl)
+    return object_ids
+
+
+def invalidate(rbac_model, target_tenant=None):
+    """Drops the sets of a project, of all the projects if none or '*'."""
+    _generations[rbac_model] += 1
+    object_ids = _object_ids.get(rbac_model)
+    if not object_ids:
+        return
+    if target_tenant in (None, '*'):
+        object_ids.clear()
+        return
+    for key in list(object_ids):
+        if key[1] == target_tenant:
+            object_ids.pop(key, None)
+
+
+def clear():
+    _object_ids.clear()
+    _generations.clear()
+
+
+def _entry_event_handler(mapper, _conn, target):
+    rbac_model = mapper.class_
+    target_tenants = {target.target_tenant}
+    history = orm.attributes.get_history(target, 'target_tenant')
+    target_tenants.update(history.deleted or ())
+    for target_tenant in target_tenants:
+        invalidate(rbac_model, target_tenant)
+    session = orm.object_session(target)
+    if session is not None:
+        # the transaction may not be committed yet, the sets loaded by other
+        # transactions are dropped again once it is
+        session.info.setdefault(_PENDING_KEY, {}).setdefault(
+            rbac_model, set()).update(target_tenants)
+
+
+def _register_events(rbac_model):
+    if rbac_model in _registered_models:
+        return
+    _registered_models.add(rbac_model)
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(rbac_model, event_name, _entry_event_handler)
+
+
+@event.listens_for(orm.Session, 'after_commit')
+@event.listens_for(orm.Session, 'after_rollback')
+def _transaction_end_handler(session):
+    for rbac_model, target_tenants in session.info.pop(
+            _PENDING_KEY, {}).items():
+        for target_tenant in target_tenants:
+            invalidate(rbac_model, target_tenant)
+
+
+@event.listens_for(orm.Session, 'after_bulk_update')
+@event.listens_for(orm.Session, 'after_bulk_delete')
+def _bulk_event_handler(bulk_context):
+    if bulk_context.mapper.class_ in _registered_models:
+        invalidate(bulk_context.mapper.class_)
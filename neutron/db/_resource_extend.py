@@ -29,12 +29,38 @@ _resource_extend_functions = {
     # ...
 }
 
+# This dictionary will store the attributes added by the extend functions
+# and the relationships of the db object they read, when they are declared.
+_resource_extend_attributes = {
+    # <func> : (<fields>, <relationships>),
+    # ...
+}
+
+# This set will store the functions extending the resources in batches,
+# called with the lists of the resource dicts and db objects.
+_resource_extend_batch_functions = set()
+
 # This dictionary will store @extends decorated methods with a list of
 # resources that each method will extend on class initialization.
 _DECORATED_EXTEND_METHODS = collections.defaultdict(list)
 
+# This dictionary will store the attributes declared by @extends decorated
+# methods.
+_DECORATED_EXTEND_ATTRIBUTES = {}
+
+# This set will store the @extends decorated methods extending the resources
+# in batches.
+_DECORATED_BATCH_METHODS = set()
 
-def register_funcs(resource, funcs):
+
+def _get_func_key(func):
+    # bound methods are registered, the attributes are declared for the
+    # function they wrap
+    return getattr(func, '__func__', func)
+
+
+def register_funcs(resource, funcs, fields=None, relationships=None,
+                   batch=False):
     """Add functions to extend a resource.
 
     :param resource: A resource collection name.
@@ -43,6 +69,21 @@ def register_funcs(resource, funcs):
     :param funcs: A list of functions.
     :type funcs: list of callable
 
+    :param fields: The attributes the functions add to the resource dict,
+                   or a callable returning them. The functions are not
+                   called when the fields of the resource are selected and
+                   none of these attributes is. Functions without fields are
+                   always called.
+    :type fields: list of str or callable
+
+    :param relationships: The relationships of the resource db object the
+                          functions read, they are not loaded with the
+                          resource when the functions are not called.
+    :type relationships: list of str
+
+    :param batch: Whether the functions extend the resources in batches.
+    :type batch: bool
+
     These functions take a resource dict and a resource object and
     update the resource dict with extension data (possibly retrieved
     from the resource db object).
@@ -50,7 +91,24 @@ def register_funcs(resource, funcs):
             foo_res['bar'] = foo_db.bar_info  # example
             return foo_res
 
+    The batch functions take the lists of the resource dicts and resource
+    objects instead, so that they can retrieve the extension data of all
+    the resources at once.
+        def _extend_foos_with_bar(foo_reses, foo_dbs):
+            bars = get_bars([foo_db.id for foo_db in foo_dbs])  # example
+            for foo_res in foo_reses:
+                foo_res['bar'] = bars.get(foo_res['id'])
+
     """
+    if batch:
+        _resource_extend_batch_functions.update(
+            _get_func_key(f) for f in funcs)
+    if fields is not None:
+        for f in funcs:
+            _resource_extend_attributes[_get_func_key(f)] = (
+                fields,
+                frozenset(relationships) if relationships is not None
+                else None)
     funcs = [helpers.make_weak_ref(f) if callable(f) else f
              for f in funcs]
     _resource_extend_functions.setdefault(resource, []).extend(funcs)
@@ -69,14 +127,90 @@ def get_funcs(resource):
     return _resource_extend_functions.get(resource, [])
 
 
-def apply_funcs(resource_type, response, db_object):
+def _is_requested(func, fields):
+    declared = _resource_extend_attributes.get(_get_func_key(func))
+    if not fields or declared is None:
+        return True
+    extended_fields = declared[0]() if callable(declared[0]) else declared[0]
+    return extended_fields is None or not fields.isdisjoint(extended_fields)
+
+
+def apply_funcs(resource_type, response, db_object, fields=None):
+    """Apply the functions extending a resource.
+
+    :param fields: The fields of the resource which are selected, the
+                   functions which do not add any of them are skipped.
+    """
+    apply_funcs_bulk(resource_type, [response], [db_object], fields)
+
+
+def apply_funcs_bulk(resource_type, responses, db_objects, fields=None):
+    """Apply the functions extending a list of resources.
+
+    The batch functions are called once with all the resources, the other
+    functions are called for each resource in turn.
+
+    :param responses: The resource dicts.
+    :param db_objects: The resource db objects, in the order of the dicts.
+    :param fields: The fields of the resources which are selected, the
+                   functions which do not add any of them are skipped.
+    """
+    if not responses:
+        return
+    fields = set(fields) if fields else None
     for func in get_funcs(resource_type):
         resolved_func = helpers.resolve_ref(func)
-        if resolved_func:
-            resolved_func(response, db_object)
+        if not resolved_func or not _is_requested(resolved_func, fields):
+            continue
+        if _get_func_key(resolved_func) in _resource_extend_batch_functions:
+            resolved_func(responses, db_objects)
+        else:
+            for response, db_object in zip(responses, db_objects):
+                resolved_func(response, db_object)
+
+
+def get_unused_relationships(resource_type, fields, relationships=None):
+    """Retrieve the relationships not needed for the fields of a resource.
+
+    :param resource_type: A resource collection name.
+    :type resource_type: str
+
+    :param fields: The fields of the resource which are selected.
+    :type fields: list of str
+
+    :param relationships: The relationships read to build the attributes of
+                          the resource dict, by attribute.
+    :type relationships: dict
 
+    :return: The relationships only read for attributes which are not
+             selected. It is empty when an extend function which is called
+             does not declare the relationships it reads.
+    :rtype: set of str
 
-def extends(resources):
+    """
+    if not fields:
+        return set()
+    fields = set(fields)
+    used, unused = set(), set()
+    for field, field_relationships in (relationships or {}).items():
+        (used if field in fields else unused).update(field_relationships)
+    for func in get_funcs(resource_type):
+        resolved_func = helpers.resolve_ref(func)
+        if not resolved_func:
+            continue
+        declared = _resource_extend_attributes.get(
+            _get_func_key(resolved_func))
+        func_relationships = declared[1] if declared else None
+        if _is_requested(resolved_func, fields):
+            if func_relationships is None:
+                return set()
+            used.update(func_relationships)
+        elif func_relationships:
+            unused.update(func_relationships)
+    return unused - used
+
+
+def extends(resources, fields=None, relationships=None, batch=False):
     """Use to decorate methods on classes before initialization.
 
     Any classes that use this must themselves be decorated with the
@@ -87,9 +221,25 @@ def extends(resources):
                       be registered with each resource as an extend function.
     :type resources: list of str
 
+    :param fields: The attributes the method adds to the resource dict, see
+                   register_funcs().
+    :type fields: list of str or callable
+
+    :param relationships: The relationships of the resource db object read
+                          by the method, see register_funcs().
+    :type relationships: list of str
+
+    :param batch: Whether the method extends the resources in batches, see
+                  register_funcs().
+    :type batch: bool
+
     """
     def decorator(method):
         _DECORATED_EXTEND_METHODS[method].extend(resources)
+        if fields is not None:
+            _DECORATED_EXTEND_ATTRIBUTES[method] = (fields, relationships)
+        if batch:
+            _DECORATED_BATCH_METHODS.add(method)
         return method
     return decorator
 
@@ -129,9 +279,13 @@ def has_resource_extenders(klass):
             method = getattr(unbound_method, 'im_func', unbound_method)
             if method not in _DECORATED_EXTEND_METHODS:
                 continue
+            fields, relationships = _DECORATED_EXTEND_ATTRIBUTES.get(
+                method, (None, None))
             for resource in _DECORATED_EXTEND_METHODS[method]:
                 # Register the bound method for the resourse
-                register_funcs(resource, [method])
+                register_funcs(resource, [method], fields=fields,
+                               relationships=relationships,
+                               batch=method in _DECORATED_BATCH_METHODS)
         setattr(instance, '_DECORATED_METHODS_REGISTERED', True)
         return instance
     klass.__new__ = replacement_new
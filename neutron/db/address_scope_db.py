@@ -121,7 +121,10 @@ class AddressScopeDbMixin(ext_address_scope.AddressScopePluginBase):
             address_scope.delete()
 
     @staticmethod
-    @resource_extend.extends([net_def.COLLECTION_NAME])
+    @resource_extend.extends([net_def.COLLECTION_NAME],
+                             fields=[apidef.IPV4_ADDRESS_SCOPE,
+                                     apidef.IPV6_ADDRESS_SCOPE],
+                             relationships=['subnets'])
     def _extend_network_dict_address_scope(network_res, network_db):
         network_res[apidef.IPV4_ADDRESS_SCOPE] = None
         network_res[apidef.IPV6_ADDRESS_SCOPE] = None
@@ -66,7 +66,9 @@ class AllowedAddressPairsMixin(object):
                 for pair in pairs]
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=[addr_apidef.ADDRESS_PAIRS],
+                             relationships=['allowed_address_pairs'])
     def _extend_port_dict_allowed_address_pairs(port_res, port_db):
         # If port_db is provided, allowed address pairs will be accessed via
         # sqlalchemy models. As they're loaded together with ports this
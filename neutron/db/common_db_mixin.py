@@ -80,7 +80,8 @@ class CommonDbMixin(object):
 
     # TODO(HenryG): Remove this when available in neutron-lib
     def _get_marker_obj(self, context, resource, limit, marker):
-        return db_utils.get_marker_obj(self, context, resource, limit, marker)
+        return _model_query.get_marker_obj(self, context, resource, limit,
+                                           marker)
 
     @staticmethod
     def _filter_non_model_columns(data, model):
@@ -30,6 +30,8 @@ from sqlalchemy.orm import exc
 
 from neutron.common import constants as n_const
 from neutron.common import exceptions
+# the used IPs of the subnets are counted as the IP allocations are stored
+from neutron.db import _ip_usage  # noqa
 from neutron.db import _model_query as model_query
 from neutron.db import _resource_extend as resource_extend
 from neutron.db import api as db_api
@@ -127,7 +129,35 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
         # Ib32509d974c8654131112234bcf19d6eae8f7cca
         allocated.create()
 
+    @staticmethod
+    @db_api.context_manager.writer
+    def _store_ip_allocations(context, allocations):
+        """Stores the allocated IPs of a number of ports at once.
+
+        :param allocations: list of dicts with the ip_address, network_id,
+            subnet_id and port_id of each allocated IP.
+        """
+        LOG.debug("Allocated IPs %s", allocations)
+        context.session.add_all(
+            [models_v2.IPAllocation(**allocation)
+             for allocation in allocations])
+
     def _make_subnet_dict(self, subnet, fields=None, context=None):
+        return self._make_subnet_dicts([subnet], fields, context)[0]
+
+    def _make_subnet_dicts(self, subnets, fields=None, context=None):
+        """Make the dicts of subnets, extended in a batch."""
+        results = [self._make_subnet_res(subnet, context)
+                   for subnet in subnets]
+        # Call auxiliary extend functions, if any, with the DB objects of the
+        # Subnet OVOs
+        resource_extend.apply_funcs_bulk(
+            subnet_def.COLLECTION_NAME, results,
+            [subnet.db_obj if isinstance(subnet, subnet_obj.Subnet)
+             else subnet for subnet in subnets], fields)
+        return [db_utils.resource_fields(res, fields) for res in results]
+
+    def _make_subnet_res(self, subnet, context=None):
         res = {'id': subnet['id'],
                'name': subnet['name'],
                'tenant_id': subnet['tenant_id'],
@@ -155,9 +185,6 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
             res['dns_nameservers'] = [str(dns.address)
                                       for dns in subnet.dns_nameservers]
             res['shared'] = subnet.shared
-            # Call auxiliary extend functions, if any
-            resource_extend.apply_funcs(subnet_def.COLLECTION_NAME,
-                                        res, subnet.db_obj)
         else:
             res['cidr'] = subnet['cidr']
             res['allocation_pools'] = [{'start': pool['first_ip'],
@@ -173,11 +200,7 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
             # as its parent network
             res['shared'] = self._is_network_shared(context,
                                                     subnet.rbac_entries)
-            # Call auxiliary extend functions, if any
-            resource_extend.apply_funcs(subnet_def.COLLECTION_NAME,
-                                        res, subnet)
-
-        return db_utils.resource_fields(res, fields)
+        return res
 
     def _make_subnetpool_dict(self, subnetpool, fields=None):
         default_prefixlen = str(subnetpool['default_prefixlen'])
@@ -201,6 +224,19 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
 
     def _make_port_dict(self, port, fields=None,
                         process_extensions=True):
+        return self._make_port_dicts([port], fields, process_extensions)[0]
+
+    def _make_port_dicts(self, ports, fields=None, process_extensions=True):
+        """Make the dicts of ports, extended in a batch."""
+        results = [self._make_port_res(port, fields) for port in ports]
+        # Call auxiliary extend functions, if any
+        if process_extensions:
+            resource_extend.apply_funcs_bulk(port_def.COLLECTION_NAME,
+                                             results, ports, fields)
+        return [db_utils.resource_fields(res, fields) for res in results]
+
+    @staticmethod
+    def _make_port_res(port, fields=None):
         res = {"id": port["id"],
                'name': port['name'],
                "network_id": port["network_id"],
@@ -208,15 +244,15 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
                "mac_address": port["mac_address"],
                "admin_state_up": port["admin_state_up"],
                "status": port["status"],
-               "fixed_ips": [{'subnet_id': ip["subnet_id"],
-                              'ip_address': ip["ip_address"]}
-                             for ip in port["fixed_ips"]],
                "device_id": port["device_id"],
                "device_owner": port["device_owner"]}
-        # Call auxiliary extend functions, if any
-        if process_extensions:
-            resource_extend.apply_funcs(port_def.COLLECTION_NAME, res, port)
-        return db_utils.resource_fields(res, fields)
+        # NOTE: the fixed IPs relationship is not loaded by get_ports when
+        # they are not selected
+        if not fields or 'fixed_ips' in fields:
+            res['fixed_ips'] = [{'subnet_id': ip["subnet_id"],
+                                 'ip_address': ip["ip_address"]}
+                                for ip in port["fixed_ips"]]
+        return res
 
     def _get_network(self, context, id):
         try:
@@ -286,6 +322,21 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
 
     def _make_network_dict(self, network, fields=None,
                            process_extensions=True, context=None):
+        return self._make_network_dicts([network], fields,
+                                        process_extensions, context)[0]
+
+    def _make_network_dicts(self, networks, fields=None,
+                            process_extensions=True, context=None):
+        """Make the dicts of networks, extended in a batch."""
+        results = [self._make_network_res(network, context)
+                   for network in networks]
+        # Call auxiliary extend functions, if any
+        if process_extensions:
+            resource_extend.apply_funcs_bulk(net_def.COLLECTION_NAME,
+                                             results, networks, fields)
+        return [db_utils.resource_fields(res, fields) for res in results]
+
+    def _make_network_res(self, network, context=None):
         res = {'id': network['id'],
                'name': network['name'],
                'tenant_id': network['tenant_id'],
@@ -295,10 +346,7 @@ class DbBasePluginCommon(common_db_mixin.CommonDbMixin):
                'subnets': [subnet['id']
                            for subnet in network['subnets']]}
         res['shared'] = self._is_network_shared(context, network.rbac_entries)
-        # Call auxiliary extend functions, if any
-        if process_extensions:
-            resource_extend.apply_funcs(net_def.COLLECTION_NAME, res, network)
-        return db_utils.resource_fields(res, fields)
+        return res
 
     def _is_network_shared(self, context, rbac_entries):
         # The shared attribute for a network now reflects if the network
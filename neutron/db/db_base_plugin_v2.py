@@ -13,7 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import functools
+import random
 
 import netaddr
 from neutron_lib.api.definitions import ip_allocation as ipalloc_apidef
@@ -46,12 +46,14 @@ from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
 from neutron.common import exceptions as n_exc
 from neutron.common import ipv6_utils
 from neutron.common import utils
+from neutron.db import _ip_usage as ip_usage
 from neutron.db import _model_query as model_query
 from neutron.db import _resource_extend as resource_extend
 from neutron.db import api as db_api
 from neutron.db import db_base_plugin_common
 from neutron.db import ipam_pluggable_backend
 from neutron.db import models_v2
+from neutron.db.quota import api as quota_api
 from neutron.db import rbac_db_mixin as rbac_mixin
 from neutron.db import rbac_db_models as rbac_db
 from neutron.db import standardattrdescription_db as stattr_db
@@ -63,10 +65,15 @@ from neutron.objects import base as base_obj
 from neutron.objects import ports as port_obj
 from neutron.objects import subnet as subnet_obj
 from neutron.objects import subnetpool as subnetpool_obj
+from neutron.quota import resource_registry
+from neutron import worker as neutron_worker
 
 
 LOG = logging.getLogger(__name__)
 
+# The relationships of the port model read to build the port attributes
+PORT_FIELD_RELATIONSHIPS = {'fixed_ips': ['fixed_ips']}
+
 # Ports with the following 'device_owner' values will not prevent
 # network deletion.  If delete_network() finds that all ports on a
 # network have these owners, it will explicitly delete each port
@@ -155,6 +162,17 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
             query_hook=None,
             filter_hook=_port_filter_hook,
             result_filters=None)
+        for profile in (model_query.API_LIST, model_query.RPC_AGENT):
+            model_query.register_loading_profile(
+                profile, models_v2.Port, {'fixed_ips': 'selectin'})
+            model_query.register_loading_profile(
+                profile, models_v2.Network,
+                {'subnets': 'selectin', 'rbac_entries': 'selectin'})
+            # only used to bump the revision of the network on updates
+            model_query.register_loading_profile(
+                profile, models_v2.Subnet,
+                {'network_standard_attr': 'lazy',
+                 'rbac_entries': 'selectin'})
         return super(NeutronDbPluginV2, cls).__new__(cls, *args, **kwargs)
 
     def __init__(self):
@@ -173,6 +191,65 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
             lib_db_api.sqla_listen(
                 models_v2.Port.status, 'set',
                 self.nova_notifier.record_port_status_changed)
+        if cfg.CONF.QUOTAS.quota_usage_check_interval:
+            self._start_quota_usage_checker()
+        if cfg.CONF.QUOTAS.reservation_cleanup_interval:
+            self._start_reservation_cleaner()
+        if cfg.CONF.ip_usage_check_interval:
+            self._start_ip_usage_checker()
+
+    def _start_quota_usage_checker(self):
+        """Starts the periodic job checking the tracked quota usages.
+
+        The usages out of sync with the resources of the tenants are marked
+        dirty, so that they are counted again on the next quota check.
+        """
+        interval = cfg.CONF.QUOTAS.quota_usage_check_interval
+        initial_delay = random.randint(0, interval)  # splay multiple servers
+        checker = neutron_worker.PeriodicWorker(self._check_quota_usages,
+                                                interval, initial_delay)
+        self.add_worker(checker)
+
+    def _check_quota_usages(self):
+        try:
+            resource_registry.check_resources_usage(ctx.get_admin_context())
+        except Exception:
+            LOG.exception("Error checking the quota usages")
+
+    def _start_reservation_cleaner(self):
+        """Starts the periodic job removing the expired reservations."""
+        interval = cfg.CONF.QUOTAS.reservation_cleanup_interval
+        initial_delay = random.randint(0, interval)  # splay multiple servers
+        cleaner = neutron_worker.PeriodicWorker(self._remove_reservations,
+                                                interval, initial_delay)
+        self.add_worker(cleaner)
+
+    def _remove_reservations(self):
+        try:
+            removed = quota_api.remove_expired_reservations(
+                ctx.get_admin_context())
+            if removed:
+                LOG.debug("Removed %d expired reservations", removed)
+        except Exception:
+            LOG.exception("Error removing the expired reservations")
+
+    def _start_ip_usage_checker(self):
+        """Starts the periodic job checking the used IPs of the subnets.
+
+        The counters of the used IPs out of sync with the allocations of the
+        subnets are deleted, so that they are initialized again.
+        """
+        interval = cfg.CONF.ip_usage_check_interval
+        initial_delay = random.randint(0, interval)  # splay multiple servers
+        checker = neutron_worker.PeriodicWorker(self._check_ip_usages,
+                                                interval, initial_delay)
+        self.add_worker(checker)
+
+    def _check_ip_usages(self):
+        try:
+            ip_usage.check_used_ips(ctx.get_admin_context())
+        except Exception:
+            LOG.exception("Error checking the used IPs of the subnets")
 
     @registry.receives(resources.RBAC_POLICY, [events.BEFORE_CREATE,
                                                events.BEFORE_UPDATE,
@@ -505,8 +582,8 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
     def _get_networks(self, context, filters=None, fields=None,
                       sorts=None, limit=None, marker=None,
                       page_reverse=False):
-        marker_obj = ndb_utils.get_marker_obj(self, context, 'network',
-                                              limit, marker)
+        marker_obj = model_query.get_marker_obj(self, context, 'network',
+                                                limit, marker)
         return model_query.get_collection(
             context, models_v2.Network,
             # if caller needs postprocessing, it should implement it explicitly
@@ -521,14 +598,11 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
     def get_networks(self, context, filters=None, fields=None,
                      sorts=None, limit=None, marker=None,
                      page_reverse=False):
-        make_network_dict = functools.partial(self._make_network_dict,
-                                              context=context)
-        return [
-            make_network_dict(net, fields)
-            for net in self._get_networks(
+        return self._make_network_dicts(
+            self._get_networks(
                 context, filters=filters, fields=fields, sorts=sorts,
-                limit=limit, marker=marker, page_reverse=page_reverse)
-        ]
+                limit=limit, marker=marker, page_reverse=page_reverse),
+            fields, context=context)
 
     @db_api.retry_if_session_inactive()
     def get_networks_count(self, context, filters=None):
@@ -1067,10 +1141,7 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
                     page_reverse=False):
         subnet_objs = self._get_subnets(context, filters, fields, sorts, limit,
                                         marker, page_reverse)
-        return [
-            self._make_subnet_dict(subnet_object, fields, context)
-            for subnet_object in subnet_objs
-        ]
+        return self._make_subnet_dicts(subnet_objs, fields, context)
 
     @db_api.retry_if_session_inactive()
     def get_subnets_count(self, context, filters=None):
@@ -1080,8 +1151,8 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
 
     @db_api.retry_if_session_inactive()
     def get_subnets_by_network(self, context, network_id):
-        return [self._make_subnet_dict(subnet_obj) for subnet_obj in
-                self._get_subnets_by_network(context, network_id)]
+        return self._make_subnet_dicts(
+            self._get_subnets_by_network(context, network_id))
 
     def _validate_address_scope_id(self, context, address_scope_id,
                                    subnetpool_id, sp_prefixes, ip_version):
@@ -1285,10 +1356,7 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
         db_port = self.create_port_db(context, port)
         return self._make_port_dict(db_port, process_extensions=False)
 
-    def create_port_db(self, context, port):
-        p = port['port']
-        port_id = p.get('id') or uuidutils.generate_uuid()
-        network_id = p['network_id']
+    def _get_port_data(self, context, p):
         if p.get('device_owner'):
             self._enforce_device_owner_not_router_intf_or_device_id(
                 context, p.get('device_owner'), p.get('device_id'),
@@ -1296,8 +1364,8 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
 
         port_data = dict(tenant_id=p['tenant_id'],
                          name=p['name'],
-                         id=port_id,
-                         network_id=network_id,
+                         id=p.get('id') or uuidutils.generate_uuid(),
+                         network_id=p['network_id'],
                          admin_state_up=p['admin_state_up'],
                          status=p.get('status', constants.PORT_STATUS_ACTIVE),
                          device_id=p['device_id'],
@@ -1305,9 +1373,25 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
                          description=p.get('description'))
         if p.get('mac_address') is not constants.ATTR_NOT_SPECIFIED:
             port_data['mac_address'] = p.get('mac_address')
+        return port_data
+
+    @staticmethod
+    def _set_port_ip_allocation(db_port, p, deferred=False):
+        if deferred:
+            db_port['ip_allocation'] = ipalloc_apidef.IP_ALLOCATION_DEFERRED
+        else:
+            db_port['ip_allocation'] = ipalloc_apidef.IP_ALLOCATION_IMMEDIATE
+        fixed_ips = p['fixed_ips']
+        if validators.is_attr_set(fixed_ips) and not fixed_ips:
+            # [] was passed explicitly as fixed_ips. An unaddressed port.
+            db_port['ip_allocation'] = ipalloc_apidef.IP_ALLOCATION_NONE
+
+    def create_port_db(self, context, port):
+        p = port['port']
+        port_data = self._get_port_data(context, p)
         with db_api.context_manager.writer.using(context):
             # Ensure that the network exists.
-            self._get_network(context, network_id)
+            self._get_network(context, port_data['network_id'])
 
             # Create the port
             db_port = self._create_db_port_obj(context, port_data)
@@ -1315,19 +1399,43 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
 
             try:
                 self.ipam.allocate_ips_for_port_and_store(
-                    context, port, port_id)
-                db_port['ip_allocation'] = (ipalloc_apidef.
-                                            IP_ALLOCATION_IMMEDIATE)
+                    context, port, db_port['id'])
+                self._set_port_ip_allocation(db_port, p)
             except ipam_exc.DeferIpam:
-                db_port['ip_allocation'] = (ipalloc_apidef.
-                                            IP_ALLOCATION_DEFERRED)
-            fixed_ips = p['fixed_ips']
-            if validators.is_attr_set(fixed_ips) and not fixed_ips:
-                # [] was passed explicitly as fixed_ips. An unaddressed port.
-                db_port['ip_allocation'] = ipalloc_apidef.IP_ALLOCATION_NONE
+                self._set_port_ip_allocation(db_port, p, deferred=True)
 
         return db_port
 
+    def create_port_bulk_db(self, context, ports):
+        """Creates the database entries of a batch of ports.
+
+        Each network is checked once, and the IP addresses of all the ports
+        are allocated and stored together.
+
+        :returns: The list of the Port database objects, in the order of
+            the ports.
+        """
+        ports_data = [self._get_port_data(context, port['port'])
+                      for port in ports]
+        with db_api.context_manager.writer.using(context):
+            # Ensure that the networks exist.
+            for network_id in {data['network_id'] for data in ports_data}:
+                self._get_network(context, network_id)
+
+            db_ports = []
+            for port, port_data in zip(ports, ports_data):
+                db_port = self._create_db_port_obj(context, port_data)
+                port['port']['mac_address'] = db_port['mac_address']
+                db_ports.append(db_port)
+
+            port_ips = self.ipam.allocate_ips_for_ports_and_store(
+                context, ports, [db_port['id'] for db_port in db_ports])
+            for port, db_port, ips in zip(ports, db_ports, port_ips):
+                self._set_port_ip_allocation(db_port, port['port'],
+                                             deferred=ips is None)
+
+        return db_ports
+
     def _validate_port_for_update(self, context, db_port, new_port, new_mac):
         changed_owner = 'device_owner' in new_port
         current_owner = (new_port.get('device_owner') or
@@ -1414,8 +1522,7 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
         filters = filters or {}
         fixed_ips = filters.pop('fixed_ips', {})
         query = model_query.get_collection_query(context, Port,
-                                                 filters=filters,
-                                                 *args, **kwargs)
+                                                 filters=filters)
         ip_addresses = fixed_ips.get('ip_address')
         subnet_ids = fixed_ips.get('subnet_id')
         if ip_addresses:
@@ -1424,25 +1531,35 @@ class NeutronDbPluginV2(db_base_plugin_common.DbBasePluginCommon,
         if subnet_ids:
             query = query.filter(
                 Port.fixed_ips.any(IPAllocation.subnet_id.in_(subnet_ids)))
-        return query
+        # NOTE: the fixed IPs filters must be applied before the limit
+        return model_query.sort_and_paginate(query, Port, *args, **kwargs)
 
     @db_api.retry_if_session_inactive()
     def get_ports(self, context, filters=None, fields=None,
                   sorts=None, limit=None, marker=None,
                   page_reverse=False):
-        marker_obj = ndb_utils.get_marker_obj(self, context, 'port',
-                                              limit, marker)
+        marker_obj = model_query.get_marker_obj(self, context, 'port',
+                                                limit, marker)
         query = self._get_ports_query(context, filters=filters,
                                       sorts=sorts, limit=limit,
                                       marker_obj=marker_obj,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query]
+        # do not load the relationships only needed for the port attributes
+        # which are not selected
+        query = model_query.lazyload_relationships(
+            query, models_v2.Port, resource_extend.get_unused_relationships(
+                port_def.COLLECTION_NAME, fields, PORT_FIELD_RELATIONSHIPS))
+        items = self._make_port_dicts(query.all(), fields)
         if limit and page_reverse:
             items.reverse()
         return items
 
     @db_api.retry_if_session_inactive()
     def get_ports_count(self, context, filters=None):
+        count = model_query.get_approximate_count(context, models_v2.Port,
+                                                  filters)
+        if count is not None:
+            return count
         return self._get_ports_query(context, filters).count()
 
     def _enforce_device_owner_not_router_intf_or_device_id(self, context,
@@ -0,0 +1,176 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Projection queries returning the subnets and ports a DHCP agent needs.
+
+Unlike the plugin get_subnets/get_ports calls, these queries only select the
+columns used by the DHCP agent and do not run the resource extend functions,
+so the number of SQL statements does not depend on the number of ports.
+"""
+
+import collections
+
+from neutron_lib import constants
+
+from neutron.db import api as db_api
+from neutron.db import dns_db
+from neutron.db.extra_dhcp_opt import models as edo_models
+from neutron.db.models import dns as dns_models
+from neutron.db import models_v2
+from neutron.db import standard_attr
+
+
+SUBNET_COLUMNS = [
+    models_v2.Subnet.id,
+    models_v2.Subnet.name,
+    models_v2.Subnet.network_id,
+    models_v2.Subnet.project_id,
+    models_v2.Subnet.segment_id,
+    models_v2.Subnet.subnetpool_id,
+    models_v2.Subnet.ip_version,
+    models_v2.Subnet.cidr,
+    models_v2.Subnet.gateway_ip,
+    models_v2.Subnet.enable_dhcp,
+    models_v2.Subnet.ipv6_ra_mode,
+    models_v2.Subnet.ipv6_address_mode,
+]
+
+PORT_COLUMNS = [
+    models_v2.Port.id,
+    models_v2.Port.name,
+    models_v2.Port.network_id,
+    models_v2.Port.project_id,
+    models_v2.Port.mac_address,
+    models_v2.Port.admin_state_up,
+    models_v2.Port.status,
+    models_v2.Port.device_id,
+    models_v2.Port.device_owner,
+    standard_attr.StandardAttribute.revision_number,
+]
+
+
+def _group_rows(query, key):
+    grouped = collections.defaultdict(list)
+    for row in query:
+        grouped[getattr(row, key)].append(row)
+    return grouped
+
+
+def _get_subnets(context, network_ids, enable_dhcp_filter):
+    query = context.session.query(*SUBNET_COLUMNS).filter(
+        models_v2.Subnet.network_id.in_(network_ids))
+    if enable_dhcp_filter:
+        query = query.filter(models_v2.Subnet.enable_dhcp.is_(True))
+    subnet_rows = query.order_by(models_v2.Subnet.id).all()
+    if not subnet_rows:
+        return []
+
+    subnet_ids = [row.id for row in subnet_rows]
+    nameservers = _group_rows(
+        context.session.query(models_v2.DNSNameServer.subnet_id,
+                              models_v2.DNSNameServer.address).
+        filter(models_v2.DNSNameServer.subnet_id.in_(subnet_ids)).
+        order_by(models_v2.DNSNameServer.order), 'subnet_id')
+    routes = _group_rows(
+        context.session.query(models_v2.SubnetRoute.subnet_id,
+                              models_v2.SubnetRoute.destination,
+                              models_v2.SubnetRoute.nexthop).
+        filter(models_v2.SubnetRoute.subnet_id.in_(subnet_ids)),
+        'subnet_id')
+
+    subnets = []
+    for row in subnet_rows:
+        subnet = row._asdict()
+        subnet['tenant_id'] = row.project_id
+        subnet['dns_nameservers'] = [
+            ns.address for ns in nameservers.get(row.id, [])]
+        subnet['host_routes'] = [
+            {'destination': route.destination, 'nexthop': route.nexthop}
+            for route in routes.get(row.id, [])]
+        subnets.append(subnet)
+    return subnets
+
+
+def _get_ports(context, network_ids, extra_dhcp_opts, dns_assignment):
+    port_rows = context.session.query(*PORT_COLUMNS).join(
+        standard_attr.StandardAttribute,
+        standard_attr.StandardAttribute.id ==
+        models_v2.Port.standard_attr_id).filter(
+        models_v2.Port.network_id.in_(network_ids)).all()
+    if not port_rows:
+        return []
+
+    fixed_ips = _group_rows(
+        context.session.query(models_v2.IPAllocation.port_id,
+                              models_v2.IPAllocation.subnet_id,
+                              models_v2.IPAllocation.ip_address).
+        filter(models_v2.IPAllocation.network_id.in_(network_ids)).
+        order_by(models_v2.IPAllocation.ip_address,
+                 models_v2.IPAllocation.subnet_id), 'port_id')
+    dhcp_opts = {}
+    if extra_dhcp_opts:
+        dhcp_opts = _group_rows(
+            context.session.query(edo_models.ExtraDhcpOpt.port_id,
+                                  edo_models.ExtraDhcpOpt.opt_name,
+                                  edo_models.ExtraDhcpOpt.opt_value,
+                                  edo_models.ExtraDhcpOpt.ip_version).
+            join(models_v2.Port).
+            filter(models_v2.Port.network_id.in_(network_ids)), 'port_id')
+    dns_names = {}
+    if dns_assignment:
+        dns_domain = dns_db.get_dns_domain()
+        # NOTE: same rule as the dns-integration extension driver, the
+        # dns_name of the port is only used with a non default dns_domain
+        if dns_domain and dns_domain != constants.DNS_DOMAIN_DEFAULT:
+            dns_names = dict(
+                context.session.query(dns_models.PortDNS.port_id,
+                                      dns_models.PortDNS.dns_name).
+                join(models_v2.Port).
+                filter(models_v2.Port.network_id.in_(network_ids)))
+
+    ports = []
+    for row in port_rows:
+        port = row._asdict()
+        port['tenant_id'] = row.project_id
+        port['fixed_ips'] = [
+            {'subnet_id': ip.subnet_id, 'ip_address': ip.ip_address}
+            for ip in fixed_ips.get(row.id, [])]
+        if extra_dhcp_opts:
+            port['extra_dhcp_opts'] = [
+                {'opt_name': opt.opt_name, 'opt_value': opt.opt_value,
+                 'ip_version': opt.ip_version}
+                for opt in dhcp_opts.get(row.id, [])]
+        if dns_assignment:
+            port['dns_assignment'] = dns_db.build_dns_assignment(
+                port['fixed_ips'], dns_names.get(row.id), dns_domain)
+        ports.append(port)
+    return ports
+
+
+@db_api.context_manager.reader
+def get_networks_subnets_and_ports(context, network_ids,
+                                   enable_dhcp_filter=True,
+                                   extra_dhcp_opts=False,
+                                   dns_assignment=False):
+    """Returns the subnets and ports of the given networks.
+
+    The subnets are sorted by ID. The optional port attributes provided by
+    the extra_dhcp_opt and dns-integration extensions are only loaded when
+    requested.
+
+    :returns: a tuple (subnets, ports) of lists of dicts.
+    """
+    if not network_ids:
+        return [], []
+    return (_get_subnets(context, network_ids, enable_dhcp_filter),
+            _get_ports(context, network_ids, extra_dhcp_opts,
+                       dns_assignment))
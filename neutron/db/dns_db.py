@@ -32,6 +32,36 @@ from neutron.services.externaldns import driver
 LOG = logging.getLogger(__name__)
 
 
+def get_dns_domain():
+    """Returns the configured dns_domain, always ending with a dot."""
+    if not cfg.CONF.dns_domain:
+        return ''
+    if cfg.CONF.dns_domain.endswith('.'):
+        return cfg.CONF.dns_domain
+    return '%s.' % cfg.CONF.dns_domain
+
+
+def build_dns_assignment(ips, dns_name, dns_domain):
+    """Returns the dns_assignment of a port with the given fixed IPs."""
+    dns_assignment = []
+    for ip in ips:
+        if dns_name:
+            hostname = dns_name
+            fqdn = dns_name
+            if not dns_name.endswith('.'):
+                fqdn = '%s.%s' % (dns_name, dns_domain)
+        else:
+            hostname = 'host-%s' % ip['ip_address'].replace(
+                '.', '-').replace(':', '-')
+            fqdn = hostname
+            if dns_domain:
+                fqdn = '%s.%s' % (hostname, dns_domain)
+        dns_assignment.append({'ip_address': ip['ip_address'],
+                               'hostname': hostname,
+                               'fqdn': fqdn})
+    return dns_assignment
+
+
 class DNSActionsData(object):
 
     def __init__(self, current_dns_name=None, current_dns_domain=None,
@@ -43,13 +43,8 @@ def _network_filter_hook(context, original_model, conditions):
     # Apply the external network filter only in non-admin and non-advsvc
     # context
     if db_utils.model_query_scope_is_project(context, original_model):
-        # the table will already be joined to the rbac entries for the
-        # shared check so we don't need to worry about ensuring that
-        rbac_model = original_model.rbac_entries.property.mapper.class_
-        tenant_allowed = (
-            (rbac_model.action == 'access_as_external') &
-            (rbac_model.target_tenant == context.tenant_id) |
-            (rbac_model.target_tenant == '*'))
+        tenant_allowed = model_query.get_rbac_filter(
+            context, original_model, rbac_db.ACCESS_EXTERNAL)
         conditions = expr.or_(tenant_allowed, *conditions)
     return conditions
 
@@ -82,7 +77,9 @@ class External_net_db_mixin(object):
             context, network_id=net_id)
 
     @staticmethod
-    @resource_extend.extends([net_def.COLLECTION_NAME])
+    @resource_extend.extends([net_def.COLLECTION_NAME],
+                             fields=[extnet_apidef.EXTERNAL],
+                             relationships=['external'])
     def _extend_network_dict_l3(network_res, network_db):
         # Comparing with None for converting uuid into bool
         network_res[extnet_apidef.EXTERNAL] = network_db.external is not None
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
 
 import netaddr
@@ -30,6 +31,7 @@ from neutron.db import ipam_backend_mixin
 from neutron.db import models_v2
 from neutron.ipam import driver
 from neutron.ipam import exceptions as ipam_exc
+from neutron.ipam import requests as ipam_req
 from neutron.objects import ports as port_obj
 from neutron.objects import subnet as obj_subnet
 
@@ -191,6 +193,124 @@ class IpamPluggableBackend(ipam_backend_mixin.IpamBackendMixin):
                                         ipam_driver, port_copy['port'], ips,
                                         revert_on_fail=False)
 
+    def allocate_ips_for_ports_and_store(self, context, ports, port_ids):
+        """Allocate and store the IP addresses of a batch of new ports.
+
+        The ports with no fixed IPs requested are allocated their addresses
+        with one IPAM request per network and IP version, the other ports
+        one port at a time. The IP allocations of all the ports are stored
+        at once.
+
+        :returns: A list of the allocated IPs of each port, None for the
+            ports whose IP allocation is deferred.
+        """
+        ports = [dict(port['port'], id=port_id)
+                 for port, port_id in zip(ports, port_ids)]
+        ipam_driver = driver.Pool.get_instance(None, context)
+        bulk_ports = collections.defaultdict(list)
+        port_ips = [None] * len(ports)
+        try:
+            for i, p in enumerate(ports):
+                if self._is_bulk_allocation(ipam_driver, p):
+                    key = (p['network_id'], p.get(portbindings.HOST_ID),
+                           p.get('device_owner'))
+                    bulk_ports[key].append(i)
+                    continue
+                try:
+                    port_ips[i] = self._allocate_ips_for_port(context,
+                                                              {'port': p})
+                except ipam_exc.DeferIpam:
+                    pass
+            # the ports asking for specific addresses are allocated first
+            # in case those addresses would be picked for the others
+            for indexes in bulk_ports.values():
+                try:
+                    ips = self._bulk_allocate_ips_for_ports(
+                        context, ipam_driver, [ports[i] for i in indexes])
+                except ipam_exc.DeferIpam:
+                    continue
+                for i, port_ip in zip(indexes, ips):
+                    port_ips[i] = port_ip
+
+            self._store_ip_allocations(
+                context,
+                [{'ip_address': ip['ip_address'],
+                  'network_id': p['network_id'],
+                  'subnet_id': ip['subnet_id'],
+                  'port_id': p['id']}
+                 for p, ips in zip(ports, port_ips) for ip in ips or []])
+            return port_ips
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                if not ipam_driver.needs_rollback():
+                    return
+
+                LOG.debug("An exception occurred during bulk port "
+                          "creation. Reverting IP allocation")
+                for p, ips in zip(ports, port_ips):
+                    if ips:
+                        self._safe_rollback(self._ipam_deallocate_ips,
+                                            context, ipam_driver, p, ips,
+                                            revert_on_fail=False)
+
+    @staticmethod
+    def _is_bulk_allocation(ipam_driver, port):
+        # the requests built by custom factories may depend on each port
+        return (port['fixed_ips'] is constants.ATTR_NOT_SPECIFIED and
+                port['device_owner'] != constants.DEVICE_OWNER_DHCP and
+                ipam_driver.get_address_request_factory() is
+                ipam_req.AddressRequestFactory)
+
+    def _bulk_allocate_ips_for_ports(self, context, ipam_driver, ports):
+        """Allocate IP addresses for ports of the same network and owner.
+
+        One address of each IPv4 and stateful IPv6 subnet group is
+        allocated to every port, with a single IPAM request per group.
+        """
+        p = ports[0]
+        subnets = self._ipam_get_subnets(context,
+                                         network_id=p['network_id'],
+                                         host=p.get(portbindings.HOST_ID),
+                                         service_type=p.get('device_owner'))
+        v4, v6_stateful, v6_stateless = self._classify_subnets(
+            context, subnets)
+
+        port_ips = [[] for port in ports]
+        try:
+            for subnets in (v4, v6_stateful):
+                if not subnets:
+                    continue
+                ipam_allocator = ipam_driver.get_allocator(
+                    [s['id'] for s in subnets])
+                try:
+                    addresses = ipam_allocator.bulk_allocate(
+                        ipam_req.BulkAddressRequest(len(ports)))
+                except ipam_exc.IpAddressGenerationFailureAllSubnets:
+                    raise n_exc.IpAddressGenerationFailure(
+                        net_id=p['network_id'])
+                for ips, (ip_address, subnet_id) in zip(port_ips, addresses):
+                    ips.append({'ip_address': ip_address,
+                                'subnet_id': subnet_id})
+
+            for port, ips in zip(ports, port_ips):
+                auto_ips = self._get_auto_address_ips(v6_stateless, port)
+                if auto_ips:
+                    ips.extend(self._ipam_allocate_ips(context, ipam_driver,
+                                                       port, auto_ips))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                if not ipam_driver.needs_rollback():
+                    return
+
+                LOG.debug("An exception occurred during bulk IP "
+                          "allocation. Reverting allocation")
+                for port, ips in zip(ports, port_ips):
+                    if ips:
+                        self._safe_rollback(self._ipam_deallocate_ips,
+                                            context, ipam_driver, port, ips,
+                                            revert_on_fail=False)
+        return port_ips
+
     def _allocate_ips_for_port(self, context, port):
         """Allocate IP addresses for the port. IPAM version.
 
@@ -594,7 +594,7 @@ class L3_NAT_dbonly_mixin(l3.RouterPluginBase,
     def get_routers(self, context, filters=None, fields=None,
                     sorts=None, limit=None, marker=None,
                     page_reverse=False):
-        marker_obj = lib_db_utils.get_marker_obj(
+        marker_obj = model_query.get_marker_obj(
             self, context, 'router', limit, marker)
         return model_query.get_collection(context, l3_models.Router,
                                           self._make_router_dict,
@@ -0,0 +1,52 @@
+# Copyright 2018 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add ipam availability ranges
+
+Revision ID: 97011354035d
+Revises: 867d39095bf4
+Create Date: 2018-10-19 09:12:44.143250
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron_lib.db import constants
+
+# revision identifiers, used by Alembic.
+revision = '97011354035d'
+down_revision = '867d39095bf4'
+
+
+def upgrade():
+    # The ranges of the existing allocation pools, and of those created by
+    # the servers not upgraded yet, are built from their allocations the
+    # first time an address is allocated from them.
+    op.add_column('ipamallocationpools',
+                  sa.Column('ranges_built', sa.Boolean(), nullable=False,
+                            server_default=sa.sql.false()))
+    op.create_table(
+        'ipamavailabilityranges',
+        sa.Column('allocation_pool_id',
+                  sa.String(length=constants.UUID_FIELD_SIZE),
+                  nullable=False),
+        sa.Column('first_ip', sa.String(length=64), nullable=False),
+        sa.Column('last_ip', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['allocation_pool_id'],
+                                ['ipamallocationpools.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('allocation_pool_id', 'first_ip')
+    )
@@ -0,0 +1,48 @@
+# Copyright 2018 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add subnet ip usages
+
+Revision ID: c896b305fbe9
+Revises: 97011354035d
+Create Date: 2018-10-22 14:31:08.502113
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron_lib.db import constants
+
+# revision identifiers, used by Alembic.
+revision = 'c896b305fbe9'
+down_revision = '97011354035d'
+
+
+def upgrade():
+    # The counters of the existing subnets are initialized from their
+    # allocations the first time an address is allocated or deallocated.
+    op.create_table(
+        'subnetipusages',
+        sa.Column('subnet_id', sa.String(length=constants.UUID_FIELD_SIZE),
+                  nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False,
+                  autoincrement=False),
+        sa.Column('used_ips', sa.Integer(), nullable=False,
+                  server_default='0'),
+        sa.ForeignKeyConstraint(['subnet_id'], ['subnets.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('subnet_id', 'shard')
+    )
@@ -0,0 +1,32 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron_lib.db import model_base
+import sqlalchemy as sa
+
+
+class SubnetIpUsage(model_base.BASEV2):
+    """Represents a shard of the counter of the used IPs of a subnet.
+
+    The number of IP allocations of a subnet is the sum of the used_ips of
+    its shards. The allocations change the shards at random, so that the
+    concurrent allocations in a subnet do not update the same row.
+    """
+
+    __tablename__ = 'subnetipusages'
+
+    subnet_id = sa.Column(sa.String(36),
+                          sa.ForeignKey('subnets.id', ondelete="CASCADE"),
+                          nullable=False, primary_key=True)
+    shard = sa.Column(sa.Integer, nullable=False, primary_key=True,
+                      autoincrement=False)
+    used_ips = sa.Column(sa.Integer, nullable=False, server_default='0')
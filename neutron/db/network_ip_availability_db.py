@@ -18,6 +18,7 @@ import six
 from sqlalchemy import func
 
 from neutron.db import api as db_api
+from neutron.db.models import subnet_ip_usage
 import neutron.db.models_v2 as mod
 
 NETWORK_ID = 'network_id'
@@ -54,6 +55,10 @@ class IpAvailabilityMixin(object):
     # Aggregate query computed column
     network_used_ips_computed_columns = [
         func.count(mod.IPAllocation.subnet_id).label('used_ips')]
+    # Columns for the used_ip counters of the subnets
+    subnet_ip_usage_columns = [
+        subnet_ip_usage.SubnetIpUsage.subnet_id,
+        func.sum(subnet_ip_usage.SubnetIpUsage.used_ips).label('used_ips')]
 
     # Columns for total_ips query
     total_ips_columns = list(common_columns)
@@ -72,14 +77,23 @@ class IpAvailabilityMixin(object):
         # Fetch total_ips by subnet
         subnet_total_ips_dict = cls._generate_subnet_total_ips_dict(context,
                                                                     filters)
-        # Query network/subnet data along with used IP counts
+        # Query network/subnet data along with used IP counters
         record_and_count_query = cls._build_network_used_ip_query(context,
                                                                   filters)
+        # Count the allocations of the subnets without counters
+        subnet_used_ips_dict = {}
+        for row in record_and_count_query:
+            if row.subnet_id and row.used_ips is None:
+                subnet_used_ips_dict = dict(
+                    cls._build_subnet_allocation_count_query(context,
+                                                             filters))
+                break
         # Assemble results
         result_dict = {}
         for row in record_and_count_query:
             cls._add_result(row, result_dict,
-                            subnet_total_ips_dict.get(row.subnet_id, 0))
+                            subnet_total_ips_dict.get(row.subnet_id, 0),
+                            subnet_used_ips_dict.get(row.subnet_id))
 
         # Convert result back into the list it expects
         net_ip_availabilities = list(six.viewvalues(result_dict))
@@ -88,17 +102,42 @@ class IpAvailabilityMixin(object):
     @classmethod
     @db_api.context_manager.reader
     def _build_network_used_ip_query(cls, context, filters):
-        # Generate a query to gather network/subnet/used_ips.
+        # Generate a query to gather network/subnet/used_ips from the
+        # counters of the subnets, used_ips is None for the subnets without
+        # counters.
         # Ensure query is tolerant of missing child table data (outerjoins)
         # Process these outerjoin columns assuming their values may be None
+        usage = context.session.query(*cls.subnet_ip_usage_columns)
+        usage = usage.group_by(
+            subnet_ip_usage.SubnetIpUsage.subnet_id).subquery()
         query = context.session.query()
         query = query.add_columns(*cls.network_used_ips_columns)
-        query = query.add_columns(*cls.network_used_ips_computed_columns)
+        query = query.add_columns(usage.c.used_ips)
         query = query.outerjoin(mod.Subnet,
                                 mod.Network.id == mod.Subnet.network_id)
+        query = query.outerjoin(usage, mod.Subnet.id == usage.c.subnet_id)
+
+        return cls._adjust_query_for_filters(query, filters).all()
+
+    @classmethod
+    @db_api.context_manager.reader
+    def _build_subnet_allocation_count_query(cls, context, filters):
+        # Generate a query counting the allocations of the subnets without
+        # counters, which were not changed since the counters were added.
+        query = context.session.query()
+        query = query.add_columns(
+            mod.Subnet.id,
+            *cls.network_used_ips_computed_columns)
+        query = query.join(mod.Network,
+                           mod.Network.id == mod.Subnet.network_id)
+        query = query.outerjoin(subnet_ip_usage.SubnetIpUsage,
+                                mod.Subnet.id ==
+                                subnet_ip_usage.SubnetIpUsage.subnet_id)
         query = query.outerjoin(mod.IPAllocation,
                                 mod.Subnet.id == mod.IPAllocation.subnet_id)
-        query = query.group_by(*cls.network_used_ips_columns)
+        query = query.filter(subnet_ip_usage.SubnetIpUsage.subnet_id.is_(
+            None))
+        query = query.group_by(mod.Subnet.id)
 
         return cls._adjust_query_for_filters(query, filters)
 
@@ -151,7 +190,8 @@ class IpAvailabilityMixin(object):
         return query
 
     @classmethod
-    def _add_result(cls, db_row, result_dict, subnet_total_ips):
+    def _add_result(cls, db_row, result_dict, subnet_total_ips,
+                    subnet_used_ips=None):
         # Find network in results. Create and add if missing
         if db_row.network_id in result_dict:
             network = result_dict[db_row.network_id]
@@ -166,16 +206,20 @@ class IpAvailabilityMixin(object):
 
         # Only add subnet data if outerjoin rows have it
         if db_row.subnet_id:
-            cls._add_subnet_data_to_net(db_row, network, subnet_total_ips)
+            cls._add_subnet_data_to_net(db_row, network, subnet_total_ips,
+                                        subnet_used_ips)
 
     @classmethod
-    def _add_subnet_data_to_net(cls, db_row, network_dict, subnet_total_ips):
+    def _add_subnet_data_to_net(cls, db_row, network_dict, subnet_total_ips,
+                                subnet_used_ips=None):
+        if subnet_used_ips is None:
+            subnet_used_ips = db_row.used_ips
         subnet = {
             SUBNET_ID: db_row.subnet_id,
             'ip_version': db_row.ip_version,
             'cidr': db_row.cidr,
             SUBNET_NAME: db_row.subnet_name,
-            'used_ips': db_row.used_ips if db_row.used_ips else 0,
+            'used_ips': int(subnet_used_ips) if subnet_used_ips else 0,
             'total_ips': subnet_total_ips
         }
         # Attach subnet result and rollup subnet sums into the parent
@@ -0,0 +1,116 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+NOTE: This module shall not be used by external projects. It will be moved
+      to neutron-lib in due course, and then it can be used from there.
+"""
+
+from oslo_cache import core as cache
+from oslo_config import cfg
+from oslo_utils import uuidutils
+from sqlalchemy import event
+from sqlalchemy import orm
+
+from neutron.common import cache_utils
+from neutron.objects import quota as quota_obj
+
+# The cache region storing the limits set for the tenants, as a dictionary
+# mapping the resource names to the limits, with the keys below. The region
+# is the one of the [cache] section when it is enabled, shared by all the
+# workers and servers using the same backend, or a memory region otherwise.
+_region = None
+_KEY_FORMAT = 'quota_limits:%s:%s'
+# The version of the limits of a tenant is stored in the region too, and is
+# part of the key of the limits. It is replaced on every change of the
+# limits, so that the limits being loaded by any worker when they changed
+# are stored with a key which is not read anymore.
+_VERSION_KEY_FORMAT = 'quota_limits_version:%s'
+
+# The tenants with limits changed by the transaction of a session are stored
+# in the info of the session, their limits are not cached until the
+# transaction ends, and are dropped again once it does.
+_PENDING_KEY = 'quota_limits_cache_pending'
+
+
+def _get_region():
+    global _region
+    if _region is None:
+        cache_utils.register_oslo_configs(cfg.CONF)
+        _region = (cache_utils.get_cache(cfg.CONF) or
+                   cache_utils._get_memory_cache_region())
+    return _region
+
+
+def get_limits(context, tenant_id):
+    """Returns the limits set for a tenant.
+
+    The limits are cached for quota_limits_cache_ttl seconds, with the
+    version of the limits of the tenant, which is replaced when they are
+    changed, see invalidate.
+
+    :returns: A dictionary mapping the resource names to the limits set for
+        the tenant, without the default limits.
+    """
+    ttl = cfg.CONF.QUOTAS.quota_limits_cache_ttl
+    if not ttl or tenant_id in context.session.info.get(_PENDING_KEY, ()):
+        return _load_limits(context, tenant_id)
+    region = _get_region()
+    version_key = _VERSION_KEY_FORMAT % tenant_id
+    version = region.get(version_key)
+    if version is cache.NO_VALUE:
+        # no limits can be cached with a new version
+        version = uuidutils.generate_uuid()
+        region.set(version_key, version)
+        limits = cache.NO_VALUE
+    else:
+        limits = region.get(_KEY_FORMAT % (tenant_id, version),
+                            expiration_time=ttl)
+    if limits is cache.NO_VALUE:
+        # the version is read before the limits, the limits are not read
+        # with it anymore if they are changed meanwhile
+        limits = _load_limits(context, tenant_id)
+        region.set(_KEY_FORMAT % (tenant_id, version), limits)
+    return limits
+
+
+def _load_limits(context, tenant_id):
+    return {quota['resource']: quota['limit'] for quota in
+            quota_obj.Quota.get_objects(context, project_id=tenant_id)}
+
+
+def _replace_versions(region, tenant_ids):
+    region.set_multi({_VERSION_KEY_FORMAT % tenant_id:
+                      uuidutils.generate_uuid() for tenant_id in tenant_ids})
+
+
+def invalidate(context, tenant_id):
+    """Drops the limits of a tenant changed in the session of a context."""
+    if not cfg.CONF.QUOTAS.quota_limits_cache_ttl:
+        return
+    _replace_versions(_get_region(), [tenant_id])
+    # the transaction may not be committed yet, the version is replaced
+    # again once it is, dropping the limits loaded by other transactions
+    context.session.info.setdefault(_PENDING_KEY, set()).add(tenant_id)
+
+
+def clear():
+    global _region
+    _region = None
+
+
+@event.listens_for(orm.Session, 'after_commit')
+@event.listens_for(orm.Session, 'after_rollback')
+def _transaction_end_handler(session):
+    tenant_ids = session.info.pop(_PENDING_KEY, ())
+    if tenant_ids and _region is not None:
+        _replace_versions(_region, tenant_ids)
@@ -15,6 +15,8 @@
 import collections
 import datetime
 
+from oslo_config import cfg
+
 from neutron.db import api as db_api
 from neutron.objects import quota as quota_obj
 
@@ -89,10 +91,17 @@ def set_quota_usage(context, resource, tenant_id,
         usage_data = quota_obj.QuotaUsage.get_object(
             context, resource=resource, project_id=tenant_id)
         if not usage_data:
-            # Must create entry
+            # Must create entry, with the amount of the resource reserved by
+            # the existing reservations
             usage_data = quota_obj.QuotaUsage(
-                context, resource=resource, project_id=tenant_id)
+                context, resource=resource, project_id=tenant_id,
+                reserved=get_total_reserved(context, resource, tenant_id))
             usage_data.create()
+        elif usage_data.dirty and cfg.CONF.QUOTAS.track_quota_usage_deltas:
+            # The quantity reserved is synchronized with the usage, as when
+            # it was found out of sync with the reservations
+            usage_data.reserved = get_total_reserved(
+                context, resource, tenant_id)
         # Perform explicit comparison with None as 0 is a valid value
         if in_use is not None:
             if delta:
@@ -163,6 +172,72 @@ def set_all_quota_usage_dirty(context, resource, dirty=True):
     return len(objs)
 
 
+@db_api.retry_if_session_inactive()
+def get_reserved_quota_usages(context, resource):
+    """Return the quantities of a resource reserved in the quota usages.
+
+    :param context: instance of neutron context with db session
+    :param resource: name of the resource
+    :returns: a dictionary mapping the tenants with the quantity of the
+              resource reserved in their quota usage
+    """
+    objs = quota_obj.QuotaUsage.get_objects(context, resource=resource)
+    return dict((item.project_id, item.reserved) for item in objs)
+
+
+def get_total_reserved(context, resource, tenant_id):
+    """Return the quantity of a resource reserved by a tenant.
+
+    The reservations expired but not removed yet are included, as they are
+    in the quantity reserved in the quota usage.
+
+    :param context: instance of neutron context with db session
+    :param resource: name of the resource
+    :param tenant_id: identifier of the tenant
+    """
+    return sum(
+        quota_obj.Reservation.get_total_reservations_map(
+            context, utcnow(), tenant_id, [resource], expired)
+        .get(resource, 0) for expired in (False, True))
+
+
+@db_api.retry_if_session_inactive()
+def reserve_quota_usage(context, resource, tenant_id, amount, limit=None):
+    """Adds an amount to the quantity of a resource reserved by a tenant.
+
+    The quantity reserved is stored in the quota usage, with a conditional
+    update if a limit is given, in which case the amount is reserved only if
+    the usage is not dirty and the quantity used and reserved does not
+    exceed the limit.
+
+    :param context: instance of neutron context with db session
+    :param resource: name of the resource to reserve
+    :param tenant_id: identifier of the tenant reserving the resource
+    :param amount: quantity of the resource to reserve
+    :param limit: the quota limit of the resource for the tenant, if the
+                  amount must be reserved only within the limit
+    :returns: True if the amount was reserved, False if the usage is not
+              found, dirty, or the limit would be exceeded.
+    """
+    with db_api.context_manager.writer.using(context):
+        return bool(quota_obj.QuotaUsage.update_reserved(
+            context, resource, tenant_id, amount, limit=limit))
+
+
+def _release_reservation(context, reservation):
+    # The reservation can be removed concurrently, as when it expires, its
+    # deltas are released from the quota usages only once
+    if not quota_obj.Reservation.delete_reservation(context, reservation.id):
+        return False
+    # the quantities reserved are only kept in the usages updated by deltas
+    if not cfg.CONF.QUOTAS.track_quota_usage_deltas:
+        return True
+    for delta in reservation.resource_deltas:
+        quota_obj.QuotaUsage.update_reserved(
+            context, delta.resource, reservation.project_id, -delta.amount)
+    return True
+
+
 @db_api.retry_if_session_inactive()
 def create_reservation(context, tenant_id, deltas, expiration=None):
     # This method is usually called from within another transaction.
@@ -204,7 +279,8 @@ def remove_reservation(context, reservation_id, set_dirty=False):
         return
     tenant_id = reservation.project_id
     resources = [delta.resource for delta in reservation.resource_deltas]
-    reservation.delete()
+    if not _release_reservation(context, reservation):
+        return
     if set_dirty:
         # quota_usage for all resource involved in this reservation must
         # be marked as dirty
@@ -234,4 +310,7 @@ def get_reservations_for_resources(context, tenant_id, resources,
 @db_api.retry_if_session_inactive()
 @db_api.context_manager.writer
 def remove_expired_reservations(context, tenant_id=None):
-    return quota_obj.Reservation.delete_expired(context, utcnow(), tenant_id)
+    reservations = quota_obj.Reservation.get_expired_reservations(
+        context, utcnow(), tenant_id)
+    return len([reservation for reservation in reservations
+                if _release_reservation(context, reservation)])
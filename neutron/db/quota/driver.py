@@ -17,10 +17,12 @@ from neutron_lib.api import attributes
 from neutron_lib import exceptions
 from neutron_lib.plugins import constants
 from neutron_lib.plugins import directory
+from oslo_config import cfg
 from oslo_log import log
 
 from neutron.common import exceptions as n_exc
 from neutron.db import api as db_api
+from neutron.db.quota import _limits_cache
 from neutron.db.quota import api as quota_api
 from neutron.objects import quota as quota_obj
 from neutron.quota import resource as res
@@ -69,9 +71,7 @@ class DbQuotaDriver(object):
                             for key, resource in resources.items())
 
         # update with tenant specific limits
-        quota_objs = quota_obj.Quota.get_objects(context, project_id=tenant_id)
-        for item in quota_objs:
-            tenant_quota[item['resource']] = item['limit']
+        tenant_quota.update(_limits_cache.get_limits(context, tenant_id))
 
         return tenant_quota
 
@@ -119,10 +119,12 @@ class DbQuotaDriver(object):
         Raise a "not found" error if the quota for the given tenant was
         never defined.
         """
-        if quota_obj.Quota.delete_objects(
-            context, project_id=tenant_id) < 1:
-            # No record deleted means the quota was not found
-            raise n_exc.TenantQuotaNotFound(tenant_id=tenant_id)
+        with db_api.context_manager.writer.using(context):
+            _limits_cache.invalidate(context, tenant_id)
+            if quota_obj.Quota.delete_objects(
+                context, project_id=tenant_id) < 1:
+                # No record deleted means the quota was not found
+                raise n_exc.TenantQuotaNotFound(tenant_id=tenant_id)
 
     @staticmethod
     @db_api.retry_if_session_inactive()
@@ -160,14 +162,16 @@ class DbQuotaDriver(object):
     @staticmethod
     @db_api.retry_if_session_inactive()
     def update_quota_limit(context, tenant_id, resource, limit):
-        tenant_quotas = quota_obj.Quota.get_objects(
-            context, project_id=tenant_id, resource=resource)
-        if tenant_quotas:
-            tenant_quotas[0].limit = limit
-            tenant_quotas[0].update()
-        else:
-            quota_obj.Quota(context, project_id=tenant_id, resource=resource,
-                            limit=limit).create()
+        with db_api.context_manager.writer.using(context):
+            _limits_cache.invalidate(context, tenant_id)
+            tenant_quotas = quota_obj.Quota.get_objects(
+                context, project_id=tenant_id, resource=resource)
+            if tenant_quotas:
+                tenant_quotas[0].limit = limit
+                tenant_quotas[0].update()
+            else:
+                quota_obj.Quota(context, project_id=tenant_id,
+                                resource=resource, limit=limit).create()
 
     def _get_quotas(self, context, tenant_id, resources):
         """Retrieves the quotas for specific resources.
@@ -207,6 +211,11 @@ class DbQuotaDriver(object):
         # failure when a MySQL Galera cluster is employed. Also, this class of
         # locks should be ok to use when support for sending "hotspot" writes
         # to a single node will be available.
+        # NOTE: when the tracked usages are updated by deltas, they are exact
+        # and the reservation is first attempted without counting, with a
+        # conditional update of the quantity reserved in the usage, and the
+        # resources are counted only if the usage is dirty, missing, or the
+        # limit would be exceeded.
         requested_resources = deltas.keys()
         with db_api.context_manager.writer.using(context):
             # get_tenant_quotes needs in input a dictionary mapping resource
@@ -223,6 +232,10 @@ class DbQuotaDriver(object):
                       ",".join(unlimited_resources))
             requested_resources = (set(requested_resources) -
                                    unlimited_resources)
+            reserved_resources = self._reserve_usages_headroom(
+                context, tenant_id, resources, deltas, current_limits,
+                requested_resources)
+            requested_resources -= reserved_resources
             # Gather current usage information
             # TODO(salv-orlando): calling count() for every resource triggers
             # multiple queries on quota usage. This should be improved, however
@@ -260,11 +273,36 @@ class DbQuotaDriver(object):
 
             if resources_over_limit:
                 raise exceptions.OverQuota(overs=sorted(resources_over_limit))
+            # The quantities reserved in the usages updated by deltas
+            # include all the reservations, the reservations made without a
+            # conditional update are added too
+            if cfg.CONF.QUOTAS.track_quota_usage_deltas:
+                for resource in set(deltas) - reserved_resources:
+                    quota_api.reserve_quota_usage(
+                        context, resource, tenant_id, deltas[resource])
             # Success, store the reservation
             # TODO(salv-orlando): Make expiration time configurable
             return quota_api.create_reservation(
                 context, tenant_id, deltas)
 
+    @staticmethod
+    def _reserve_usages_headroom(context, tenant_id, resources, deltas,
+                                 current_limits, requested_resources):
+        """Reserves the resources in the headroom of their usages.
+
+        :returns: the set of the resources reserved.
+        """
+        if not cfg.CONF.QUOTAS.track_quota_usage_deltas:
+            return set()
+        reserved_resources = set()
+        for resource in requested_resources:
+            if (isinstance(resources[resource], res.TrackedResource) and
+                    quota_api.reserve_quota_usage(
+                        context, resource, tenant_id, deltas[resource],
+                        limit=current_limits[resource])):
+                reserved_resources.add(resource)
+        return reserved_resources
+
     def commit_reservation(self, context, reservation_id):
         # Do not mark resource usage as dirty. If a reservation is committed,
         # then the relevant resources have been created. Usage data for these
@@ -720,7 +720,9 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
             **kwargs)
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=[ext_sg.SECURITYGROUPS],
+                             relationships=['security_groups'])
     def _extend_port_dict_security_group(port_res, port_db):
         # Security group bindings will be retrieved from the SQLAlchemy
         # model. As they're loaded eagerly with ports because of the
@@ -23,7 +23,9 @@ class SubnetServiceTypeMixin(object):
     """Mixin class to extend subnet with service type attribute"""
 
     @staticmethod
-    @resource_extend.extends([subnet_def.COLLECTION_NAME])
+    @resource_extend.extends([subnet_def.COLLECTION_NAME],
+                             fields=['service_types'],
+                             relationships=['service_types'])
     def _extend_subnet_service_types(subnet_res, subnet_db):
         subnet_res['service_types'] = [service_type['service_type'] for
                                        service_type in
@@ -15,6 +15,7 @@ import abc
 from oslo_config import cfg
 import six
 
+from neutron.ipam import exceptions as ipam_exc
 from neutron.ipam import requests as ipam_req
 from neutron import manager
 
@@ -149,6 +150,26 @@ class Subnet(object):
             AddressOutsideSubnet
         """
 
+    def bulk_allocate(self, address_request):
+        """Allocates a number of any available IP addresses
+
+        The default implementation allocates the addresses one at a time,
+        drivers can override it to allocate them at once.
+
+        :param address_request: Specifies how many addresses to allocate.
+        :type address_request: An instance of BulkAddressRequest
+        :returns: A list of the allocated addresses, shorter than requested
+            if the subnet has no more available addresses.
+        """
+        addresses = []
+        for i in range(address_request.num_addresses):
+            try:
+                addresses.append(
+                    self.allocate(ipam_req.AnyAddressRequest()))
+            except ipam_exc.IpAddressGenerationFailure:
+                break
+        return addresses
+
     @abc.abstractmethod
     def deallocate(self, address):
         """Returns a previously allocated address to the pool
@@ -187,3 +208,14 @@ class SubnetGroup(object):
         :raises: AddressNotAvailable, AddressOutsideAllocationPool,
             AddressOutsideSubnet, IpAddressGenerationFailureAllSubnets
         """
+
+    def bulk_allocate(self, address_request):
+        """Allocates a number of any available IP addresses
+
+        :param address_request: Specifies how many addresses to allocate.
+        :type address_request: An instance of BulkAddressRequest
+        :returns: A list of netaddr.IPAddress, subnet_id tuples
+        :raises: IpAddressGenerationFailureAllSubnets
+        """
+        return [self.allocate(ipam_req.AnyAddressRequest())
+                for i in range(address_request.num_addresses)]
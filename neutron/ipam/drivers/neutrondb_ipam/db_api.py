@@ -16,6 +16,7 @@
 from oslo_utils import uuidutils
 
 from neutron.common import constants as const
+from neutron.ipam.drivers.neutrondb_ipam import db_models
 from neutron.objects import ipam as ipam_objs
 
 # Database operations for Neutron's DB-backed IPAM driver
@@ -96,6 +97,81 @@ class IpamSubnetManager(object):
         return ipam_objs.IpamAllocationPool.get_objects(
             context, ipam_subnet_id=self._ipam_subnet_id)
 
+    def list_pools_without_ranges(self, context):
+        """Return the pools of the subnet whose ranges were never built.
+
+        :param context: neutron api request context
+        :returns: a list of IpamAllocationPool models
+        """
+        return context.session.query(db_models.IpamAllocationPool).filter_by(
+            ipam_subnet_id=self._ipam_subnet_id, ranges_built=False).all()
+
+    def set_ranges_built(self, context, allocation_pool_ids):
+        """Mark the free address ranges of allocation pools as built.
+
+        An allocation pool whose ranges were built has no free address when
+        it has no range.
+
+        :param context: neutron api request context
+        :param allocation_pool_ids: the pools whose ranges were built
+        """
+        if not allocation_pool_ids:
+            return
+        context.session.query(db_models.IpamAllocationPool).filter(
+            db_models.IpamAllocationPool.id.in_(allocation_pool_ids)).update(
+            {'ranges_built': True}, synchronize_session=False)
+
+    def list_ranges(self, context):
+        """Return the free address ranges of the pools of the subnet.
+
+        :param context: neutron api request context
+        :returns: a list of (allocation_pool_id, first_ip, last_ip) rows
+        """
+        ip_range = db_models.IpamAvailabilityRange
+        return context.session.query(
+            ip_range.allocation_pool_id, ip_range.first_ip,
+            ip_range.last_ip).join(
+            db_models.IpamAllocationPool,
+            db_models.IpamAllocationPool.id == ip_range.allocation_pool_id
+        ).filter(
+            db_models.IpamAllocationPool.ipam_subnet_id ==
+            self._ipam_subnet_id).all()
+
+    def create_ranges(self, context, allocation_pool_id, ip_ranges):
+        """Create free address ranges in an allocation pool.
+
+        :param context: neutron api request context
+        :param allocation_pool_id: the pool of the ranges
+        :param ip_ranges: a list of (first_ip, last_ip) tuples
+        """
+        for first_ip, last_ip in ip_ranges:
+            context.session.add(db_models.IpamAvailabilityRange(
+                allocation_pool_id=allocation_pool_id,
+                first_ip=first_ip, last_ip=last_ip))
+        context.session.flush()
+
+    def delete_range(self, context, ip_range):
+        """Delete a free address range unless it was changed concurrently.
+
+        :param context: neutron api request context
+        :param ip_range: the (allocation_pool_id, first_ip, last_ip) row
+        :returns: True if the range was deleted, False if it was changed or
+            deleted by another transaction.
+        """
+        allocation_pool_id, first_ip, last_ip = ip_range
+        count = context.session.query(
+            db_models.IpamAvailabilityRange).filter_by(
+            allocation_pool_id=allocation_pool_id, first_ip=first_ip,
+            last_ip=last_ip).delete(synchronize_session='evaluate')
+        return count == 1
+
+    def list_allocated_addresses(self, context, ip_addresses):
+        """Return which of the given addresses are allocated."""
+        return {ip_address for ip_address, in context.session.query(
+            db_models.IpamAllocation.ip_address).filter(
+            db_models.IpamAllocation.ipam_subnet_id == self._ipam_subnet_id,
+            db_models.IpamAllocation.ip_address.in_(ip_addresses))}
+
     def check_unique_allocation(self, context, ip_address):
         """Validate that the IP address on the subnet is not in use."""
         return not ipam_objs.IpamAllocation.objects_exist(
@@ -103,6 +179,11 @@ class IpamSubnetManager(object):
                      status=const.IPAM_ALLOCATION_STATUS_ALLOCATED,
                      ip_address=ip_address)
 
+    def count_allocations(self, context):
+        """Return the number of allocations of the subnet."""
+        return ipam_objs.IpamAllocation.count(
+            context, ipam_subnet_id=self._ipam_subnet_id)
+
     def list_allocations(self, context,
                          status=const.IPAM_ALLOCATION_STATUS_ALLOCATED):
         """Return current allocations for the subnet.
@@ -126,6 +207,21 @@ class IpamSubnetManager(object):
             context, ip_address=ip_address, status=status,
             ipam_subnet_id=self._ipam_subnet_id).create()
 
+    def create_allocations(self, context, ip_addresses,
+                           status=const.IPAM_ALLOCATION_STATUS_ALLOCATED):
+        """Create the IP allocation entries of a number of addresses.
+
+        The entries are inserted at once rather than one object at a time.
+
+        :param context: neutron api request context
+        :param ip_addresses: the IP addresses to allocate
+        :param status: IP allocation status
+        """
+        context.session.add_all(
+            [db_models.IpamAllocation(ip_address=ip_address, status=status,
+                                      ipam_subnet_id=self._ipam_subnet_id)
+             for ip_address in ip_addresses])
+
     def delete_allocation(self, context, ip_address):
         """Remove an IP allocation for this subnet.
 
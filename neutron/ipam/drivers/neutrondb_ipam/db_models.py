@@ -38,6 +38,10 @@ class IpamAllocationPool(model_base.BASEV2, model_base.HasId):
                                nullable=False)
     first_ip = sa.Column(sa.String(64), nullable=False)
     last_ip = sa.Column(sa.String(64), nullable=False)
+    # Whether the free address ranges of the pool were built, the pool is
+    # full when they were and it has no range left.
+    ranges_built = sa.Column(sa.Boolean(), nullable=False, default=False,
+                             server_default=sa.sql.false())
 
     def __repr__(self):
         return "%s - %s" % (self.first_ip, self.last_ip)
@@ -69,3 +73,22 @@ class IpamAllocation(model_base.BASEV2):
                                              ondelete="CASCADE"),
                                primary_key=True,
                                nullable=False)
+
+
+class IpamAvailabilityRange(model_base.BASEV2):
+    """Range of the free addresses of an allocation pool.
+
+    The ranges are updated when the addresses are allocated and deallocated,
+    so that the driver can pick an address without listing the allocations
+    of the subnet.
+    """
+    allocation_pool_id = sa.Column(sa.String(36),
+                                   sa.ForeignKey('ipamallocationpools.id',
+                                                 ondelete="CASCADE"),
+                                   nullable=False,
+                                   primary_key=True)
+    first_ip = sa.Column(sa.String(64), nullable=False, primary_key=True)
+    last_ip = sa.Column(sa.String(64), nullable=False)
+
+    def __repr__(self):
+        return "%s - %s" % (self.first_ip, self.last_ip)
@@ -13,15 +13,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import itertools
 import random
 
 import netaddr
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
+from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_log import log
 from oslo_utils import uuidutils
+from sqlalchemy import event
+from sqlalchemy import orm
 
 from neutron._i18n import _
 from neutron.ipam import driver as ipam_base
@@ -34,6 +38,88 @@ from neutron.ipam import utils as ipam_utils
 
 LOG = log.getLogger(__name__)
 
+# The shards of the pools of the subnets this process allocated addresses
+# from, it keeps allocating from them while they have free addresses so that
+# the processes allocate from different shards.
+#   <subnet id> : {(<allocation pool id>, <shard index>)}
+_worker_shards = collections.defaultdict(set)
+# The shards allocated from by the transactions of this process in progress,
+# the other transactions of this process allocate from other shards.
+#   <subnet id> : {(<allocation pool id>, <shard index>)}
+_busy_shards = collections.defaultdict(set)
+_BUSY_SHARDS_KEY = 'ipam_busy_shards'
+
+# The free ranges of the allocation pools are split, and not merged, at the
+# bounds of blocks of addresses, so that the concurrent allocations picking
+# their addresses from random free addresses update different range rows.
+# The pools are divided into at most _MAX_RANGE_BLOCKS blocks of at least
+# _MIN_RANGE_BLOCK_SIZE addresses.
+_MAX_RANGE_BLOCKS = 256
+_MIN_RANGE_BLOCK_SIZE = 16
+
+
+@event.listens_for(orm.Session, 'after_commit')
+@event.listens_for(orm.Session, 'after_rollback')
+def _release_busy_shards(session):
+    for subnet_id, shards in session.info.pop(_BUSY_SHARDS_KEY, {}).items():
+        _busy_shards[subnet_id].difference_update(shards)
+        if not _busy_shards[subnet_id]:
+            del _busy_shards[subnet_id]
+
+
+def _get_shard_size(ip_pool):
+    """Return the number of addresses of the shards of a pool, 0 if none."""
+    num_shards = cfg.CONF.ipam_allocation_shards
+    if not num_shards:
+        return 0
+    pool_size = netaddr.IPRange(ip_pool.first_ip, ip_pool.last_ip).size
+    return -(-pool_size // num_shards)
+
+
+def _get_shard(ip_pool, ip_address, shard_size):
+    offset = int(netaddr.IPAddress(ip_address)) - int(
+        netaddr.IPAddress(ip_pool.first_ip))
+    return ip_pool.id, offset // shard_size
+
+
+def _get_block_sizes(ip_pool):
+    """Return the sizes of the blocks and shards the ranges are split at."""
+    pool_size = netaddr.IPRange(ip_pool.first_ip, ip_pool.last_ip).size
+    block_size = max(_MIN_RANGE_BLOCK_SIZE, -(-pool_size // _MAX_RANGE_BLOCKS))
+    return [size for size in (block_size, _get_shard_size(ip_pool)) if size]
+
+
+def _get_block(ip_pool, ip_address):
+    """Return the block and the shard of a pool an address is in."""
+    offset = int(netaddr.IPAddress(ip_address)) - int(
+        netaddr.IPAddress(ip_pool.first_ip))
+    return tuple(offset // size for size in _get_block_sizes(ip_pool))
+
+
+def _split_ranges(ip_pool, ip_set):
+    """Split the ranges of an IPSet at the bounds of the blocks of a pool.
+
+    The ranges are split at the bounds of the shards of the pool too.
+
+    :returns: A list of (first_ip, last_ip) tuples.
+    """
+    block_sizes = _get_block_sizes(ip_pool)
+    pool_first = int(netaddr.IPAddress(ip_pool.first_ip))
+    ip_ranges = []
+    for ip_range in ip_set.iter_ipranges():
+        first = ip_range.first
+        while first <= ip_range.last:
+            last = ip_range.last
+            for size in block_sizes:
+                block_last = pool_first + size * (
+                    (first - pool_first) // size + 1) - 1
+                last = min(last, block_last)
+            ip_ranges.append(
+                (str(netaddr.IPAddress(first, ip_range.version)),
+                 str(netaddr.IPAddress(last, ip_range.version))))
+            first = last + 1
+    return ip_ranges
+
 
 class NeutronDbSubnet(ipam_base.Subnet):
     """Manage IP addresses for Neutron DB IPAM driver.
@@ -72,6 +158,8 @@ class NeutronDbSubnet(ipam_base.Subnet):
         # Create IPAM allocation pools
         cls.create_allocation_pools(subnet_manager, ctx, pools,
                                     subnet_request.subnet_cidr)
+        cls._build_ranges(subnet_manager, ctx,
+                          subnet_manager.list_pools(ctx))
 
         return cls(ipam_subnet_id,
                    ctx,
@@ -150,39 +238,261 @@ class NeutronDbSubnet(ipam_base.Subnet):
                 subnet_id=self.subnet_manager.neutron_id,
                 ip=ip_address)
 
-    def _generate_ip(self, context, prefer_next=False):
-        """Generate an IP address from the set of available addresses."""
+    @classmethod
+    def _build_ranges(cls, subnet_manager, context, ip_pools):
+        """Build the free address ranges of pools of the subnet.
+
+        This lists the allocations of the subnet. It is only done when the
+        pools are created or updated, and when the ranges of the pools are
+        missing, see _build_missing_ranges.
+        """
         ip_allocations = netaddr.IPSet()
-        for ipallocation in self.subnet_manager.list_allocations(context):
+        for ipallocation in subnet_manager.list_allocations(context):
             ip_allocations.add(ipallocation.ip_address)
 
-        for ip_pool in self.subnet_manager.list_pools(context):
+        for ip_pool in ip_pools:
             ip_set = netaddr.IPSet()
             ip_set.add(netaddr.IPRange(ip_pool.first_ip, ip_pool.last_ip))
             av_set = ip_set.difference(ip_allocations)
-            if av_set.size == 0:
+            subnet_manager.create_ranges(context, ip_pool.id,
+                                         _split_ranges(ip_pool, av_set))
+        subnet_manager.set_ranges_built(
+            context, [ip_pool.id for ip_pool in ip_pools])
+        return subnet_manager.list_ranges(context)
+
+    def _build_missing_ranges(self, context):
+        """Build the free address ranges missing from the subnet.
+
+        The subnet has no free range: it is full, unless the ranges of some
+        of its pools were never built, as for the pools created by servers
+        which do not build them, or unless addresses were deallocated by
+        such servers, as during an upgrade. The latter is detected with a
+        count of the allocations of the subnet, the allocations are only
+        listed when ranges are built.
+
+        :returns: The free address ranges of the subnet.
+        """
+        ip_pools = self.subnet_manager.list_pools_without_ranges(context)
+        if not ip_pools:
+            ip_pools = self.subnet_manager.list_pools(context)
+            pools_size = sum(
+                netaddr.IPRange(ip_pool.first_ip, ip_pool.last_ip).size
+                for ip_pool in ip_pools)
+            if self.subnet_manager.count_allocations(context) >= pools_size:
+                return []
+            LOG.debug("Addresses of subnet %s were deallocated but not "
+                      "added back to its free ranges",
+                      self.subnet_manager.neutron_id)
+        return self._build_ranges(self.subnet_manager, context, ip_pools)
+
+    def _remove_from_ranges(self, context, ranges, ip_addresses):
+        """Remove allocated addresses from the free address ranges."""
+        removed = collections.defaultdict(netaddr.IPSet)
+        for ip_address in ip_addresses:
+            ip_address = netaddr.IPAddress(ip_address)
+            for ip_range in ranges:
+                if ip_address in netaddr.IPRange(ip_range.first_ip,
+                                                 ip_range.last_ip):
+                    removed[ip_range].add(ip_address)
+                    break
+
+        for ip_range, ip_set in removed.items():
+            # NOTE: The range is not replaced if another transaction changed
+            # it since it was read, the request is retried instead.
+            if not self.subnet_manager.delete_range(context, ip_range):
+                # the shards of this process are being allocated from by
+                # another one, this process picks other shards
+                _worker_shards.pop(self.subnet_manager.neutron_id, None)
+                raise db_exc.RetryRequest(
+                    ipam_exc.IpAddressGenerationFailure(
+                        subnet_id=self.subnet_manager.neutron_id))
+            av_set = netaddr.IPSet(
+                netaddr.IPRange(ip_range.first_ip, ip_range.last_ip))
+            av_set = av_set.difference(ip_set)
+            self.subnet_manager.create_ranges(
+                context, ip_range.allocation_pool_id,
+                [(str(av_range[0]), str(av_range[-1]))
+                 for av_range in av_set.iter_ipranges()])
+
+    @staticmethod
+    def _pick_addresses(ranges, num_addresses, prefer_next=False):
+        """Pick addresses from the free addresses of the ranges.
+
+        The first free addresses are picked if prefer_next, otherwise the
+        addresses are picked at random in a window of free addresses which
+        starts at a random free address, so the concurrent allocations
+        rarely remove addresses from the same range.
+        """
+        ip_ranges = sorted(
+            (netaddr.IPRange(ip_range.first_ip, ip_range.last_ip)
+             for ip_range in ranges), key=lambda r: r.first)
+        if prefer_next:
+            window = num_addresses
+        else:
+            # Compute a value for the selection window
+            window = num_addresses + 29
+            # the window wraps around the free addresses, its start is
+            # picked at random so the ranges are weighted by their size
+            offset = random.randrange(sum(r.size for r in ip_ranges))
+            for index, ip_range in enumerate(ip_ranges):
+                if offset < ip_range.size:
+                    break
+                offset -= ip_range.size
+            start = ip_range[offset]
+            ip_ranges = ([netaddr.IPRange(start, ip_range[-1])] +
+                         ip_ranges[index + 1:] + ip_ranges[:index])
+            if offset:
+                ip_ranges.append(netaddr.IPRange(ip_range[0], start - 1))
+        candidate_ips = []
+        for ip_range in ip_ranges:
+            candidate_ips.extend(itertools.islice(
+                ip_range, window - len(candidate_ips)))
+            if len(candidate_ips) >= window:
+                break
+        if not prefer_next:
+            candidate_ips = sorted(random.sample(
+                candidate_ips, min(num_addresses, len(candidate_ips))))
+        return [str(ip) for ip in candidate_ips[:num_addresses]]
+
+    def _pick_sharded_addresses(self, context, ranges, num_addresses):
+        """Pick the first free addresses of shards of the pools.
+
+        The shards this process allocated addresses from are preferred,
+        then the shards not allocated from by the transactions of this
+        process in progress, picked at random, then the other shards.
+        """
+        subnet_id = self.subnet_manager.neutron_id
+        ip_pools = {ip_pool.id: ip_pool for ip_pool in
+                    self.subnet_manager.list_pools(context)}
+        shard_ranges = collections.defaultdict(list)
+        for ip_range in ranges:
+            ip_pool = ip_pools.get(ip_range.allocation_pool_id)
+            if ip_pool is None:
                 continue
-
-            if prefer_next:
-                window = 1
+            shard = _get_shard(ip_pool, ip_range.first_ip,
+                               _get_shard_size(ip_pool))
+            shard_ranges[shard].append(ip_range)
+
+        # the exhausted shards are forgotten
+        worker_shards = _worker_shards[subnet_id]
+        worker_shards.intersection_update(shard_ranges)
+        busy_shards = _busy_shards[subnet_id]
+        own = [shard for shard in worker_shards if shard not in busy_shards]
+        free = [shard for shard in shard_ranges
+                if shard not in busy_shards and shard not in worker_shards]
+        busy = [shard for shard in shard_ranges if shard in busy_shards]
+        random.shuffle(free)
+        random.shuffle(busy)
+
+        candidate_ips = []
+        used_shards = set()
+        for shard in itertools.chain(own, free, busy):
+            for ip_range in sorted(shard_ranges[shard],
+                                   key=lambda r: netaddr.IPAddress(
+                                       r.first_ip)):
+                candidate_ips.extend(itertools.islice(
+                    netaddr.IPRange(ip_range.first_ip, ip_range.last_ip),
+                    num_addresses - len(candidate_ips)))
+                if len(candidate_ips) >= num_addresses:
+                    break
+            used_shards.add(shard)
+            if len(candidate_ips) >= num_addresses:
+                break
+
+        worker_shards.update(used_shards)
+        busy_shards.update(used_shards)
+        context.session.info.setdefault(_BUSY_SHARDS_KEY, {}).setdefault(
+            subnet_id, set()).update(used_shards)
+        return [str(ip) for ip in candidate_ips]
+
+    def _generate_ips(self, context, num_addresses, prefer_next=False):
+        """Generate IP addresses from the free address ranges.
+
+        The addresses are picked from the shards of the pools, or at random
+        in a window of free addresses if the pools are not divided in shards,
+        and removed from the ranges, the allocations of the subnet are not
+        listed.
+
+        :returns: A list of at most num_addresses addresses.
+        """
+        ranges = self.subnet_manager.list_ranges(context)
+        if not ranges:
+            ranges = self._build_missing_ranges(context)
+        ip_addresses = []
+        while ranges and len(ip_addresses) < num_addresses:
+            if cfg.CONF.ipam_allocation_shards and not prefer_next:
+                candidate_ips = self._pick_sharded_addresses(
+                    context, ranges, num_addresses - len(ip_addresses))
             else:
-                # Compute a value for the selection window
-                window = min(av_set.size, 30)
-            ip_index = random.randint(1, window)
-            candidate_ips = list(itertools.islice(av_set, ip_index))
-            allocated_ip = candidate_ips[
-                random.randint(0, len(candidate_ips) - 1)]
-            return str(allocated_ip), ip_pool.id
+                candidate_ips = self._pick_addresses(
+                    ranges, num_addresses - len(ip_addresses), prefer_next)
+            self._remove_from_ranges(context, ranges, candidate_ips)
+            # The addresses allocated by servers which did not update the
+            # ranges, as during an upgrade, are only removed from them.
+            allocated = self.subnet_manager.list_allocated_addresses(
+                context, candidate_ips)
+            ip_addresses.extend(ip for ip in candidate_ips
+                                if ip not in allocated)
+            if allocated:
+                LOG.debug("Addresses %(ips)s of subnet %(subnet_id)s were "
+                          "allocated but not removed from its free ranges",
+                          {'ips': ', '.join(allocated),
+                           'subnet_id': self.subnet_manager.neutron_id})
+            ranges = self.subnet_manager.list_ranges(context)
+
+        return ip_addresses
+
+    def _generate_ip(self, context, prefer_next=False):
+        """Generate an IP address from the set of available addresses."""
+        ip_addresses = self._generate_ips(context, 1, prefer_next)
+        if not ip_addresses:
+            raise ipam_exc.IpAddressGenerationFailure(
+                subnet_id=self.subnet_manager.neutron_id)
+        return ip_addresses[0]
+
+    def _release_address(self, context, address):
+        """Add a deallocated address back to the free address ranges."""
+        ip_address = netaddr.IPAddress(address)
+        for ip_pool in self.subnet_manager.list_pools(context):
+            if ip_address in netaddr.IPRange(ip_pool.first_ip,
+                                             ip_pool.last_ip):
+                break
+        else:
+            # the address is not in the pools since they were updated
+            return
 
-        raise ipam_exc.IpAddressGenerationFailure(
-                  subnet_id=self.subnet_manager.neutron_id)
+        block = _get_block(ip_pool, address)
+        first_ip = last_ip = address
+        for ip_range in self.subnet_manager.list_ranges(context):
+            if ip_range.allocation_pool_id != ip_pool.id:
+                continue
+            if ip_address in netaddr.IPRange(ip_range.first_ip,
+                                             ip_range.last_ip):
+                return
+            if (ip_range.last_ip != str(ip_address - 1) and
+                    ip_range.first_ip != str(ip_address + 1)):
+                continue
+            if _get_block(ip_pool, ip_range.first_ip) != block:
+                # the ranges are not merged across the blocks and shards
+                continue
+            if ip_range.last_ip == str(ip_address - 1):
+                first_ip = ip_range.first_ip
+            else:
+                last_ip = ip_range.last_ip
+            # the adjacent ranges are merged with the address
+            if not self.subnet_manager.delete_range(context, ip_range):
+                raise db_exc.RetryRequest(
+                    ipam_exc.IpAddressAllocationNotFound(
+                        subnet_id=self.subnet_manager.neutron_id,
+                        ip_address=address))
+        self.subnet_manager.create_ranges(context, ip_pool.id,
+                                          [(first_ip, last_ip)])
 
     def allocate(self, address_request):
         # NOTE(pbondar): Ipam driver is always called in context of already
         # running transaction, which is started on create_port or upper level.
         # To be able to do rollback/retry actions correctly ipam driver
         # should not create new nested transaction blocks.
-        all_pool_id = None
         # NOTE(salv-orlando): It would probably better to have a simpler
         # model for address requests and just check whether there is a
         # specific IP address specified in address_request
@@ -191,11 +501,13 @@ class NeutronDbSubnet(ipam_base.Subnet):
             # Check availability of requested IP
             ip_address = str(address_request.address)
             self._verify_ip(self._context, ip_address)
+            self._remove_from_ranges(
+                self._context, self.subnet_manager.list_ranges(self._context),
+                [ip_address])
         else:
             prefer_next = isinstance(address_request,
                                      ipam_req.PreferNextAddressRequest)
-            ip_address, all_pool_id = self._generate_ip(self._context,
-                                                        prefer_next)
+            ip_address = self._generate_ip(self._context, prefer_next)
 
         # Create IP allocation request object
         # The only defined status at this stage is 'ALLOCATED'.
@@ -215,6 +527,23 @@ class NeutronDbSubnet(ipam_base.Subnet):
                 subnet_id=self.subnet_manager.neutron_id)
         return ip_address
 
+    def bulk_allocate(self, address_request):
+        # NOTE: The addresses are taken from the free ranges at once and
+        # inserted at once.
+        ip_addresses = self._generate_ips(self._context,
+                                          address_request.num_addresses)
+        if not ip_addresses:
+            raise ipam_exc.IpAddressGenerationFailure(
+                subnet_id=self.subnet_manager.neutron_id)
+        try:
+            with self._context.session.begin(subtransactions=True):
+                self.subnet_manager.create_allocations(self._context,
+                                                       ip_addresses)
+        except db_exc.DBReferenceError:
+            raise n_exc.SubnetNotFound(
+                subnet_id=self.subnet_manager.neutron_id)
+        return ip_addresses
+
     def deallocate(self, address):
         # This is almost a no-op because the Neutron DB IPAM driver does not
         # delete IPAllocation objects at every deallocation. The only
@@ -226,6 +555,7 @@ class NeutronDbSubnet(ipam_base.Subnet):
             raise ipam_exc.IpAddressAllocationNotFound(
                 subnet_id=self.subnet_manager.neutron_id,
                 ip_address=address)
+        self._release_address(self._context, address)
 
     def _no_pool_changes(self, context, pools):
         """Check if pool updates in db are required."""
@@ -243,6 +573,9 @@ class NeutronDbSubnet(ipam_base.Subnet):
         self.subnet_manager.delete_allocation_pools(self._context)
         self.create_allocation_pools(self.subnet_manager, self._context, pools,
                                      cidr)
+        # the ranges of the deleted pools were deleted with them
+        self._build_ranges(self.subnet_manager, self._context,
+                           self.subnet_manager.list_pools(self._context))
         self._pools = pools
 
     def get_details(self):
@@ -210,6 +210,21 @@ class PreferNextAddressRequest(AnyAddressRequest):
     """Used to request next available IP address from the pool."""
 
 
+class BulkAddressRequest(AddressRequest):
+    """Used to request a number of any available addresses from the pool."""
+    def __init__(self, num_addresses):
+        """
+        :param num_addresses: The number of addresses being requested
+        :type num_addresses: int
+        """
+        super(BulkAddressRequest, self).__init__()
+        self._num_addresses = num_addresses
+
+    @property
+    def num_addresses(self):
+        return self._num_addresses
+
+
 class AutomaticAddressRequest(SpecificAddressRequest):
     """Used to create auto generated addresses, such as EUI64"""
     EUI64 = 'eui64'
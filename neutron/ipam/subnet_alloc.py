@@ -13,8 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import heapq
 import math
-import operator
 
 import netaddr
 from neutron_lib import constants
@@ -32,6 +33,83 @@ from neutron.ipam import requests as ipam_req
 from neutron.ipam import utils as ipam_utils
 
 
+# This dictionary will store the free prefixes of the subnet pools this
+# process allocated subnets from, with the hash the subnet pool was locked
+# with. They are used again while the hash of the subnet pool is unchanged,
+# when no subnet was allocated from the subnet pool by another process.
+# With the allocations of a subnet pool spread over N API workers, about
+# 1/N of them find the free prefixes cached, the others compute them from
+# the subnets of the subnet pool as before.
+#   <subnetpool id> : (<hash>, <prefixes>, <FreePrefixes>)
+_free_prefixes = {}
+
+
+class FreePrefixes(object):
+    """Buddy allocator of the free prefixes of a subnet pool.
+
+    The free space of the subnet pool is kept as the aligned CIDRs of the
+    difference of its prefixes and of the CIDRs of its subnets, indexed by
+    prefix length. A free prefix of a given length is found by looking at
+    the prefix lengths up to it, which are at most the number of bits of
+    the addresses, and the CIDR it is taken from is split in halves down to
+    the length of the prefix.
+    """
+
+    def __init__(self, prefixes, allocations):
+        available_set = netaddr.IPSet(prefixes).difference(
+            netaddr.IPSet(allocations))
+        available_set.compact()
+        self._cidrs = collections.defaultdict(set)
+        # the heaps of the CIDRs by prefix length, where the allocated
+        # CIDRs are left until they are on top
+        self._heaps = collections.defaultdict(list)
+        for cidr in available_set.iter_cidrs():
+            self._add(cidr)
+
+    def _add(self, cidr):
+        self._cidrs[cidr.prefixlen].add(cidr)
+        heapq.heappush(self._heaps[cidr.prefixlen], cidr)
+
+    def _first(self, prefixlen):
+        cidrs = self._cidrs[prefixlen]
+        heap = self._heaps[prefixlen]
+        while heap and heap[0] not in cidrs:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _split(self, cidr, subnet):
+        self._cidrs[cidr.prefixlen].discard(cidr)
+        for remaining in netaddr.IPSet([cidr]).difference(
+                netaddr.IPSet([subnet])).iter_cidrs():
+            self._add(remaining)
+
+    def allocate_any(self, prefixlen):
+        """Allocate the first prefix of the smallest CIDR it fits in.
+
+        :returns: The allocated prefix, None if there is no free space.
+        """
+        for length in range(prefixlen, -1, -1):
+            cidr = self._first(length)
+            if cidr is not None:
+                subnet = next(cidr.subnet(prefixlen))
+                self._split(cidr, subnet)
+                return subnet
+        return None
+
+    def allocate_specific(self, subnet):
+        """Allocate a specific prefix.
+
+        :returns: True if the prefix was free, False otherwise.
+        """
+        for length in range(subnet.prefixlen, -1, -1):
+            cidr = netaddr.IPNetwork((subnet.first, length),
+                                     version=subnet.version).cidr
+            if cidr in self._cidrs[length]:
+                self._split(cidr, subnet)
+                return True
+        return False
+
+
 class SubnetAllocator(driver.Pool):
     """Class for handling allocation of subnet prefixes from a subnet pool.
 
@@ -72,6 +150,7 @@ class SubnetAllocator(driver.Pool):
         if not count:
             raise db_exc.RetryRequest(lib_exc.SubnetPoolInUse(
                                       subnet_pool_id=self._subnetpool['id']))
+        return current_hash, new_hash
 
     def _get_allocated_cidrs(self):
         with db_api.context_manager.reader.using(self._context):
@@ -79,16 +158,42 @@ class SubnetAllocator(driver.Pool):
             subnets = query.filter_by(subnetpool_id=self._subnetpool['id'])
             return (x.cidr for x in subnets)
 
-    def _get_available_prefix_list(self):
-        prefixes = (x.cidr for x in self._subnetpool.prefixes)
-        allocations = self._get_allocated_cidrs()
-        prefix_set = netaddr.IPSet(iterable=prefixes)
-        allocation_set = netaddr.IPSet(iterable=allocations)
-        available_set = prefix_set.difference(allocation_set)
-        available_set.compact()
-        return sorted(available_set.iter_cidrs(),
-                      key=operator.attrgetter('prefixlen'),
-                      reverse=True)
+    def _get_free_prefixes(self, current_hash, prefixes):
+        """Return the free prefixes of the subnet pool.
+
+        They are only computed from the CIDRs of the subnets of the subnet
+        pool when it was not locked by this process with its current hash.
+
+        :returns: A tuple of the free prefixes and whether they were
+            computed.
+        """
+        entry = _free_prefixes.pop(self._subnetpool['id'], None)
+        if entry and entry[0] == current_hash and entry[1] == prefixes:
+            return entry[2], False
+        return FreePrefixes(prefixes, self._get_allocated_cidrs()), True
+
+    def _allocate_prefix(self, subnetpool_hashes, allocate_func, *args):
+        """Allocate a prefix from the free prefixes of the subnet pool.
+
+        The free prefixes are cached for the next allocation with the new
+        hash the subnet pool was locked with. The cached free prefixes do
+        not include the CIDRs of the subnets deleted since they were
+        computed, they are computed again if the prefix is not free.
+
+        :returns: The result of allocate_func.
+        """
+        current_hash, new_hash = subnetpool_hashes
+        prefixes = frozenset(str(x.cidr) for x in self._subnetpool.prefixes)
+        free_prefixes, computed = self._get_free_prefixes(current_hash,
+                                                          prefixes)
+        result = allocate_func(free_prefixes, *args)
+        if not result and not computed:
+            free_prefixes = FreePrefixes(prefixes,
+                                         self._get_allocated_cidrs())
+            result = allocate_func(free_prefixes, *args)
+        _free_prefixes[self._subnetpool['id']] = (new_hash, prefixes,
+                                                  free_prefixes)
+        return result
 
     def _num_quota_units_in_prefixlen(self, prefixlen, quota_unit):
         return math.pow(2, quota_unit - prefixlen)
@@ -122,37 +227,36 @@ class SubnetAllocator(driver.Pool):
 
     def _allocate_any_subnet(self, request):
         with db_api.context_manager.writer.using(self._context):
-            self._lock_subnetpool()
+            subnetpool_hashes = self._lock_subnetpool()
             self._check_subnetpool_tenant_quota(request.tenant_id,
                                                 request.prefixlen)
-            prefix_pool = self._get_available_prefix_list()
-            for prefix in prefix_pool:
-                if request.prefixlen >= prefix.prefixlen:
-                    subnet = next(prefix.subnet(request.prefixlen))
-                    gateway_ip = request.gateway_ip
-                    if not gateway_ip:
-                        gateway_ip = subnet.network + 1
-                    pools = ipam_utils.generate_pools(subnet.cidr,
-                                                      gateway_ip)
-
-                    return IpamSubnet(request.tenant_id,
-                                      request.subnet_id,
-                                      subnet.cidr,
-                                      gateway_ip=gateway_ip,
-                                      allocation_pools=pools)
+            subnet = self._allocate_prefix(subnetpool_hashes,
+                                           FreePrefixes.allocate_any,
+                                           request.prefixlen)
+            if subnet:
+                gateway_ip = request.gateway_ip
+                if not gateway_ip:
+                    gateway_ip = subnet.network + 1
+                pools = ipam_utils.generate_pools(subnet.cidr,
+                                                  gateway_ip)
+
+                return IpamSubnet(request.tenant_id,
+                                  request.subnet_id,
+                                  subnet.cidr,
+                                  gateway_ip=gateway_ip,
+                                  allocation_pools=pools)
             msg = _("Insufficient prefix space to allocate subnet size /%s")
             raise n_exc.SubnetAllocationError(reason=msg %
                                               str(request.prefixlen))
 
     def _allocate_specific_subnet(self, request):
         with db_api.context_manager.writer.using(self._context):
-            self._lock_subnetpool()
+            subnetpool_hashes = self._lock_subnetpool()
             self._check_subnetpool_tenant_quota(request.tenant_id,
                                                 request.prefixlen)
             cidr = request.subnet_cidr
-            available = self._get_available_prefix_list()
-            matched = netaddr.all_matching_cidrs(cidr, available)
-            if len(matched) is 1 and matched[0].prefixlen <= cidr.prefixlen:
+            if self._allocate_prefix(subnetpool_hashes,
+                                     FreePrefixes.allocate_specific, cidr):
                 return IpamSubnet(request.tenant_id,
                                   request.subnet_id,
                                   cidr,
@@ -240,6 +344,29 @@ class IpamSubnetGroup(driver.SubnetGroup):
                 continue
         raise ipam_exc.IpAddressGenerationFailureAllSubnets()
 
+    def bulk_allocate(self, address_request):
+        """Allocates the addresses from each subnet in turn until the
+           request is fulfilled, the subnets allocate them at once.
+        """
+        allocated = []
+        for subnet_id in self._subnet_ids:
+            num_addresses = address_request.num_addresses - len(allocated)
+            if not num_addresses:
+                break
+            try:
+                ipam_subnet = self._driver.get_subnet(subnet_id)
+                addresses = ipam_subnet.bulk_allocate(
+                    ipam_req.BulkAddressRequest(num_addresses))
+            except ipam_exc.IpAddressGenerationFailure:
+                continue
+            allocated.extend((address, subnet_id) for address in addresses)
+        if len(allocated) < address_request.num_addresses:
+            if self._driver.needs_rollback():
+                for address, subnet_id in allocated:
+                    self._driver.get_subnet(subnet_id).deallocate(address)
+            raise ipam_exc.IpAddressGenerationFailureAllSubnets()
+        return allocated
+
 
 class SubnetPoolReader(object):
     '''Class to assist with reading a subnetpool, loading defaults, and
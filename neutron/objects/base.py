@@ -32,6 +32,7 @@ import six
 from sqlalchemy import orm
 
 from neutron._i18n import _
+from neutron.db import _model_query as model_query
 from neutron.db import api as db_api
 from neutron.db import standard_attr
 from neutron.objects.db import api as obj_db_api
@@ -76,7 +77,9 @@ class Pager(object):
         :param limit: maximum number of items to return
         :param page_reverse: True if sort direction is reversed.
         :param marker: the last item of the previous page; when used, returns
-                       next results after the marker resource.
+                       next results after the marker resource. The marker
+                       resource is not retrieved if the values of its sort
+                       keys are in the sort_values attribute of the marker.
         '''
 
         self.sorts = sorts
@@ -91,8 +94,9 @@ class Pager(object):
             if getattr(self, attr) is not None
         }
         if self.marker and self.limit:
-            res['marker_obj'] = obj_db_api.get_object(
-                obj_cls, context, id=self.marker)
+            res['marker_obj'] = model_query.get_marker(
+                self.marker, functools.partial(
+                    obj_db_api.get_object, obj_cls, context, id=self.marker))
         return res
 
     def __str__(self):
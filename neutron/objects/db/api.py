@@ -34,7 +34,9 @@ def get_object(obj_cls, context, **kwargs):
 
 
 def count(obj_cls, context, **kwargs):
-    return _get_filter_query(obj_cls, context, **kwargs).count()
+    with obj_cls.db_context_reader(context):
+        return model_query.get_collection_count(
+            context, obj_cls.db_model, _kwargs_to_filters(**kwargs))
 
 
 def _kwargs_to_filters(**kwargs):
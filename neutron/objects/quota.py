@@ -82,6 +82,21 @@ class Reservation(base.NeutronDbObject):
             project_expr, models.Reservation.expiration < now))
         return resv_query.delete()
 
+    @classmethod
+    def get_expired_reservations(cls, context, now, project_id):
+        resv_query = context.session.query(models.Reservation).filter(
+            models.Reservation.expiration < now)
+        if project_id:
+            resv_query = resv_query.filter(
+                models.Reservation.project_id == project_id)
+        return [cls._load_object(context, db_obj) for db_obj in resv_query]
+
+    @classmethod
+    def delete_reservation(cls, context, reservation_id):
+        """Deletes a reservation, returns 0 if it was already deleted."""
+        return context.session.query(models.Reservation).filter_by(
+            id=reservation_id).delete(synchronize_session='evaluate')
+
     @classmethod
     def get_total_reservations_map(cls, context, now, project_id,
                                    resources, expired):
@@ -148,3 +163,29 @@ class QuotaUsage(base.NeutronDbObject):
         res = query.first()
         if res:
             return cls._load_object(context, res)
+
+    @classmethod
+    def update_reserved(cls, context, resource, project_id, amount,
+                        limit=None):
+        """Adds an amount to the reserved quantity of a resource.
+
+        The reserved quantity does not become negative. If a limit is given,
+        the amount is added only if the usage is not dirty and the quantity
+        used and reserved does not exceed the limit once it is added.
+
+        :returns: the number of usages updated, 0 or 1.
+        """
+        query = context.session.query(cls.db_model).filter_by(
+            resource=resource, project_id=project_id)
+        if limit is not None:
+            query = query.filter(
+                cls.db_model.dirty == sql.false(),
+                cls.db_model.in_use + cls.db_model.reserved + amount <= limit)
+        if amount < 0:
+            reserved = sa.case(
+                [(cls.db_model.reserved > -amount,
+                  cls.db_model.reserved + amount)], else_=0)
+        else:
+            reserved = cls.db_model.reserved + amount
+        return query.update({'reserved': reserved},
+                            synchronize_session=False)
@@ -12,12 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+
 from oslo_log import log as logging
 import pecan
 from pecan import request
 import webob
 
 from neutron._i18n import _
+from neutron.api import api_common
+from neutron.db import _model_query as model_query
 from neutron import manager
 from neutron.pecan_wsgi.controllers import utils
 
@@ -137,8 +141,66 @@ class CollectionsController(utils.NeutronPecanController):
         lister_args = [neutron_context]
         if 'parent_id' in request.context:
             lister_args.append(request.context['parent_id'])
-        return {self.collection: self.plugin_lister(*lister_args,
-                **query_params)}
+        if request.context.get('approximate_count'):
+            return self._count(*lister_args,
+                               filters=query_params.get('filters'))
+        if api_common.is_streaming_supported(
+                self.native_pagination, self.native_sorting,
+                query_params.get('limit')):
+            return self._stream(lister_args, query_params)
+        return {self.collection: self._list(*lister_args, **query_params)}
+
+    def _list(self, neutron_context, *args, **kwargs):
+        with model_query.loading_profile(neutron_context,
+                                         model_query.API_LIST):
+            return self.plugin_lister(neutron_context, *args, **kwargs)
+
+    def _count(self, neutron_context, *args, **kwargs):
+        """Returns the number of items of the collection.
+
+        Only the admins can count the items, all the items of the large
+        collections may be estimated from the statistics of the database.
+        """
+        if not neutron_context.is_admin:
+            msg = _("Only admins can count the %s") % self.collection
+            raise webob.exc.HTTPForbidden(msg)
+        counter = getattr(self.plugin,
+                          '%s_count' % self._plugin_handlers[self.LIST],
+                          None)
+        try:
+            if counter is None:
+                raise NotImplementedError()
+            with model_query.count_mode(neutron_context,
+                                        model_query.APPROXIMATE_COUNT):
+                count = counter(neutron_context, *args, **kwargs)
+        except NotImplementedError:
+            msg = _("The %s can not be counted") % self.collection
+            raise webob.exc.HTTPBadRequest(msg)
+        return {'%s_count' % self.collection: count}
+
+    def _stream(self, lister_args, query_params):
+        """Returns a response streaming the items of the collection.
+
+        The stream is stored in the request context, the hooks processing
+        list responses add their filters to it instead of processing the
+        response body.
+        """
+        query_params = dict(query_params)
+        for key in ('limit', 'marker', 'page_reverse'):
+            query_params.pop(key, None)
+        sorts = query_params.pop('sorts', None)
+        fields = query_params.get('fields')
+        # the primary key is needed to retrieve the next chunk, it is
+        # stripped by the user filter hook if not requested
+        if fields and self.primary_key not in fields:
+            query_params['fields'] = fields + [self.primary_key]
+        stream = api_common.CollectionStream(
+            self.collection,
+            functools.partial(self._list, *lister_args, **query_params),
+            sorts=sorts, primary_key=self.primary_key)
+        request.context['collection_stream'] = stream
+        return webob.Response(app_iter=stream.serialize(),
+                              content_type='application/json')
 
     @utils.when(index, method='HEAD')
     @utils.when(index, method='PATCH')
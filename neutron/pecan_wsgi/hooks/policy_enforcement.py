@@ -14,6 +14,7 @@
 #    under the License.
 
 import copy
+import functools
 
 from oslo_log import log as logging
 from oslo_policy import policy as oslo_policy
@@ -129,6 +130,8 @@ class PolicyHook(hooks.PecanHook):
         # store them in the request context. However, this should be done in a
         # separate hook which is conveniently called before all other hooks
         state.request.context['original_resources'] = original_resources
+        policy.prefetch_parent_resources(neutron_context, action,
+                                         resources_copy)
         for item in resources_copy:
             try:
                 policy.enforce(
@@ -158,6 +161,14 @@ class PolicyHook(hooks.PecanHook):
         # NOTE(kevinbenton): extension listing isn't controlled by policy
         if resource == 'extension':
             return
+        stream = state.request.context.get('collection_stream')
+        if stream:
+            # the items are filtered as they are streamed
+            policy.init()
+            stream.add_filter(functools.partial(
+                self._get_filtered_items, state.request, controller,
+                resource, collection, {}))
+            return
         try:
             data = state.response.json
         except ValueError:
@@ -175,18 +186,26 @@ class PolicyHook(hooks.PecanHook):
             action = controller.plugin_handlers[action_type]
         key = resource if is_single else collection
         to_process = [data[resource]] if is_single else data[collection]
-        # in the single case, we enforce which raises on violation
-        # in the plural case, we just check so violating items are hidden
-        policy_method = policy.enforce if is_single else policy.check
         plugin = manager.NeutronManager.get_plugin_for_resource(collection)
+        # the policy checks of the attributes are compiled once for all
+        # the items of the response
+        attribute_checks = {}
         try:
-            resp = [self._get_filtered_item(state.request, controller,
-                                            resource, collection, item)
-                    for item in to_process
-                    if (state.request.method != 'GET' or
-                        policy_method(neutron_context, action, item,
-                                      plugin=plugin,
-                                      pluralized=collection))]
+            if state.request.method == 'GET' and not is_single:
+                # in the plural case, violating items are hidden
+                resp = self._get_filtered_items(
+                    state.request, controller, resource, collection,
+                    attribute_checks, to_process)
+            else:
+                if state.request.method == 'GET':
+                    # in the single case, we enforce which raises on
+                    # violation
+                    policy.enforce(neutron_context, action, to_process[0],
+                                   plugin=plugin, pluralized=collection)
+                resp = [self._get_filtered_item(state.request, controller,
+                                                resource, collection, item,
+                                                attribute_checks)
+                        for item in to_process]
         except oslo_policy.PolicyNotAuthorized:
             # This exception must be explicitly caught as the exception
             # translation hook won't be called if an error occurs in the
@@ -200,11 +219,24 @@ class PolicyHook(hooks.PecanHook):
             resp = resp[0]
         state.response.json = {key: resp}
 
+    def _get_filtered_items(self, request, controller, resource, collection,
+                            attribute_checks, items):
+        """Hides the items of a list the user is not authorized to see."""
+        neutron_context = request.context.get('neutron_context')
+        action = controller.plugin_handlers[controller.SHOW]
+        policy.prefetch_parent_resources(neutron_context, action, items)
+        items = policy.CompiledCheck(neutron_context, action,
+                                     pluralized=collection).filter(items)
+        return [self._get_filtered_item(request, controller, resource,
+                                        collection, item, attribute_checks)
+                for item in items]
+
     def _get_filtered_item(self, request, controller, resource, collection,
-                           data):
+                           data, attribute_checks=None):
         neutron_context = request.context.get('neutron_context')
         to_exclude = self._exclude_attributes_by_policy(
-            neutron_context, controller, resource, collection, data)
+            neutron_context, controller, resource, collection, data,
+            attribute_checks)
         return self._filter_attributes(request, data, to_exclude)
 
     def _filter_attributes(self, request, data, fields_to_strip):
@@ -215,13 +247,18 @@ class PolicyHook(hooks.PecanHook):
                     if item[0] not in fields_to_strip)
 
     def _exclude_attributes_by_policy(self, context, controller, resource,
-                                      collection, data):
+                                      collection, data,
+                                      attribute_checks=None):
         """Identifies attributes to exclude according to authZ policies.
 
         Return a list of attribute names which should be stripped from the
         response returned to the user because the user is not authorized
-        to see them.
+        to see them. The policy checks compiled for the attributes are
+        stored in attribute_checks, when provided, to be reused for the
+        other items of a response.
         """
+        if attribute_checks is None:
+            attribute_checks = {}
         attributes_to_exclude = []
         for attr_name in data.keys():
             # TODO(amotoki): All attribute maps have tenant_id and
@@ -233,14 +270,15 @@ class PolicyHook(hooks.PecanHook):
                 continue
             attr_data = controller.resource_info.get(attr_name)
             if attr_data and attr_data['is_visible']:
-                if policy.check(
+                if attr_name not in attribute_checks:
+                    attribute_checks[attr_name] = policy.CompiledCheck(
                         context,
                         # NOTE(kevinbenton): this used to reference a
                         # _plugin_handlers dict, why?
                         'get_%s:%s' % (resource, attr_name),
-                        data,
                         might_not_exist=True,
-                        pluralized=collection):
+                        pluralized=collection)
+                if attribute_checks[attr_name](data):
                     # this attribute is visible, check next one
                     continue
             # if the code reaches this point then either the policy check
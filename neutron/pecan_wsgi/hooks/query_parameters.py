@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from neutron_lib.api import converters
 from pecan import hooks
 
 from neutron.api import api_common
@@ -77,7 +78,7 @@ def _set_filters(state, controller):
         {k: _listify(v) for k, v in params.items()},
         controller.resource_info,
         skips=['fields', 'sort_key', 'sort_dir',
-               'limit', 'marker', 'page_reverse'],
+               'limit', 'marker', 'page_reverse', 'approximate_count'],
         is_filter_validation_supported=controller.filter_validation)
     return filters
 
@@ -97,6 +98,9 @@ class QueryParametersHook(hooks.PecanHook):
         if not collection:
             return
         controller = utils.get_controller(state)
+        state.request.context['approximate_count'] = (
+            converters.convert_to_boolean(
+                state.request.params.get('approximate_count', False)))
         combined_fields, added_fields = _set_fields(state, controller)
         filters = _set_filters(state, controller)
         query_params = {'fields': combined_fields, 'filters': filters}
@@ -129,6 +133,9 @@ class QueryParametersHook(hooks.PecanHook):
         if (not resource or resource == 'extension' or
                 state.request.method != 'GET'):
             return
+        # NOTE: streamed collections are natively sorted and not paginated
+        if state.request.context.get('collection_stream'):
+            return
         try:
             data = state.response.json
         except ValueError:
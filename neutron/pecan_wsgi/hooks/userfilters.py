@@ -25,6 +25,11 @@ class UserFilterHook(hooks.PecanHook):
         user_fields = state.request.params.getall('fields')
         if not user_fields:
             return
+        stream = state.request.context.get('collection_stream')
+        if stream:
+            stream.add_filter(lambda items: [
+                self._filter_item(i, user_fields) for i in items])
+            return
         try:
             data = state.response.json
         except ValueError:
@@ -27,6 +27,7 @@ from sqlalchemy import or_
 from sqlalchemy.orm import exc
 
 from neutron._i18n import _
+from neutron.db import _model_query as model_query
 from neutron.db import api as db_api
 from neutron.db.models import securitygroup as sg_models
 from neutron.db import models_v2
@@ -297,6 +298,8 @@ def get_port_db_objects(context, port_ids):
     for values or None if the port was not present.
     """
     port_qry = (context.session.query(models_v2.Port).
+                options(*model_query.get_loading_options(
+                    models_v2.Port, model_query.RPC_AGENT)).
                 filter(models_v2.Port.id.in_(port_ids)))
     result = {p: None for p in port_ids}
     for port in port_qry:
@@ -26,6 +26,7 @@ from neutron_lib.plugins import utils as plugin_utils
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from neutron.db import dns_db
 from neutron.db import segments_db
 from neutron.objects import network as net_obj
 from neutron.objects import ports as port_obj
@@ -261,11 +262,7 @@ class DNSExtensionDriver(api.ExtensionDriver):
         return response_data
 
     def _get_dns_domain(self):
-        if not cfg.CONF.dns_domain:
-            return ''
-        if cfg.CONF.dns_domain.endswith('.'):
-            return cfg.CONF.dns_domain
-        return '%s.' % cfg.CONF.dns_domain
+        return dns_db.get_dns_domain()
 
     def _get_request_dns_name(self, port):
         dns_domain = self._get_dns_domain()
@@ -282,25 +279,9 @@ class DNSExtensionDriver(api.ExtensionDriver):
         return dns_name, dns_domain
 
     def _get_dns_names_for_port(self, ips, dns_data_db):
-        dns_assignment = []
         dns_name, dns_domain = self._get_request_dns_name_and_domain_name(
             dns_data_db)
-        for ip in ips:
-            if dns_name:
-                hostname = dns_name
-                fqdn = dns_name
-                if not dns_name.endswith('.'):
-                    fqdn = '%s.%s' % (dns_name, dns_domain)
-            else:
-                hostname = 'host-%s' % ip['ip_address'].replace(
-                    '.', '-').replace(':', '-')
-                fqdn = hostname
-                if dns_domain:
-                    fqdn = '%s.%s' % (hostname, dns_domain)
-            dns_assignment.append({'ip_address': ip['ip_address'],
-                                   'hostname': hostname,
-                                   'fqdn': fqdn})
-        return dns_assignment
+        return dns_db.build_dns_assignment(ips, dns_name, dns_domain)
 
     def _get_dns_name_for_port_get(self, port, dns_data_db):
         if port['fixed_ips']:
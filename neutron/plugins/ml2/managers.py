@@ -447,6 +447,47 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
                 errors=errors
             )
 
+    def _call_on_drivers_bulk(self, method_name, contexts,
+                              raise_db_retriable=False):
+        """Helper method for calling a method on a batch of resources.
+
+        The drivers implementing a <method_name>_bulk method are called once
+        with the list of the contexts, the other drivers are called with
+        each context in turn.
+
+        :param method_name: name of the method to call
+        :param contexts: list of the context parameters of the method calls
+        :param raise_db_retriable: whether or not to treat retriable db
+        exception by mechanism drivers to propagate up to upper layer so
+        that upper layer can handle it or error in ML2 player
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver call fails, or DB retriable error when
+        raise_db_retriable=True.
+        """
+        for driver in self.ordered_mech_drivers:
+            bulk_method = getattr(driver.obj, method_name + '_bulk', None)
+            try:
+                if bulk_method is not None:
+                    bulk_method(contexts)
+                else:
+                    for context in contexts:
+                        getattr(driver.obj, method_name)(context)
+            except Exception as e:
+                if raise_db_retriable and db_api.is_retriable(e):
+                    with excutils.save_and_reraise_exception():
+                        LOG.debug("DB exception raised by Mechanism driver "
+                                  "'%(name)s' in %(method)s",
+                                  {'name': driver.name, 'method': method_name},
+                                  exc_info=e)
+                LOG.exception(
+                    "Mechanism driver '%(name)s' failed in %(method)s",
+                    {'name': driver.name, 'method': method_name}
+                )
+                raise ml2_exc.MechanismDriverError(
+                    method=method_name,
+                    errors=[e]
+                )
+
     def create_network_precommit(self, context):
         """Notify all mechanism drivers during network creation.
 
@@ -666,6 +707,35 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         """
         self._call_on_drivers("create_port_postcommit", context)
 
+    def create_port_precommit_bulk(self, contexts):
+        """Notify all mechanism drivers during the creation of ports.
+
+        :raises: DB retriable error if create_port_precommit raises them
+        See neutron.db.api.is_retriable for what db exception is retriable
+        or neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_port_precommit call fails.
+
+        Called within the database transaction with the contexts of all the
+        ports created by a bulk request. The mechanism drivers implementing
+        create_port_precommit_bulk are called once with the contexts, the
+        others have their create_port_precommit called for each port.
+        """
+        self._call_on_drivers_bulk("create_port_precommit", contexts,
+                                   raise_db_retriable=True)
+
+    def create_port_postcommit_bulk(self, contexts):
+        """Notify all mechanism drivers of the creation of ports.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_port_postcommit call fails.
+
+        Called after the database transaction with the contexts of all the
+        ports created by a bulk request, see create_port_precommit_bulk.
+        Errors raised by mechanism drivers are left to propagate to the
+        caller, where the ports will be deleted.
+        """
+        self._call_on_drivers_bulk("create_port_postcommit", contexts)
+
     def update_port_precommit(self, context):
         """Notify all mechanism drivers during port update.
 
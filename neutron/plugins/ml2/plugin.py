@@ -121,6 +121,13 @@ def _ml2_port_result_filter_hook(query, filters):
     return query.filter(models_v2.Port.port_bindings.any(bind_criteria))
 
 
+def _get_extension_drivers_fields():
+    # NOTE: the attributes added by the extension drivers are not known, the
+    # functions calling them are only skipped when there is no driver
+    plugin = directory.get_plugin()
+    return None if plugin.extension_manager.ordered_ext_drivers else []
+
+
 @resource_extend.has_resource_extenders
 @registry.has_registry_receivers
 class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
@@ -193,6 +200,15 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             query_hook=None,
             filter_hook=None,
             result_filters=_ml2_port_result_filter_hook)
+        # the binding levels are only needed to build the port contexts
+        # of the ports bound by the agents
+        model_query.register_loading_profile(
+            model_query.API_LIST, models_v2.Port,
+            {'binding_levels': 'lazy', 'distributed_port_binding': 'lazy'})
+        model_query.register_loading_profile(
+            model_query.RPC_AGENT, models_v2.Port,
+            {'binding_levels': 'selectin',
+             'distributed_port_binding': 'selectin'})
         return super(Ml2Plugin, cls).__new__(cls, *args, **kwargs)
 
     @resource_registry.tracked_resources(
@@ -662,38 +678,56 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         return {}
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
-    def _ml2_extend_port_dict_binding(port_res, port_db):
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=[portbindings.HOST_ID,
+                                     portbindings.VIF_TYPE,
+                                     portbindings.VIF_DETAILS,
+                                     portbindings.VNIC_TYPE,
+                                     portbindings.PROFILE],
+                             relationships=['port_bindings'], batch=True)
+    def _ml2_extend_port_dict_binding(port_reses, port_dbs):
         plugin = directory.get_plugin()
-        port_binding = p_utils.get_port_binding_by_status_and_host(
-            port_db.port_bindings, const.ACTIVE)
-        # None when called during unit tests for other plugins.
-        if port_binding:
-            plugin._update_port_dict_binding(port_res, port_binding)
+        for port_res, port_db in zip(port_reses, port_dbs):
+            port_binding = p_utils.get_port_binding_by_status_and_host(
+                port_db.port_bindings, const.ACTIVE)
+            # None when called during unit tests for other plugins.
+            if port_binding:
+                plugin._update_port_dict_binding(port_res, port_binding)
 
     # ML2's resource extend functions allow extension drivers that extend
     # attributes for the resources to add those attributes to the result.
 
     @staticmethod
-    @resource_extend.extends([net_def.COLLECTION_NAME])
-    def _ml2_md_extend_network_dict(result, netdb):
+    @resource_extend.extends([net_def.COLLECTION_NAME],
+                             fields=_get_extension_drivers_fields,
+                             batch=True)
+    def _ml2_md_extend_network_dict(results, netdbs):
         plugin = directory.get_plugin()
-        session = plugin._object_session_or_new_session(netdb)
-        plugin.extension_manager.extend_network_dict(session, netdb, result)
+        for result, netdb in zip(results, netdbs):
+            session = plugin._object_session_or_new_session(netdb)
+            plugin.extension_manager.extend_network_dict(session, netdb,
+                                                         result)
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
-    def _ml2_md_extend_port_dict(result, portdb):
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=_get_extension_drivers_fields,
+                             batch=True)
+    def _ml2_md_extend_port_dict(results, portdbs):
         plugin = directory.get_plugin()
-        session = plugin._object_session_or_new_session(portdb)
-        plugin.extension_manager.extend_port_dict(session, portdb, result)
+        for result, portdb in zip(results, portdbs):
+            session = plugin._object_session_or_new_session(portdb)
+            plugin.extension_manager.extend_port_dict(session, portdb, result)
 
     @staticmethod
-    @resource_extend.extends([subnet_def.COLLECTION_NAME])
-    def _ml2_md_extend_subnet_dict(result, subnetdb):
+    @resource_extend.extends([subnet_def.COLLECTION_NAME],
+                             fields=_get_extension_drivers_fields,
+                             batch=True)
+    def _ml2_md_extend_subnet_dict(results, subnetdbs):
         plugin = directory.get_plugin()
-        session = plugin._object_session_or_new_session(subnetdb)
-        plugin.extension_manager.extend_subnet_dict(session, subnetdb, result)
+        for result, subnetdb in zip(results, subnetdbs):
+            session = plugin._object_session_or_new_session(subnetdb)
+            plugin.extension_manager.extend_subnet_dict(session, subnetdb,
+                                                        result)
 
     @staticmethod
     def _object_session_or_new_session(sql_obj):
@@ -999,11 +1033,10 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # NOTE(ihrachys) pre Pike networks may have null mtus; update them
             # in database if needed
             # TODO(ihrachys) remove in Queens+ when mtu is not nullable
-            net_data = []
             for net in nets_db:
                 if net.mtu is None:
                     net.mtu = self._get_network_mtu(net, validate=False)
-                net_data.append(self._make_network_dict(net, context=context))
+            net_data = self._make_network_dicts(nets_db, context=context)
 
             self.type_manager.extend_networks_dict_provider(context, net_data)
             nets = self._filter_nets_provider(context, net_data, filters)
@@ -1205,16 +1238,18 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 context, port['id'], resources.PORT,
                 provisioning_blocks.DHCP_ENTITY)
 
-    def _before_create_port(self, context, port):
+    def _before_create_port(self, context, port,
+                            ensure_default_security_group=True):
         attrs = port[port_def.RESOURCE_NAME]
         if not attrs.get('status'):
             attrs['status'] = const.PORT_STATUS_DOWN
 
         registry.notify(resources.PORT, events.BEFORE_CREATE, self,
                         context=context, port=attrs)
-        # NOTE(kevinbenton): triggered outside of transaction since it
-        # emits 'AFTER' events if it creates.
-        self._ensure_default_security_group(context, attrs['tenant_id'])
+        if ensure_default_security_group:
+            # NOTE(kevinbenton): triggered outside of transaction since it
+            # emits 'AFTER' events if it creates.
+            self._ensure_default_security_group(context, attrs['tenant_id'])
 
     def _create_port_db(self, context, port):
         attrs = port[port_def.RESOURCE_NAME]
@@ -1278,11 +1313,108 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
 
         return bound_context.current
 
+    def _create_port_bulk_db(self, context, ports):
+        """Creates the database entries of a batch of ports.
+
+        The ports, their IP allocations and bindings are created together,
+        see _create_port_db for a single port, and the mechanism drivers
+        are called with the contexts of all the ports.
+        """
+        network_contexts = {}
+        results = []
+        mech_contexts = []
+        with db_api.context_manager.writer.using(context):
+            port_dbs = self.create_port_bulk_db(context, ports)
+            for port, port_db in zip(ports, port_dbs):
+                attrs = port[port_def.RESOURCE_NAME]
+                dhcp_opts = attrs.get(edo_ext.EXTRADHCPOPTS, [])
+                result = self._make_port_dict(port_db,
+                                              process_extensions=False)
+                self.extension_manager.process_create_port(context, attrs,
+                                                           result)
+                self._portsec_ext_port_create_processing(context, result,
+                                                         port)
+
+                # sgids must be got after portsec checked with security group
+                sgids = self._get_security_groups_on_port(context, port)
+                self._process_port_create_security_group(context, result,
+                                                         sgids)
+                network_id = result['network_id']
+                if network_id not in network_contexts:
+                    network_contexts[network_id] = (
+                        driver_context.NetworkContext(
+                            self, context,
+                            self.get_network(context, network_id)))
+                binding = db.add_port_binding(context, result['id'])
+                mech_context = driver_context.PortContext(
+                    self, context, result, network_contexts[network_id],
+                    binding, None)
+                self._process_port_binding(mech_context, attrs)
+
+                result[addr_apidef.ADDRESS_PAIRS] = (
+                    self._process_create_allowed_address_pairs(
+                        context, result,
+                        attrs.get(addr_apidef.ADDRESS_PAIRS)))
+                self._process_port_create_extra_dhcp_opts(context, result,
+                                                          dhcp_opts)
+                kwargs = {'context': context, 'port': result}
+                registry.notify(
+                    resources.PORT, events.PRECOMMIT_CREATE, self, **kwargs)
+                results.append(result)
+                mech_contexts.append(mech_context)
+            self.mechanism_manager.create_port_precommit_bulk(mech_contexts)
+            for result in results:
+                self._setup_dhcp_agent_provisioning_component(context, result)
+
+        resource_extend.apply_funcs_bulk('ports', results, port_dbs)
+        return results, mech_contexts
+
+    def _after_create_port_bulk(self, context, results, mech_contexts):
+        # notify any plugin that is interested in port create events
+        for result in results:
+            kwargs = {'context': context, 'port': result}
+            registry.notify(resources.PORT, events.AFTER_CREATE, self,
+                            **kwargs)
+
+        objects = [{'result': result} for result in results]
+        try:
+            self.mechanism_manager.create_port_postcommit_bulk(mech_contexts)
+        except ml2_exc.MechanismDriverError:
+            with excutils.save_and_reraise_exception():
+                LOG.error("mechanism_manager.create_port_postcommit_bulk "
+                          "failed, deleting ports %s",
+                          ', '.join(result['id'] for result in results))
+                self._delete_objects(context, port_def.RESOURCE_NAME,
+                                     objects)
+
+        bound_ports = []
+        for result, mech_context in zip(results, mech_contexts):
+            try:
+                bound_context = self._bind_port_if_needed(mech_context)
+            except ml2_exc.MechanismDriverError:
+                with excutils.save_and_reraise_exception():
+                    LOG.error("_bind_port_if_needed failed for port "
+                              "'%s', deleting ports %s", result['id'],
+                              ', '.join(res['id'] for res in results))
+                    self._delete_objects(context, port_def.RESOURCE_NAME,
+                                         objects)
+            bound_ports.append(bound_context.current)
+        return bound_ports
+
     @utils.transaction_guard
     @db_api.retry_if_session_inactive()
     def create_port_bulk(self, context, ports):
-        objects = self._create_bulk_ml2(port_def.RESOURCE_NAME, context, ports)
-        return [obj['result'] for obj in objects]
+        items = ports[port_def.COLLECTION_NAME]
+        for item in items:
+            self._before_create_port(context, item,
+                                     ensure_default_security_group=False)
+        # NOTE(kevinbenton): triggered outside of transaction since it
+        # emits 'AFTER' events if it creates.
+        for tenant_id in {item[port_def.RESOURCE_NAME]['tenant_id']
+                          for item in items}:
+            self._ensure_default_security_group(context, tenant_id)
+        results, mech_contexts = self._create_port_bulk_db(context, items)
+        return self._after_create_port_bulk(context, results, mech_contexts)
 
     # TODO(yalei) - will be simplified after security group and address pair be
     # converted to ext driver too.
@@ -1930,14 +2062,14 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 filters['id'] = [entry['port_id'] for entry in port_bindings]
         fixed_ips = filters.get('fixed_ips', {})
         ip_addresses_s = fixed_ips.get('ip_address_substr')
-        query = super(Ml2Plugin, self)._get_ports_query(context, filters,
-                                                        *args, **kwargs)
+        query = super(Ml2Plugin, self)._get_ports_query(context, filters)
         if ip_addresses_s:
             substr_filter = or_(*[models_v2.Port.fixed_ips.any(
                 models_v2.IPAllocation.ip_address.like('%%%s%%' % ip))
                 for ip in ip_addresses_s])
             query = query.filter(substr_filter)
-        return query
+        return model_query.sort_and_paginate(query, models_v2.Port,
+                                             *args, **kwargs)
 
     def filter_hosts_with_network_access(
             self, context, network_id, candidate_hosts):
@@ -14,6 +14,7 @@
 #    under the License.
 
 import collections
+import functools
 import re
 
 from neutron_lib.api import attributes
@@ -45,6 +46,19 @@ _RESOURCE_FOREIGN_KEYS = {
     net_apidef.COLLECTION_NAME: 'network_id'
 }
 
+# The checks built by oslo.policy for '@', '!', 'role:<role>' and generic
+# '<credential>:<value>' matches; unless their match is templatized with
+# target values, their result only depends on the credentials
+_CREDENTIALS_CHECK_TYPES = tuple(
+    type(rule) for rule in policy.Rules.from_dict(
+        {'always': '@', 'never': '!', 'role': 'role:member',
+         'generic': 'user_id:user'}).values())
+
+# The parent resources prefetched for the checks of a request are kept in a
+# dictionary set as this attribute of its context, mapping (resource, ID,
+# field) to the value of the field
+_PARENTS_MEMO = '_policy_parents_memo'
+
 
 def reset():
     global _ENFORCER
@@ -218,16 +232,20 @@ class OwnerCheck(policy.Check):
         self._cache = cache._get_memory_cache_region(expiration_time=5)
         super(OwnerCheck, self).__init__(kind, match)
 
-    @cache.cache_method_results
-    def _extract(self, resource_type, resource_id, field):
+    @staticmethod
+    def _get_parent_plugin(resource_type):
         # NOTE(salv-orlando): This check currently assumes the parent
         # resource is handled by the core plugin. It might be worth
         # having a way to map resources to plugins so to make this
         # check more general
-        plugin = directory.get_plugin()
         if resource_type in const.EXT_PARENT_RESOURCE_MAPPING:
-            plugin = directory.get_plugin(
+            return directory.get_plugin(
                 const.EXT_PARENT_RESOURCE_MAPPING[resource_type])
+        return directory.get_plugin()
+
+    @cache.cache_method_results
+    def _extract(self, resource_type, resource_id, field):
+        plugin = self._get_parent_plugin(resource_type)
         f = getattr(plugin, 'get_%s' % resource_type)
         # f *must* exist, if not found it is better to let neutron
         # explode. Check will be performed with admin context
@@ -247,53 +265,105 @@ class OwnerCheck(policy.Check):
                 LOG.exception('Policy check error while calling %s!', f)
         return data[field]
 
+    def _get_parent_reference(self, target):
+        """Return the parent resource type, field and foreign key.
+
+        The target field is in the form resource:field, however if they're
+        not separated by a colon, an underscore is used as a separator for
+        backward compatibility.
+        """
+
+        def do_split(separator):
+            parent_res, parent_field = self.target_field.split(
+                separator, 1)
+            return parent_res, parent_field
+
+        for separator in (':', '_'):
+            try:
+                parent_res, parent_field = do_split(separator)
+                break
+            except ValueError:
+                LOG.debug("Unable to find ':' as separator in %s.",
+                          self.target_field)
+        else:
+            # If we are here split failed with both separators
+            err_reason = (_("Unable to find resource name in %s") %
+                          self.target_field)
+            LOG.error(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        parent_foreign_key = _RESOURCE_FOREIGN_KEYS.get(
+            "%ss" % parent_res, None)
+        if parent_res == const.EXT_PARENT_PREFIX:
+            for resource in const.EXT_PARENT_RESOURCE_MAPPING:
+                key = "%s_%s_id" % (const.EXT_PARENT_PREFIX, resource)
+                if key in target:
+                    parent_foreign_key = key
+                    parent_res = resource
+                    break
+        if not parent_foreign_key:
+            err_reason = (_("Unable to verify match:%(match)s as the "
+                            "parent resource: %(res)s was not found") %
+                          {'match': self.match, 'res': parent_res})
+            LOG.error(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        return parent_res, parent_field, parent_foreign_key
+
+    def prefetch(self, targets, memo):
+        """Fetch the parent resources of many targets at once.
+
+        The parent resources are retrieved with one plugin call per
+        resource type, and the values of the parent field are stored in the
+        memo of the request, the targets are left untouched, so checking the
+        targets does not require a plugin call for each of them. The parents
+        which could not be fetched are left to the check.
+        """
+        parents = collections.defaultdict(list)
+        for target in targets:
+            if self.target_field in target:
+                continue
+            try:
+                parent = self._get_parent_reference(target)
+            except exceptions.PolicyCheckError:
+                continue
+            parent_res, parent_field, parent_foreign_key = parent
+            if (parent_foreign_key in target and
+                    (parent_res, target[parent_foreign_key],
+                     parent_field) not in memo):
+                parents[parent].append(target)
+        admin_context = context.get_admin_context()
+        for (parent_res, parent_field, parent_foreign_key), parent_targets in (
+                parents.items()):
+            plugin = self._get_parent_plugin(parent_res)
+            f = getattr(plugin, 'get_%ss' % parent_res, None)
+            if not f:
+                continue
+            parent_ids = {target[parent_foreign_key]
+                          for target in parent_targets}
+            try:
+                values = {data['id']: data[parent_field]
+                          for data in f(admin_context,
+                                        filters={'id': list(parent_ids)},
+                                        fields=['id', parent_field])}
+            except Exception:
+                LOG.debug("Unable to prefetch %(res)s resources with %(func)s",
+                          {'res': parent_res, 'func': f})
+                continue
+            for parent_id, value in values.items():
+                memo[parent_res, parent_id, parent_field] = value
+
     def __call__(self, target, creds, enforcer):
         if self.target_field not in target:
             # policy needs a plugin check
-            # target field is in the form resource:field
-            # however if they're not separated by a colon, use an underscore
-            # as a separator for backward compatibility
-
-            def do_split(separator):
-                parent_res, parent_field = self.target_field.split(
-                    separator, 1)
-                return parent_res, parent_field
-
-            for separator in (':', '_'):
-                try:
-                    parent_res, parent_field = do_split(separator)
-                    break
-                except ValueError:
-                    LOG.debug("Unable to find ':' as separator in %s.",
-                              self.target_field)
-            else:
-                # If we are here split failed with both separators
-                err_reason = (_("Unable to find resource name in %s") %
-                              self.target_field)
-                LOG.error(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
-            parent_foreign_key = _RESOURCE_FOREIGN_KEYS.get(
-                "%ss" % parent_res, None)
-            if parent_res == const.EXT_PARENT_PREFIX:
-                for resource in const.EXT_PARENT_RESOURCE_MAPPING:
-                    key = "%s_%s_id" % (const.EXT_PARENT_PREFIX, resource)
-                    if key in target:
-                        parent_foreign_key = key
-                        parent_res = resource
-                        break
-            if not parent_foreign_key:
-                err_reason = (_("Unable to verify match:%(match)s as the "
-                                "parent resource: %(res)s was not found") %
-                              {'match': self.match, 'res': parent_res})
-                LOG.error(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
-
-            target[self.target_field] = self._extract(
-                parent_res, target[parent_foreign_key], parent_field)
+            parent_res, parent_field, parent_foreign_key = (
+                self._get_parent_reference(target))
+            key = (parent_res, target[parent_foreign_key], parent_field)
+            parents = getattr(target, 'parents', {})
+            target[self.target_field] = (parents[key] if key in parents else
+                                         self._extract(*key))
 
         match = self.match % target
         if self.kind in creds:
@@ -335,12 +405,27 @@ class FieldCheck(policy.Check):
         return target_value == self.value
 
 
+class _Target(dict):
+    """A copy of a target with the parents prefetched for its request.
+
+    The owner checks store the parent fields they use in the copy, the
+    target of the request is left untouched.
+    """
+
+    def __init__(self, target, parents):
+        super(_Target, self).__init__(target)
+        self.parents = parents
+
+
 def _prepare_check(context, action, target, pluralized):
     """Prepare rule, target, and credentials for the policy engine."""
     # Compare with None to distinguish case in which target is {}
     if target is None:
         target = {}
     match_rule = _build_match_rule(action, target, pluralized)
+    parents = getattr(context, _PARENTS_MEMO, None)
+    if parents:
+        target = _Target(target, parents)
     credentials = context.to_policy_values()
     return match_rule, target, credentials
 
@@ -388,6 +473,166 @@ def check(context, action, target, plugin=None, might_not_exist=False,
     return result
 
 
+def _compile_rule(rule, enforcer, credentials):
+    """Partially evaluate a policy rule for the given credentials.
+
+    The rule references are resolved and the checks which do not depend on
+    the target are evaluated.
+
+    :return: True or False if the result of the rule does not depend on the
+        target, otherwise a function returning the result for a target.
+    """
+    if isinstance(rule, policy.RuleCheck):
+        try:
+            # indexing the rules falls back to the default rule
+            rule = enforcer.rules[rule.match]
+        except KeyError:
+            return False
+        return _compile_rule(rule, enforcer, credentials)
+    if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        is_and = isinstance(rule, policy.AndCheck)
+        checks = []
+        for sub_rule in rule.rules:
+            compiled = _compile_rule(sub_rule, enforcer, credentials)
+            if compiled is not is_and and isinstance(compiled, bool):
+                # False in an and, or True in an or, decides the result
+                return compiled
+            if not isinstance(compiled, bool):
+                checks.append(compiled)
+        if not checks:
+            return is_and
+        if len(checks) == 1:
+            return checks[0]
+        combine = all if is_and else any
+        return lambda target: combine(check(target) for check in checks)
+    if isinstance(rule, policy.NotCheck):
+        compiled = _compile_rule(rule.rule, enforcer, credentials)
+        if isinstance(compiled, bool):
+            return not compiled
+        return lambda target: not compiled(target)
+    if (type(rule) in _CREDENTIALS_CHECK_TYPES and
+            '%' not in getattr(rule, 'match', '')):
+        return bool(rule({}, credentials, enforcer))
+    return lambda target: rule(target, credentials, enforcer)
+
+
+class CompiledCheck(object):
+    """Policy check of an action compiled for a request context.
+
+    The rule of the action is resolved and the checks which do not depend on
+    the target are evaluated once, so checking many targets, e.g. the items
+    of a list response, only evaluates the target dependent checks, or none
+    at all when the result is the same for every target. The rules of the
+    actions enforcing attribute based checks, like create_network, depend on
+    the attributes set in the target, they are built for each target.
+
+    Arguments are the same as for check().
+    """
+
+    def __init__(self, context, action, might_not_exist=False,
+                 pluralized=None):
+        # set when the result does not depend on the target
+        self.result = None
+        self._check = None
+        if context.is_admin or (
+                might_not_exist and
+                not (_ENFORCER.rules and action in _ENFORCER.rules)):
+            self.result = True
+            return
+        _resource, enforce_attr_based_check = get_resource_and_action(
+            action, pluralized)
+        if enforce_attr_based_check:
+            self._check = functools.partial(
+                check, context, action, might_not_exist=might_not_exist,
+                pluralized=pluralized)
+            return
+        _ENFORCER.load_rules()
+        credentials = context.to_policy_values()
+        # NOTE: same as done by the oslo.policy enforcer
+        if credentials.get('system_scope'):
+            credentials['system'] = credentials.get('system_scope')
+        compiled = _compile_rule(policy.RuleCheck('rule', action),
+                                 _ENFORCER, credentials)
+        parents = getattr(context, _PARENTS_MEMO, None)
+        if isinstance(compiled, bool):
+            self.result = compiled
+        elif parents:
+            self._check = lambda target: compiled(_Target(target, parents))
+        else:
+            self._check = compiled
+
+    def __call__(self, target):
+        if self.result is not None:
+            return self.result
+        return self._check(target)
+
+    def filter(self, targets):
+        """Return the targets on which the action is allowed."""
+        if self.result is not None:
+            return list(targets) if self.result else []
+        return [target for target in targets if self._check(target)]
+
+
+def _get_owner_checks(rule, checks, visited_rules):
+    """Collect the owner checks a policy rule may evaluate."""
+    if isinstance(rule, OwnerCheck):
+        checks.append(rule)
+    elif isinstance(rule, policy.RuleCheck):
+        if rule.match not in visited_rules:
+            visited_rules.add(rule.match)
+            try:
+                _get_owner_checks(_ENFORCER.rules[rule.match], checks,
+                                  visited_rules)
+            except KeyError:
+                pass
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        for sub_rule in rule.rules:
+            _get_owner_checks(sub_rule, checks, visited_rules)
+    elif isinstance(rule, policy.NotCheck):
+        _get_owner_checks(rule.rule, checks, visited_rules)
+    return checks
+
+
+def prefetch_parent_resources(context, action, targets):
+    """Prefetch the parent resources needed to check an action on targets.
+
+    The owner checks of parent resources, e.g. tenant_id:%(network:tenant_id)s,
+    used by the rule of the action or by the rules of the attributes set in
+    the targets load the parent resources of all the targets with one plugin
+    call, instead of one call per target. The parents are kept in a memo in
+    the context, which the checks of the targets with this context use.
+    This is meant to be called before checking a collection of targets,
+    like the items of a list or bulk request. A single target is left to
+    the check, which may not need its parent.
+    """
+    if context.is_admin or len(targets) < 2:
+        return
+    rule_names = [action]
+    _resource, enforce_attr_based_check = get_resource_and_action(action)
+    if enforce_attr_based_check:
+        # only the rules of the attributes set in a target may be checked
+        set_attributes = {name for target in targets
+                          for name, value in target.items()
+                          if value is not constants.ATTR_NOT_SPECIFIED}
+        prefix = action + ':'
+        rule_names += [
+            name for name in _ENFORCER.rules if name.startswith(prefix) and
+            name[len(prefix):].split(':', 1)[0] in set_attributes]
+    checks = []
+    visited_rules = set()
+    for name in rule_names:
+        _get_owner_checks(policy.RuleCheck('rule', name), checks,
+                          visited_rules)
+    if not checks:
+        return
+    memo = getattr(context, _PARENTS_MEMO, None)
+    if memo is None:
+        memo = {}
+        setattr(context, _PARENTS_MEMO, memo)
+    for check in checks:
+        check.prefetch(targets, memo)
+
+
 def enforce(context, action, target, plugin=None, pluralized=None):
     """Verifies that the action is valid on the target in this context.
 
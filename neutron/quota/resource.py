@@ -18,11 +18,14 @@ from neutron_lib.plugins import directory
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import excutils
+import sqlalchemy as sa
 from sqlalchemy import exc as sql_exc
 from sqlalchemy.orm import session as se
 
+from neutron.db import _model_query as model_query
 from neutron.db import api as db_api
 from neutron.db.quota import api as quota_api
+from neutron.db.quota import models as quota_models
 
 LOG = log.getLogger(__name__)
 
@@ -41,8 +44,11 @@ def _count_resource(context, collection_name, tenant_id):
         # in python, allowing older plugins to still be supported
         try:
             obj_count_getter = getattr(plugins[pname], count_getter_name)
-            return obj_count_getter(
-                context, filters={'tenant_id': [tenant_id]})
+            # the cached counts may not reflect the resources created by
+            # the other workers and servers, which could exceed the quota
+            with model_query.count_mode(context, model_query.EXACT_COUNT):
+                return obj_count_getter(
+                    context, filters={'tenant_id': [tenant_id]})
         except (NotImplementedError, AttributeError):
             try:
                 obj_getter = getattr(plugins[pname], getter_name)
@@ -206,15 +212,36 @@ class TrackedResource(BaseResource):
         self._out_of_sync_tenants |= dirty_tenants_snap
         self._dirty_tenants -= dirty_tenants_snap
 
-    def _db_event_handler(self, mapper, _conn, target):
+    def _db_event_handler(self, mapper, connection, target, delta=0):
         try:
             tenant_id = target['tenant_id']
         except AttributeError:
             with excutils.save_and_reraise_exception():
                 LOG.error("Model class %s does not have a tenant_id "
                           "attribute", target)
+        if (delta and cfg.CONF.QUOTAS.track_quota_usage_deltas and
+                self._update_quota_usage(connection, tenant_id, delta)):
+            return
         self._dirty_tenants.add(tenant_id)
 
+    def _db_insert_event_handler(self, mapper, connection, target):
+        self._db_event_handler(mapper, connection, target, delta=1)
+
+    def _db_delete_event_handler(self, mapper, connection, target):
+        self._db_event_handler(mapper, connection, target, delta=-1)
+
+    def _update_quota_usage(self, connection, tenant_id, delta):
+        # The usage is updated in the transaction changing the resources, so
+        # that it is never out of sync with them. A dirty or missing usage is
+        # left to be counted again, the tenant is then marked dirty.
+        usages = quota_models.QuotaUsage.__table__
+        result = connection.execute(usages.update().where(sa.and_(
+            usages.c.resource == self.name,
+            usages.c.project_id == tenant_id,
+            usages.c.dirty == sa.false())).values(
+            in_use=usages.c.in_use + delta))
+        return result.rowcount > 0
+
     # Retry the operation if a duplicate entry exception is raised. This
     # can happen is two or more workers are trying to create a resource of a
     # give kind for the same tenant concurrently. Retrying the operation will
@@ -277,8 +304,9 @@ class TrackedResource(BaseResource):
 
             # Update quota usage, if requested (by default do not do that, as
             # typically one counts before adding a record, and that would mark
-            # the usage counter as dirty again)
-            if resync_usage:
+            # the usage counter as dirty again, unless the usage is updated by
+            # the number of records added)
+            if resync_usage or cfg.CONF.QUOTAS.track_quota_usage_deltas:
                 usage_info = self._resync(context, tenant_id, in_use)
             else:
                 resource = usage_info.resource if usage_info else self.name
@@ -293,6 +321,59 @@ class TrackedResource(BaseResource):
                        'used': usage_info.used})
         return usage_info.used
 
+    def check_usages(self, context):
+        """Marks dirty the usages not matching the count of the resources.
+
+        When the usages are updated by deltas, the quantities reserved in
+        the usages are checked against the reservations of the tenants too.
+
+        :param context: The request context.
+        :returns: The IDs of the tenants whose usage was marked dirty.
+        """
+        check_reserved = cfg.CONF.QUOTAS.track_quota_usage_deltas
+        with db_api.context_manager.reader.using(context):
+            usages = quota_api.get_quota_usage_by_resource(context, self.name)
+            counts = dict(context.session.query(
+                self._model_class.tenant_id, sa.func.count()).group_by(
+                self._model_class.tenant_id))
+            if check_reserved:
+                reserved = quota_api.get_reserved_quota_usages(context,
+                                                               self.name)
+                total_reserved = dict(
+                    (usage.tenant_id, quota_api.get_total_reserved(
+                        context, self.name, usage.tenant_id))
+                    for usage in usages if not usage.dirty)
+        out_of_sync_tenants = []
+        for usage in usages:
+            if usage.dirty:
+                continue
+            in_use = counts.get(usage.tenant_id, 0)
+            if check_reserved and (reserved.get(usage.tenant_id, 0) !=
+                                   total_reserved[usage.tenant_id]):
+                LOG.warning("Quota usage of resource %(resource)s for "
+                            "tenant %(tenant_id)s has %(reserved)d reserved, "
+                            "%(total_reserved)d in its reservations. "
+                            "Marking it dirty.",
+                            {'resource': self.name,
+                             'tenant_id': usage.tenant_id,
+                             'reserved': reserved.get(usage.tenant_id, 0),
+                             'total_reserved':
+                                 total_reserved[usage.tenant_id]})
+            elif usage.used != in_use:
+                LOG.warning("Quota usage of resource %(resource)s for tenant "
+                            "%(tenant_id)s is %(used)d, %(in_use)d counted. "
+                            "Marking it dirty.",
+                            {'resource': self.name,
+                             'tenant_id': usage.tenant_id,
+                             'used': usage.used,
+                             'in_use': in_use})
+            else:
+                continue
+            quota_api.set_quota_usage_dirty(
+                context, self.name, usage.tenant_id)
+            out_of_sync_tenants.append(usage.tenant_id)
+        return out_of_sync_tenants
+
     def count_reserved(self, context, tenant_id):
         """Return the current reservation count for the resource."""
         # NOTE(princenana) Current implementation of reservations
@@ -322,16 +403,18 @@ class TrackedResource(BaseResource):
 
     def register_events(self):
         listen = lib_db_api.sqla_listen
-        listen(self._model_class, 'after_insert', self._db_event_handler)
-        listen(self._model_class, 'after_delete', self._db_event_handler)
+        listen(self._model_class, 'after_insert',
+               self._db_insert_event_handler)
+        listen(self._model_class, 'after_delete',
+               self._db_delete_event_handler)
         listen(se.Session, 'after_bulk_delete', self._except_bulk_delete)
 
     def unregister_events(self):
         try:
             lib_db_api.sqla_remove(self._model_class, 'after_insert',
-                                   self._db_event_handler)
+                                   self._db_insert_event_handler)
             lib_db_api.sqla_remove(self._model_class, 'after_delete',
-                                   self._db_event_handler)
+                                   self._db_delete_event_handler)
             lib_db_api.sqla_remove(se.Session, 'after_bulk_delete',
                                    self._except_bulk_delete)
         except sql_exc.InvalidRequestError:
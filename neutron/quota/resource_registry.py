@@ -87,6 +87,23 @@ def resync_resource(context, resource_name, tenant_id):
         res.resync(context, tenant_id)
 
 
+def check_resources_usage(context):
+    """Marks dirty the usages of the tracked resources which are out of sync.
+
+    The usage of every tenant is compared with the count of its resources,
+    and marked dirty if they differ, so that it is counted again on the next
+    quota check.
+
+    :param context: a Neutron request context with a DB session
+    """
+    if not cfg.CONF.QUOTAS.track_quota_usage:
+        return
+
+    for res in get_all_resources().values():
+        if is_tracked(res.name):
+            res.check_usages(context)
+
+
 def mark_resources_dirty(f):
     """Decorator for functions which alter resource usage.
 
@@ -224,6 +241,14 @@ class ResourceRegistry(object):
     def register_resource(self, resource):
         if resource.name in self._resources:
             LOG.warning('%s is already registered', resource.name)
+            # Keep the resource already tracking the usage of the model, the
+            # usage must not be updated twice by the events of the model. The
+            # dirty status of a resource is None if it does not track usage.
+            registered_resource = self._resources[resource.name]
+            if (registered_resource.dirty is not None and
+                    registered_resource._model_class is
+                    self._tracked_resource_mappings.get(resource.name)):
+                return
         if resource.name in self._tracked_resource_mappings:
             resource.register_events()
         self._resources[resource.name] = resource
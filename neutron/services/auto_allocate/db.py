@@ -125,7 +125,9 @@ class AutoAllocatedTopologyMixin(common_db_mixin.CommonDbMixin):
         return self._l3_plugin
 
     @staticmethod
-    @resource_extend.extends([net_def.COLLECTION_NAME])
+    @resource_extend.extends([net_def.COLLECTION_NAME],
+                             fields=[api_const.IS_DEFAULT],
+                             relationships=['external'])
     def _extend_external_network_default(net_res, net_db):
         """Add is_default field to 'show' response."""
         if net_db.external is not None:
@@ -85,7 +85,8 @@ class RevisionPlugin(service_base.ServicePluginBase):
 
     @staticmethod
     @resource_extend.extends(
-        list(standard_attr.get_standard_attr_resource_model_map()))
+        list(standard_attr.get_standard_attr_resource_model_map()),
+        fields=['revision_number'], relationships=['standard_attr'])
     def extend_resource_dict_revision(resource_res, resource_db):
         resource_res['revision_number'] = resource_db.revision_number
 
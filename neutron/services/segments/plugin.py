@@ -75,7 +75,9 @@ class Plugin(db.SegmentDbMixin, segment.SegmentPluginBase):
         self.segment_host_routes = SegmentHostRoutes()
 
     @staticmethod
-    @resource_extend.extends([net_def.COLLECTION_NAME])
+    @resource_extend.extends([net_def.COLLECTION_NAME],
+                             fields=[l2adj_apidef.L2_ADJACENCY],
+                             relationships=['subnets'])
     def _extend_network_dict_binding(network_res, network_db):
         if not directory.get_plugin('segments'):
             return
@@ -87,12 +89,15 @@ class Plugin(db.SegmentDbMixin, segment.SegmentPluginBase):
         network_res[l2adj_apidef.L2_ADJACENCY] = is_adjacent
 
     @staticmethod
-    @resource_extend.extends([subnet_def.COLLECTION_NAME])
+    @resource_extend.extends([subnet_def.COLLECTION_NAME],
+                             fields=['segment_id'], relationships=[])
     def _extend_subnet_dict_binding(subnet_res, subnet_db):
         subnet_res['segment_id'] = subnet_db.get('segment_id')
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=[ipalloc_apidef.IP_ALLOCATION],
+                             relationships=[])
     def _extend_port_dict_binding(port_res, port_db):
         if not directory.get_plugin('segments'):
             return
@@ -44,12 +44,14 @@ class TagPlugin(common_db_mixin.CommonDbMixin, tagging.TagPluginBase):
         return inst
 
     @staticmethod
-    @resource_extend.extends(list(resource_model_map))
-    def _extend_tags_dict(response_data, db_data):
+    @resource_extend.extends(list(resource_model_map), fields=['tags'],
+                             relationships=['standard_attr'], batch=True)
+    def _extend_tags_dict(responses_data, dbs_data):
         if not directory.get_plugin(tagging.TAG_PLUGIN_TYPE):
             return
-        tags = [tag_db.tag for tag_db in db_data.standard_attr.tags]
-        response_data['tags'] = tags
+        for response_data, db_data in zip(responses_data, dbs_data):
+            tags = [tag_db.tag for tag_db in db_data.standard_attr.tags]
+            response_data['tags'] = tags
 
     def _get_resource(self, context, resource, resource_id):
         model = resource_model_map[resource]
@@ -100,7 +100,8 @@ class TimeStamp_db_mixin(object):
 
     @staticmethod
     @resource_extend.extends(
-        list(standard_attr.get_standard_attr_resource_model_map()))
+        list(standard_attr.get_standard_attr_resource_model_map()),
+        fields=['created_at', 'updated_at'], relationships=['standard_attr'])
     def _extend_resource_dict_timestamp(resource_res, resource_db):
         if (resource_db and resource_db.created_at and
                 resource_db.updated_at):
@@ -67,27 +67,35 @@ class TrunkPlugin(service_base.ServicePluginBase,
         self.check_compatibility()
 
     @staticmethod
-    @resource_extend.extends([port_def.COLLECTION_NAME])
-    def _extend_port_trunk_details(port_res, port_db):
-        """Add trunk details to a port."""
-        if port_db.trunk_port:
-            subports = {
-                x.port_id: {'segmentation_id': x.segmentation_id,
-                            'segmentation_type': x.segmentation_type,
-                            'port_id': x.port_id}
-                for x in port_db.trunk_port.sub_ports
-            }
+    @resource_extend.extends([port_def.COLLECTION_NAME],
+                             fields=['trunk_details'],
+                             relationships=['trunk_port'], batch=True)
+    def _extend_port_trunk_details(port_reses, port_dbs):
+        """Add trunk details to ports."""
+        trunks = [(port_res, port_db.trunk_port)
+                  for port_res, port_db in zip(port_reses, port_dbs)
+                  if port_db.trunk_port]
+        subports = {
+            x.port_id: {'segmentation_id': x.segmentation_id,
+                        'segmentation_type': x.segmentation_type,
+                        'port_id': x.port_id}
+            for _port_res, trunk in trunks for x in trunk.sub_ports
+        }
+        if subports:
+            # the MAC addresses of the subports of all the trunks are
+            # retrieved at once
             core_plugin = directory.get_plugin()
             ports = core_plugin.get_ports(
-                context.get_admin_context(), filters={'id': subports})
+                context.get_admin_context(), filters={'id': list(subports)},
+                fields=['id', 'mac_address'])
             for port in ports:
                 subports[port['id']]['mac_address'] = port['mac_address']
-            trunk_details = {'trunk_id': port_db.trunk_port.id,
-                             'sub_ports': [x for x in subports.values()]}
+        for port_res, trunk in trunks:
+            trunk_details = {'trunk_id': trunk.id,
+                             'sub_ports': [subports[x.port_id]
+                                           for x in trunk.sub_ports]}
             port_res['trunk_details'] = trunk_details
 
-        return port_res
-
     def check_compatibility(self):
         """Verify the plugin can load correctly and fail otherwise."""
         self.check_driver_compatibility()
@@ -13,8 +13,12 @@
 #    under the License.
 
 import os
+import resource
+import subprocess
+import time
 
 from oslo_config import cfg
+from oslo_log import log as logging
 from six import moves
 
 from neutron.agent.linux import external_process
@@ -22,6 +26,7 @@ from neutron.common import utils
 from neutron.tests import base
 from neutron.tests.functional.agent.linux import simple_daemon
 
+LOG = logging.getLogger(__name__)
 
 UUID_FORMAT = "test-uuid-%d"
 SERVICE_NAME = "service"
@@ -108,3 +113,123 @@ class TestProcessMonitor(BaseTestProcessMonitor):
         self.wait_for_all_children_spawned()
         self._kill_last_child()
         self.wait_for_all_children_spawned()
+
+
+class TestProcessMonitorEvents(BaseTestProcessMonitor):
+
+    def setUp(self):
+        if not external_process.pidfd_supported():
+            self.skipTest('pidfds are not supported on this platform')
+        cfg.CONF.set_override('check_child_processes_events', True, 'AGENT')
+        super(TestProcessMonitorEvents, self).setUp()
+        # exits must be handled long before the next periodic check
+        cfg.CONF.set_override('check_child_processes_interval', 60, 'AGENT')
+        self.create_child_processes_manager('respawn')
+
+    def test_respawn_handler(self):
+        self.spawn_n_children(2)
+        utils.wait_until_true(
+            lambda: all(pm.active for pm in self._child_processes),
+            timeout=5, sleep=0.01)
+        # the daemons may not have written their pid files when registered,
+        # in which case they are watched by the next periodic check
+        monitor = self._process_monitor
+        for pm in self._child_processes:
+            monitor._watch(external_process.ServiceId(pm.uuid, SERVICE_NAME),
+                           pm)
+        self.assertEqual(2, len(monitor._watched_processes))
+        old_pid = self._child_processes[-1].pid
+        self._kill_last_child()
+        utils.wait_until_true(
+            lambda: (self._child_processes[-1].active and
+                     self._child_processes[-1].pid != old_pid),
+            timeout=10, sleep=0.01,
+            exception=RuntimeError('Child not respawned.'))
+
+
+class FakeMonitoredProcess(external_process.MonitoredProcess):
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    @property
+    def active(self):
+        return os.path.exists('/proc/%d' % self.pid)
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+
+class TestProcessMonitorScale(base.BaseTestCase):
+    """Compares the periodic checks cost with and without pidfd watching.
+
+    NUM_MONITORED processes are registered, backed by NUM_CHILDREN real
+    processes, the time spent in a periodic check and the time needed to
+    detect the exit of a process are logged.
+    """
+
+    NUM_MONITORED = 5000
+    NUM_CHILDREN = 50
+
+    def setUp(self):
+        super(TestProcessMonitorScale, self).setUp()
+        soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        if soft_limit < self.NUM_MONITORED + 1024:
+            self.skipTest('%d open files are needed' %
+                          (self.NUM_MONITORED + 1024))
+        self.children = []
+        for _i in moves.range(self.NUM_CHILDREN):
+            child = subprocess.Popen(['sleep', '600'])
+            self.addCleanup(child.wait)
+            self.addCleanup(child.kill)
+            self.children.append(child)
+
+    def _build_process_monitor(self, events):
+        cfg.CONF.set_override('check_child_processes_interval', 60, 'AGENT')
+        cfg.CONF.set_override('check_child_processes_events', events, 'AGENT')
+        monitor = external_process.ProcessMonitor(config=cfg.CONF,
+                                                  resource_type='test')
+        self.addCleanup(monitor.stop)
+        for i in moves.range(self.NUM_MONITORED):
+            child = self.children[i % self.NUM_CHILDREN]
+            monitor.register(UUID_FORMAT % i, SERVICE_NAME,
+                             FakeMonitoredProcess(child.pid))
+        return monitor
+
+    def _measure(self, events):
+        monitor = self._build_process_monitor(events)
+        start = time.time()
+        monitor._check_child_processes()
+        check_time = time.time() - start
+
+        # all the processes backed by the killed child are gone
+        num_exited = self.NUM_MONITORED // self.NUM_CHILDREN
+        actions = []
+        monitor._execute_action = actions.append
+        start = time.time()
+        self.children[0].kill()
+        self.children[0].wait()
+        if events:
+            utils.wait_until_true(
+                lambda: len(actions) == num_exited,
+                timeout=10, sleep=0.001)
+        else:
+            monitor._check_child_processes()
+        detection_time = time.time() - start
+        LOG.info("%(mode)s mode: periodic check of %(num)d processes in "
+                 "%(check).3f seconds, exit detected in %(detect).3f "
+                 "seconds", {'mode': 'Event' if events else 'Polling',
+                             'num': self.NUM_MONITORED, 'check': check_time,
+                             'detect': detection_time})
+        self.assertEqual(num_exited, len(actions))
+
+    def test_polling(self):
+        self._measure(events=False)
+
+    def test_events(self):
+        if not external_process.pidfd_supported():
+            self.skipTest('pidfds are not supported on this platform')
+        self._measure(events=True)
@@ -0,0 +1,108 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import eventlet
+from oslo_config import fixture as config_fixture
+from oslo_log import log as logging
+import webob
+import webob.dec
+
+from neutron.agent.metadata import agent
+from neutron.common import cache_utils as cache
+from neutron.conf.agent.metadata import config as meta_conf
+from neutron.tests import base
+
+LOG = logging.getLogger(__name__)
+
+NUM_REQUESTS = 500
+NUM_CONCURRENT_REQUESTS = 50
+POOL_MAXSIZE = 5
+
+
+class FakeNovaMetadataServer(object):
+    """Fake Nova metadata API recording the client connections."""
+
+    def __init__(self):
+        self.connections = set()
+        self.requests = 0
+
+    @webob.dec.wsgify()
+    def __call__(self, req):
+        self.connections.add(req.environ['REMOTE_PORT'])
+        self.requests += 1
+        # simulate the time needed by Nova to build the response
+        eventlet.sleep(0.001)
+        return webob.Response(body=b'instance metadata',
+                              content_type='text/plain')
+
+
+class TestMetadataProxyHandlerLoad(base.BaseTestCase):
+    """Proxies a burst of metadata requests to a local fake Nova.
+
+    The throughput of the proxy is logged, and the number of connections
+    opened to Nova must be bounded by the connection pool size.
+    """
+
+    def setUp(self):
+        super(TestMetadataProxyHandlerLoad, self).setUp()
+        self.nova = FakeNovaMetadataServer()
+        sock = eventlet.listen(('127.0.0.1', 0))
+        server = eventlet.spawn(eventlet.wsgi.server, sock, self.nova,
+                                log=LOG)
+        self.addCleanup(server.kill)
+
+        conf_fixture = self.useFixture(config_fixture.Config())
+        meta_conf.register_meta_conf_opts(
+            meta_conf.METADATA_PROXY_HANDLER_OPTS, conf_fixture.conf)
+        cache.register_oslo_configs(conf_fixture.conf)
+        conf_fixture.config(nova_metadata_host='127.0.0.1',
+                            nova_metadata_port=sock.getsockname()[1],
+                            metadata_proxy_shared_secret='secret',
+                            nova_metadata_pool_maxsize=POOL_MAXSIZE)
+        self.conf = conf_fixture.conf
+
+    def _proxy_requests(self, handler, path='/latest/meta-data/'):
+        def _request(index):
+            req = webob.Request.blank(
+                path, headers={'X-Forwarded-For': '10.0.0.%d' % index})
+            # set by webob.dec.wsgify when called through the handler
+            req.response = webob.Response()
+            return handler._proxy_request(
+                'instance-%d' % index, 'tenant', req).status_int
+
+        pool = eventlet.GreenPool(NUM_CONCURRENT_REQUESTS)
+        start = time.time()
+        statuses = list(pool.imap(_request, range(NUM_REQUESTS)))
+        elapsed = time.time() - start
+        LOG.info("Proxied %(requests)d metadata requests in %(elapsed).2f "
+                 "seconds (%(rate).0f requests/s) using %(conns)d "
+                 "connections",
+                 {'requests': NUM_REQUESTS, 'elapsed': elapsed,
+                  'rate': NUM_REQUESTS / elapsed,
+                  'conns': len(self.nova.connections)})
+        self.assertEqual([200] * NUM_REQUESTS, statuses)
+
+    def test_connections_are_pooled(self):
+        handler = agent.MetadataProxyHandler(self.conf)
+        self._proxy_requests(handler)
+        self.assertEqual(NUM_REQUESTS, self.nova.requests)
+        self.assertLessEqual(len(self.nova.connections), POOL_MAXSIZE)
+
+    def test_responses_are_cached(self):
+        self.conf.set_override('nova_metadata_cache_ttl', 60)
+        handler = agent.MetadataProxyHandler(self.conf)
+        self._proxy_requests(handler)
+        self._proxy_requests(handler)
+        # the second burst of requests is served from the cache
+        self.assertEqual(NUM_REQUESTS, self.nova.requests)
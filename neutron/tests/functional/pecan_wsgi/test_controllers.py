@@ -331,6 +331,19 @@ class TestResourceController(TestRootController):
         response = self.app.get('/v2.0/ports.json')
         self.assertEqual(response.status_int, 200)
 
+    def test_get_approximate_count(self):
+        response = self.app.get('/v2.0/ports.json?approximate_count=true',
+                                headers={'X-Project-Id': 'admin',
+                                         'X-Roles': 'admin'})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual({'ports_count': 1}, jsonutils.loads(response.body))
+
+    def test_get_approximate_count_not_admin(self):
+        response = self.app.get('/v2.0/ports.json?approximate_count=true',
+                                headers={'X-Project-Id': 'tenid'},
+                                expect_errors=True)
+        self.assertEqual(403, response.status_int)
+
     def _check_item(self, expected, item):
         for attribute in expected:
             self.assertIn(attribute, item)
@@ -285,6 +285,26 @@ class TestPolicyEnforcementHook(test_functional.PecanFunctionalTest):
         json_response = jsonutils.loads(response.body)
         self.assertNotIn('restricted_attr', json_response['mehs'][0])
 
+    def test_after_on_list_compiles_policy_once(self):
+        self.mock_plugin.get_mehs.return_value = [
+            {'id': meh_id, 'attr': 'meh', 'restricted_attr': '',
+             'tenant_id': 'tenid'} for meh_id in ('xxx', 'yyy', 'xxx')]
+        with mock.patch.object(policy, 'CompiledCheck',
+                               wraps=policy.CompiledCheck) as compile_mock:
+            response = self.app.get('/v2.0/mehs',
+                                    headers={'X-Project-Id': 'tenid'})
+        self.assertEqual(200, response.status_int)
+        json_response = jsonutils.loads(response.body)
+        self.assertEqual(['xxx', 'xxx'],
+                         [meh['id'] for meh in json_response['mehs']])
+        for meh in json_response['mehs']:
+            self.assertNotIn('restricted_attr', meh)
+        # the action and each of the 4 attributes are compiled once
+        compiled_actions = [mock_call[1][1]
+                            for mock_call in compile_mock.mock_calls]
+        self.assertEqual(1 + 4, len(compiled_actions))
+        self.assertEqual(len(compiled_actions), len(set(compiled_actions)))
+
     def test_after_inits_policy(self):
         self.mock_plugin.get_mehs.return_value = [{
             'id': 'xxx',
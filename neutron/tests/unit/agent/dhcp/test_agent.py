@@ -15,6 +15,7 @@
 
 import collections
 import copy
+import os
 import sys
 import uuid
 
@@ -414,6 +415,97 @@ class TestDhcpAgent(base.BaseTestCase):
                     self.assertTrue(log.called)
                     schedule_resync.assert_called_with(exc, 'foo_network')
 
+    def test_sync_state_paged(self):
+        cfg.CONF.set_override('sync_page_size', 2)
+        networks = {net_id: mock.Mock(id=net_id) for net_id in 'abcde'}
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_network_ids.return_value = list('abcde')
+            mock_plugin.get_active_networks_info.side_effect = (
+                lambda network_ids, **kwargs: [networks[net_id]
+                                               for net_id in network_ids])
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp._port_activity = {'d': 2, 'c': 1}
+            with mock.patch.object(dhcp, 'safe_configure_dhcp_for_network',
+                                   return_value=True) as sc:
+                dhcp.sync_state()
+            self.assertEqual(
+                [mock.call(enable_dhcp_filter=False, network_ids=['d', 'c']),
+                 mock.call(enable_dhcp_filter=False, network_ids=['a', 'b']),
+                 mock.call(enable_dhcp_filter=False, network_ids=['e'])],
+                mock_plugin.get_active_networks_info.call_args_list)
+            sc.assert_has_calls([mock.call(networks[net_id])
+                                 for net_id in 'dcabe'])
+
+    def test_sync_state_paged_page_error(self):
+        cfg.CONF.set_override('sync_page_size', 2)
+        exc = Exception()
+        network = mock.Mock(id='c')
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_network_ids.return_value = ['a', 'b', 'c']
+            mock_plugin.get_active_networks_info.side_effect = [exc,
+                                                                [network]]
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp, 'schedule_resync') as resync,\
+                    mock.patch.object(
+                        dhcp, 'safe_configure_dhcp_for_network') as sc:
+                dhcp.sync_state()
+            self.assertEqual([mock.call(exc, 'a'), mock.call(exc, 'b')],
+                             resync.call_args_list)
+            sc.assert_called_once_with(network)
+
+    def test_sync_state_network_error_resyncs_network(self):
+        exc = Exception()
+        networks = [mock.Mock(id='a'), mock.Mock(id='b')]
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = networks
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp, 'schedule_resync') as resync,\
+                    mock.patch.object(
+                        dhcp, 'safe_configure_dhcp_for_network',
+                        side_effect=[exc, None]):
+                dhcp.sync_state()
+            resync.assert_called_once_with(exc, 'a')
+
+    def test_sync_state_records_configured_networks(self):
+        networks = [mock.Mock(id='a'), mock.Mock(id='b')]
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = networks
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            # the driver error of the first network is handled by
+            # call_driver
+            with mock.patch.object(dhcp, 'configure_dhcp_for_network',
+                                   side_effect=[False, True]),\
+                    mock.patch.object(dhcp._sync_progress, 'add') as add:
+                dhcp.sync_state()
+            add.assert_called_once_with('b')
+
+    def test_sync_state_resumes_interrupted_sync(self):
+        progress_file = self.get_temp_file_path('sync_progress.json')
+        with open(progress_file, 'w') as f:
+            f.write('{"completed": ["a", "b"]}')
+        networks = [mock.Mock(id=net_id) for net_id in 'abc']
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = networks
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        dhcp._sync_progress = dhcp_agent.SyncProgress(progress_file)
+        self.assertIn('a', dhcp._sync_progress)
+        with mock.patch.object(dhcp,
+                               'safe_configure_dhcp_for_network') as sc:
+            dhcp.sync_state()
+        self.assertEqual(networks[2], sc.call_args_list[0][0][0])
+        self.assertNotIn('a', dhcp._sync_progress)
+        self.assertFalse(os.path.exists(progress_file))
+
     def test_periodic_resync(self):
         dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
         with mock.patch.object(dhcp_agent.eventlet, 'spawn') as spawn:
@@ -777,6 +869,16 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.assertFalse(self.cache.called)
         self.assertFalse(self.external_process.called)
 
+    def test_configure_dhcp_for_network_driver_failure(self):
+        self.call_driver.return_value = False
+        self.assertFalse(self.dhcp.configure_dhcp_for_network(fake_network))
+        self.assertFalse(self.cache.called)
+
+    def test_configure_dhcp_for_network(self):
+        self.call_driver.return_value = True
+        self.assertTrue(self.dhcp.configure_dhcp_for_network(fake_network))
+        self.cache.assert_has_calls([mock.call.put(fake_network)])
+
     def _disable_dhcp_helper_known_network(self, isolated_metadata=False):
         if isolated_metadata:
             cfg.CONF.set_override('enable_isolated_metadata', True)
@@ -1178,6 +1280,156 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.call_driver.assert_has_calls(
             [mock.call.call_driver('disable', fake_network)])
 
+    def _enable_port_event_coalescing(self):
+        self.dhcp._port_events.interval = 0.5
+        spawn_after = mock.patch.object(eventlet, 'spawn_after').start()
+        self.cache.get_network_by_id.return_value = fake_network
+        return spawn_after
+
+    def test_port_update_end_coalesced(self):
+        spawn_after = self._enable_port_event_coalescing()
+        self.cache.get_port_by_id.return_value = fake_port2
+        with mock.patch.object(
+                self.dhcp, 'update_isolated_metadata_proxy') as ump:
+            self.dhcp.port_update_end(None, dict(port=fake_port2))
+            self.dhcp.port_create_end(None, dict(port=fake_port1))
+            self.assertFalse(self.call_driver.called)
+            spawn_after.assert_called_once_with(
+                0.5, self.dhcp._process_port_events, fake_network.id)
+
+            self.dhcp._process_port_events(fake_network.id)
+            self.call_driver.assert_called_once_with('reload_allocations',
+                                                     fake_network)
+            ump.assert_called_once_with(fake_network)
+        self.assertEqual({fake_port1.id, fake_port2.id},
+                         self.dhcp.dhcp_ready_ports)
+        stats = self.dhcp._port_events.get_stats()
+        self.assertEqual(2, stats['received_events'])
+        self.assertEqual(1, stats['coalesced_events'])
+        self.assertEqual(1, stats['processed_batches'])
+        self.assertEqual(0, stats['pending_networks'])
+
+    def test_port_create_then_delete_coalesced(self):
+        self._enable_port_event_coalescing()
+        self.cache.get_port_by_id.return_value = fake_port2
+        self.dhcp.port_create_end(None, dict(port=fake_port2))
+        self.dhcp.port_delete_end(None, dict(port_id=fake_port2.id,
+                                             network_id=fake_network.id))
+        self.cache.remove_port.assert_called_once_with(fake_port2)
+        self.assertFalse(self.call_driver.called)
+
+        self.cache.get_port_by_id.return_value = None
+        self.dhcp._process_port_events(fake_network.id)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+        self.assertEqual(set(), self.dhcp.dhcp_ready_ports)
+
+    def test_process_port_events_already_processed(self):
+        self._enable_port_event_coalescing()
+        self.dhcp._process_port_events(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
+    def test_port_update_restart_discards_coalesced_events(self):
+        self._enable_port_event_coalescing()
+        self.cache.get_port_by_id.return_value = fake_port2
+        self.dhcp.port_update_end(None, dict(port=fake_port2))
+
+        self.cache.get_port_by_id.return_value = fake_port1
+        payload = dict(port=copy.deepcopy(fake_port1))
+        payload['port']['device_id'] = utils.get_dhcp_agent_device_id(
+            payload['port']['network_id'], self.dhcp.conf.host)
+        payload['port']['fixed_ips'][0]['ip_address'] = '172.9.9.99'
+        self.dhcp.port_update_end(None, payload)
+        self.call_driver.assert_called_once_with('restart', fake_network)
+        self.assertEqual({fake_port1.id, fake_port2.id},
+                         self.dhcp.dhcp_ready_ports)
+
+        self.call_driver.reset_mock()
+        self.dhcp._process_port_events(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
+
+class TestSyncProgress(base.BaseTestCase):
+    def setUp(self):
+        super(TestSyncProgress, self).setUp()
+        self.path = self.get_temp_file_path('sync_progress.json')
+
+    def test_no_file(self):
+        progress = dhcp_agent.SyncProgress(self.path)
+        self.assertNotIn('a', progress)
+
+    def test_invalid_file(self):
+        with open(self.path, 'w') as f:
+            f.write('garbage')
+        progress = dhcp_agent.SyncProgress(self.path)
+        self.assertNotIn('a', progress)
+
+    def test_save_and_load(self):
+        progress = dhcp_agent.SyncProgress(self.path)
+        progress.add('a')
+        progress.save()
+        self.assertIn('a', dhcp_agent.SyncProgress(self.path))
+
+    def test_save_interval(self):
+        progress = dhcp_agent.SyncProgress(self.path)
+        with mock.patch.object(progress, 'save') as save:
+            for index in range(progress.SAVE_INTERVAL):
+                progress.add(str(index))
+            save.assert_called_once_with()
+
+    def test_clear(self):
+        progress = dhcp_agent.SyncProgress(self.path)
+        progress.add('a')
+        progress.save()
+        progress.clear()
+        self.assertNotIn('a', progress)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestPortEventCoalescer(base.BaseTestCase):
+    def setUp(self):
+        super(TestPortEventCoalescer, self).setUp()
+        self.spawn_after = mock.patch.object(eventlet, 'spawn_after').start()
+        self.callback = mock.Mock()
+        self.coalescer = dhcp_agent.PortEventCoalescer(1, self.callback)
+
+    def test_enabled(self):
+        self.assertTrue(self.coalescer.enabled)
+        self.assertFalse(
+            dhcp_agent.PortEventCoalescer(0, self.callback).enabled)
+
+    def test_add_schedules_once_per_network(self):
+        self.coalescer.add('net1', 'port1')
+        self.coalescer.add('net1', 'port2')
+        self.coalescer.add('net2')
+        self.assertEqual(
+            [mock.call(1, self.callback, 'net1'),
+             mock.call(1, self.callback, 'net2')],
+            self.spawn_after.call_args_list)
+        stats = self.coalescer.get_stats()
+        self.assertEqual(2, stats['pending_networks'])
+        self.assertEqual(3, stats['pending_events'])
+        self.assertEqual(1, stats['coalesced_events'])
+
+    def test_pop(self):
+        self.coalescer.add('net1', 'port1')
+        batch = self.coalescer.pop('net1')
+        self.assertEqual({'port1'}, batch.port_ids)
+        self.assertEqual(1, batch.events)
+        self.assertIsNone(self.coalescer.pop('net1'))
+        self.assertEqual(1, self.coalescer.get_stats()['processed_batches'])
+
+    def test_discard(self):
+        self.coalescer.add('net1', 'port1')
+        self.assertEqual({'port1'}, self.coalescer.discard('net1'))
+        self.assertEqual(set(), self.coalescer.discard('net1'))
+
+    def test_add_after_pop_schedules_again(self):
+        self.coalescer.add('net1')
+        self.coalescer.pop('net1')
+        self.coalescer.add('net1')
+        self.assertEqual(2, self.spawn_after.call_count)
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def _test_dhcp_api(self, method, **kwargs):
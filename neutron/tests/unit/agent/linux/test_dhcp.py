@@ -1430,6 +1430,98 @@ class TestDnsmasq(TestBase):
         self._test_spawn(['--conf-file=', '--domain=openstacklocal'],
                          dhcp_t1=30, dhcp_t2=100)
 
+    def _test_enable_fast_restart(self, fingerprint, stored_fingerprint):
+        self.conf.set_override('dnsmasq_fast_restart', True)
+        test_pm = mock.Mock()
+        dm = self._get_dnsmasq(FakeDualNetwork(), test_pm)
+        self.external_process.return_value.active = True
+        self.mock_mgr.return_value.setup.return_value = 'tap0'
+        with mock.patch.object(dm, '_output_config_files'), \
+                mock.patch.object(dm, '_output_init_lease_file') as lease, \
+                mock.patch.object(dm, '_get_config_fingerprint',
+                                  return_value=fingerprint), \
+                mock.patch.object(dm, '_get_value_from_conf_file',
+                                  return_value=stored_fingerprint), \
+                mock.patch.object(dm, 'restart') as restart:
+            dm.enable()
+            self.assertFalse(restart.called)
+        self.mock_mgr.return_value.setup.assert_called_once_with(dm.network)
+        self.assertTrue(test_pm.register.called)
+        return lease
+
+    def test_enable_fast_restart_adopts_process(self):
+        lease = self._test_enable_fast_restart('abc', 'abc')
+        self.assertFalse(lease.called)
+        self.assertFalse(self.external_process.return_value.disable.called)
+        self.assertFalse(self.external_process.return_value.enable.called)
+
+    def test_enable_fast_restart_respawns_changed_process(self):
+        lease = self._test_enable_fast_restart('abc', 'def')
+        self.assertTrue(lease.called)
+        self.external_process.return_value.disable.assert_called_once_with()
+        self.external_process.return_value.enable.assert_called_once_with(
+            reload_cfg=False)
+
+    def test_enable_fast_restart_respawns_without_fingerprint(self):
+        lease = self._test_enable_fast_restart('abc', None)
+        self.assertTrue(lease.called)
+
+    def test_enable_fast_restart_disabled(self):
+        dm = self._get_dnsmasq(FakeDualNetwork())
+        self.external_process.return_value.active = True
+        with mock.patch.object(dm, 'restart') as restart:
+            dm.enable()
+        restart.assert_called_once_with()
+        self.assertFalse(self.mock_mgr.return_value.setup.called)
+
+    def test_config_fingerprint(self):
+        self.conf.set_override('dhcp_confs', self.get_temp_file_path('dhcp'))
+        pm = mock.Mock()
+        pm.get_pid_file_name.return_value = '/dhcp/pid'
+        dm = self._get_dnsmasq(FakeDualNetwork())
+        dm._build_cmdline_callback = mock.Mock(return_value=['dnsmasq'])
+        # os.makedirs is mocked by the base class
+        os.mkdir(dm.confs_dir)
+        os.mkdir(dm.network_conf_dir)
+
+        def _write(kind, contents):
+            with open(dm.get_conf_file_name(kind), 'w') as f:
+                f.write(contents)
+
+        self.assertIsNone(dm._get_config_fingerprint(pm))
+        _write('host', 'a\nb\n')
+        _write('addn_hosts', '')
+        _write('opts', 'c\n')
+        fingerprint = dm._get_config_fingerprint(pm)
+        self.assertIsNotNone(fingerprint)
+        # the order of the entries does not matter
+        _write('host', 'b\na\n')
+        self.assertEqual(fingerprint, dm._get_config_fingerprint(pm))
+        _write('opts', 'd\n')
+        self.assertNotEqual(fingerprint, dm._get_config_fingerprint(pm))
+        _write('opts', 'c\n')
+        dm._build_cmdline_callback.return_value = ['dnsmasq', '--foo']
+        self.assertNotEqual(fingerprint, dm._get_config_fingerprint(pm))
+
+    def test_spawn_updates_config_fingerprint(self):
+        self.conf.set_override('dnsmasq_fast_restart', True)
+        dm = self._get_dnsmasq(FakeDualNetwork())
+        with mock.patch.object(dm, '_output_config_files'), \
+                mock.patch.object(dm, '_get_config_fingerprint',
+                                  return_value='abc'):
+            dm._spawn_or_reload_process(reload_with_HUP=True)
+        self.safe.assert_called_once_with(
+            dm.get_conf_file_name('fingerprint'), 'abc')
+
+    @mock.patch.object(fileutils, 'delete_if_exists')
+    def test_spawn_removes_config_fingerprint(self, delete_if_exists):
+        dm = self._get_dnsmasq(FakeDualNetwork())
+        with mock.patch.object(dm, '_output_config_files'):
+            dm._spawn_or_reload_process(reload_with_HUP=True)
+        delete_if_exists.assert_called_once_with(
+            dm.get_conf_file_name('fingerprint'))
+        self.assertFalse(self.safe.called)
+
     def _test_output_init_lease_file(self, timestamp):
         expected = [
             '00:00:80:aa:bb:cc 192.168.0.2 * *',
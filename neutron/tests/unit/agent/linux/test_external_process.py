@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
 import os.path
 
 import mock
@@ -47,6 +48,7 @@ class BaseTestProcessMonitor(base.BaseTestCase):
         conf = mock.Mock()
         conf.AGENT.check_child_processes_action = action
         conf.AGENT.check_child_processes = True
+        conf.AGENT.check_child_processes_events = False
         self.pmonitor = ep.ProcessMonitor(
             config=conf,
             resource_type='test')
@@ -101,6 +103,176 @@ class TestProcessMonitor(BaseTestProcessMonitor):
         self.assertEqual(len(self.pmonitor._monitored_processes), 0)
 
 
+class TestPidfdOpen(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPidfdOpen, self).setUp()
+        # the os module of the supported Python versions does not provide
+        # pidfd_open, the system call is made through the C library
+        mock.patch.object(ep, '_os_pidfd_open', None).start()
+        self.syscall = mock.patch.object(ep, '_syscall').start()
+
+    def test_pidfd_open(self):
+        self.syscall.return_value = 5
+        self.assertEqual(5, ep.pidfd_open(TEST_PID))
+        self.syscall.assert_called_once_with(434, TEST_PID, 0)
+
+    def test_pidfd_open_fails(self):
+        self.syscall.return_value = -1
+        with mock.patch.object(ep.ctypes, 'get_errno',
+                               return_value=errno.ESRCH):
+            exc = self.assertRaises(OSError, ep.pidfd_open, TEST_PID)
+        self.assertEqual(errno.ESRCH, exc.errno)
+
+    def test_pidfd_supported(self):
+        self.syscall.return_value = os.dup(0)
+        self.assertTrue(ep.pidfd_supported())
+        self.syscall.assert_called_once_with(434, os.getpid(), 0)
+
+    def test_pidfd_not_supported(self):
+        self.syscall.return_value = -1
+        with mock.patch.object(ep.ctypes, 'get_errno',
+                               return_value=errno.ENOSYS):
+            self.assertFalse(ep.pidfd_supported())
+
+    def test_pidfd_not_supported_process_monitor_polls(self):
+        self.syscall.return_value = -1
+        with mock.patch.object(ep.eventlet, 'spawn') as spawn:
+            conf = mock.Mock()
+            conf.AGENT.check_child_processes_events = True
+            pmonitor = ep.ProcessMonitor(config=conf, resource_type='test')
+        self.assertIsNone(pmonitor._epoll)
+        spawn.assert_called_once_with(pmonitor._periodic_checking_thread)
+        pmonitor.register(TEST_UUID, TEST_SERVICE, mock.Mock(pid=TEST_PID))
+        self.assertEqual({}, pmonitor._watched_processes)
+        self.syscall.assert_called_once_with(434, os.getpid(), 0)
+
+
+class TestProcessMonitorPidfd(BaseTestProcessMonitor):
+
+    def setUp(self):
+        super(TestProcessMonitorPidfd, self).setUp()
+        self.pidfds = []
+        mock.patch.object(ep, 'pidfd_supported', return_value=True).start()
+        # pipes are used as pidfds, a process exit is simulated by writing
+        # into the pipe
+        self.pidfd_open = mock.patch.object(
+            ep, 'pidfd_open', side_effect=self._pidfd_open).start()
+        conf = mock.Mock()
+        conf.AGENT.check_child_processes_action = 'respawn'
+        conf.AGENT.check_child_processes_events = True
+        self.pmonitor = ep.ProcessMonitor(config=conf, resource_type='test')
+        self.addCleanup(self.pmonitor.stop)
+
+    def _pidfd_open(self, pid):
+        read_fd, write_fd = os.pipe()
+        self.pidfds.append((read_fd, write_fd))
+        self.addCleanup(os.close, write_fd)
+        return read_fd
+
+    def _register(self, uuid, pid=TEST_PID, active=True):
+        monitored_process = mock.Mock(pid=pid, active=active)
+        self.pmonitor.register(uuid=uuid, service_name=TEST_SERVICE,
+                               monitored_process=monitored_process)
+        return monitored_process
+
+    def _exit(self, index):
+        os.write(self.pidfds[index][1], b'x')
+
+    def test_pidfd_thread_spawned(self):
+        self.eventlent_spawn.assert_has_calls([
+            mock.call(self.pmonitor._periodic_checking_thread),
+            mock.call(self.pmonitor._pidfd_watching_thread)])
+
+    def test_stop_closes_pidfds(self):
+        self._register('uuid1')
+        epoll = self.pmonitor._epoll
+        watcher = self.pmonitor._pidfd_watcher
+        self.pmonitor.stop()
+        watcher.kill.assert_called_once_with()
+        self.assertIsNone(self.pmonitor._epoll)
+        self.assertTrue(epoll.closed)
+        self.assertEqual({}, self.pmonitor._watched_processes)
+        self.assertEqual({}, self.pmonitor._watched_pidfds)
+        self.assertRaises(OSError, os.fstat, self.pidfds[0][0])
+
+    def test_register_watches_process(self):
+        self._register('uuid1')
+        service_id = ep.ServiceId('uuid1', TEST_SERVICE)
+        self.assertEqual(
+            ep.WatchedProcess(TEST_PID, self.pidfds[0][0]),
+            self.pmonitor._watched_processes[service_id])
+        self.pmonitor.unregister('uuid1', TEST_SERVICE)
+        self.assertEqual({}, self.pmonitor._watched_processes)
+        self.assertEqual({}, self.pmonitor._watched_pidfds)
+        self.assertRaises(OSError, os.fstat, self.pidfds[0][0])
+
+    def test_register_inactive_process_not_watched(self):
+        self._register('uuid1', active=False)
+        self.assertEqual({}, self.pmonitor._watched_processes)
+        self.assertRaises(OSError, os.fstat, self.pidfds[0][0])
+
+    def test_register_process_without_pid_not_watched(self):
+        self._register('uuid1', pid=None)
+        self.assertEqual({}, self.pmonitor._watched_processes)
+        self.assertEqual([], self.pidfds)
+
+    def test_register_dead_process_not_watched(self):
+        self.pidfd_open.side_effect = OSError
+        self._register('uuid1')
+        self.assertEqual({}, self.pmonitor._watched_processes)
+
+    def test_check_child_processes_skips_watched_processes(self):
+        actives = []
+        for uuid, pid in (('uuid1', TEST_PID), ('uuid2', None)):
+            monitored_process = mock.Mock(pid=pid)
+            actives.append(mock.PropertyMock(return_value=True))
+            type(monitored_process).active = actives[-1]
+            self.pmonitor.register(uuid=uuid, service_name=TEST_SERVICE,
+                                   monitored_process=monitored_process)
+            actives[-1].reset_mock()
+        self.pmonitor._check_child_processes()
+        self.assertFalse(actives[0].called)
+        self.assertTrue(actives[1].called)
+
+    def test_exited_process_handled(self):
+        self._register('uuid1')
+        self._register('uuid2')
+        self._exit(1)
+        self.eventlent_spawn.reset_mock()
+        self.pmonitor._handle_exited_child_processes()
+        service_id = ep.ServiceId('uuid2', TEST_SERVICE)
+        self.eventlent_spawn.assert_called_once_with(
+            self.pmonitor._check_exited_child_processes, [service_id])
+        self.assertEqual([ep.ServiceId('uuid1', TEST_SERVICE)],
+                         list(self.pmonitor._watched_processes))
+        # nothing more to handle
+        self.eventlent_spawn.reset_mock()
+        self.pmonitor._handle_exited_child_processes()
+        self.assertFalse(self.eventlent_spawn.called)
+
+    def test_check_exited_child_process_respawned(self):
+        pm = self._register('uuid1')
+        pm.active = False
+        pm.enable.side_effect = lambda: setattr(pm, 'active', True)
+        service_id = ep.ServiceId('uuid1', TEST_SERVICE)
+        self.pmonitor._unwatch(service_id)
+        self.pmonitor._check_exited_child_processes([service_id])
+        pm.enable.assert_called_once_with()
+        # the respawned process is watched again
+        self.assertIn(service_id, self.pmonitor._watched_processes)
+
+    def test_check_exited_child_process_reloaded(self):
+        pm = self._register('uuid1')
+        service_id = ep.ServiceId('uuid1', TEST_SERVICE)
+        self.pmonitor._unwatch(service_id)
+        pm.pid = TEST_PID + 1
+        self.pmonitor._check_exited_child_processes([service_id])
+        self.assertFalse(pm.enable.called)
+        self.assertEqual(TEST_PID + 1,
+                         self.pmonitor._watched_processes[service_id].pid)
+
+
 class TestProcessManager(base.BaseTestCase):
     def setUp(self):
         super(TestProcessManager, self).setUp()
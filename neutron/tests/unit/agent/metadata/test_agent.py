@@ -344,7 +344,7 @@ class _TestMetadataProxyHandlerCacheMixin(object):
         req.response = resp
         with mock.patch.object(self.handler, '_sign_instance_id') as sign:
             sign.return_value = 'signed'
-            with mock.patch('requests.request') as mock_request:
+            with mock.patch('requests.Session.request') as mock_request:
                 resp.headers = {'content-type': 'text/plain'}
                 mock_request.return_value = resp
                 retval = self.handler._proxy_request('the_id', 'tenant_id',
@@ -398,6 +398,61 @@ class _TestMetadataProxyHandlerCacheMixin(object):
         with testtools.ExpectedException(Exception):
             self._proxy_request_test_helper(302)
 
+    def test_get_session(self):
+        session = self.handler._get_session()
+        self.assertIs(session, self.handler._get_session())
+        adapter = session.get_adapter('http://9.9.9.9:8775/')
+        self.assertIs(adapter, session.get_adapter('https://9.9.9.9:8775/'))
+        self.assertEqual(self.fake_conf.nova_metadata_pool_maxsize,
+                         adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+        with mock.patch.object(agent.os, 'getpid', return_value=-1):
+            self.assertIsNot(session, self.handler._get_session())
+
+    def _proxy_cached_request(self, path_info='/the_path', method='GET',
+                              status_code=200):
+        req = mock.Mock(path_info=path_info, query_string='', method=method,
+                        headers={'X-Forwarded-For': '8.8.8.8'}, body='')
+        req.response = mock.Mock()
+        resp = mock.Mock(status_code=status_code, content='content',
+                         headers={'content-type': 'text/plain'})
+        with mock.patch('requests.Session.request',
+                        return_value=resp) as mock_request:
+            self.handler._proxy_request('the_id', 'tenant_id', req)
+        return mock_request.called, req.response
+
+    def test_proxy_request_cached(self):
+        self.fake_conf.set_override('nova_metadata_cache_ttl', 60)
+        self.assertTrue(self._proxy_cached_request()[0])
+        called, response = self._proxy_cached_request()
+        self.assertFalse(called)
+        self.assertEqual('text/plain', response.content_type)
+        self.assertEqual('content', response.body)
+        self.assertTrue(self._proxy_cached_request('/other_path')[0])
+
+    def test_proxy_request_cache_expired(self):
+        self.fake_conf.set_override('nova_metadata_cache_ttl', 60)
+        with mock.patch.object(agent.time, 'time', return_value=1000):
+            self._proxy_cached_request()
+        with mock.patch.object(agent.time, 'time', return_value=1061):
+            self.assertTrue(self._proxy_cached_request()[0])
+        self.assertEqual(1, len(self.handler._response_cache))
+
+    def test_proxy_request_cache_invalidated_by_post(self):
+        self.fake_conf.set_override('nova_metadata_cache_ttl', 60)
+        self._proxy_cached_request()
+        self.assertTrue(self._proxy_cached_request(method='POST')[0])
+        self.assertTrue(self._proxy_cached_request()[0])
+
+    def test_proxy_request_cache_errors_not_cached(self):
+        self.fake_conf.set_override('nova_metadata_cache_ttl', 60)
+        self._proxy_cached_request(status_code=404)
+        self.assertTrue(self._proxy_cached_request()[0])
+
+    def test_proxy_request_cache_disabled(self):
+        self._proxy_cached_request()
+        self.assertTrue(self._proxy_cached_request()[0])
+
     def test_sign_instance_id(self):
         self.assertEqual(
             self.handler._sign_instance_id('foo'),
@@ -411,6 +466,100 @@ class TestMetadataProxyHandlerNewCache(TestMetadataProxyHandlerBase,
     fake_conf_fixture = NewCacheConfFixture(fake_conf)
 
 
+class TestMetadataProxyHandlerPortCache(TestMetadataProxyHandlerBase):
+
+    def setUp(self):
+        super(TestMetadataProxyHandlerPortCache, self).setUp()
+        self.fake_conf.set_override('metadata_port_cache_ttl', 60)
+        self.connection = mock.patch.object(agent.n_rpc,
+                                            'Connection').start()
+        self.register = mock.patch.object(agent.registry_rpc,
+                                          'register').start()
+        self.get_ports = self.handler.plugin_rpc.get_ports
+        self.port = {'id': 'port_id', 'network_id': 'net_id',
+                     'device_id': 'device_id', 'tenant_id': 'tenant_id'}
+
+    def _port_notification(self, port_id, network_id, ip_address,
+                           device_id='device_id', device_owner='compute:az'):
+        port = mock.Mock(id=port_id, network_id=network_id,
+                         device_id=device_id, device_owner=device_owner,
+                         fixed_ips=[mock.Mock(ip_address=ip_address)])
+        self.handler._handle_port_notification(
+            mock.Mock(), 'Port', [port], 'updated')
+
+    def test_port_cache_disabled(self):
+        self.fake_conf.set_override('metadata_port_cache_ttl', 0)
+        self.assertIsNone(self.handler._get_port_cache())
+        self.assertFalse(self.connection.called)
+
+    def test_port_cache_created_once_per_process(self):
+        cache = self.handler._get_port_cache()
+        self.assertIs(cache, self.handler._get_port_cache())
+        self.register.assert_called_once_with(
+            self.handler._handle_port_notification, 'Port')
+        self.assertTrue(
+            self.connection.return_value.consume_in_threads.called)
+        with mock.patch.object(agent.os, 'getpid', return_value=-1):
+            self.assertIsNot(cache, self.handler._get_port_cache())
+
+    def test_get_ports_network_cached(self):
+        self.get_ports.return_value = [self.port]
+        for _i in range(3):
+            self.assertEqual([self.port],
+                             self.handler._get_ports('1.1.1.1', 'net_id'))
+        self.get_ports.assert_called_once_with(
+            self.handler.context,
+            {'network_id': ('net_id',),
+             'fixed_ips': {'ip_address': ['1.1.1.1']}})
+        stats = self.handler._port_cache.get_stats()
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    def test_get_ports_router_cached(self):
+        self.get_ports.side_effect = [
+            [{'network_id': 'net_id'}, {'network_id': 'net_id2'}],
+            [self.port]]
+        for _i in range(2):
+            self.assertEqual([self.port], self.handler._get_ports(
+                '1.1.1.1', router_id='router_id'))
+        self.assertEqual(2, self.get_ports.call_count)
+        self.get_ports.assert_called_with(
+            self.handler.context,
+            {'network_id': ('net_id', 'net_id2'),
+             'fixed_ips': {'ip_address': ['1.1.1.1']}})
+
+    def test_get_ports_invalidated_by_port_update(self):
+        self.get_ports.return_value = [self.port]
+        self.handler._get_ports('1.1.1.1', 'net_id')
+        self._port_notification('port_id', 'net_id', '1.1.1.2')
+        self.handler._get_ports('1.1.1.1', 'net_id')
+        self.assertEqual(2, self.get_ports.call_count)
+
+    def test_negative_entry_invalidated_by_new_port(self):
+        self.get_ports.return_value = []
+        self.handler._get_ports('1.1.1.1', 'net_id')
+        self.handler._get_ports('1.1.1.1', 'net_id')
+        self.assertEqual(1, self.get_ports.call_count)
+        self._port_notification('port_id', 'net_id', '1.1.1.1')
+        self.get_ports.return_value = [self.port]
+        self.assertEqual([self.port],
+                         self.handler._get_ports('1.1.1.1', 'net_id'))
+
+    def test_router_networks_invalidated_by_router_interface(self):
+        self.get_ports.side_effect = [
+            [{'network_id': 'net_id'}], [],
+            [{'network_id': 'net_id'}, {'network_id': 'net_id2'}],
+            [self.port]]
+        self.assertEqual([], self.handler._get_ports(
+            '1.1.1.1', router_id='router_id'))
+        self._port_notification(
+            'router_port_id', 'net_id2', '1.1.1.254', device_id='router_id',
+            device_owner=n_const.DEVICE_OWNER_ROUTER_INTF)
+        self.assertEqual([self.port], self.handler._get_ports(
+            '1.1.1.1', router_id='router_id'))
+        self.assertEqual(4, self.get_ports.call_count)
+
+
 class TestUnixDomainMetadataProxy(base.BaseTestCase):
     def setUp(self):
         super(TestUnixDomainMetadataProxy, self).setUp()
@@ -21,6 +21,7 @@ from oslo_utils import uuidutils
 
 from neutron.agent.l3 import agent as l3_agent
 from neutron.agent.l3 import router_info
+from neutron.agent.linux import external_process
 from neutron.agent.linux import iptables_manager
 from neutron.agent.metadata import driver as metadata_driver
 from neutron.common import constants
@@ -157,6 +158,7 @@ class TestMetadataDriverProcess(base.BaseTestCase):
             cfg_contents = metadata_driver._HAPROXY_CONFIG_TEMPLATE % {
                 'user': self.EUNAME,
                 'group': self.EGNAME,
+                'maxconn': metadata_driver.HAPROXY_MAXCONN,
                 'port': self.METADATA_PORT,
                 'unix_socket_path': self.METADATA_SOCKET,
                 'res_type': 'Router',
@@ -197,3 +199,251 @@ class TestMetadataDriverProcess(base.BaseTestCase):
                                                          mock.ANY, mock.ANY)
             self.assertRaises(metadata_driver.InvalidUserOrGroupException,
                               config.create_config_file)
+
+
+class TestConsolidatedMetadataProxy(base.BaseTestCase):
+
+    EUNAME = 'neutron'
+    EGNAME = 'neutron'
+    METADATA_PORT = 8080
+    METADATA_SOCKET = '/socket/path'
+    PIDFILE = 'pidfile'
+
+    def setUp(self):
+        super(TestConsolidatedMetadataProxy, self).setUp()
+        meta_conf.register_meta_conf_opts(meta_conf.SHARED_OPTS, cfg.CONF)
+        cfg.CONF.set_override('metadata_proxy_consolidated', True)
+        cfg.CONF.set_override('metadata_proxy_user', self.EUNAME)
+        cfg.CONF.set_override('metadata_proxy_group', self.EGNAME)
+        cfg.CONF.set_override('metadata_proxy_socket', self.METADATA_SOCKET)
+        cfg.CONF.set_override('state_path', self.get_default_temp_dir().path)
+        mock.patch.dict(metadata_driver.MetadataDriver.consolidated_proxies,
+                        clear=True).start()
+        mock.patch.dict(metadata_driver.MetadataDriver._consolidated_reloads,
+                        clear=True).start()
+        mock.patch.dict(metadata_driver.MetadataDriver.monitors,
+                        clear=True).start()
+        self.pm = mock.patch.object(external_process,
+                                    'ProcessManager').start()
+        self.spawn_after = mock.patch.object(metadata_driver.eventlet,
+                                             'spawn_after').start()
+        self.namespaces = []
+        mock.patch.object(metadata_driver.ip_lib, 'list_network_namespaces',
+                          return_value=self.namespaces).start()
+        self.monitor = mock.Mock()
+        self.driver = metadata_driver.MetadataDriver
+
+    def _spawn(self, router_id):
+        self.driver.spawn_monitored_metadata_proxy(
+            self.monitor, 'qrouter-%s' % router_id, self.METADATA_PORT,
+            cfg.CONF, router_id=router_id)
+
+    def _run_reloads(self):
+        for call in self.spawn_after.call_args_list:
+            call[0][1](*call[0][2:])
+        self.spawn_after.reset_mock()
+
+    def _destroy(self, router_id):
+        self.driver.destroy_monitored_metadata_proxy(
+            self.monitor, router_id, cfg.CONF, 'qrouter-%s' % router_id)
+
+    def test_spawn_metadata_proxy(self):
+        router_id = _uuid()
+        self._spawn(router_id)
+        self.pm.assert_has_calls([
+            mock.call(conf=cfg.CONF, uuid='metadata-proxy-routers',
+                      default_cmd_callback=mock.ANY,
+                      custom_reload_callback=mock.ANY, run_as_root=True),
+            mock.call(conf=cfg.CONF, uuid=router_id,
+                      namespace='qrouter-%s' % router_id,
+                      default_cmd_callback=None),
+            mock.call().disable()])
+        self.monitor.register.assert_called_once_with(
+            'metadata-proxy-routers', metadata_driver.METADATA_SERVICE_NAME,
+            self.pm.return_value)
+        self.assertFalse(self.pm.return_value.enable.called)
+        self.spawn_after.assert_called_once_with(
+            metadata_driver.CONSOLIDATED_PROXY_RELOAD_DELAY,
+            self.driver._reload_consolidated_metadata_proxy,
+            'metadata-proxy-routers', self.pm.return_value)
+        self._run_reloads()
+        self.pm.return_value.enable.assert_called_once_with(reload_cfg=True)
+        self.assertEqual({}, self.driver._consolidated_reloads)
+        self.assertEqual(
+            {'metadata-proxy-routers': {
+                router_id: ('Router', 'qrouter-%s' % router_id,
+                            self.METADATA_PORT)}},
+            self.driver.consolidated_proxies)
+
+    def test_spawn_metadata_proxies_reload_once(self):
+        router_ids = [_uuid() for _i in range(3)]
+        for router_id in router_ids:
+            self._spawn(router_id)
+        self.assertEqual(1, self.spawn_after.call_count)
+        self._run_reloads()
+        self.pm.return_value.enable.assert_called_once_with(reload_cfg=True)
+        self.assertEqual(
+            set(router_ids),
+            set(self.driver.consolidated_proxies['metadata-proxy-routers']))
+
+    def test_spawn_metadata_proxy_unchanged_does_not_reload(self):
+        router_id = _uuid()
+        self._spawn(router_id)
+        self._run_reloads()
+        self.pm.reset_mock()
+        self._spawn(router_id)
+        self.pm.return_value.enable.assert_called_once_with()
+        self.assertFalse(self.pm.return_value.disable.called)
+        self.assertFalse(self.spawn_after.called)
+        self.assertEqual(2, self.monitor.register.call_count)
+
+    def test_spawn_metadata_proxy_changed_reloads(self):
+        router_id = _uuid()
+        self._spawn(router_id)
+        self._run_reloads()
+        self.pm.reset_mock()
+        self.driver.spawn_monitored_metadata_proxy(
+            self.monitor, 'qrouter-%s' % router_id, self.METADATA_PORT + 1,
+            cfg.CONF, router_id=router_id)
+        self._run_reloads()
+        self.pm.return_value.enable.assert_called_once_with(reload_cfg=True)
+        self.assertFalse(self.pm.return_value.disable.called)
+        self.assertEqual(
+            ('Router', 'qrouter-%s' % router_id, self.METADATA_PORT + 1),
+            self.driver.consolidated_proxies['metadata-proxy-routers'][
+                router_id])
+
+    def test_destroy_metadata_proxy_reloads(self):
+        router_id, router_id2 = _uuid(), _uuid()
+        self._spawn(router_id)
+        self._spawn(router_id2)
+        self._run_reloads()
+        self.pm.reset_mock()
+        with mock.patch.object(metadata_driver.HaproxyConfigurator,
+                               'cleanup_config_file') as cleanup:
+            self._destroy(router_id)
+        self._run_reloads()
+        self.pm.return_value.enable.assert_called_once_with(reload_cfg=True)
+        self.assertEqual(
+            [router_id2],
+            list(self.driver.consolidated_proxies['metadata-proxy-routers']))
+        self.monitor.unregister.assert_called_once_with(
+            router_id, metadata_driver.METADATA_SERVICE_NAME)
+        # only the config file of a dedicated proxy is removed
+        cleanup.assert_called_once_with(router_id, mock.ANY)
+
+    def test_destroy_last_metadata_proxy_stops_process(self):
+        router_id = _uuid()
+        self._spawn(router_id)
+        reload = self.spawn_after.return_value
+        self.pm.reset_mock()
+        with mock.patch.object(metadata_driver.HaproxyConfigurator,
+                               'cleanup_config_file') as cleanup:
+            self._destroy(router_id)
+        # the pending reload is cancelled
+        reload.cancel.assert_called_once_with()
+        self.assertEqual({}, self.driver._consolidated_reloads)
+        self.assertFalse(self.pm.return_value.enable.called)
+        self.monitor.unregister.assert_has_calls([
+            mock.call('metadata-proxy-routers',
+                      metadata_driver.METADATA_SERVICE_NAME),
+            mock.call(router_id, metadata_driver.METADATA_SERVICE_NAME)])
+        cleanup.assert_has_calls([
+            mock.call('metadata-proxy-routers', mock.ANY),
+            mock.call(router_id, mock.ANY)])
+        self.assertNotIn('metadata-proxy-routers',
+                         self.driver.consolidated_proxies)
+
+    def _write_config_file(self, router_ids):
+        proxies = {router_id: ('Router', 'qrouter-%s' % router_id,
+                               self.METADATA_PORT)
+                   for router_id in router_ids}
+        config = metadata_driver.ConsolidatedHaproxyConfigurator(
+            'metadata-proxy-routers', proxies, self.METADATA_SOCKET,
+            self.EUNAME, self.EGNAME, cfg.CONF.state_path, self.PIDFILE)
+        with mock.patch('pwd.getpwnam',
+                        return_value=test_utils.FakeUser(self.EUNAME)),\
+                mock.patch('grp.getgrnam',
+                           return_value=test_utils.FakeGroup(self.EGNAME)):
+            config.create_config_file()
+        return proxies
+
+    def test_load_proxies(self):
+        proxies = self._write_config_file([_uuid(), _uuid()])
+        self.assertEqual(
+            proxies,
+            metadata_driver.ConsolidatedHaproxyConfigurator.load_proxies(
+                'metadata-proxy-routers', cfg.CONF.state_path))
+        self.assertEqual(
+            {}, metadata_driver.ConsolidatedHaproxyConfigurator.load_proxies(
+                'metadata-proxy-networks', cfg.CONF.state_path))
+
+    def test_spawn_metadata_proxy_after_restart(self):
+        router_ids = [_uuid() for _i in range(3)]
+        proxies = self._write_config_file(router_ids)
+        # the namespace of the last router was removed meanwhile
+        self.namespaces.extend('qrouter-%s' % router_id
+                               for router_id in router_ids[:2])
+        self._spawn(router_ids[0])
+        # the running process already proxies the router
+        self.assertFalse(self.spawn_after.called)
+        self.pm.return_value.enable.assert_called_once_with()
+        del proxies[router_ids[2]]
+        self.assertEqual(
+            {'metadata-proxy-routers': proxies},
+            self.driver.consolidated_proxies)
+
+    def test_destroy_metadata_proxy_after_restart(self):
+        router_id, router_id2 = _uuid(), _uuid()
+        self._write_config_file([router_id, router_id2])
+        self.namespaces.extend(['qrouter-%s' % router_id,
+                                'qrouter-%s' % router_id2])
+        with mock.patch.object(metadata_driver.HaproxyConfigurator,
+                               'cleanup_config_file'):
+            self._destroy(router_id)
+        self._run_reloads()
+        self.pm.return_value.enable.assert_called_once_with(reload_cfg=True)
+        self.assertEqual(
+            [router_id2],
+            list(self.driver.consolidated_proxies['metadata-proxy-routers']))
+
+    def _get_callbacks(self):
+        kwargs = [c[2] for c in self.pm.mock_calls
+                  if c[2].get('uuid') == 'metadata-proxy-routers'][0]
+        return kwargs['default_cmd_callback'], kwargs['custom_reload_callback']
+
+    def test_metadata_proxy_callbacks(self):
+        router_id, router_id2 = _uuid(), _uuid()
+        self._spawn(router_id)
+        self._spawn(router_id2)
+        callback, reload_callback = self._get_callbacks()
+        cfg_file = os.path.join(
+            metadata_driver.HaproxyConfigurator.get_config_path(
+                cfg.CONF.state_path), 'metadata-proxy-routers.conf')
+        with mock.patch('pwd.getpwnam',
+                        return_value=test_utils.FakeUser(self.EUNAME)),\
+                mock.patch('grp.getgrnam',
+                           return_value=test_utils.FakeGroup(self.EGNAME)),\
+                mock.patch('os.makedirs'),\
+                mock.patch.object(metadata_driver.linux_utils,
+                                  'get_value_from_file', return_value=42):
+            mock_open = self.useFixture(
+                tools.OpenFixture(cfg_file)).mock_open
+            self.assertEqual(['haproxy', '-f', cfg_file],
+                             callback(self.PIDFILE))
+            self.assertEqual(['haproxy', '-f', cfg_file, '-sf', '42'],
+                             reload_callback(self.PIDFILE))
+
+        cfg_contents = mock_open.return_value.write.call_args[0][0]
+        self.assertIn('maxconn     2048\n', cfg_contents)
+        self.assertIn('pidfile     %s\n' % self.PIDFILE, cfg_contents)
+        for res_id in (router_id, router_id2):
+            self.assertIn(
+                metadata_driver._HAPROXY_NAMESPACE_LISTEN_TEMPLATE % {
+                    'res_type': 'Router',
+                    'res_id': res_id,
+                    'namespace': 'qrouter-%s' % res_id,
+                    'port': self.METADATA_PORT,
+                    'maxconn': metadata_driver.HAPROXY_MAXCONN,
+                    'unix_socket_path': self.METADATA_SOCKET},
+                cfg_contents)
@@ -0,0 +1,114 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from neutron_lib import constants
+
+from neutron.agent.metadata import port_cache
+from neutron.tests import base
+
+
+class TestPortLookupCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPortLookupCache, self).setUp()
+        self.time = mock.patch.object(port_cache.time, 'time',
+                                      return_value=1000).start()
+        self.cache = port_cache.PortLookupCache(60, 5)
+        self.port = {'id': 'port_id', 'network_id': 'net_id'}
+
+    def _make_port(self, port_id='port_id', network_id='net_id',
+                   ip_address='10.0.0.2', device_id='device_id',
+                   device_owner='compute:az'):
+        return mock.Mock(id=port_id, network_id=network_id,
+                         device_id=device_id, device_owner=device_owner,
+                         fixed_ips=[mock.Mock(ip_address=ip_address)])
+
+    def _set(self, key, networks, ports, router_id=None):
+        self.cache.set_ports(key, networks, key[1], ports,
+                             self.cache.generation, router_id=router_id)
+
+    def test_get_ports_miss(self):
+        self.assertIsNone(self.cache.get_ports(('net_id', '10.0.0.2')))
+        self.assertEqual(1, self.cache.get_stats()['misses'])
+
+    def test_get_ports_hit(self):
+        key = ('net_id', '10.0.0.2')
+        self._set(key, ['net_id'], [self.port])
+        self.assertEqual([self.port], self.cache.get_ports(key))
+        self.assertEqual({'entries': 1, 'hit_rate': 1.0, 'hits': 1,
+                          'negative_hits': 0, 'misses': 0,
+                          'invalidations': 0}, self.cache.get_stats())
+
+    def test_get_ports_expired(self):
+        key = ('net_id', '10.0.0.2')
+        self._set(key, ['net_id'], [self.port])
+        self.time.return_value = 1061
+        self.assertIsNone(self.cache.get_ports(key))
+        self.assertEqual(0, self.cache.get_stats()['entries'])
+
+    def test_negative_entry_short_ttl(self):
+        key = ('net_id', '10.0.0.2')
+        self._set(key, ['net_id'], [])
+        self.assertEqual([], self.cache.get_ports(key))
+        self.assertEqual(1, self.cache.get_stats()['negative_hits'])
+        self.time.return_value = 1006
+        self.assertIsNone(self.cache.get_ports(key))
+
+    def test_set_ports_stale_generation(self):
+        key = ('net_id', '10.0.0.2')
+        generation = self.cache.generation
+        self.cache.invalidate_port(self._make_port())
+        self.cache.set_ports(key, ['net_id'], '10.0.0.2', [self.port],
+                             generation)
+        self.assertIsNone(self.cache.get_ports(key))
+
+    def test_invalidate_port_by_id(self):
+        key = ('net_id', '10.0.0.2')
+        self._set(key, ['net_id'], [self.port])
+        self.cache.invalidate_port(self._make_port(ip_address='10.0.0.3'))
+        self.assertIsNone(self.cache.get_ports(key))
+        self.assertEqual(1, self.cache.get_stats()['invalidations'])
+
+    def test_invalidate_port_by_address(self):
+        net_key = ('net_id', '10.0.0.2')
+        router_key = ('router_id', '10.0.0.2')
+        other_key = ('net_id', '10.0.0.3')
+        self._set(net_key, ['net_id'], [])
+        self._set(router_key, ['net_id2', 'net_id'], [], 'router_id')
+        self._set(other_key, ['net_id'], [])
+        self.cache.invalidate_port(self._make_port(port_id='new_port_id'))
+        self.assertIsNone(self.cache.get_ports(net_key))
+        self.assertIsNone(self.cache.get_ports(router_key))
+        self.assertEqual([], self.cache.get_ports(other_key))
+
+    def test_invalidate_router_interface(self):
+        key = ('router_id', '10.0.0.2')
+        self.cache.set_router_networks('router_id', ['net_id'],
+                                       self.cache.generation)
+        self._set(key, ['net_id'], [self.port], 'router_id')
+        self.assertEqual(('net_id', ),
+                         self.cache.get_router_networks('router_id'))
+        self.cache.invalidate_port(self._make_port(
+            port_id='router_port_id', network_id='net_id2',
+            ip_address='10.0.1.1', device_id='router_id',
+            device_owner=constants.DEVICE_OWNER_ROUTER_INTF))
+        self.assertIsNone(self.cache.get_router_networks('router_id'))
+        self.assertIsNone(self.cache.get_ports(key))
+
+    def test_invalidate_cleans_indexes(self):
+        key = ('net_id', '10.0.0.2')
+        self._set(key, ['net_id'], [self.port])
+        self.cache.invalidate_port(self._make_port())
+        self.assertFalse(self.cache._keys_by_address)
+        self.assertFalse(self.cache._keys_by_port)
+        self.assertFalse(self.cache._keys_by_router)
@@ -20,11 +20,13 @@ from neutron_lib import constants
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import constants as plugin_constants
 from neutron_lib.plugins import directory
+from oslo_config import cfg
 from oslo_db import exception as db_exc
 
 from neutron.api.rpc.handlers import dhcp_rpc
 from neutron.common import exceptions
 from neutron.common import utils
+from neutron.db import dhcp_info_db
 from neutron.db import provisioning_blocks
 from neutron.tests import base
 
@@ -115,6 +117,49 @@ class TestDhcpRpcCallback(base.BaseTestCase):
     def test_get_active_networks_info_enable_dhcp_filter_true(self):
         self._test_get_active_networks_info_enable_dhcp_filter(True)
 
+    def test_get_active_networks_info_minimal_network_info(self):
+        cfg.CONF.set_override('dhcp_agent_minimal_network_info', True)
+        self.plugin.get_networks.return_value = [{'id': 'a'}]
+        port = {'network_id': 'a'}
+        subnet = {'network_id': 'a', 'id': 'c'}
+        with mock.patch.object(dhcp_info_db,
+                               'get_networks_subnets_and_ports',
+                               return_value=([subnet], [port])) as get_info:
+            networks = self.callbacks.get_active_networks_info(
+                mock.Mock(), host='host', enable_dhcp_filter=False)
+            get_info.assert_called_once_with(
+                mock.ANY, ['a'], enable_dhcp_filter=False,
+                extra_dhcp_opts=mock.ANY, dns_assignment=mock.ANY)
+        self.assertFalse(self.plugin.get_ports.called)
+        self.assertFalse(self.plugin.get_subnets.called)
+        self.assertEqual([{'id': 'a', 'non_local_subnets': [],
+                           'subnets': [subnet], 'ports': [port]}],
+                         networks)
+
+    def test_get_active_network_ids(self):
+        self.plugin.get_networks.return_value = [{'id': 'a'}, {'id': 'b'}]
+        self.assertEqual(
+            ['a', 'b'],
+            self.callbacks.get_active_network_ids(mock.Mock(), host='host'))
+
+    def test_get_active_networks_info_network_ids(self):
+        self.plugin.get_networks.return_value = [{'id': 'b'}]
+        self.plugin.get_ports.return_value = []
+        self.plugin.get_subnets.return_value = []
+        with mock.patch.object(self.callbacks,
+                               '_get_active_networks') as get_nets:
+            networks = self.callbacks.get_active_networks_info(
+                mock.Mock(), host='host', network_ids=['b'])
+            self.assertFalse(get_nets.called)
+        self.plugin.get_networks.assert_called_once_with(
+            mock.ANY, filters={'id': ['b'], 'admin_state_up': [True]})
+        self.assertEqual(['b'], [network['id'] for network in networks])
+
+    def test_get_active_networks_info_empty_network_ids(self):
+        self.assertEqual([], self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', network_ids=[]))
+        self.assertFalse(self.plugin.get_networks.called)
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
@@ -13,6 +13,9 @@
 #    under the License.
 
 from oslo_config import cfg
+from oslo_serialization import jsonutils
+from six.moves.urllib import parse
+import webob
 
 from neutron.api import api_common
 from neutron.tests import base
@@ -31,3 +34,133 @@ class PrepareUrlTestCase(base.BaseTestCase):
         requrl = 'http://neutron.example/sub/ports.json?test=1'
         expected = 'http://quantum.example/sub/ports.json?test=1'
         self.assertEqual(expected, api_common.prepare_url(requrl))
+
+
+class PaginationMarkerTestCase(base.BaseTestCase):
+
+    def _get_marker(self, link):
+        return parse.parse_qs(parse.urlsplit(link).query)['marker'][0]
+
+    def test_get_marker(self):
+        marker = api_common.get_marker(
+            {'id': 'id1', 'name': None, 'mtu': 1500, 'shared': True},
+            ['name', 'mtu'])
+        self.assertEqual('id1', marker)
+        self.assertEqual({'id': 'id1', 'name': None, 'mtu': 1500},
+                         marker.sort_values)
+
+    def test_get_marker_unknown_values(self):
+        for item in ({'id': 'id1'}, {'id': 'id1', 'name': ['name']}):
+            marker = api_common.get_marker(item, ['name'])
+            self.assertEqual('id1', marker)
+            self.assertIsNone(marker.sort_values)
+
+    def test_links(self):
+        request = webob.Request.blank(
+            '/things?limit=2&sort_key=name&sort_dir=asc'
+            '&sort_key=id&sort_dir=asc')
+        items = [{'id': 'id1', 'name': 'name1'},
+                 {'id': 'id2', 'name': 'name2'}]
+        next_marker = self._get_marker(
+            api_common.get_next_link(request, items, 'id'))
+        previous_marker = self._get_marker(
+            api_common.get_previous_link(request, items, 'id'))
+        self.assertTrue(next_marker.startswith('id2.'))
+        self.assertTrue(previous_marker.startswith('id1.'))
+        marker = api_common.decode_marker(next_marker)
+        self.assertEqual('id2', marker)
+        self.assertEqual(items[1], marker.sort_values)
+        self.assertEqual(
+            items[0], api_common.decode_marker(previous_marker).sort_values)
+
+    def test_links_sorted_by_id(self):
+        request = webob.Request.blank('/things?limit=1')
+        link = api_common.get_next_link(request, [{'id': 'id1'}], 'id')
+        self.assertEqual('id1', self._get_marker(link))
+
+    def test_decode_marker_id(self):
+        for marker in ('id1', 'zone.name', 'id1.WzFd'):
+            self.assertIsNone(getattr(api_common.decode_marker(marker),
+                                      'sort_values', None))
+
+
+class CollectionStreamTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(CollectionStreamTestCase, self).setUp()
+        cfg.CONF.set_override('list_streaming_chunk_size', 2)
+        self.items = [{'id': 'id%d' % i, 'name': 'name%d' % i}
+                      for i in range(5)]
+        self.calls = []
+
+    def _lister(self, marker=None, limit=None, sorts=None,
+                page_reverse=False):
+        self.calls.append((marker, limit, sorts))
+        start = 0
+        if marker:
+            start = [item['id'] for item in self.items].index(marker) + 1
+        return [dict(item) for item in self.items[start:start + limit]]
+
+    def _serialize(self, stream):
+        return jsonutils.loads(b''.join(stream.serialize()))
+
+    def test_serialize(self):
+        stream = api_common.CollectionStream('things', self._lister)
+        # the first chunk is retrieved before the response is started
+        self.assertEqual([(None, 2, [('id', True)])], self.calls)
+        self.assertEqual({'things': self.items}, self._serialize(stream))
+        self.assertEqual([(None, 2, [('id', True)]),
+                          ('id1', 2, [('id', True)]),
+                          ('id3', 2, [('id', True)])], self.calls)
+
+    def test_serialize_empty(self):
+        self.items = []
+        stream = api_common.CollectionStream('things', self._lister)
+        self.assertEqual({'things': []}, self._serialize(stream))
+        self.assertEqual(1, len(self.calls))
+
+    def test_serialize_full_last_chunk(self):
+        self.items = self.items[:4]
+        stream = api_common.CollectionStream('things', self._lister)
+        self.assertEqual({'things': self.items}, self._serialize(stream))
+        # an empty chunk tells the end of the collection
+        self.assertEqual(3, len(self.calls))
+
+    def test_serialize_lister_ignoring_pagination(self):
+        stream = api_common.CollectionStream(
+            'things', lambda **kwargs: [dict(item) for item in self.items])
+        self.assertEqual({'things': self.items}, self._serialize(stream))
+
+    def test_sorts(self):
+        stream = api_common.CollectionStream(
+            'things', self._lister, sorts=[('name', False)])
+        self._serialize(stream)
+        self.assertEqual([[('name', False), ('id', True)]] * 3,
+                         [call[2] for call in self.calls])
+        # the values of the sort keys are passed with the markers
+        self.assertEqual([None, {'id': 'id1', 'name': 'name1'},
+                          {'id': 'id3', 'name': 'name3'}],
+                         [getattr(call[0], 'sort_values', None)
+                          for call in self.calls])
+
+    def test_filters(self):
+        stream = api_common.CollectionStream('things', self._lister)
+        # the markers are taken before the filters remove the items or
+        # their primary key
+        stream.add_filter(lambda items: [item for item in items
+                                         if item['id'] != 'id1'])
+        stream.add_filter(lambda items: [{'name': item['name']}
+                                         for item in items])
+        self.assertEqual(
+            {'things': [{'name': 'name%d' % i} for i in (0, 2, 3, 4)]},
+            self._serialize(stream))
+        self.assertEqual([None, 'id1', 'id3'],
+                         [call[0] for call in self.calls])
+
+    def test_is_streaming_supported(self):
+        self.assertTrue(api_common.is_streaming_supported(True, True))
+        self.assertFalse(api_common.is_streaming_supported(False, True))
+        self.assertFalse(api_common.is_streaming_supported(True, False))
+        self.assertFalse(api_common.is_streaming_supported(True, True, 10))
+        cfg.CONF.set_override('list_streaming_chunk_size', 0)
+        self.assertFalse(api_common.is_streaming_supported(True, True))
@@ -549,6 +549,61 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         tenant_id = _uuid()
         self._test_list(tenant_id + "bad", tenant_id)
 
+    def _test_list_streaming(self, env=None, **params):
+        cfg.CONF.set_override('list_streaming_chunk_size', 2)
+        networks = [{'id': 'net%d' % i, 'name': 'net%d' % i,
+                     'tenant_id': 'tenant%d' % (i % 2), 'shared': False}
+                    for i in range(5)]
+
+        def _get_networks(context, marker=None, limit=None, **kwargs):
+            start = 0
+            if marker:
+                start = [n['id'] for n in networks].index(marker) + 1
+            return [dict(network) for network in networks[start:start + limit]]
+
+        instance = self.plugin.return_value
+        instance.get_networks.side_effect = _get_networks
+        res = self.api.get(_get_path('networks', fmt=self.fmt), params=params,
+                           extra_environ=env or {})
+        self.assertEqual(200, res.status_int)
+        self.assertEqual([mock.call(mock.ANY, filters=mock.ANY,
+                                    fields=mock.ANY,
+                                    sorts=[('id', True)], limit=2,
+                                    page_reverse=False, marker=marker)
+                          for marker in (None, 'net1', 'net3')],
+                         instance.get_networks.call_args_list)
+        return self.deserialize(res)['networks']
+
+    def test_list_streaming(self):
+        networks = self._test_list_streaming()
+        self.assertEqual(['net%d' % i for i in range(5)],
+                         [network['id'] for network in networks])
+
+    def test_list_streaming_authz(self):
+        policy._ENFORCER.set_rules(oslo_policy.Rules.from_dict(
+            {'get_network': 'field:networks:tenant_id=tenant1'}),
+            overwrite=False)
+        env = {'neutron.context': context.Context('', 'tenant1')}
+        networks = self._test_list_streaming(env=env)
+        self.assertEqual(['net1', 'net3'],
+                         [network['id'] for network in networks])
+
+    def test_list_streaming_fields(self):
+        networks = self._test_list_streaming(fields='name')
+        self.assertEqual([{'name': 'net%d' % i} for i in range(5)],
+                         networks)
+
+    def test_list_streaming_not_used_with_pagination(self):
+        cfg.CONF.set_override('list_streaming_chunk_size', 2)
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = []
+        self.api.get(_get_path('networks', fmt=self.fmt),
+                     params={'limit': 10})
+        instance.get_networks.assert_called_once_with(
+            mock.ANY, filters=mock.ANY, fields=mock.ANY,
+            sorts=[('id', True)], limit=10, marker=None,
+            page_reverse=False)
+
     def test_list_pagination(self):
         id1 = str(_uuid())
         id2 = str(_uuid())
@@ -592,16 +647,24 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         self.assertEqual(1, len(next_links))
         self.assertEqual(1, len(previous_links))
 
+        # the markers carry the values of the sort keys of the marker items
         url = urlparse.urlparse(next_links[0]['href'])
         self.assertEqual(url.path, _get_path('networks'))
-        params['marker'] = [id2]
-        self.assertEqual(params, urlparse.parse_qs(url.query))
+        query = urlparse.parse_qs(url.query)
+        marker = api_common.decode_marker(query.pop('marker')[0])
+        self.assertEqual(id2, marker)
+        self.assertEqual({'id': id2, 'name': 'net2'}, marker.sort_values)
+        del params['marker']
+        self.assertEqual(params, query)
 
         url = urlparse.urlparse(previous_links[0]['href'])
         self.assertEqual(url.path, _get_path('networks'))
-        params['marker'] = [id1]
+        query = urlparse.parse_qs(url.query)
+        marker = api_common.decode_marker(query.pop('marker')[0])
+        self.assertEqual(id1, marker)
+        self.assertEqual({'id': id1, 'name': 'net1'}, marker.sort_values)
         params['page_reverse'] = ['True']
-        self.assertEqual(params, urlparse.parse_qs(url.query))
+        self.assertEqual(params, query)
 
     def test_list_pagination_with_last_page(self):
         id = str(_uuid())
@@ -1296,6 +1359,46 @@ class V2Views(base.BaseTestCase):
         self._view(keys, 'subnets', 'subnet')
 
 
+class LegacyControllerStreamingTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(LegacyControllerStreamingTestCase, self).setUp()
+        cfg.CONF.set_override('list_streaming_chunk_size', 2)
+        policy.init()
+        self.addCleanup(policy.reset)
+        self.plugin = mock.Mock()
+        self.plugin._Mock__native_pagination_support = True
+        self.plugin._Mock__native_sorting_support = True
+        self.networks = [{'id': 'net%d' % i, 'name': 'net%d' % i,
+                          'tenant_id': 'tenant', 'shared': False}
+                         for i in range(3)]
+        self.plugin.get_networks.side_effect = self._get_networks
+        self.resource = v2_base.create_resource(
+            'networks', 'network', self.plugin,
+            attributes.RESOURCES['networks'], allow_pagination=True,
+            allow_sorting=True)
+
+    def _get_networks(self, context, marker=None, limit=None, **kwargs):
+        start = 0
+        if marker:
+            start = [n['id'] for n in self.networks].index(marker) + 1
+        return [dict(n) for n in self.networks[start:start + limit]]
+
+    def test_index(self):
+        request = webob.Request.blank('/networks?fields=name')
+        request.environ['wsgiorg.routing_args'] = ((), {'action': 'index'})
+        request.environ['neutron.context'] = context.get_admin_context()
+        response = request.get_response(self.resource)
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.content_length)
+        self.assertEqual({'networks': [{'name': 'net%d' % i}
+                                       for i in range(3)]},
+                         response.json)
+        self.assertEqual([None, 'net1'],
+                         [call[1]['marker'] for call in
+                          self.plugin.get_networks.call_args_list])
+
+
 class NotificationTest(APIv2TestBase):
 
     def setUp(self):
@@ -21,6 +21,7 @@ from neutron_lib.plugins import directory
 from oslo_config import cfg
 
 from neutron.db.quota import api as quota_api
+from neutron.objects import quota as quota_obj
 from neutron.tests.unit.db.quota import test_driver
 from neutron.tests.unit import testlib_api
 
@@ -307,6 +308,83 @@ class TestQuotaDbApi(testlib_api.SqlTestCaseLight):
             self.assertIsNone(quota_api.get_reservation(
                 self.context, resv_1.reservation_id))
 
+    def _get_reserved(self, resource, tenant_id=None):
+        return quota_obj.QuotaUsage.get_object(
+            context.get_admin_context(), resource=resource,
+            project_id=tenant_id or self.tenant_id).reserved
+
+    def test_reserve_quota_usage(self):
+        self._create_quota_usage('goals', 2)
+        self.assertTrue(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 2, limit=5))
+        self.assertFalse(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 2, limit=5))
+        self.assertTrue(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 1, limit=5))
+        self.assertEqual(3, self._get_reserved('goals'))
+
+    def test_reserve_dirty_quota_usage(self):
+        self._create_quota_usage('goals', 2)
+        quota_api.set_quota_usage_dirty(self.context, 'goals', self.tenant_id)
+        self.assertFalse(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 1, limit=5))
+        # without a limit the amount is reserved anyway
+        self.assertTrue(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 1))
+        self.assertEqual(1, self._get_reserved('goals'))
+
+    def test_reserve_non_existing_quota_usage(self):
+        self.assertFalse(quota_api.reserve_quota_usage(
+            self.context, 'goals', self.tenant_id, 1))
+
+    def test_create_quota_usage_with_reservations(self):
+        self._create_reservation({'goals': 2, 'assists': 1})
+        self._create_quota_usage('goals', 26)
+        self.assertEqual(2, self._get_reserved('goals'))
+
+    def test_remove_reservation_releases_reserved(self):
+        cfg.CONF.set_override('track_quota_usage_deltas', True, 'QUOTAS')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'track_quota_usage_deltas', 'QUOTAS')
+        self._create_quota_usage('goals', 2)
+        resv = self._create_reservation({'goals': 2})
+        quota_api.reserve_quota_usage(self.context, 'goals',
+                                      self.tenant_id, 2)
+        self.assertEqual(1, quota_api.remove_reservation(
+            self.context, resv.reservation_id))
+        self.assertEqual(0, self._get_reserved('goals'))
+        self.assertIsNone(quota_api.remove_reservation(
+            self.context, resv.reservation_id))
+        self.assertEqual(0, self._get_reserved('goals'))
+
+    def test_remove_reservation_without_deltas(self):
+        self._create_quota_usage('goals', 2)
+        resv = self._create_reservation({'goals': 2})
+        quota_api.reserve_quota_usage(self.context, 'goals',
+                                      self.tenant_id, 2)
+        self.assertEqual(1, quota_api.remove_reservation(
+            self.context, resv.reservation_id))
+        # the quantities reserved are not released from the usages
+        self.assertEqual(2, self._get_reserved('goals'))
+
+    def test_remove_expired_reservations_releases_reserved(self):
+        cfg.CONF.set_override('track_quota_usage_deltas', True, 'QUOTAS')
+        self.addCleanup(cfg.CONF.clear_override,
+                        'track_quota_usage_deltas', 'QUOTAS')
+        with mock.patch('neutron.db.quota.api.utcnow') as mock_utcnow:
+            mock_utcnow.return_value = datetime.datetime(
+                2015, 5, 20, 0, 0)
+            self._create_quota_usage('goals', 2)
+            self._create_reservation(
+                {'goals': 2}, expiration=datetime.datetime(2016, 3, 31))
+            self._create_reservation(
+                {'goals': 1}, expiration=datetime.datetime(2015, 3, 31))
+            quota_api.reserve_quota_usage(self.context, 'goals',
+                                          self.tenant_id, 3)
+            self.assertEqual(1, quota_api.remove_expired_reservations(
+                self.context, self.tenant_id))
+            self.assertEqual(2, self._get_reserved('goals'))
+
 
 class TestQuotaDbApiAdminContext(TestQuotaDbApi):
 
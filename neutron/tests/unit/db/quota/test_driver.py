@@ -13,11 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import mock
 from neutron_lib import context
 from neutron_lib import exceptions as lib_exc
+from oslo_config import cfg
 
+from neutron.common import cache_utils
 from neutron.common import exceptions
 from neutron.db import db_base_plugin_v2 as base_plugin
+from neutron.db.quota import _limits_cache
 from neutron.db.quota import api as quota_api
 from neutron.db.quota import driver
 from neutron.objects import quota as quota_obj
@@ -203,6 +207,80 @@ class TestDbQuotaDriver(testlib_api.SqlTestCase,
                           self.plugin.limit_check, context.get_admin_context(),
                           PROJECT, resources, values)
 
+    def _test_get_tenant_quotas_cached(self, ttl=60):
+        self.config(quota_limits_cache_ttl=ttl, group='QUOTAS')
+        self.addCleanup(_limits_cache.clear)
+        defaults = {RESOURCE: TestResource(RESOURCE, 4)}
+        self.plugin.update_quota_limit(self.context, PROJECT, RESOURCE, 2)
+        self.assertEqual(2, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+        # change the limit without invalidating the cached limits
+        quota = quota_obj.Quota.get_objects(
+            self.context, project_id=PROJECT, resource=RESOURCE)[0]
+        quota.limit = 3
+        quota.update()
+        return defaults
+
+    def test_get_tenant_quotas_cached(self):
+        defaults = self._test_get_tenant_quotas_cached()
+        self.assertEqual(2, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+
+    def test_get_tenant_quotas_cached_in_cache_backend(self):
+        cache_utils.register_oslo_configs(cfg.CONF)
+        self.config(enabled=True, backend='oslo_cache.dict', group='cache')
+        self._test_get_tenant_quotas_cached()
+        region = _limits_cache._get_region()
+        version = region.get('quota_limits_version:%s' % PROJECT)
+        self.assertEqual({RESOURCE: 2}, region.get(
+            'quota_limits:%s:%s' % (PROJECT, version)))
+
+    def test_get_tenant_quotas_changed_while_loading(self):
+        defaults = self._test_get_tenant_quotas_cached()
+        region = _limits_cache._get_region()
+        region.delete('quota_limits_version:%s' % PROJECT)
+        load_limits = _limits_cache._load_limits
+
+        def _load_changed_limits(context, tenant_id):
+            limits = load_limits(context, tenant_id)
+            # the limits are changed by another worker meanwhile
+            _limits_cache._replace_versions(region, [tenant_id])
+            return limits
+
+        with mock.patch.object(_limits_cache, '_load_limits',
+                               side_effect=_load_changed_limits):
+            self.assertEqual(3, self.plugin.get_tenant_quotas(
+                self.context, defaults, PROJECT)[RESOURCE])
+        quota = quota_obj.Quota.get_objects(
+            self.context, project_id=PROJECT, resource=RESOURCE)[0]
+        quota.limit = 1
+        quota.update()
+        # the limits loaded were not cached with the new version
+        self.assertEqual(1, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+
+    def test_get_tenant_quotas_cache_disabled(self):
+        defaults = self._test_get_tenant_quotas_cached(ttl=0)
+        self.assertEqual(3, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+
+    def test_update_quota_limit_invalidates_cached_limits(self):
+        defaults = self._test_get_tenant_quotas_cached()
+        self.plugin.update_quota_limit(self.context, PROJECT, RESOURCE, 1)
+        self.assertEqual(1, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+
+    def test_delete_tenant_quota_invalidates_cached_limits(self):
+        defaults = self._test_get_tenant_quotas_cached()
+        self.plugin.delete_tenant_quota(self.context, PROJECT)
+        self.assertEqual(4, self.plugin.get_tenant_quotas(
+            self.context, defaults, PROJECT)[RESOURCE])
+
+    def test_limit_check_cached_limits(self):
+        resources = self._test_get_tenant_quotas_cached()
+        self.assertRaises(lib_exc.OverQuota, self.plugin.limit_check,
+                          self.context, PROJECT, resources, {RESOURCE: 3})
+
     def _test_make_reservation_success(self, quota_driver,
                                        resource_name, deltas):
         resources = {resource_name: TestResource(resource_name, 2)}
@@ -263,6 +341,65 @@ class TestDbQuotaDriver(testlib_api.SqlTestCase,
                           deltas,
                           self.plugin)
 
+    def _get_reserved(self, resource_name):
+        return quota_obj.QuotaUsage.get_object(
+            self.context, resource=resource_name,
+            project_id=PROJECT).reserved
+
+    def _test_make_reservation_with_deltas(self, used, dirty=False):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = TestTrackedResource(RESOURCE, test_quota.MehModel)
+        self.plugin.update_quota_limit(self.context, PROJECT, RESOURCE, 4)
+        quota_api.set_quota_usage(self.context, RESOURCE, PROJECT, used)
+        if dirty:
+            quota_api.set_quota_usage_dirty(self.context, RESOURCE, PROJECT)
+        quota_driver = driver.DbQuotaDriver()
+        with mock.patch.object(TestTrackedResource, 'count',
+                               return_value=used) as mock_count:
+            reservation = quota_driver.make_reservation(
+                self.context, PROJECT, {RESOURCE: res}, {RESOURCE: 2},
+                self.plugin)
+        return quota_driver, reservation, mock_count
+
+    def test_make_reservation_with_deltas(self):
+        quota_driver, reservation, mock_count = (
+            self._test_make_reservation_with_deltas(2))
+        # the headroom was reserved without counting the resources
+        self.assertFalse(mock_count.called)
+        self.assertEqual({RESOURCE: 2}, reservation.deltas)
+        self.assertEqual(2, self._get_reserved(RESOURCE))
+        quota_driver.commit_reservation(self.context,
+                                        reservation.reservation_id)
+        self.assertEqual(0, self._get_reserved(RESOURCE))
+
+    def test_make_reservation_with_deltas_dirty_usage(self):
+        quota_driver, reservation, mock_count = (
+            self._test_make_reservation_with_deltas(2, dirty=True))
+        self.assertTrue(mock_count.called)
+        self.assertEqual(2, self._get_reserved(RESOURCE))
+        quota_driver.cancel_reservation(self.context,
+                                        reservation.reservation_id)
+        self.assertEqual(0, self._get_reserved(RESOURCE))
+
+    def test_make_reservation_with_deltas_over_quota_fails(self):
+        self.assertRaises(lib_exc.OverQuota,
+                          self._test_make_reservation_with_deltas, 3)
+        self.assertEqual(0, self._get_reserved(RESOURCE))
+
+    def test_make_reservation_without_deltas(self):
+        res = TestTrackedResource(RESOURCE, test_quota.MehModel)
+        self.plugin.update_quota_limit(self.context, PROJECT, RESOURCE, 4)
+        quota_api.set_quota_usage(self.context, RESOURCE, PROJECT, 2)
+        quota_driver = driver.DbQuotaDriver()
+        reservation = quota_driver.make_reservation(
+            self.context, PROJECT, {RESOURCE: res}, {RESOURCE: 2},
+            self.plugin)
+        # the quantities reserved are not kept in the usages
+        self.assertEqual(0, self._get_reserved(RESOURCE))
+        quota_driver.cancel_reservation(self.context,
+                                        reservation.reservation_id)
+        self.assertEqual(0, self._get_reserved(RESOURCE))
+
     def test_get_detailed_tenant_quotas_resource(self):
         res = {RESOURCE: TestTrackedResource(RESOURCE, test_quota.MehModel)}
 
@@ -0,0 +1,419 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from neutron_lib import context
+from neutron_lib.db import api as lib_db_api
+from neutron_lib.objects import utils as obj_utils
+from sqlalchemy import sql
+
+from neutron.db import _count_cache
+from neutron.db import _rbac_cache
+from neutron.db import _model_query as model_query
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.db import rbac_db_models
+from neutron.objects import network
+from neutron.tests import base
+from neutron.tests.unit import testlib_api
+
+PROFILE = 'test-profile'
+
+
+class LoadingProfileTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(LoadingProfileTestCase, self).setUp()
+        self.addCleanup(model_query._loading_profiles.pop, PROFILE, None)
+
+    def test_register_loading_profile_unknown_strategy(self):
+        self.assertRaises(ValueError, model_query.register_loading_profile,
+                          PROFILE, models_v2.Port, {'fixed_ips': 'eager'})
+        self.assertNotIn(PROFILE, model_query._loading_profiles)
+
+    def test_get_loading_options_unknown_profile(self):
+        self.assertEqual(
+            [], model_query.get_loading_options(models_v2.Port, PROFILE))
+
+    def test_get_loading_options(self):
+        model_query.register_loading_profile(
+            PROFILE, None, {'*': 'lazy', 'subnets': 'noload'})
+        model_query.register_loading_profile(
+            PROFILE, models_v2.Network,
+            {'subnets': 'selectin', 'rbac_entries': 'lazy'})
+        with mock.patch.dict(model_query._LOADING_STRATEGIES,
+                             {'lazy': mock.Mock(return_value='lazy'),
+                              'noload': mock.Mock(return_value='noload'),
+                              'selectin': mock.Mock(
+                                  return_value='selectin')}):
+            self.assertEqual(
+                ['lazy', 'selectin', 'lazy'],
+                model_query.get_loading_options(models_v2.Network, PROFILE))
+            model_query._LOADING_STRATEGIES['lazy'].assert_called_with('*')
+            # the strategies of the other models only apply to them and
+            # the relationships missing from the model are ignored
+            self.assertEqual(
+                ['lazy'],
+                model_query.get_loading_options(models_v2.Subnet, PROFILE))
+
+    def test_loading_profile(self):
+        context = mock.Mock(spec=[])
+        with model_query.loading_profile(context, PROFILE):
+            self.assertEqual(PROFILE, context.loading_profile)
+            with model_query.loading_profile(context, model_query.API_LIST):
+                self.assertEqual(model_query.API_LIST,
+                                 context.loading_profile)
+            self.assertEqual(PROFILE, context.loading_profile)
+        self.assertIsNone(context.loading_profile)
+
+    def test_query_with_hooks_profile(self):
+        context = mock.Mock(loading_profile=PROFILE)
+        with mock.patch.object(model_query, 'get_loading_options',
+                               return_value=['option']) as get_options, \
+                mock.patch.object(model_query.db_utils,
+                                  'model_query_scope_is_project',
+                                  return_value=False):
+            model_query.query_with_hooks(context, models_v2.Port)
+            get_options.assert_called_once_with(models_v2.Port, PROFILE)
+            context.session.query.return_value.options.assert_called_once_with(
+                'option')
+            get_options.reset_mock()
+            # the profile given to the query takes precedence
+            model_query.query_with_hooks(context, models_v2.Port,
+                                         profile=model_query.COUNT_ONLY)
+            get_options.assert_called_once_with(models_v2.Port,
+                                                model_query.COUNT_ONLY)
+
+
+class KeysetPaginationTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(KeysetPaginationTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        for index, name in enumerate([None, 'a', 'b', None, 'a', 'c', 'b']):
+            network.Network(self.ctx, name=name, mtu=1500 - index % 3 * 100,
+                            admin_state_up=bool(index % 2)).create()
+        self.networks = self.ctx.session.query(models_v2.Network).all()
+
+    def _sort(self, sorts):
+        networks = list(self.networks)
+        for key, direction in reversed(sorts):
+            # the NULL values are sorted first
+            networks.sort(
+                key=lambda net, key=key: (getattr(net, key) is not None,
+                                          getattr(net, key) or 0),
+                reverse=not direction)
+        return [net.id for net in networks]
+
+    def _paginate(self, sorts, get_marker):
+        ids = []
+        marker = None
+        while True:
+            page = model_query.get_collection(
+                self.ctx, models_v2.Network, None, sorts=sorts, limit=2,
+                marker_obj=marker)
+            ids += [net.id for net in page]
+            if len(page) < 2:
+                return ids
+            marker = get_marker(page[-1])
+
+    def _test_paginate(self, sorts):
+        sorts = sorts + [('id', True)]
+        expected = self._sort(sorts)
+        self.assertEqual(expected, self._paginate(sorts, lambda net: net))
+        get_object = mock.Mock()
+        self.assertEqual(expected, self._paginate(
+            sorts, lambda net: model_query._Marker(
+                {key: getattr(net, key) for key, _direction in sorts},
+                get_object)))
+        self.assertFalse(get_object.called)
+
+    def test_paginate_asc(self):
+        self._test_paginate([('name', True), ('mtu', True)])
+
+    def test_paginate_desc(self):
+        self._test_paginate([('name', False), ('mtu', False)])
+
+    def test_paginate_mixed_directions(self):
+        self._test_paginate([('name', True), ('admin_state_up', False),
+                             ('mtu', True)])
+        self._test_paginate([('admin_state_up', True), ('name', False)])
+
+    def test_get_marker_obj(self):
+        plugin = mock.Mock()
+        marker = mock.Mock(spec=['sort_values'],
+                           sort_values={'id': 'id1', 'name': 'name1'})
+        marker_obj = model_query.get_marker_obj(
+            plugin, self.ctx, 'network', 2, marker)
+        self.assertEqual('name1', marker_obj.name)
+        self.assertFalse(plugin._get_network.called)
+        # the marker object is retrieved for the other keys
+        self.assertEqual(plugin._get_network.return_value.mtu,
+                         marker_obj.mtu)
+        plugin._get_network.assert_called_once_with(self.ctx, marker)
+        self.assertIsNone(model_query.get_marker_obj(
+            plugin, self.ctx, 'network', None, marker))
+
+
+class CollectionCountTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(CollectionCountTestCase, self).setUp()
+        self.config(collection_count_cache_ttl=60)
+        self.addCleanup(_count_cache.clear)
+        self.ctx = context.get_admin_context()
+        self.user_ctx = context.Context('user', 'project1')
+        self._create_network('project1')
+        self._statements = []
+
+        def _record(conn, clauseelement, *args, **kwargs):
+            if 'count(*)' in str(clauseelement):
+                self._statements.append(str(clauseelement))
+
+        engine = db_api.context_manager.writer.get_engine()
+        lib_db_api.sqla_listen(engine, 'after_execute', _record)
+
+    def _create_network(self, project_id):
+        net = network.Network(self.ctx, project_id=project_id)
+        net.create()
+        return net
+
+    def _count(self, context, filters=None):
+        self._statements = []
+        count = model_query.get_collection_count(
+            context, models_v2.Network, filters)
+        return count, len(self._statements)
+
+    def test_count_cached(self):
+        self.assertEqual((1, 1), self._count(self.user_ctx))
+        self.assertEqual((1, 0), self._count(self.user_ctx))
+        # the counts of the other filters and projects are not cached
+        self.assertEqual((1, 1), self._count(self.ctx))
+        self.assertEqual((0, 1),
+                         self._count(self.ctx, {'name': ['net']}))
+        self._create_network('project1')
+        self.assertEqual((2, 1), self._count(self.user_ctx))
+
+    def test_count_cache_disabled(self):
+        self.config(collection_count_cache_ttl=0)
+        self._count(self.user_ctx)
+        self.assertEqual((1, 1), self._count(self.user_ctx))
+
+    def test_count_not_cacheable_filters(self):
+        filters = {'name': obj_utils.StringContains('net')}
+        self._count(self.ctx, filters)
+        self.assertEqual((0, 1), self._count(self.ctx, filters))
+
+    def test_count_invalidated_by_project(self):
+        filters = {'project_id': ['project1']}
+        self._count(self.ctx, filters)
+        self._create_network('project2')
+        self.assertEqual((1, 0), self._count(self.ctx, filters))
+        self.assertEqual((2, 1), self._count(self.ctx))
+        self._create_network('project1')
+        self.assertEqual((2, 1), self._count(self.ctx, filters))
+
+    def test_count_invalidated_by_related_model(self):
+        net = self._create_network('project2')
+        self._count(self.user_ctx)
+        with db_api.context_manager.writer.using(self.ctx), \
+                mock.patch.object(rbac_db_models.NetworkRBAC,
+                                  'get_valid_actions',
+                                  return_value=('access_as_shared',)):
+            self.ctx.session.add(rbac_db_models.NetworkRBAC(
+                object_id=net.id, target_tenant='*',
+                action='access_as_shared', project_id='project2'))
+        self.assertEqual((2, 1), self._count(self.user_ctx))
+
+    def test_count_in_transaction(self):
+        self._count(self.ctx)
+        with db_api.context_manager.writer.using(self.ctx):
+            self._create_network('project1')
+            self.assertEqual((2, 1), self._count(self.ctx))
+            # the rows created by the transaction are not cached
+            self.assertEqual((2, 1), self._count(self.ctx))
+        self.assertEqual((2, 1), self._count(self.ctx))
+        self.assertEqual((2, 0), self._count(self.ctx))
+
+    def test_count_exact(self):
+        self._count(self.user_ctx)
+        with model_query.count_mode(self.user_ctx, model_query.EXACT_COUNT):
+            self.assertEqual((1, 1), self._count(self.user_ctx))
+            self.assertEqual((1, 1), self._count(self.user_ctx))
+        self.assertIsNone(self.user_ctx.count_mode)
+        self.assertEqual((1, 0), self._count(self.user_ctx))
+
+    def test_count_approximate(self):
+        with mock.patch.object(model_query, '_APPROXIMATE_COUNT_QUERIES',
+                               {'sqlite': sql.text('SELECT 10')}):
+            self.assertEqual((1, 1), self._count(self.ctx))
+            with model_query.count_mode(self.ctx,
+                                        model_query.APPROXIMATE_COUNT):
+                self.assertEqual((10, 0), self._count(self.ctx))
+                # the approximate count is only used without filters
+                self.assertEqual(
+                    1, self._count(self.ctx, {'project_id': ['project1']})[0])
+            # and by admins
+            with model_query.count_mode(self.user_ctx,
+                                        model_query.APPROXIMATE_COUNT):
+                self.assertEqual((1, 1), self._count(self.user_ctx))
+
+    def test_count_approximate_unsupported_dialect(self):
+        # SQLite has no statistics of the table rows
+        with model_query.count_mode(self.ctx, model_query.APPROXIMATE_COUNT):
+            self.assertEqual((1, 1), self._count(self.ctx))
+
+    def test_get_approximate_count(self):
+        context = mock.Mock(is_admin=True,
+                            count_mode=model_query.APPROXIMATE_COUNT)
+        context.session.bind.dialect.name = 'mysql'
+        context.session.execute.return_value.scalar.return_value = 10
+        self.assertEqual(
+            10, model_query.get_approximate_count(context, models_v2.Network))
+        self.assertEqual(
+            {'table_name': 'networks'},
+            context.session.execute.call_args[0][1])
+        # the tables never analyzed by PostgreSQL have no statistics
+        context.session.bind.dialect.name = 'postgresql'
+        context.session.execute.return_value.scalar.return_value = -1.0
+        self.assertIsNone(
+            model_query.get_approximate_count(context, models_v2.Network))
+
+
+class RbacFilterTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(RbacFilterTestCase, self).setUp()
+        mock.patch.object(rbac_db_models.NetworkRBAC, 'get_valid_actions',
+                          return_value=('access_as_shared',
+                                        'access_as_external')).start()
+        self.addCleanup(_rbac_cache.clear)
+        self.ctx = context.get_admin_context()
+        self.user_ctx = context.Context('user', 'project1')
+        self.own_net = self._create_network('project1')
+        self.public_net = self._create_network('project2', '*')
+        self.shared_net = self._create_network('project2', 'project1')
+        self.other_net = self._create_network('project2', 'project3')
+        self.external_net = self._create_network(
+            'project2', 'project1', action='access_as_external')
+        self._statements = []
+
+        def _record(conn, clauseelement, *args, **kwargs):
+            self._statements.append(str(clauseelement))
+
+        engine = db_api.context_manager.writer.get_engine()
+        lib_db_api.sqla_listen(engine, 'after_execute', _record)
+
+    def _create_network(self, project_id, target_tenant=None,
+                        action='access_as_shared'):
+        net = network.Network(self.ctx, project_id=project_id)
+        net.create()
+        if target_tenant:
+            self._create_rbac_entry(net.id, target_tenant, action)
+        return net.id
+
+    def _create_rbac_entry(self, object_id, target_tenant,
+                           action='access_as_shared'):
+        with db_api.context_manager.writer.using(self.ctx):
+            entry = rbac_db_models.NetworkRBAC(
+                object_id=object_id, target_tenant=target_tenant,
+                action=action, project_id='project2')
+            self.ctx.session.add(entry)
+        return entry
+
+    def _get_rbac_entry(self, entry_id):
+        return self.ctx.session.query(rbac_db_models.NetworkRBAC).filter_by(
+            id=entry_id).one()
+
+    def _get_network_ids(self, context, filters=None):
+        self._statements = []
+        query = model_query.get_collection_query(
+            context, models_v2.Network, filters)
+        self.assertNotIn('JOIN networkrbacs', str(query))
+        return {net.id for net in query}
+
+    def _rbac_statements(self):
+        return [statement for statement in self._statements
+                if statement.startswith('SELECT networkrbacs.object_id')]
+
+    def _test_scoped_query(self):
+        self.assertEqual(
+            {self.own_net, self.public_net, self.shared_net},
+            self._get_network_ids(self.user_ctx))
+        # the networks shared with the other projects are not listed twice
+        # by the admins
+        self.assertEqual(5, len(self._get_network_ids(self.ctx)))
+
+    def test_scoped_query(self):
+        self._test_scoped_query()
+
+    def test_scoped_query_cached(self):
+        self.config(rbac_shared_objects_cache_ttl=60)
+        self._test_scoped_query()
+        self._get_network_ids(self.user_ctx)
+        self.assertEqual([], self._rbac_statements())
+
+    def test_shared_filter(self):
+        self.assertEqual(
+            {self.public_net},
+            self._get_network_ids(self.ctx, {'shared': [True]}))
+        self.assertEqual(
+            {self.public_net, self.shared_net},
+            self._get_network_ids(self.user_ctx, {'shared': [True]}))
+        self.assertEqual(
+            {self.own_net, self.shared_net, self.other_net,
+             self.external_net},
+            self._get_network_ids(self.ctx, {'shared': [False]}))
+        self.assertEqual(
+            {self.own_net},
+            self._get_network_ids(self.user_ctx, {'shared': [False]}))
+
+    def test_cached_object_ids_updated(self):
+        self.config(rbac_shared_objects_cache_ttl=60)
+        self._get_network_ids(self.user_ctx)
+        entry = self._create_rbac_entry(self.other_net, 'project1')
+        self.assertIn(self.other_net, self._get_network_ids(self.user_ctx))
+        with db_api.context_manager.writer.using(self.ctx):
+            self.ctx.session.delete(self._get_rbac_entry(entry.id))
+        self.assertNotIn(self.other_net,
+                         self._get_network_ids(self.user_ctx))
+        self.assertEqual(1, len(self._rbac_statements()))
+        self._get_network_ids(self.user_ctx)
+        self.assertEqual([], self._rbac_statements())
+
+    def test_cached_object_ids_wildcard_updated(self):
+        self.config(rbac_shared_objects_cache_ttl=60)
+        other_ctx = context.Context('user', 'project3')
+        self._get_network_ids(self.user_ctx)
+        self._get_network_ids(other_ctx)
+        self._create_rbac_entry(self.own_net, '*')
+        self.assertIn(self.own_net, self._get_network_ids(other_ctx))
+        self.assertEqual(1, len(self._rbac_statements()))
+        # the set of the other project is not updated
+        entry = self._create_rbac_entry(self.own_net, 'project4')
+        self._get_network_ids(other_ctx)
+        self.assertEqual([], self._rbac_statements())
+        # the projects of the updated entries are updated
+        with db_api.context_manager.writer.using(self.ctx):
+            self._get_rbac_entry(entry.id).target_tenant = 'project3'
+        self._get_network_ids(other_ctx)
+        self.assertEqual(1, len(self._rbac_statements()))
+
+    def test_cached_object_ids_in_transaction(self):
+        self.config(rbac_shared_objects_cache_ttl=60)
+        self._get_network_ids(self.user_ctx)
+        with db_api.context_manager.writer.using(self.ctx):
+            self._create_rbac_entry(self.other_net, 'project1')
+            self.assertIsNone(_rbac_cache.get_object_ids(
+                self.ctx, rbac_db_models.NetworkRBAC, 'access_as_shared',
+                60))
+        self.assertIn(self.other_net, self._get_network_ids(self.user_ctx))
@@ -0,0 +1,155 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.db import _resource_extend as resource_extend
+from neutron.tests import base
+
+
+def _extend_foo_with_bar(foo_res, foo_db):
+    foo_res['bar'] = foo_db['bar']
+
+
+def _extend_foo_with_baz(foo_res, foo_db):
+    foo_res['baz'] = foo_db['baz']
+
+
+def _extend_foo_with_qux(foo_res, foo_db):
+    foo_res['qux'] = foo_db['qux']
+
+
+def _extend_foos_with_quux(foo_reses, foo_dbs):
+    quuxes = [foo_db['qux'] * 10 for foo_db in foo_dbs]
+    for foo_res, quux in zip(foo_reses, quuxes):
+        foo_res['quux'] = quux
+
+
+@resource_extend.has_resource_extenders
+class FooExtender(object):
+
+    @staticmethod
+    @resource_extend.extends(['foos'], fields=['bar'], relationships=['bars'])
+    def _extend_foo_with_bar(foo_res, foo_db):
+        _extend_foo_with_bar(foo_res, foo_db)
+
+    @staticmethod
+    @resource_extend.extends(['foos'], fields=['quux'], batch=True)
+    def _extend_foos_with_quux(foo_reses, foo_dbs):
+        _extend_foos_with_quux(foo_reses, foo_dbs)
+
+
+class ResourceExtendTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ResourceExtendTestCase, self).setUp()
+        self.foo_db = {'bar': 1, 'baz': 2, 'qux': 3}
+
+    def _apply_funcs(self, fields=None):
+        foo_res = {}
+        resource_extend.apply_funcs('foos', foo_res, self.foo_db, fields)
+        return foo_res
+
+    def test_apply_funcs(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=['bar'])
+        resource_extend.register_funcs('foos', [_extend_foo_with_baz])
+        self.assertEqual({'bar': 1, 'baz': 2}, self._apply_funcs())
+
+    def test_apply_funcs_fields(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=['bar'])
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_baz], fields=['baz'])
+        # the functions without fields are always called
+        resource_extend.register_funcs('foos', [_extend_foo_with_qux])
+        self.assertEqual({'baz': 2, 'qux': 3},
+                         self._apply_funcs(fields=['id', 'baz']))
+
+    def test_apply_funcs_fields_callable(self):
+        extended_fields = ['bar']
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=lambda: extended_fields)
+        self.assertEqual({}, self._apply_funcs(fields=['id']))
+        # the function is called when its fields are not known
+        extended_fields = None
+        self.assertEqual({'bar': 1}, self._apply_funcs(fields=['id']))
+
+    def test_apply_funcs_decorated_fields(self):
+        FooExtender()
+        self.assertEqual({}, self._apply_funcs(fields=['id']))
+        self.assertEqual({'bar': 1}, self._apply_funcs(fields=['id', 'bar']))
+        self.assertEqual({'quux': 30},
+                         self._apply_funcs(fields=['id', 'quux']))
+
+    def test_apply_funcs_batch(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foos_with_quux], batch=True)
+        resource_extend.register_funcs('foos', [_extend_foo_with_bar])
+        self.assertEqual({'bar': 1, 'quux': 30}, self._apply_funcs())
+
+    def test_apply_funcs_bulk(self):
+        batch_func = mock.Mock(side_effect=_extend_foos_with_quux)
+        resource_extend.register_funcs('foos', [batch_func], batch=True)
+        resource_extend.register_funcs('foos', [_extend_foo_with_bar])
+        foo_reses = [{}, {}]
+        foo_dbs = [self.foo_db, {'bar': 4, 'qux': 5}]
+        resource_extend.apply_funcs_bulk('foos', foo_reses, foo_dbs)
+        self.assertEqual([{'bar': 1, 'quux': 30}, {'bar': 4, 'quux': 50}],
+                         foo_reses)
+        # the batch functions are called once with all the resources
+        batch_func.assert_called_once_with(foo_reses, foo_dbs)
+
+    def test_apply_funcs_bulk_fields(self):
+        batch_func = mock.Mock()
+        resource_extend.register_funcs('foos', [batch_func], fields=['quux'],
+                                       batch=True)
+        resource_extend.apply_funcs_bulk('foos', [{}], [self.foo_db],
+                                         fields=['id'])
+        resource_extend.apply_funcs_bulk('foos', [], [])
+        self.assertFalse(batch_func.called)
+
+    def test_get_unused_relationships(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=['bar'],
+            relationships=['bars', 'common'])
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_baz], fields=['baz'],
+            relationships=['bazs', 'common'])
+        self.assertEqual(
+            {'bars', 'quxs'},
+            resource_extend.get_unused_relationships(
+                'foos', ['id', 'baz'], {'qux': ['quxs']}))
+        self.assertEqual(
+            set(), resource_extend.get_unused_relationships(
+                'foos', ['id', 'bar', 'baz', 'qux'], {'qux': ['quxs']}))
+
+    def test_get_unused_relationships_no_fields(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=['bar'],
+            relationships=['bars'])
+        self.assertEqual(set(),
+                         resource_extend.get_unused_relationships('foos', []))
+
+    def test_get_unused_relationships_undeclared(self):
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_bar], fields=['bar'],
+            relationships=['bars'])
+        # the relationships read by this function are not known
+        resource_extend.register_funcs(
+            'foos', [_extend_foo_with_baz], fields=['baz'])
+        self.assertEqual(
+            {'bars'},
+            resource_extend.get_unused_relationships('foos', ['id']))
+        self.assertEqual(
+            set(),
+            resource_extend.get_unused_relationships('foos', ['id', 'baz']))
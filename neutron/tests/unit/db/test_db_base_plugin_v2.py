@@ -1251,6 +1251,35 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
                                             (port1, port2, port3),
                                             ('mac_address', 'asc'), 2, 2)
 
+    def test_list_ports_with_pagination_native_marker_not_retrieved(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        plugin = directory.get_plugin()
+        with self.port(mac_address='00:00:00:00:00:01') as port1,\
+                self.port(mac_address='00:00:00:00:00:02') as port2,\
+                self.port(mac_address='00:00:00:00:00:03') as port3,\
+                mock.patch.object(plugin, '_get_port',
+                                  wraps=plugin._get_port) as get_port:
+            self._test_list_with_pagination('port',
+                                            (port3, port2, port1),
+                                            ('mac_address', 'desc'), 1, 4)
+        # the sort values of the markers are in the links
+        self.assertFalse(get_port.called)
+
+    def test_list_ports_filtered_by_fixed_ip_with_pagination_native(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        with self.subnet() as subnet:
+            with self.port(subnet, mac_address='00:00:00:00:00:01') as port1,\
+                    self.port(subnet,
+                              mac_address='00:00:00:00:00:02') as port2,\
+                    self.port(mac_address='00:00:00:00:00:03'):
+                query_params = 'fixed_ips=subnet_id%%3D%s' % (
+                    subnet['subnet']['id'])
+                self._test_list_with_pagination('port', (port1, port2),
+                                                ('mac_address', 'asc'), 1, 3,
+                                                query_params=query_params)
+
     def test_list_ports_with_pagination_emulated(self):
         helper_patcher = mock.patch(
             'neutron.api.v2.base.Controller._get_pagination_helper',
@@ -0,0 +1,147 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron_lib import context
+from neutron_lib.db import api as lib_db_api
+from neutron_lib.plugins import directory
+from oslo_config import cfg
+
+from neutron.api.rpc.handlers import dhcp_rpc
+from neutron.db import api as db_api
+from neutron.db import dhcp_info_db
+from neutron.tests.unit.plugins.ml2 import test_plugin
+
+
+PORT_KEYS = ('id', 'name', 'network_id', 'tenant_id', 'mac_address',
+             'admin_state_up', 'status', 'device_id', 'device_owner',
+             'fixed_ips', 'extra_dhcp_opts')
+SUBNET_KEYS = ('id', 'name', 'network_id', 'tenant_id',
+               'subnetpool_id', 'ip_version', 'cidr', 'gateway_ip',
+               'enable_dhcp', 'ipv6_ra_mode', 'ipv6_address_mode',
+               'dns_nameservers', 'host_routes')
+
+
+class DhcpInfoDbTestCase(test_plugin.Ml2PluginV2TestCase):
+
+    def setUp(self):
+        super(DhcpInfoDbTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.plugin = directory.get_plugin()
+        self.callbacks = dhcp_rpc.DhcpRpcCallback()
+        self._statements = []
+
+        def _record(conn, clauseelement, *args, **kwargs):
+            self._statements.append(str(clauseelement))
+
+        engine = db_api.context_manager.writer.get_engine()
+        lib_db_api.sqla_listen(engine, 'after_execute', _record)
+
+    def _create_network_with_ports(self, num_ports):
+        net = self._make_network(self.fmt, 'net', True)['network']
+        self._make_subnet(self.fmt, {'network': net}, '10.0.0.1',
+                          '10.0.0.0/24', dns_nameservers=['8.8.8.8'],
+                          host_routes=[{'destination': '1.1.1.0/24',
+                                        'nexthop': '10.0.0.5'}])
+        self._make_subnet(self.fmt, {'network': net}, '10.0.1.1',
+                          '10.0.1.0/24', enable_dhcp=False)
+        for index in range(num_ports):
+            self._make_port(
+                self.fmt, net['id'], device_owner='compute:nova',
+                arg_list=('extra_dhcp_opts',),
+                extra_dhcp_opts=[{'opt_name': 'tftp-server',
+                                  'opt_value': '10.0.0.%d' % (index + 10)}])
+        return net
+
+    def _count_statements(self, func, *args, **kwargs):
+        self._statements = []
+        result = func(*args, **kwargs)
+        return len(self._statements), result
+
+    def _legacy(self, network_ids, enable_dhcp_filter=True):
+        networks = [{'id': network_id} for network_id in network_ids]
+        return self.callbacks._get_subnets_and_ports(
+            self.ctx, self.plugin, networks, enable_dhcp_filter)
+
+    def _projection(self, network_ids, enable_dhcp_filter=True):
+        return dhcp_info_db.get_networks_subnets_and_ports(
+            self.ctx, network_ids, enable_dhcp_filter=enable_dhcp_filter,
+            extra_dhcp_opts=True, dns_assignment=False)
+
+    def test_no_networks(self):
+        self.assertEqual(([], []),
+                         dhcp_info_db.get_networks_subnets_and_ports(
+                             self.ctx, []))
+
+    def _test_matches_plugin_output(self, enable_dhcp_filter):
+        net = self._create_network_with_ports(3)
+        legacy_subnets, legacy_ports = self._legacy([net['id']],
+                                                    enable_dhcp_filter)
+        subnets, ports = self._projection([net['id']], enable_dhcp_filter)
+        self.assertEqual(
+            [{key: subnet[key] for key in SUBNET_KEYS}
+             for subnet in legacy_subnets],
+            [{key: subnet[key] for key in SUBNET_KEYS} for subnet in subnets])
+
+        def _port_key(port):
+            return port['id']
+
+        def _normalize(port):
+            port = {key: port[key] for key in PORT_KEYS}
+            port['extra_dhcp_opts'] = sorted(
+                port['extra_dhcp_opts'], key=lambda opt: opt['opt_name'])
+            return port
+
+        self.assertEqual(
+            [_normalize(port)
+             for port in sorted(legacy_ports, key=_port_key)],
+            [_normalize(port) for port in sorted(ports, key=_port_key)])
+        # always returned, regardless of the revisions service plugin
+        self.assertTrue(all('revision_number' in port for port in ports))
+
+    def test_matches_plugin_output(self):
+        self._test_matches_plugin_output(True)
+
+    def test_matches_plugin_output_no_enable_dhcp_filter(self):
+        self._test_matches_plugin_output(False)
+
+    def test_dns_assignment(self):
+        cfg.CONF.set_override('dns_domain', 'example.org')
+        net = self._create_network_with_ports(1)
+        _subnets, ports = dhcp_info_db.get_networks_subnets_and_ports(
+            self.ctx, [net['id']], dns_assignment=True)
+        ip_address = ports[0]['fixed_ips'][0]['ip_address']
+        hostname = 'host-%s' % ip_address.replace('.', '-')
+        self.assertEqual([{'ip_address': ip_address,
+                           'hostname': hostname,
+                           'fqdn': '%s.example.org.' % hostname}],
+                         ports[0]['dns_assignment'])
+        self.assertNotIn('extra_dhcp_opts', ports[0])
+
+    def test_queries_constant(self):
+        net1 = self._create_network_with_ports(1)
+        count_before, _result = self._count_statements(
+            self._projection, [net1['id']])
+        net2 = self._create_network_with_ports(5)
+        count_after, (subnets, ports) = self._count_statements(
+            self._projection, [net1['id'], net2['id']])
+        self.assertEqual(count_before, count_after)
+        # the 2 networks have 6 ports plus a DHCP disabled subnet each
+        self.assertEqual(6, len(ports))
+        self.assertEqual(2, len(subnets))
+
+    def test_fewer_queries_than_plugin(self):
+        net = self._create_network_with_ports(5)
+        legacy_count, _result = self._count_statements(
+            self._legacy, [net['id']])
+        projection_count, _result = self._count_statements(
+            self._projection, [net['id']])
+        self.assertLess(projection_count, legacy_count)
@@ -20,6 +20,7 @@ import netaddr
 from neutron_lib import constants
 from neutron_lib import context as ncontext
 from neutron_lib import exceptions as n_exc
+from neutron_lib.plugins import directory
 from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_utils import netutils
@@ -28,6 +29,7 @@ import webob.exc
 
 from neutron.db import ipam_backend_mixin
 from neutron.db import ipam_pluggable_backend
+from neutron.ipam.drivers.neutrondb_ipam import driver as ipam_driver
 from neutron.ipam import requests as ipam_req
 from neutron.objects import ports as port_obj
 from neutron.objects import subnet as obj_subnet
@@ -624,6 +626,40 @@ class TestDbBasePluginIpam(test_db_base.NeutronDbPluginV2TestCase):
                 self.assertEqual(webob.exc.HTTPNoContent.code, res.status_int)
                 mocks['subnet'].deallocate.assert_called_once_with(auto_ip)
 
+    def test_create_port_bulk_db_ipam(self):
+        plugin = directory.get_plugin()
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            ports = [{'port': {'network_id': net_id,
+                               'tenant_id': self.tenant_id,
+                               'name': 'port%s' % i,
+                               'admin_state_up': True,
+                               'device_id': '',
+                               'device_owner': '',
+                               'mac_address': constants.ATTR_NOT_SPECIFIED,
+                               'fixed_ips': constants.ATTR_NOT_SPECIFIED}}
+                     for i in range(4)]
+            ports[-1]['port']['fixed_ips'] = [
+                {'subnet_id': subnet['subnet']['id'],
+                 'ip_address': '10.0.0.2'}]
+            bulk_allocate = ipam_driver.NeutronDbSubnet.bulk_allocate
+            with mock.patch.object(ipam_driver.NeutronDbSubnet,
+                                   'bulk_allocate', autospec=True,
+                                   side_effect=bulk_allocate) as bulk_mock:
+                db_ports = plugin.create_port_bulk_db(self.admin_context,
+                                                      ports)
+
+            # the addresses of the ports without fixed IPs are allocated
+            # with a single request, after the requested address
+            bulk_mock.assert_called_once_with(mock.ANY, mock.ANY)
+            self.assertEqual(3, bulk_mock.call_args[0][1].num_addresses)
+            ips = [[ip['ip_address'] for ip in db_port.fixed_ips]
+                   for db_port in db_ports]
+            self.assertEqual(['10.0.0.2'], ips[-1])
+            auto_ips = {ip for port_ips in ips[:-1] for ip in port_ips}
+            self.assertEqual(3, len(auto_ips))
+            self.assertNotIn('10.0.0.2', auto_ips)
+
     def test_recreate_port_ipam(self):
         with self.subnet() as subnet:
             subnet_cidr = subnet['subnet']['cidr']
@@ -141,9 +141,11 @@ class ExtNetDBTestCase(test_db_base_plugin_v2.NeutronDbPluginV2TestCase):
     def test_network_filter_hook_nonadmin_context(self):
         ctx = context.Context('edinson', 'cavani')
         model = models_v2.Network
-        txt = ("networkrbacs.action = :action_1 AND "
-               "networkrbacs.target_tenant = :target_tenant_1 OR "
-               "networkrbacs.target_tenant = :target_tenant_2")
+        txt = ("networks.id IN (SELECT networkrbacs.object_id \n"
+               "FROM networkrbacs \n"
+               "WHERE networkrbacs.target_tenant IN "
+               "(:target_tenant_1, :target_tenant_2) AND "
+               "networkrbacs.action = :action_1)")
         conditions = external_net_db._network_filter_hook(ctx, model, [])
         self.assertEqual(conditions.__str__(), txt)
         # Try to concatenate conditions
@@ -14,9 +14,12 @@
 #  limitations under the License.
 
 from neutron_lib import constants
+from neutron_lib import context
 
 import neutron.api.extensions as api_ext
 import neutron.common.config as config
+from neutron.db import _ip_usage as ip_usage
+from neutron.db.models import subnet_ip_usage
 import neutron.extensions
 import neutron.services.network_ip_availability.plugin as plugin_module
 import neutron.tests.unit.db.test_db_base_plugin_v2 as test_db_base_plugin_v2
@@ -194,6 +197,78 @@ class TestNetworkIPAvailabilityAPI(
                     self._validate_from_availabilities(response[IP_AVAILS_KEY],
                                                        net, 2)
 
+    def _get_counted_used_ips(self, subnet_id):
+        ctx = context.get_admin_context()
+        return sum(usage.used_ips for usage in ctx.session.query(
+            subnet_ip_usage.SubnetIpUsage).filter_by(subnet_id=subnet_id))
+
+    def test_usages_port_deleted_v4(self):
+        with self.network() as net:
+            with self.subnet(network=net) as subnet:
+                request = self.new_list_request(API_RESOURCE)
+                with self.port(subnet=subnet):
+                    with self.port(subnet=subnet) as port:
+                        self.assertEqual(2, self._get_counted_used_ips(
+                            subnet['subnet']['id']))
+                        self._delete('ports', port['port']['id'])
+                    response = self.deserialize(self.fmt,
+                                                request.get_response(
+                                                    self.ext_api))
+                    self._validate_from_availabilities(response[IP_AVAILS_KEY],
+                                                       net, 1)
+                    self.assertEqual(1, self._get_counted_used_ips(
+                        subnet['subnet']['id']))
+
+    def test_usages_subnet_without_counters(self):
+        with self.network() as net:
+            with self.subnet(network=net) as subnet:
+                request = self.new_list_request(API_RESOURCE)
+                with self.port(subnet=subnet), self.port(subnet=subnet):
+                    # the counters of the subnets which were not changed
+                    # since the counters were added do not exist
+                    ctx = context.get_admin_context()
+                    with ctx.session.begin():
+                        ctx.session.query(
+                            subnet_ip_usage.SubnetIpUsage).delete()
+                    response = self.deserialize(self.fmt,
+                                                request.get_response(
+                                                    self.ext_api))
+                    self._validate_from_availabilities(response[IP_AVAILS_KEY],
+                                                       net, 2)
+                    # the counter is initialized from the allocations
+                    with self.port(subnet=subnet):
+                        self.assertEqual(3, self._get_counted_used_ips(
+                            subnet['subnet']['id']))
+
+    def test_usages_counters_out_of_sync(self):
+        with self.network() as net, self.network() as net2:
+            with self.subnet(network=net) as subnet, \
+                    self.subnet(network=net2, cidr='10.0.1.0/24') as subnet2:
+                request = self.new_list_request(API_RESOURCE)
+                with self.port(subnet=subnet), self.port(subnet=subnet), \
+                        self.port(subnet=subnet2):
+                    # an address allocated without updating the counters
+                    ctx = context.get_admin_context()
+                    with ctx.session.begin():
+                        ctx.session.query(
+                            subnet_ip_usage.SubnetIpUsage).filter_by(
+                            subnet_id=subnet['subnet']['id']).update(
+                            {'used_ips': 0})
+                    self.assertEqual([subnet['subnet']['id']],
+                                     ip_usage.check_used_ips(ctx))
+                    self.assertEqual(0, self._get_counted_used_ips(
+                        subnet['subnet']['id']))
+                    self.assertEqual(1, self._get_counted_used_ips(
+                        subnet2['subnet']['id']))
+                    response = self.deserialize(self.fmt,
+                                                request.get_response(
+                                                    self.ext_api))
+                    self._validate_from_availabilities(response[IP_AVAILS_KEY],
+                                                       net, 2)
+                    self._validate_from_availabilities(response[IP_AVAILS_KEY],
+                                                       net2, 1)
+                    self.assertEqual([], ip_usage.check_used_ips(ctx))
+
     def test_usages_query_ip_version_v4(self):
         with self.network() as net:
             with self.subnet(network=net):
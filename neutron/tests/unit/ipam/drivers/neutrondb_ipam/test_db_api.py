@@ -92,6 +92,11 @@ class TestIpamSubnetManager(testlib_api.SqlTestCase):
         for allocation in allocs:
             self.assertIn(str(allocation.ip_address), ips)
 
+    def test_count_allocations(self):
+        for ip in ['1.2.3.4', '1.2.3.6']:
+            self.subnet_manager.create_allocation(self.ctx, ip)
+        self.assertEqual(2, self.subnet_manager.count_allocations(self.ctx))
+
     def _test_create_allocation(self):
         self.subnet_manager.create_allocation(self.ctx,
                                               self.subnet_ip)
@@ -112,3 +117,44 @@ class TestIpamSubnetManager(testlib_api.SqlTestCase):
         alloc_exists = ipam_obj.IpamAllocation.objects_exist(
             self.ctx, ipam_subnet_id=self.ipam_subnet_id)
         self.assertFalse(alloc_exists)
+
+    def test_create_and_list_ranges(self):
+        pool = self.subnet_manager.create_pool(self.ctx, *self.single_pool)
+        self.subnet_manager.create_ranges(
+            self.ctx, pool.id,
+            [('1.2.3.4', '1.2.3.5'), ('1.2.3.8', '1.2.3.10')])
+        self.assertEqual(
+            [(pool.id, '1.2.3.4', '1.2.3.5'),
+             (pool.id, '1.2.3.8', '1.2.3.10')],
+            sorted(tuple(ip_range) for ip_range in
+                   self.subnet_manager.list_ranges(self.ctx)))
+
+    def test_set_ranges_built(self):
+        pools = [self.subnet_manager.create_pool(self.ctx, *pool)
+                 for pool in self.multi_pool]
+        self.assertEqual(
+            sorted(pool.id for pool in pools),
+            sorted(pool.id for pool in
+                   self.subnet_manager.list_pools_without_ranges(self.ctx)))
+        self.subnet_manager.set_ranges_built(self.ctx, [pools[0].id])
+        self.assertEqual(
+            [pools[1].id],
+            [pool.id for pool in
+             self.subnet_manager.list_pools_without_ranges(self.ctx)])
+
+    def test_delete_range(self):
+        pool = self.subnet_manager.create_pool(self.ctx, *self.single_pool)
+        self.subnet_manager.create_ranges(self.ctx, pool.id,
+                                          [self.single_pool])
+        ip_range = self.subnet_manager.list_ranges(self.ctx)[0]
+        self.assertTrue(self.subnet_manager.delete_range(self.ctx, ip_range))
+        self.assertEqual([], self.subnet_manager.list_ranges(self.ctx))
+        # the range was already deleted by "another transaction"
+        self.assertFalse(self.subnet_manager.delete_range(self.ctx, ip_range))
+
+    def test_list_allocated_addresses(self):
+        self.subnet_manager.create_allocation(self.ctx, '1.2.3.4')
+        self.assertEqual(
+            {'1.2.3.4'},
+            self.subnet_manager.list_allocated_addresses(
+                self.ctx, ['1.2.3.4', '1.2.3.5']))
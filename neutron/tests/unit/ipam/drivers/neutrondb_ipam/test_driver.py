@@ -19,9 +19,13 @@ from neutron_lib import constants
 from neutron_lib import context
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
+from oslo_config import cfg
+from oslo_db import exception as db_exc
 from oslo_utils import uuidutils
 
 from neutron.common import constants as n_const
+from neutron.db import api as db_api
+from neutron.ipam.drivers.neutrondb_ipam import db_models as ipam_db_models
 from neutron.ipam.drivers.neutrondb_ipam import driver
 from neutron.ipam import exceptions as ipam_exc
 from neutron.ipam import requests as ipam_req
@@ -361,6 +365,253 @@ class TestNeutronDbIpamSubnet(testlib_api.SqlTestCase,
                           ipam_subnet.allocate,
                           ipam_req.AnyAddressRequest)
 
+    def test_bulk_allocate_v4_addresses(self):
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('10.0.0.2'))
+        ip_addresses = ipam_subnet.bulk_allocate(
+            ipam_req.BulkAddressRequest(100))
+        self.assertEqual(100, len(set(ip_addresses)))
+        self.assertNotIn('10.0.0.2', ip_addresses)
+        allocations = ipam_subnet.subnet_manager.list_allocations(self.ctx)
+        self.assertEqual(101, len(allocations))
+
+    def _create_unsharded_ipam_subnet(self, cidr):
+        # the pool is not divided in shards and fits in one block, its free
+        # addresses are in one range
+        return self._create_and_allocate_ipam_subnet(
+            cidr, ip_version=constants.IP_VERSION_4)[0]
+
+    def test_bulk_allocate_exhausted_pools(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/29')
+        # only 5 addresses are available in the pool of a /29 subnet
+        ip_addresses = ipam_subnet.bulk_allocate(
+            ipam_req.BulkAddressRequest(10))
+        self.assertEqual(['192.168.0.2', '192.168.0.3', '192.168.0.4',
+                          '192.168.0.5', '192.168.0.6'], ip_addresses)
+        self.assertRaises(ipam_exc.IpAddressGenerationFailure,
+                          ipam_subnet.bulk_allocate,
+                          ipam_req.BulkAddressRequest(1))
+
+    def _get_ranges(self, ipam_subnet):
+        return sorted(
+            (ip_range.first_ip, ip_range.last_ip) for ip_range in
+            ipam_subnet.subnet_manager.list_ranges(self.ctx))
+
+    def test_allocate_updates_ranges(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/28')
+        self.assertEqual([('192.168.0.2', '192.168.0.14')],
+                         self._get_ranges(ipam_subnet))
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.5'))
+        self.assertEqual([('192.168.0.2', '192.168.0.4'),
+                          ('192.168.0.6', '192.168.0.14')],
+                         self._get_ranges(ipam_subnet))
+        ipam_subnet.allocate(ipam_req.PreferNextAddressRequest())
+        self.assertEqual([('192.168.0.3', '192.168.0.4'),
+                          ('192.168.0.6', '192.168.0.14')],
+                         self._get_ranges(ipam_subnet))
+
+    def test_deallocate_merges_ranges(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/28')
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.5'))
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.14'))
+        ipam_subnet.deallocate('192.168.0.5')
+        self.assertEqual([('192.168.0.2', '192.168.0.13')],
+                         self._get_ranges(ipam_subnet))
+        ipam_subnet.deallocate('192.168.0.14')
+        self.assertEqual([('192.168.0.2', '192.168.0.14')],
+                         self._get_ranges(ipam_subnet))
+
+    def _delete_ranges(self, ipam_subnet):
+        for ip_range in ipam_subnet.subnet_manager.list_ranges(self.ctx):
+            ipam_subnet.subnet_manager.delete_range(self.ctx, ip_range)
+
+    def test_allocate_builds_missing_ranges(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/29')
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.2'))
+        # the ranges of the pools created before the ranges are missing
+        self._delete_ranges(ipam_subnet)
+        self.ctx.session.query(ipam_db_models.IpamAllocationPool).update(
+            {'ranges_built': False})
+        ip_address = ipam_subnet.allocate(
+            ipam_req.PreferNextAddressRequest())
+        self.assertEqual('192.168.0.3', ip_address)
+        self.assertEqual([('192.168.0.4', '192.168.0.6')],
+                         self._get_ranges(ipam_subnet))
+        self.assertEqual(
+            [], ipam_subnet.subnet_manager.list_pools_without_ranges(
+                self.ctx))
+
+    def test_allocate_exhausted_ranges_not_built(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/30')
+        ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        # the allocations of a full subnet are not listed
+        with mock.patch.object(ipam_subnet.subnet_manager,
+                               'list_allocations') as list_allocations:
+            self.assertRaises(ipam_exc.IpAddressGenerationFailure,
+                              ipam_subnet.allocate,
+                              ipam_req.AnyAddressRequest)
+        self.assertFalse(list_allocations.called)
+
+    def test_allocate_builds_ranges_of_deallocated_addresses(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/29')
+        ipam_subnet.bulk_allocate(ipam_req.BulkAddressRequest(5))
+        # an address deallocated without updating the ranges
+        ipam_subnet.subnet_manager.delete_allocation(self.ctx, '192.168.0.4')
+        ip_address = ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        self.assertEqual('192.168.0.4', ip_address)
+        self.assertEqual([], self._get_ranges(ipam_subnet))
+
+    def test_allocate_skips_allocated_address_in_ranges(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/29')
+        # an address allocated without updating the ranges
+        ipam_subnet.subnet_manager.create_allocation(self.ctx, '192.168.0.2')
+        ip_address = ipam_subnet.allocate(
+            ipam_req.PreferNextAddressRequest())
+        self.assertEqual('192.168.0.3', ip_address)
+        self.assertEqual([('192.168.0.4', '192.168.0.6')],
+                         self._get_ranges(ipam_subnet))
+
+    def test_allocate_changed_range_retries(self):
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/29', ip_version=constants.IP_VERSION_4)[0]
+        with mock.patch.object(ipam_subnet.subnet_manager, 'delete_range',
+                               return_value=False):
+            self.assertRaises(db_exc.RetryRequest,
+                              ipam_subnet.allocate,
+                              ipam_req.AnyAddressRequest)
+
+    def test_allocate_random_window_start(self):
+        ipam_subnet = self._create_unsharded_ipam_subnet('192.168.0.0/29')
+        # the window starts at the 4th free address and wraps around
+        with mock.patch.object(driver.random, 'randrange',
+                               return_value=3) as randrange, \
+                mock.patch.object(driver.random, 'sample',
+                                  side_effect=lambda ips, k: ips[:k]):
+            ip_addresses = ipam_subnet.bulk_allocate(
+                ipam_req.BulkAddressRequest(4))
+        randrange.assert_called_once_with(5)
+        self.assertEqual(['192.168.0.2', '192.168.0.3', '192.168.0.5',
+                          '192.168.0.6'], sorted(ip_addresses))
+        self.assertEqual([('192.168.0.4', '192.168.0.4')],
+                         self._get_ranges(ipam_subnet))
+
+    def test_build_ranges_in_blocks(self):
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        # the pool of 253 addresses is divided in blocks of 16 addresses
+        ranges = self._get_ranges(ipam_subnet)
+        self.assertEqual(16, len(ranges))
+        self.assertIn(('10.0.0.2', '10.0.0.17'), ranges)
+        self.assertIn(('10.0.0.242', '10.0.0.254'), ranges)
+
+    def test_deallocate_does_not_merge_blocks(self):
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('10.0.0.17'))
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('10.0.0.18'))
+        ipam_subnet.deallocate('10.0.0.17')
+        ipam_subnet.deallocate('10.0.0.18')
+        ranges = self._get_ranges(ipam_subnet)
+        self.assertIn(('10.0.0.2', '10.0.0.17'), ranges)
+        self.assertIn(('10.0.0.18', '10.0.0.33'), ranges)
+
+    def test_overlapping_allocations(self):
+        subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[1]
+        ctx_a, ctx_b = context.get_admin_context(), context.get_admin_context()
+        ipam_subnet_a = driver.NeutronDbSubnet.load(subnet['id'], ctx_a)
+        ipam_subnet_b = driver.NeutronDbSubnet.load(subnet['id'], ctx_b)
+        # the second allocation reads the free ranges before the first one
+        # removes its address from them
+        list_ranges = ipam_subnet_b.subnet_manager.list_ranges
+        stale_ranges = [list_ranges(ctx_b)]
+
+        def _list_ranges(context):
+            return stale_ranges.pop() if stale_ranges else list_ranges(
+                context)
+
+        # the allocations pick their addresses from different blocks
+        with mock.patch.object(ipam_subnet_b.subnet_manager, 'list_ranges',
+                               side_effect=_list_ranges), \
+                mock.patch.object(driver.random, 'randrange',
+                                  side_effect=[0, 100]), \
+                db_api.context_manager.writer.using(ctx_a):
+            ip_address_a = ipam_subnet_a.allocate(
+                ipam_req.AnyAddressRequest)
+            # the range changed by the first allocation is not updated
+            ip_address_b = ipam_subnet_b.allocate(
+                ipam_req.AnyAddressRequest)
+        self.assertNotEqual(ip_address_a, ip_address_b)
+        self.assertEqual(
+            {ip_address_a, ip_address_b},
+            {str(allocation.ip_address) for allocation in
+             ipam_subnet_a.subnet_manager.list_allocations(ctx_a)})
+
+    def _create_sharded_ipam_subnet(self):
+        cfg.CONF.set_override('ipam_allocation_shards', 4)
+        self.addCleanup(driver._worker_shards.clear)
+        self.addCleanup(driver._busy_shards.clear)
+        # the pool of 13 addresses is divided in shards of 4 addresses
+        return self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/28', ip_version=constants.IP_VERSION_4)[0]
+
+    def test_build_ranges_in_shards(self):
+        ipam_subnet = self._create_sharded_ipam_subnet()
+        self.assertEqual([('192.168.0.10', '192.168.0.13'),
+                          ('192.168.0.14', '192.168.0.14'),
+                          ('192.168.0.2', '192.168.0.5'),
+                          ('192.168.0.6', '192.168.0.9')],
+                         self._get_ranges(ipam_subnet))
+
+    def test_sharded_allocate_from_worker_shard(self):
+        ipam_subnet = self._create_sharded_ipam_subnet()
+        # the last shard of a single address would be exhausted at once
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.14'))
+        first_ip = netaddr.IPAddress(
+            ipam_subnet.allocate(ipam_req.AnyAddressRequest))
+        # the next address is the first free address of the same shard
+        ip_address = ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        self.assertEqual(str(first_ip + 1), ip_address)
+        self.assertEqual(1, len(driver._worker_shards[
+            ipam_subnet.subnet_manager.neutron_id]))
+
+    def test_sharded_allocate_skips_busy_shards(self):
+        ipam_subnet = self._create_sharded_ipam_subnet()
+        subnet_id = ipam_subnet.subnet_manager.neutron_id
+        pool_id = ipam_subnet.subnet_manager.list_pools(self.ctx)[0].id
+        # the shards being allocated from by other transactions
+        driver._busy_shards[subnet_id].update(
+            [(pool_id, 0), (pool_id, 1), (pool_id, 3)])
+        ip_address = ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        self.assertEqual('192.168.0.10', ip_address)
+        # the shard is released when the transaction ends
+        self.assertEqual({(pool_id, 0), (pool_id, 1), (pool_id, 3)},
+                         driver._busy_shards[subnet_id])
+
+    def test_sharded_allocate_changed_range_picks_other_shard(self):
+        ipam_subnet = self._create_sharded_ipam_subnet()
+        subnet_id = ipam_subnet.subnet_manager.neutron_id
+        ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        with mock.patch.object(ipam_subnet.subnet_manager, 'delete_range',
+                               return_value=False):
+            self.assertRaises(db_exc.RetryRequest,
+                              ipam_subnet.allocate,
+                              ipam_req.AnyAddressRequest)
+        self.assertNotIn(subnet_id, driver._worker_shards)
+
+    def test_sharded_deallocate_does_not_merge_shards(self):
+        ipam_subnet = self._create_sharded_ipam_subnet()
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.5'))
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('192.168.0.6'))
+        ipam_subnet.deallocate('192.168.0.5')
+        ipam_subnet.deallocate('192.168.0.6')
+        self.assertEqual([('192.168.0.10', '192.168.0.13'),
+                          ('192.168.0.14', '192.168.0.14'),
+                          ('192.168.0.2', '192.168.0.5'),
+                          ('192.168.0.6', '192.168.0.9')],
+                         self._get_ranges(ipam_subnet))
+
     def _test_deallocate_address(self, cidr, ip_version):
         ipam_subnet = self._create_and_allocate_ipam_subnet(
             cidr, ip_version=ip_version)[0]
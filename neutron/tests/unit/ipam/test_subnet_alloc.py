@@ -25,7 +25,9 @@ from oslo_utils import uuidutils
 from neutron.common import exceptions as n_exc
 from neutron.db import api as db_api
 from neutron.ipam import requests as ipam_req
+from neutron.db import models_v2
 from neutron.ipam import subnet_alloc
+from neutron.tests import base
 from neutron.tests.unit.db import test_db_base_plugin_v2
 from neutron.tests.unit import testlib_api
 
@@ -198,3 +200,90 @@ class TestSubnetAllocation(testlib_api.SqlTestCase):
                                          'fe80::/63')
         with mock.patch("sqlalchemy.orm.query.Query.update", return_value=0):
             self.assertRaises(db_exc.RetryRequest, sa.allocate_subnet, req)
+
+    def _allocate_any_subnet(self, sa, prefixlen):
+        req = ipam_req.AnySubnetRequest(self._tenant_id,
+                                        uuidutils.generate_uuid(),
+                                        constants.IPv4, prefixlen)
+        return str(sa.allocate_subnet(req).get_details().subnet_cidr)
+
+    def test_allocate_any_subnet_with_cached_free_prefixes(self):
+        sp = self._create_subnet_pool(self.plugin, self.ctx, 'test-sp',
+                                      ['10.1.0.0/16'], 21, 4)
+        sp = self.plugin._get_subnetpool(self.ctx, sp['id'])
+        sa = subnet_alloc.SubnetAllocator(sp, self.ctx)
+        self.assertEqual('10.1.0.0/24', self._allocate_any_subnet(sa, 24))
+        with mock.patch.object(sa, '_get_allocated_cidrs') as get_cidrs:
+            self.assertEqual('10.1.1.0/24',
+                             self._allocate_any_subnet(sa, 24))
+            self.assertFalse(get_cidrs.called)
+
+    def test_allocate_any_subnet_subnetpool_locked_by_other_process(self):
+        sp = self._create_subnet_pool(self.plugin, self.ctx, 'test-sp',
+                                      ['10.1.0.0/16'], 21, 4)
+        sp = self.plugin._get_subnetpool(self.ctx, sp['id'])
+        sa = subnet_alloc.SubnetAllocator(sp, self.ctx)
+        self._allocate_any_subnet(sa, 24)
+        with db_api.context_manager.writer.using(self.ctx):
+            self.ctx.session.query(models_v2.SubnetPool).filter_by(
+                id=sp['id']).update({'hash': uuidutils.generate_uuid()})
+        with mock.patch.object(sa, '_get_allocated_cidrs',
+                               return_value=['10.1.0.0/24',
+                                             '10.1.1.0/24']):
+            self.assertEqual('10.1.2.0/24',
+                             self._allocate_any_subnet(sa, 24))
+
+    def test_allocate_any_subnet_cached_free_prefixes_exhausted(self):
+        sp = self._create_subnet_pool(self.plugin, self.ctx, 'test-sp',
+                                      ['10.1.0.0/23'], 21, 4)
+        sp = self.plugin._get_subnetpool(self.ctx, sp['id'])
+        sa = subnet_alloc.SubnetAllocator(sp, self.ctx)
+        self._allocate_any_subnet(sa, 24)
+        self._allocate_any_subnet(sa, 24)
+        # the subnet of 10.1.0.0/24 was deleted since
+        with mock.patch.object(sa, '_get_allocated_cidrs',
+                               return_value=['10.1.1.0/24']):
+            self.assertEqual('10.1.0.0/24',
+                             self._allocate_any_subnet(sa, 24))
+
+
+class TestFreePrefixes(base.BaseTestCase):
+
+    def test_allocate_any_smallest_cidr(self):
+        free_prefixes = subnet_alloc.FreePrefixes(
+            ['10.0.0.0/16', '192.168.0.0/24'], ['10.0.0.0/24'])
+        self.assertEqual(netaddr.IPNetwork('10.0.1.0/26'),
+                         free_prefixes.allocate_any(26))
+        self.assertEqual(netaddr.IPNetwork('10.0.1.64/26'),
+                         free_prefixes.allocate_any(26))
+        self.assertEqual(netaddr.IPNetwork('192.168.0.0/24'),
+                         free_prefixes.allocate_any(24))
+        self.assertEqual(netaddr.IPNetwork('10.0.2.0/23'),
+                         free_prefixes.allocate_any(23))
+
+    def test_allocate_any_no_free_space(self):
+        free_prefixes = subnet_alloc.FreePrefixes(
+            ['10.0.0.0/24'], ['10.0.0.0/25'])
+        self.assertIsNone(free_prefixes.allocate_any(24))
+        self.assertEqual(netaddr.IPNetwork('10.0.0.128/25'),
+                         free_prefixes.allocate_any(25))
+        self.assertIsNone(free_prefixes.allocate_any(32))
+
+    def test_allocate_specific(self):
+        free_prefixes = subnet_alloc.FreePrefixes(['10.0.0.0/16'], [])
+        self.assertTrue(free_prefixes.allocate_specific(
+            netaddr.IPNetwork('10.0.5.0/24')))
+        self.assertFalse(free_prefixes.allocate_specific(
+            netaddr.IPNetwork('10.0.4.0/23')))
+        self.assertFalse(free_prefixes.allocate_specific(
+            netaddr.IPNetwork('10.1.0.0/24')))
+        self.assertEqual(netaddr.IPNetwork('10.0.4.0/24'),
+                         free_prefixes.allocate_any(24))
+
+    def test_allocate_any_large_ipv6_pool(self):
+        free_prefixes = subnet_alloc.FreePrefixes(
+            ['2001:db8::/32'], ['2001:db8::/64'])
+        self.assertEqual(netaddr.IPNetwork('2001:db8:0:1::/64'),
+                         free_prefixes.allocate_any(64))
+        self.assertEqual(netaddr.IPNetwork('2001:db8:1::/48'),
+                         free_prefixes.allocate_any(48))
@@ -53,6 +53,20 @@ class GetObjectsTestCase(test_base.BaseTestCase):
             limit=limit,
             marker_obj=get_object.return_value)
 
+    def test_get_objects_marker_with_sort_values(self):
+        ctxt = context.get_admin_context()
+        marker = mock.Mock(spec=['sort_values'], sort_values={'id': 'id1'})
+        pager = base.Pager(marker=marker, limit=mock.sentinel.limit)
+
+        with mock.patch.object(
+                model_query, 'get_collection') as get_collection:
+            with mock.patch.object(api, 'get_object') as get_object:
+                api.get_objects(FakeObj, ctxt, _pager=pager)
+        # the marker object is not retrieved
+        self.assertFalse(get_object.called)
+        marker_obj = get_collection.call_args[1]['marker_obj']
+        self.assertEqual('id1', marker_obj.id)
+
 
 class CreateObjectTestCase(test_base.BaseTestCase):
     def test_populate_id(self, populate_id=True):
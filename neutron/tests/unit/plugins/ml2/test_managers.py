@@ -125,3 +125,30 @@ class TestMechManager(base.BaseTestCase):
 
     def test_port_precommit(self):
         self._check_resource('port')
+
+    def test_port_precommit_bulk(self):
+        fake_ctxts = [mock.Mock(), mock.Mock()]
+        with mock.patch.object(mechanism_test.TestMechanismDriver,
+                               'create_port_precommit') as precommit:
+            self._manager.create_port_precommit_bulk(fake_ctxts)
+        precommit.assert_has_calls([mock.call(ctxt) for ctxt in fake_ctxts])
+
+        with mock.patch.object(mechanism_test.TestMechanismDriver,
+                               'create_port_precommit_bulk',
+                               create=True) as precommit_bulk:
+            self._manager.create_port_precommit_bulk(fake_ctxts)
+        precommit_bulk.assert_called_once_with(fake_ctxts)
+
+        with mock.patch.object(mechanism_test.TestMechanismDriver,
+                               'create_port_precommit_bulk', create=True,
+                               side_effect=db_exc.DBDeadlock()):
+            self.assertRaises(db_exc.DBDeadlock,
+                              self._manager.create_port_precommit_bulk,
+                              fake_ctxts)
+
+        with mock.patch.object(mechanism_test.TestMechanismDriver,
+                               'create_port_precommit',
+                               side_effect=RuntimeError()):
+            self.assertRaises(ml2_exc.MechanismDriverError,
+                              self._manager.create_port_precommit_bulk,
+                              fake_ctxts)
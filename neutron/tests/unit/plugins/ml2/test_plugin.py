@@ -44,6 +44,7 @@ import webob
 
 from neutron._i18n import _
 from neutron.common import utils
+from neutron.db import _model_query as model_query
 from neutron.db import agents_db
 from neutron.db import api as db_api
 from neutron.db import provisioning_blocks
@@ -710,7 +711,143 @@ class TestMl2DbOperationBoundsTenantRbac(TestMl2DbOperationBoundsTenant):
             self.make_port_in_shared_network, 'ports')
 
 
-class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
+class TestMl2LoadingProfiles(Ml2PluginV2TestCase):
+    """Query count benchmark of the relationship loading profiles.
+
+    The number of statements run by the main list and get operations of the
+    plugin must not grow with the number of objects, and must not be higher
+    with the loading profiles than without them.
+    """
+
+    PROFILES = (None, model_query.API_LIST, model_query.RPC_AGENT)
+
+    def setUp(self):
+        super(TestMl2LoadingProfiles, self).setUp()
+        self.plugin = directory.get_plugin()
+        self._statements = []
+
+        def _record(conn, clauseelement, *args, **kwargs):
+            self._statements.append(str(clauseelement))
+
+        engine = db_api.context_manager.writer.get_engine()
+        lib_db_api.sqla_listen(engine, 'after_execute', _record)
+
+    def _make_network_with_ports(self, num_ports):
+        net = self._make_network(self.fmt, 'net', True)
+        self._make_subnet(self.fmt, net, '10.0.0.1', '10.0.0.0/24')
+        ports = [self._make_port(self.fmt, net['network']['id'])['port']
+                 for _index in range(num_ports)]
+        return net['network'], ports
+
+    def _count_statements(self, profile, method, *args, **kwargs):
+        # a new context to not reuse the objects loaded by another call
+        ctx = context.get_admin_context()
+        self._statements = []
+        with model_query.loading_profile(ctx, profile):
+            getattr(self.plugin, method)(ctx, *args, **kwargs)
+        return len(self._statements)
+
+    def _count_list_statements(self):
+        return {(profile, method): self._count_statements(profile, method)
+                for profile in self.PROFILES
+                for method in ('get_networks', 'get_subnets', 'get_ports')}
+
+    def test_list_queries_constant(self):
+        self._make_network_with_ports(1)
+        counts = self._count_list_statements()
+        self._make_network_with_ports(3)
+        self.assertEqual(counts, self._count_list_statements())
+
+    def test_list_queries_profiles(self):
+        self._make_network_with_ports(2)
+        counts = self._count_list_statements()
+        for method in ('get_networks', 'get_subnets', 'get_ports'):
+            for profile in (model_query.API_LIST, model_query.RPC_AGENT):
+                self.assertLessEqual(counts[(profile, method)],
+                                     counts[(None, method)])
+        # the binding levels are not loaded to list the ports, nor the
+        # standard attributes of the network to list the subnets
+        for method in ('get_subnets', 'get_ports'):
+            self.assertLess(counts[(model_query.API_LIST, method)],
+                            counts[(None, method)])
+
+    def test_get_queries_profiles(self):
+        net, ports = self._make_network_with_ports(1)
+        for method, object_id in (('get_network', net['id']),
+                                  ('get_port', ports[0]['id'])):
+            count = self._count_statements(None, method, object_id)
+            for profile in (model_query.API_LIST, model_query.RPC_AGENT):
+                self.assertLessEqual(
+                    self._count_statements(profile, method, object_id),
+                    count)
+
+
+class Ml2BulkPortsFailureTestMixin(object):
+    """Injects the bulk failures in the creation of the ML2 ports.
+
+    The ports of a bulk request are not created by _create_port_db, the
+    failure is injected in the processing of the second port instead.
+    """
+
+    def _test_create_ports_bulk_plugin_failure(self):
+        plugin = directory.get_plugin()
+        with self.network() as net:
+            orig = plugin.extension_manager.process_create_port
+            with mock.patch.object(plugin.extension_manager,
+                                   'process_create_port') as patched:
+
+                def side_effect(*args, **kwargs):
+                    return self._fail_second_call(patched, orig,
+                                                  *args, **kwargs)
+
+                patched.side_effect = side_effect
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True)
+                # We expect a 500 as we injected a fault in the plugin
+                self._validate_behavior_on_bulk_failure(
+                    res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_create_ports_bulk_emulated_plugin_failure(self):
+        real_has_attr = hasattr
+
+        # ensures the API choose the emulation code path
+        def fakehasattr(item, attr):
+            if attr.endswith('__native_bulk_support'):
+                return False
+            return real_has_attr(item, attr)
+
+        with mock.patch('six.moves.builtins.hasattr', new=fakehasattr):
+            self._test_create_ports_bulk_plugin_failure()
+
+    def test_create_ports_bulk_native_plugin_failure(self):
+        self._test_create_ports_bulk_plugin_failure()
+
+
+class TestMl2PortsV2(Ml2BulkPortsFailureTestMixin, test_plugin.TestPortsV2,
+                     Ml2PluginV2TestCase):
+
+    def _list_ports_and_record_queries(self, query_params=None):
+        statements = []
+
+        def _record(conn, clauseelement, *args, **kwargs):
+            statements.append(str(clauseelement))
+
+        engine = db_api.context_manager.writer.get_engine()
+        lib_db_api.sqla_listen(engine, 'after_execute', _record)
+        ports = self._list('ports', query_params=query_params)['ports']
+        return ports, statements
+
+    def test_list_ports_fields_queries(self):
+        with self.port():
+            ports, statements = self._list_ports_and_record_queries()
+            fields_ports, fields_statements = (
+                self._list_ports_and_record_queries(
+                    query_params='fields=id&fields=name'))
+        self.assertEqual([{'id': port['id'], 'name': port['name']}
+                          for port in ports], fields_ports)
+        # the relationships only needed for the other fields are not loaded
+        self.assertLess(len(fields_statements), len(statements))
 
     def test__port_provisioned_with_blocks(self):
         plugin = directory.get_plugin()
@@ -1043,6 +1180,40 @@ class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
                 self._validate_behavior_on_bulk_failure(
                     res, 'ports', webob.exc.HTTPServerError.code)
 
+    def test_create_ports_bulk_mech_driver_batch_calls(self):
+        plugin = directory.get_plugin()
+        with self.network() as net, self.subnet(network=net),\
+                mock.patch.object(plugin.mechanism_manager,
+                                  'create_port_precommit') as precommit,\
+                mock.patch.object(plugin.mechanism_manager,
+                                  'create_port_precommit_bulk') as pre_bulk,\
+                mock.patch.object(plugin.mechanism_manager,
+                                  'create_port_postcommit_bulk') as post_bulk:
+            res = self._create_port_bulk(self.fmt, 3, net['network']['id'],
+                                         'test', True)
+            ports = self.deserialize(self.fmt, res)['ports']
+
+        self.assertEqual(3, len(ports))
+        self.assertEqual(3, len({p['fixed_ips'][0]['ip_address']
+                                 for p in ports}))
+        self.assertFalse(precommit.called)
+        pre_bulk.assert_called_once_with(mock.ANY)
+        post_bulk.assert_called_once_with(mock.ANY)
+        self.assertEqual([p['id'] for p in ports],
+                         [c.current['id'] for c in pre_bulk.call_args[0][0]])
+
+    def test_create_ports_bulk_postcommit_failure(self):
+        plugin = directory.get_plugin()
+        with self.network() as net,\
+                mock.patch.object(plugin.mechanism_manager,
+                                  'create_port_postcommit_bulk',
+                                  side_effect=ml2_exc.MechanismDriverError(
+                                      method='create_port_postcommit')):
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True)
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPServerError.code)
+
     def test_create_ports_bulk_with_sec_grp(self):
         ctx = context.get_admin_context()
         plugin = directory.get_plugin()
@@ -1460,7 +1631,8 @@ class TestMl2PortsV2WithRevisionPlugin(Ml2PluginV2TestCase):
                              after_2['revision_number'])
 
 
-class TestMl2PortsV2WithL3(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
+class TestMl2PortsV2WithL3(Ml2BulkPortsFailureTestMixin,
+                           test_plugin.TestPortsV2, Ml2PluginV2TestCase):
     """For testing methods that require the L3 service plugin."""
 
     l3_plugin = 'neutron.services.l3_router.l3_router_plugin.L3RouterPlugin'
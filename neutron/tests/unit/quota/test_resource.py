@@ -21,6 +21,7 @@ from oslo_config import cfg
 from oslo_utils import uuidutils
 import testtools
 
+from neutron.db import _model_query as model_query
 from neutron.db.quota import api as quota_api
 from neutron.quota import resource
 from neutron.tests import base
@@ -328,6 +329,96 @@ class TestTrackedResource(testlib_api.SqlTestCase):
             mock_set_quota_usage.assert_called_once_with(
                 self.context, self.resource, self.tenant_id, in_use=2)
 
+    def _get_usage(self, tenant_id=None):
+        return quota_api.get_quota_usage_by_resource_and_tenant(
+            self.context, self.resource, tenant_id or self.tenant_id)
+
+    def test_add_delete_data_updates_usage_with_deltas(self):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = self._create_resource()
+        quota_api.set_quota_usage(
+            self.context, self.resource, self.tenant_id, in_use=0)
+        self._add_data()
+        self.assertFalse(res._dirty_tenants)
+        self.assertEqual(2, self._get_usage().used)
+        self.assertFalse(self._get_usage().dirty)
+        self._delete_data()
+        self.assertFalse(res._dirty_tenants)
+        self.assertEqual(0, self._get_usage().used)
+
+    def test_add_data_dirty_usage_with_deltas(self):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = self._create_resource()
+        quota_api.set_quota_usage(
+            self.context, self.resource, self.tenant_id, in_use=0)
+        quota_api.set_quota_usage_dirty(
+            self.context, self.resource, self.tenant_id)
+        self._add_data()
+        self.assertIn(self.tenant_id, res._dirty_tenants)
+        self.assertEqual(0, self._get_usage().used)
+
+    def test_add_data_no_usage_with_deltas(self):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = self._create_resource()
+        self._add_data()
+        self.assertIn(self.tenant_id, res._dirty_tenants)
+        self.assertIsNone(self._get_usage())
+
+    def test_count_used_no_resync_sets_usage_with_deltas(self):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = self._create_resource()
+        self._add_data()
+        self.assertEqual(
+            2, res.count_used(self.context, self.tenant_id,
+                              resync_usage=False))
+        self.assertNotIn(self.tenant_id, res._dirty_tenants)
+        self.assertEqual(2, self._get_usage().used)
+        self.assertFalse(self._get_usage().dirty)
+        # the usage is now updated by the records added
+        self._add_data()
+        self.assertEqual(
+            4, res.count_used(self.context, self.tenant_id,
+                              resync_usage=False))
+        self.assertEqual(4, self._get_usage().used)
+
+    def test_check_usages(self):
+        res = self._create_resource()
+        self._add_data()
+        self._add_data('someone_else')
+        admin_context = context.get_admin_context()
+        quota_api.set_quota_usage(
+            admin_context, self.resource, self.tenant_id, in_use=2)
+        quota_api.set_quota_usage(
+            admin_context, self.resource, 'someone_else', in_use=1)
+        self.assertEqual(['someone_else'], res.check_usages(admin_context))
+        usages = quota_api.get_quota_usage_by_resource(
+            admin_context, self.resource)
+        self.assertEqual({self.tenant_id: False, 'someone_else': True},
+                         dict((usage.tenant_id, usage.dirty)
+                              for usage in usages))
+
+    def test_check_usages_reserved_with_deltas(self):
+        self.config(track_quota_usage_deltas=True, group='QUOTAS')
+        res = self._create_resource()
+        admin_context = context.get_admin_context()
+        quota_api.set_quota_usage(
+            admin_context, self.resource, self.tenant_id, in_use=0)
+        quota_api.set_quota_usage(
+            admin_context, self.resource, 'someone_else', in_use=0)
+        # the reservation is not included in the quantity reserved
+        quota_api.create_reservation(
+            admin_context, 'someone_else', {self.resource: 1})
+        self.assertEqual(['someone_else'], res.check_usages(admin_context))
+        # and it is when the usage is synchronized
+        quota_api.set_quota_usage(
+            admin_context, self.resource, 'someone_else', in_use=0)
+        self.assertEqual({'someone_else': 1, self.tenant_id: 0},
+                         quota_api.get_reserved_quota_usages(
+                             admin_context, self.resource))
+        self.assertFalse(quota_api.get_quota_usage_by_resource_and_tenant(
+            admin_context, self.resource, 'someone_else').dirty)
+        self.assertEqual([], res.check_usages(admin_context))
+
 
 class Test_CountResource(base.BaseTestCase):
 
@@ -369,3 +460,16 @@ class Test_CountResource(base.BaseTestCase):
         tenant_id = 'fakeid'
         self.assertEqual(
             10, resource._count_resource(context, collection_name, tenant_id))
+
+    def test_count_exact(self):
+        plugin = mock.Mock()
+        plugin.get_floatingips_count.side_effect = (
+            lambda context, filters: context.count_mode)
+        directory.add_plugin(constants.CORE, plugin)
+
+        context = mock.Mock(count_mode=None)
+        # the cached counts are not used to enforce the quotas
+        self.assertEqual(
+            model_query.EXACT_COUNT,
+            resource._count_resource(context, 'floatingips', 'fakeid'))
+        self.assertIsNone(context.count_mode)
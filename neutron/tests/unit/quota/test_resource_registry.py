@@ -62,6 +62,16 @@ class TestResourceRegistry(base.DietTestCase):
         self.test_set_tracked_resource_new_resource()
         self._test_register_resource_by_name('meh', resource.TrackedResource)
 
+    def test_register_resource_by_name_tracked_twice(self):
+        self.test_register_resource_by_name_tracked()
+        res = self.registry.get_resource('meh')
+        with mock.patch.object(resource.TrackedResource,
+                               'register_events') as mock_register:
+            self.registry.register_resource_by_name('meh')
+            # the registered resource keeps tracking the usage
+            self.assertFalse(mock_register.called)
+        self.assertIs(res, self.registry.get_resource('meh'))
+
     def test_register_resource_by_name_not_tracked(self):
         self._test_register_resource_by_name('meh', resource.CountableResource)
 
@@ -164,3 +174,12 @@ class TestAuxiliaryFunctions(base.DietTestCase):
             res._dirty_tenants.add('tenant_id')
             resource_registry.set_resources_dirty(ctx)
             mock_mark_dirty.assert_called_once_with(ctx)
+
+    def test_check_resources_usage(self):
+        with mock.patch('neutron.quota.resource.'
+                        'TrackedResource.check_usages') as mock_check:
+            self.registry.set_tracked_resource('meh', test_quota.MehModel)
+            self.registry.register_resource_by_name('meh')
+            self.registry.register_resource_by_name('othermeh')
+            resource_registry.check_resources_usage(mock.ANY)
+            mock_check.assert_called_once_with(mock.ANY)
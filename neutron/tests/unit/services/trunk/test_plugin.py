@@ -101,6 +101,29 @@ class TrunkPluginTestCase(test_plugin.Ml2PluginV2TestCase):
                               self.trunk_plugin.delete_trunk,
                               self.context, trunk['id'])
 
+    def test_get_ports_trunk_details(self):
+        core_plugin = directory.get_plugin()
+        with self.port() as parent1, self.port() as parent2, \
+                self.port() as child1, self.port() as child2:
+            trunk1 = self._create_test_trunk(
+                parent1, [create_subport_dict(child1['port']['id'])])
+            trunk2 = self._create_test_trunk(
+                parent2, [create_subport_dict(child2['port']['id'])])
+            with mock.patch.object(core_plugin, 'get_ports',
+                                   wraps=core_plugin.get_ports) as get_ports:
+                ports = {port['id']: port for port in get_ports(
+                    self.context, fields=['id', 'trunk_details'])}
+            for trunk, parent, child in ((trunk1, parent1, child1),
+                                         (trunk2, parent2, child2)):
+                subport = create_subport_dict(child['port']['id'])
+                subport['mac_address'] = child['port']['mac_address']
+                self.assertEqual(
+                    {'trunk_id': trunk['id'], 'sub_ports': [subport]},
+                    ports[parent['port']['id']]['trunk_details'])
+            self.assertNotIn('trunk_details', ports[child1['port']['id']])
+            # the subports of all the trunks are retrieved at once
+            self.assertEqual(2, get_ports.call_count)
+
     def _test_trunk_create_notify(self, event):
         with self.port() as parent_port:
             callback = register_mock_callback(constants.TRUNK, event)
@@ -622,3 +622,218 @@ class NeutronPolicyTestCase(base.BaseTestCase):
         result = policy.enforce(self.context, action, target)
         mock_get_plugin.assert_called_with('registered_plugin_name')
         self.assertTrue(result)
+
+    def _test_compiled_check(self, context, action, targets, **kwargs):
+        compiled_check = policy.CompiledCheck(context, action, **kwargs)
+        expected = [target for target in targets
+                    if policy.check(context, action, dict(target), **kwargs)]
+        self.assertEqual(expected, compiled_check.filter(targets))
+        self.assertEqual([target in expected for target in targets],
+                         [compiled_check(target) for target in targets])
+        return compiled_check
+
+    def test_compiled_check_matches_check(self):
+        targets = [{'tenant_id': 'fake', 'shared': False},
+                   {'tenant_id': 'somebody_else', 'shared': True},
+                   {'tenant_id': 'somebody_else', 'shared': False}]
+        for roles in (['user'], ['user', 'advsvc']):
+            ctx = context.Context('', 'fake', roles=roles)
+            for action in ('get_network', 'get_port', 'delete_port'):
+                self._test_compiled_check(ctx, action, targets)
+
+    def test_compiled_check_target_dependent(self):
+        compiled_check = self._test_compiled_check(
+            self.context, 'get_port',
+            [{'tenant_id': 'fake'}, {'tenant_id': 'somebody_else'}])
+        self.assertIsNone(compiled_check.result)
+
+    def test_compiled_check_target_independent(self):
+        advsvc_context = context.Context('', 'fake', roles=['advsvc'])
+        compiled_check = self._test_compiled_check(
+            advsvc_context, 'get_port', [{'tenant_id': 'somebody_else'}])
+        self.assertTrue(compiled_check.result)
+        self._set_rules(get_port='rule:context_is_admin')
+        self.fakepolicyinit()
+        compiled_check = self._test_compiled_check(
+            self.context, 'get_port', [{'tenant_id': 'fake'}])
+        self.assertFalse(compiled_check.result)
+
+    def test_compiled_check_admin(self):
+        compiled_check = policy.CompiledCheck(
+            context.get_admin_context(), 'get_port')
+        self.assertTrue(compiled_check.result)
+
+    def test_compiled_check_not_rule(self):
+        self._set_rules(get_port='not rule:context_is_advsvc and '
+                                 'not rule:network_device')
+        self.fakepolicyinit()
+        self._test_compiled_check(
+            self.context, 'get_port',
+            [{'device_owner': 'network:dhcp'}, {'device_owner': 'compute'}])
+
+    def test_compiled_check_default_rule(self):
+        self._set_rules(default='rule:admin_or_owner')
+        self.fakepolicyinit()
+        self._test_compiled_check(
+            self.context, 'get_foo',
+            [{'tenant_id': 'fake'}, {'tenant_id': 'somebody_else'}])
+
+    def test_compiled_check_might_not_exist(self):
+        compiled_check = policy.CompiledCheck(
+            self.context, 'get_port:foo', might_not_exist=True)
+        self.assertTrue(compiled_check.result)
+
+    def test_compiled_check_parent_resource(self):
+        target = {'network_id': 'whatever'}
+        with mock.patch.object(directory.get_plugin(), 'get_network',
+                               return_value={'tenant_id': 'fake'}):
+            compiled_check = policy.CompiledCheck(self.context,
+                                                  'create_port:mac')
+            self.assertTrue(compiled_check(target))
+
+    def test_compiled_check_attribute_based_action(self):
+        compiled_check = self._test_compiled_check(
+            self.context, 'create_network',
+            [{'tenant_id': 'fake', 'shared': False},
+             {'tenant_id': 'fake', 'shared': True}])
+        self.assertIsNone(compiled_check.result)
+
+    def test_prefetch_parent_resources(self):
+        plugin = directory.get_plugin()
+        networks = [{'id': 'net1', 'tenant_id': 'fake'},
+                    {'id': 'net2', 'tenant_id': 'somebody_else'}]
+        targets = [{'network_id': 'net1', 'mac': 'mac1'},
+                   {'network_id': 'net2', 'mac': 'mac2'},
+                   {'network_id': 'net1', 'mac': 'mac3'}]
+        with mock.patch.object(plugin, 'get_networks',
+                               return_value=networks) as get_networks, \
+                mock.patch.object(plugin, 'get_network') as get_network:
+            policy.prefetch_parent_resources(self.context, 'create_port',
+                                             targets)
+            results = [policy.check(self.context, 'create_port:mac', target)
+                       for target in targets]
+        self.assertEqual([True, False, True], results)
+        # the parents are kept in the memo of the request
+        for target in targets:
+            self.assertNotIn('network:tenant_id', target)
+        get_networks.assert_called_once_with(
+            mock.ANY, filters={'id': mock.ANY},
+            fields=['id', 'tenant_id'])
+        self.assertEqual(
+            {'net1', 'net2'},
+            set(get_networks.call_args[1]['filters']['id']))
+        get_network.assert_not_called()
+
+    def test_prefetch_parent_resources_compiled_check(self):
+        self._set_rules(get_port="rule:admin_or_network_owner")
+        self.fakepolicyinit()
+        plugin = directory.get_plugin()
+        networks = [{'id': 'net1', 'tenant_id': 'fake'},
+                    {'id': 'net2', 'tenant_id': 'somebody_else'}]
+        targets = [{'id': 'port1', 'network_id': 'net1'},
+                   {'id': 'port2', 'network_id': 'net2'}]
+        with mock.patch.object(plugin, 'get_networks',
+                               return_value=networks), \
+                mock.patch.object(plugin, 'get_network') as get_network:
+            policy.prefetch_parent_resources(self.context, 'get_port',
+                                             targets)
+            allowed = policy.CompiledCheck(self.context,
+                                           'get_port').filter(targets)
+        self.assertEqual([targets[0]], allowed)
+        self.assertEqual({'id': 'port1', 'network_id': 'net1'}, targets[0])
+        get_network.assert_not_called()
+
+    def test_prefetch_parent_resources_unset_attributes(self):
+        plugin = directory.get_plugin()
+        with mock.patch.object(plugin, 'get_networks') as get_networks:
+            policy.prefetch_parent_resources(
+                self.context, 'create_port',
+                [{'network_id': 'net1'},
+                 {'network_id': 'net2', 'mac': constants.ATTR_NOT_SPECIFIED}])
+        get_networks.assert_not_called()
+
+    def test_prefetch_parent_resources_memo(self):
+        plugin = directory.get_plugin()
+        networks = [{'id': 'net1', 'tenant_id': 'fake'}]
+        targets = [{'network_id': 'net1', 'mac': 'mac1'},
+                   {'network_id': 'net1', 'mac': 'mac2'}]
+        with mock.patch.object(plugin, 'get_networks',
+                               return_value=networks) as get_networks:
+            policy.prefetch_parent_resources(self.context, 'create_port',
+                                             targets)
+            policy.prefetch_parent_resources(self.context, 'create_port',
+                                             targets)
+        get_networks.assert_called_once_with(
+            mock.ANY, filters={'id': ['net1']}, fields=['id', 'tenant_id'])
+        # the memo is scoped to the context of the request
+        other_context = context.Context('fake', 'fake', roles=['user'])
+        with mock.patch.object(plugin, 'get_network',
+                               return_value={'tenant_id': 'fake'}) as get:
+            self.assertTrue(policy.check(other_context, 'create_port:mac',
+                                         dict(targets[0])))
+        get.assert_called_once_with(mock.ANY, 'net1', fields=['tenant_id'])
+
+    def test_prefetch_parent_resources_admin(self):
+        plugin = directory.get_plugin()
+        with mock.patch.object(plugin, 'get_networks') as get_networks:
+            policy.prefetch_parent_resources(
+                context.get_admin_context(), 'create_port',
+                [{'network_id': 'net1'}, {'network_id': 'net2'}])
+        get_networks.assert_not_called()
+
+    def test_prefetch_parent_resources_single_target(self):
+        plugin = directory.get_plugin()
+        with mock.patch.object(plugin, 'get_networks') as get_networks:
+            policy.prefetch_parent_resources(
+                self.context, 'create_port', [{'network_id': 'net1'}])
+        get_networks.assert_not_called()
+
+    def test_prefetch_parent_resources_missing_parent(self):
+        plugin = directory.get_plugin()
+        target = {'network_id': 'net1', 'mac': 'mac1'}
+        with mock.patch.object(plugin, 'get_networks', return_value=[]), \
+                mock.patch.object(plugin, 'get_network',
+                                  return_value={'tenant_id': 'fake'}):
+            policy.prefetch_parent_resources(
+                self.context, 'create_port',
+                [target, {'network_id': 'net2', 'mac': 'mac2'}])
+            self.assertNotIn('network:tenant_id', target)
+            # the parent is looked up by the check itself
+            self.assertTrue(policy.check(self.context, 'create_port:mac',
+                                         target))
+
+    def test_prefetch_parent_resources_failure(self):
+        plugin = directory.get_plugin()
+        target = {'network_id': 'net1', 'mac': 'mac1'}
+        with mock.patch.object(plugin, 'get_networks',
+                               side_effect=NotImplementedError) as get:
+            policy.prefetch_parent_resources(
+                self.context, 'create_port',
+                [target, {'network_id': 'net2', 'mac': 'mac2'}])
+        get.assert_called_once_with(mock.ANY, filters=mock.ANY,
+                                    fields=['id', 'tenant_id'])
+        self.assertEqual({}, getattr(self.context, policy._PARENTS_MEMO))
+
+    @mock.patch("neutron.common.constants.EXT_PARENT_RESOURCE_MAPPING",
+                {'parentresource': 'registered_plugin_name'})
+    @mock.patch("neutron_lib.plugins.directory.get_plugin")
+    def test_prefetch_parent_resources_ext_parent(self, mock_get_plugin):
+        mock_plugin = mock.Mock()
+        mock_plugin.get_parentresources.return_value = [
+            {'id': 'parent1', 'tenant_id': 'fake'}]
+        mock_get_plugin.return_value = mock_plugin
+        self._set_rules(
+            admin_or_ext_parent_owner="rule:context_is_admin or "
+                                      "tenant_id:%(ext_parent:tenant_id)s",
+            create_parentresource_subresource="rule:admin_or_ext_parent_owner")
+        self.fakepolicyinit()
+        targets = [{'ext_parent_parentresource_id': 'parent1'}
+                   for _i in range(3)]
+        policy.prefetch_parent_resources(
+            self.context, 'create_parentresource_subresource', targets)
+        for target in targets:
+            self.assertTrue(policy.enforce(
+                self.context, 'create_parentresource_subresource', target))
+        mock_get_plugin.assert_called_with('registered_plugin_name')
+        self.assertEqual(1, mock_plugin.get_parentresources.call_count)
+        mock_plugin.get_parentresource.assert_not_called()
@@ -0,0 +1,42 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from rally.common import validation
+from rally.task import atomic
+from rally_openstack import consts
+from rally_openstack import scenario
+from rally_openstack.scenarios.neutron import utils
+
+
+"""Scenarios for the bulk creation of ports."""
+
+
+@validation.add("required_services", services=[consts.Service.NEUTRON])
+@validation.add("required_platform", platform="openstack", users=True)
+@scenario.configure(context={"cleanup@openstack": ["neutron"]},
+                    name="NeutronPorts.create_bulk_ports")
+class BulkPortCreation(utils.NeutronScenario):
+
+    def run(self, port_count=1000, cidr='10.0.0.0/16'):
+        net = self._create_network({})
+        self._create_subnet(net, {'cidr': cidr})
+        port_payload = [{'network_id': net['network']['id'],
+                         'name': self.generate_random_name()}
+                        for i in range(port_count)]
+        ports = self._create_bulk_ports(port_payload)
+        self.assertEqual(port_count, len(ports))
+
+    @atomic.action_timer("neutron.create_bulk_ports")
+    def _create_bulk_ports(self, port_payload):
+        return self.clients("neutron").create_port(
+            {'ports': port_payload})['ports']
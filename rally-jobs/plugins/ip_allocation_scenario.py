@@ -0,0 +1,42 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from rally.common import validation
+from rally.task import atomic
+from rally_openstack import consts
+from rally_openstack import scenario
+from rally_openstack.scenarios.neutron import utils
+
+
+"""Scenarios for the concurrent allocation of the addresses of a subnet."""
+
+
+@validation.add("required_services", services=[consts.Service.NEUTRON])
+@validation.add("required_platform", platform="openstack", users=True)
+@validation.add("required_contexts", contexts=["network"])
+@scenario.configure(context={"cleanup@openstack": ["neutron"]},
+                    name="NeutronPorts.create_ports_on_shared_subnet")
+class SharedSubnetPortCreation(utils.NeutronScenario):
+
+    def run(self):
+        # all the iterations of a tenant allocate their addresses in the
+        # subnet of the network created by the network context
+        network = self.context["tenant"]["networks"][0]
+        port = self._create_shared_subnet_port(network["id"])
+        self.assertEqual(1, len(port['fixed_ips']))
+
+    @atomic.action_timer("neutron.create_port_on_shared_subnet")
+    def _create_shared_subnet_port(self, network_id):
+        return self.clients("neutron").create_port(
+            {'port': {'network_id': network_id,
+                      'name': self.generate_random_name()}})['port']